@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: plain LRU vs LRU with TinyLFU admission
+
+Replays a stream of search keys against LRUCacheWithTTL with and without
+the frequency-sketch admission filter (get, and set on miss) and reports
+the hit rate for several cache sizes.
+
+The stream comes from a SearchAnalyticsTracker file (--trace, the
+'events' list of search_analytics.json). Without one, a synthetic trace is
+generated: Zipf-distributed searches over popular routes mixed with
+one-off queries for random IATA pairs and months.
+
+Usage:
+    python scripts/benchmarks/bench_cache_admission.py [--trace search_analytics.json]
+                                                       [--sizes 100,500,1000]
+"""
+
+import os
+import sys
+import json
+import random
+import argparse
+from itertools import product
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'features'))
+
+from search_cache import LRUCacheWithTTL, canonical_params  # noqa: E402
+
+AIRPORTS = ['MAD', 'BCN', 'AGP', 'PMI', 'SVQ', 'VLC', 'BIO', 'LIS', 'OPO', 'CDG', 'ORY', 'LHR',
+            'LGW', 'FCO', 'MXP', 'BER', 'AMS', 'BRU', 'DUB', 'ZRH', 'VIE', 'PRG', 'ATH', 'IST',
+            'JFK', 'MIA', 'BOG', 'MEX', 'EZE', 'GRU', 'LIM', 'SCL', 'CUN', 'HAV', 'NRT', 'DXB']
+MONTHS = [f"2026-{m:02d}" for m in range(1, 13)]
+
+
+def search_key(method, params):
+    return f"search:{method}:{json.dumps(canonical_params(params), sort_keys=True)}"
+
+
+def load_trace(path):
+    """Search keys from a SearchAnalyticsTracker storage file"""
+    with open(path, 'r', encoding='utf-8') as f:
+        events = json.load(f).get('events', [])
+    return [search_key(e['method'], e['params']) for e in events]
+
+
+def synthetic_trace(length, hot_routes=300, one_off_share=0.5, seed=7):
+    """Zipf traffic over hot routes interleaved with one-off exotic queries"""
+    rng = random.Random(seed)
+    pairs = [p for p in product(AIRPORTS, AIRPORTS) if p[0] != p[1]]
+    rng.shuffle(pairs)
+    hot = [('flexible_dates', {'origin': o, 'destination': d, 'month': m})
+           for (o, d), m in zip(pairs[:hot_routes], rng.choices(MONTHS[2:5], k=hot_routes))]
+    weights = [1 / (rank + 1) for rank in range(len(hot))]
+
+    trace = []
+    for _ in range(length):
+        if rng.random() < one_off_share:
+            origin, dest = rng.sample(AIRPORTS, 2)
+            params = {'origin': origin, 'destination': dest,
+                      'date': f"{rng.choice(MONTHS)}-{rng.randint(1, 28):02d}"}
+            trace.append(search_key(rng.choice(('nonstop_only', 'redeye', 'group_booking')), params))
+        else:
+            trace.append(search_key(*rng.choices(hot, weights)[0]))
+    return trace
+
+
+def replay(trace, size, admission):
+    cache = LRUCacheWithTTL(max_size=size, default_ttl=86400, admission=admission)
+    hits = 0
+    for key in trace:
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, True)
+    return hits / len(trace), cache.admission_rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--trace', help="search_analytics.json to replay")
+    parser.add_argument('--length', type=int, default=100000, help="synthetic trace length")
+    parser.add_argument('--sizes', default='50,100,200,400')
+    args = parser.parse_args()
+
+    trace = load_trace(args.trace) if args.trace else synthetic_trace(args.length)
+    print(f"Replaying {len(trace):,} searches ({len(set(trace)):,} distinct keys)")
+    print(f"{'size':>6} {'LRU hit %':>10} {'TinyLFU hit %':>14} {'rejected':>10}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        lru, _ = replay(trace, size, admission=False)
+        tinylfu, rejected = replay(trace, size, admission=True)
+        print(f"{size:>6} {lru * 100:>10.1f} {tinylfu * 100:>14.1f} {rejected:>10,}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: LRUCacheWithTTL expiry cleanup
+
+Compares the legacy full-scan cleanup_expired() (walks every key under the
+lock) with the heap-indexed batched cleanup. For each cache size, half the
+entries are expired and a reader thread calls get() in a loop while the
+cleanup runs; the report shows the longest single lock hold and the worst
+get() latency seen by the reader.
+
+Usage:
+    python scripts/benchmarks/bench_cache_cleanup.py [--sizes 10000,100000]
+"""
+
+import os
+import sys
+import time
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'features'))
+
+from search_cache import LRUCacheWithTTL  # noqa: E402
+
+
+class TimedLock:
+    """RLock wrapper that records the longest outermost hold time"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._depth = 0
+        self._acquired_at = 0.0
+        self.max_hold = 0.0
+
+    def __enter__(self):
+        self._lock.acquire()
+        self._depth += 1
+        if self._depth == 1:
+            self._acquired_at = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self._depth -= 1
+        if self._depth == 0:
+            self.max_hold = max(self.max_hold, time.perf_counter() - self._acquired_at)
+        self._lock.release()
+
+
+class LegacyLRUCache(LRUCacheWithTTL):
+    """Full-scan cleanup as shipped before the expiry index"""
+
+    def cleanup_expired(self, batch_size=None):
+        with self.lock:
+            expired_keys = [key for key in self.cache if self._is_expired(key)]
+            for key in expired_keys:
+                self._remove(key)
+        return len(expired_keys)
+
+
+def fill(cache, size):
+    """Insert size entries, half of them already expired"""
+    for i in range(size):
+        cache.set(f"search:flexible_dates:{i:08d}", {'i': i}, ttl=3600)
+    now = time.time()
+    with cache.lock:
+        for i in range(0, size, 2):
+            key = f"search:flexible_dates:{i:08d}"
+            cache.ttl_map[key] = now - 1
+        cache._rebuild_heap()
+
+
+def run(cache_cls, size):
+    cache = cache_cls(max_size=size * 2, default_ttl=3600)
+    cache.SET_EXPIRE_BUDGET = 0  # keep the expired half until cleanup
+    fill(cache, size)
+    cache.lock = TimedLock()
+
+    stop = threading.Event()
+    worst_get = [0.0]
+
+    def reader():
+        i = 1
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            cache.get(f"search:flexible_dates:{i % size:08d}")
+            worst_get[0] = max(worst_get[0], time.perf_counter() - t0)
+            i += 2
+
+    t = threading.Thread(target=reader)
+    t.start()
+    time.sleep(0.05)
+    cache.lock.max_hold = 0.0
+    worst_get[0] = 0.0
+
+    t0 = time.perf_counter()
+    removed = cache.cleanup_expired()
+    total = time.perf_counter() - t0
+
+    stop.set()
+    t.join()
+    return removed, total, cache.lock.max_hold, worst_get[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', default='10000,100000,200000')
+    args = parser.parse_args()
+
+    print(f"{'entries':>9} {'variant':<8} {'removed':>8} {'total ms':>9} "
+          f"{'max lock ms':>12} {'worst get ms':>13}")
+    for size in (int(s) for s in args.sizes.split(',')):
+        for label, cls in (('scan', LegacyLRUCache), ('heap', LRUCacheWithTTL)):
+            removed, total, hold, worst = run(cls, size)
+            print(f"{size:>9} {label:<8} {removed:>8} {total * 1000:>9.1f} "
+                  f"{hold * 1000:>12.2f} {worst * 1000:>13.2f}")
+
+
+if __name__ == '__main__':
+    main()
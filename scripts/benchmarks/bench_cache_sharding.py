@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: single-lock LRUCacheWithTTL vs lock-striped ShardedLRUCache
+
+Each worker thread runs a 90% get / 10% set mix over a shared key space
+for a fixed duration while a cleanup thread keeps calling
+cleanup_expired(), as SearchCacheManager's cleanup loop does. Reports
+total throughput and p99 operation latency per thread count.
+
+On a GIL build of CPython the interpreter lock caps raw throughput, so
+the difference shows mostly in tail latency; on free-threaded builds
+throughput scales with shards as well.
+
+Usage:
+    python scripts/benchmarks/bench_cache_sharding.py [--threads 1,2,4,8] [--shards 16]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'features'))
+
+from search_cache import LRUCacheWithTTL, ShardedLRUCache  # noqa: E402
+
+KEY_SPACE = 50000
+
+
+def run(cache, threads, duration):
+    for i in range(KEY_SPACE // 2):
+        cache.set(f"search:budget:{i}", {'i': i}, ttl=random.choice((0.2, 3600)))
+
+    stop = threading.Event()
+    counts = [0] * threads
+    latencies = [[] for _ in range(threads)]
+
+    def worker(n):
+        rng = random.Random(n)
+        ops = 0
+        samples = latencies[n]
+        while not stop.is_set():
+            key = f"search:budget:{rng.randrange(KEY_SPACE)}"
+            t0 = time.perf_counter()
+            if rng.random() < 0.9:
+                cache.get(key)
+            else:
+                cache.set(key, {'k': key}, ttl=0.5)
+            if ops % 16 == 0:
+                samples.append(time.perf_counter() - t0)
+            ops += 1
+        counts[n] = ops
+
+    def cleaner():
+        while not stop.is_set():
+            cache.cleanup_expired()
+            time.sleep(0.01)
+
+    workers = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    workers.append(threading.Thread(target=cleaner))
+    for t in workers:
+        t.start()
+    time.sleep(duration)
+    stop.set()
+    for t in workers:
+        t.join()
+
+    samples = sorted(s for per_thread in latencies for s in per_thread)
+    p99 = samples[int(len(samples) * 0.99)] if samples else 0.0
+    return sum(counts) / duration, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--threads', default='1,2,4,8')
+    parser.add_argument('--shards', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=1.0)
+    args = parser.parse_args()
+
+    gil = getattr(sys, '_is_gil_enabled', lambda: True)()
+    print(f"Python {sys.version.split()[0]} (GIL {'enabled' if gil else 'disabled'})")
+    print(f"{'threads':>7} {'variant':<12} {'ops/s':>12} {'p99 us':>9}")
+    for threads in (int(t) for t in args.threads.split(',')):
+        variants = (
+            ('single-lock', LRUCacheWithTTL(max_size=KEY_SPACE, default_ttl=300)),
+            (f'{args.shards} shards', ShardedLRUCache(max_size=KEY_SPACE, default_ttl=300,
+                                                      shards=args.shards)),
+        )
+        for label, cache in variants:
+            ops, p99 = run(cache, threads, args.duration)
+            print(f"{threads:>7} {label:<12} {ops:>12,.0f} {p99 * 1e6:>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
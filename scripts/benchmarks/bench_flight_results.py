@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: columnar FlightResultSet vs list comprehensions over FlightResult
+
+Runs the same filter (nonstop, under a price, not red-eye), full sort by
+price and top-10 on N random flights, once over a list of dataclasses and
+once over the columnar set, checks both give the same flights and reports
+the speedup. Conversion costs are shown separately.
+
+Usage:
+    python scripts/benchmarks/bench_flight_results.py [--sizes 10000 100000] [--repeat 5]
+"""
+
+import os
+import sys
+import time
+import heapq
+import random
+import argparse
+from operator import attrgetter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'features'))
+
+from advanced_search_methods import FlightResult  # noqa: E402
+from flight_results import FlightResultSet  # noqa: E402
+
+
+def flights(n, rng):
+    return [FlightResult(origin='MAD', destination='BCN', date='2026-03-15',
+                         price=round(rng.uniform(40, 300), 2),
+                         airline=rng.choice(['IB', 'VY', 'UX', 'FR', 'U2', 'AF']),
+                         flight_number=f"XX{i}",
+                         departure_time=f"{rng.randint(0, 23):02d}:{rng.choice((0, 15, 30, 45)):02d}",
+                         duration_minutes=rng.randint(70, 500), stops=rng.choice((0, 0, 1, 2)))
+            for i in range(n)]
+
+
+def best_ms(fn, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        times.append((time.perf_counter() - start) * 1000)
+    return result, min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10_000, 100_000])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    price = attrgetter('price')
+
+    print(f"{'flights':>8} {'operation':<10} {'list ms':>9} {'columnar ms':>12} {'speedup':>8}")
+    for n in args.sizes:
+        data = flights(n, rng)
+        columnar, build_ms = best_ms(lambda: FlightResultSet.from_results(data), args.repeat)
+        _, back_ms = best_ms(columnar.to_results, args.repeat)
+
+        cases = [
+            ('filter',
+             lambda: [f for f in data if f.stops == 0 and f.price <= 120 and not f.is_redeye()],
+             lambda: columnar.filter(max_price=120, max_stops=0, redeye=False)),
+            ('sort', lambda: sorted(data, key=price), lambda: columnar.sort('price')),
+            ('top-10', lambda: heapq.nsmallest(10, data, key=price), lambda: columnar.top_k(10)),
+        ]
+        for name, listed, vectorized in cases:
+            expected, list_ms = best_ms(listed, args.repeat)
+            actual, col_ms = best_ms(vectorized, args.repeat)
+            if [f.flight_number for f in expected] != actual.column('flight_number').tolist():
+                raise SystemExit(f"{name}: results differ at n={n}")
+            print(f"{n:>8} {name:<10} {list_ms:>9.2f} {col_ms:>12.2f} {list_ms / col_ms:>7.1f}x")
+        print(f"{n:>8} {'convert':<10} {'':>9} {build_ms:>7.1f} in / {back_ms:.1f} out")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Benchmark: multi-city itinerary optimizer runtime vs city count
+
+Times Held-Karp (exact) and nearest-neighbour + 2-opt/Or-opt (heuristic)
+on random asymmetric fare matrices with fixed endpoints, and reports the
+heuristic's gap to the optimum wherever the exact solver also runs.
+
+Usage:
+    python scripts/benchmarks/bench_multicity_optimizer.py [--exact-max 13] [--heuristic-max 40]
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', '..', 'src', 'features'))
+
+from itinerary_optimizer import held_karp, local_search, nearest_neighbour, path_cost  # noqa: E402
+
+
+def fares(n, rng):
+    cost = rng.integers(40, 300, (n, n)).astype(float)
+    np.fill_diagonal(cost, 0)
+    return cost
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--exact-max', type=int, default=13, help="largest city count for Held-Karp")
+    parser.add_argument('--heuristic-max', type=int, default=40)
+    parser.add_argument('--trials', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(args.seed)
+    sizes = sorted(set(range(4, args.exact_max + 1)) | set(range(15, args.heuristic_max + 1, 5)))
+
+    print(f"{'cities':>6} {'exact ms':>10} {'heuristic ms':>13} {'gap %':>7}")
+    for n in sizes:
+        exact_ms, heur_ms, gaps = [], [], []
+        for _ in range(args.trials):
+            cost = fares(n, rng)
+            path, ms = timed(lambda c: local_search(c, nearest_neighbour(c)), cost)
+            heur_ms.append(ms)
+            if n <= args.exact_max:
+                (_, best), ms = timed(held_karp, cost)
+                exact_ms.append(ms)
+                gaps.append((path_cost(cost, path) - best) / best * 100)
+        exact = f"{np.mean(exact_ms):>10.1f}" if exact_ms else f"{'-':>10}"
+        gap = f"{np.mean(gaps):>7.2f}" if gaps else f"{'-':>7}"
+        print(f"{n:>6} {exact} {np.mean(heur_ms):>13.1f} {gap}")
+
+
+if __name__ == '__main__':
+    main()
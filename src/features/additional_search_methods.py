@@ -16,13 +16,23 @@ Version: 14.1.0
 Date: 2026-01-17
 """
 
+import math
 import random
 import logging
+import calendar
+import threading
 from datetime import datetime, timedelta
 from typing import List, Dict, Optional, Tuple
 from dataclasses import dataclass
 import statistics
 
+import numpy as np
+
+from route_graph import RouteGraphIndex, Itinerary
+from price_history import PriceHistoryStore, route_key, to_epoch
+from price_rollups import PriceRollups, rollups_for
+from price_drop_model import DropModelTrainer, get_drop_model
+
 logger = logging.getLogger(__name__)
 
 
@@ -148,6 +158,22 @@ class StopoverOptimizer:
         'MIA': {'name': 'Miami', 'rating': 8.6, 'region': 'usa'},
     }
     
+    # One background-refreshed graph for all instances
+    _shared_graph: Optional[RouteGraphIndex] = None
+    _graph_lock = threading.Lock()
+    
+    def __init__(self, graph: Optional[RouteGraphIndex] = None):
+        # Leg prices come from the graph snapshot, not from every query
+        self.graph = graph or self._default_graph()
+    
+    @classmethod
+    def _default_graph(cls) -> RouteGraphIndex:
+        with cls._graph_lock:
+            if cls._shared_graph is None:
+                cls._shared_graph = RouteGraphIndex(cls._estimate_price, cls.HUB_CITIES)
+                cls._shared_graph.start()
+            return cls._shared_graph
+    
     def find_best_stopovers(
         self,
         origin: str,
@@ -156,30 +182,24 @@ class StopoverOptimizer:
     ) -> List[StopoverRoute]:
         """Find best stopover options"""
         
-        # Simulate finding stopovers
-        # In production, this would query real flight APIs
-        
+        graph = self.graph.ensure(origin, destination)
         stopovers = []
         
         # Direct flight price (baseline)
-        direct_price = self._estimate_price(origin, destination)
+        direct_price = graph.price(origin, destination)
         
-        # Test each hub
-        for hub_code, hub_info in self.HUB_CITIES.items():
-            if hub_code in [origin, destination]:
+        # Every single-stop path through the graph, cheapest first
+        for itinerary in graph.k_cheapest(origin, destination, k=len(self.HUB_CITIES), max_stops=1):
+            hub_code = itinerary.stops[0]
+            hub_info = self.HUB_CITIES.get(hub_code)
+            if hub_info is None:
                 continue
             
-            # Calculate prices
-            leg1_price = self._estimate_price(origin, hub_code)
-            leg2_price = self._estimate_price(hub_code, destination)
-            total_price = leg1_price + leg2_price
-            
-            # Random layover time (4-12 hours)
-            layover_hours = random.randint(4, 12)
+            leg1_price, leg2_price = itinerary.leg_prices
+            total_price = itinerary.total_price
             
             # Calculate savings
             savings = direct_price - total_price
-            savings_pct = (savings / direct_price) * 100 if direct_price > 0 else 0
             
             # Only include if there's savings
             if savings > 0:
@@ -190,7 +210,7 @@ class StopoverOptimizer:
                     leg1_price=leg1_price,
                     leg2_price=leg2_price,
                     total_price=total_price,
-                    layover_hours=layover_hours,
+                    layover_hours=itinerary.layovers[0][0],
                     savings_vs_direct=savings,
                     stopover_city_rating=hub_info['rating']
                 )
@@ -205,7 +225,18 @@ class StopoverOptimizer:
         
         return stopovers[:max_stopovers]
     
-    def _estimate_price(self, origin: str, dest: str) -> float:
+    def find_cheapest_itineraries(
+        self,
+        origin: str,
+        destination: str,
+        k: int = 5,
+        max_stops: int = 2
+    ) -> List[Itinerary]:
+        """k cheapest itineraries with one or two stops (Yen's algorithm)"""
+        return self.graph.k_cheapest(origin, destination, k=k, max_stops=max_stops)
+    
+    @staticmethod
+    def _estimate_price(origin: str, dest: str) -> float:
         """Estimate flight price"""
         # Simplified price estimation
         base_prices = {
@@ -239,6 +270,23 @@ class StopoverOptimizer:
             output.append(f"   📍 {hub_info['name']} - ¡Explora la ciudad!\n")
         
         return "\n".join(output)
+    
+    def format_itineraries(self, itineraries: List[Itinerary]) -> str:
+        """Format k-cheapest multi-stop itineraries"""
+        if not itineraries:
+            return "❌ No se encontraron itinerarios con escala"
+        
+        output = []
+        output.append("🧭 **ITINERARIOS MÁS BARATOS CON ESCALAS**\n")
+        
+        for i, itinerary in enumerate(itineraries, 1):
+            output.append(f"{i}. **{' → '.join(itinerary.path)}** - €{itinerary.total_price:.0f}")
+            for stop, (shortest, longest) in zip(itinerary.stops, itinerary.layovers):
+                name = self.HUB_CITIES.get(stop, {}).get('name', stop)
+                output.append(f"   ⏱️ Escala en {name}: {shortest}-{longest}h")
+            output.append("")
+        
+        return "\n".join(output)
 
 
 # ============================================================================
@@ -249,9 +297,15 @@ class CheapestMonthFinder:
     """
     Find cheapest month to fly for a route.
     
-    Analyzes 12 months ahead to find best value.
+    Analyzes 12 months ahead to find best value. Routes with stored price
+    history are projected from the same calendar months in past years;
+    routes without any fall back to seasonal estimates.
     """
     
+    def __init__(self, history: Optional[PriceHistoryStore] = None,
+                 rollups: Optional[PriceRollups] = None):
+        self.rollups = rollups or rollups_for(history)
+    
     def find_cheapest_months(
         self,
         origin: str,
@@ -260,6 +314,10 @@ class CheapestMonthFinder:
     ) -> List[MonthlyPrice]:
         """Find cheapest months to fly"""
         
+        profile = self.rollups.calendar_profile(route_key(origin, destination))
+        if profile:
+            return self._months_from_history(profile, months_ahead)
+        
         results = []
         base_price = random.randint(300, 800)
         
@@ -299,6 +357,32 @@ class CheapestMonthFinder:
         
         return results
     
+    def _months_from_history(self, profile: Dict[int, Dict], months_ahead: int) -> List[MonthlyPrice]:
+        results = []
+        for month_offset in range(months_ahead):
+            date = datetime.now() + timedelta(days=30 * month_offset)
+            entry = profile.get(date.month)
+            if entry is None:
+                continue
+            
+            previous = profile.get(12 if date.month == 1 else date.month - 1)
+            trend = 'stable'
+            if previous and entry['avg_price'] > previous['avg_price'] * 1.05:
+                trend = 'increasing'
+            elif previous and entry['avg_price'] < previous['avg_price'] * 0.95:
+                trend = 'decreasing'
+            
+            day = min(int(entry['best_day'][8:10]), calendar.monthrange(date.year, date.month)[1])
+            results.append(MonthlyPrice(
+                month=date.strftime('%Y-%m'),
+                avg_price=entry['avg_price'],
+                min_price=entry['min_price'],
+                max_price=entry['max_price'],
+                best_day=date.replace(day=day).strftime('%Y-%m-%d'),
+                price_trend=trend
+            ))
+        return results
+    
     def format_results(self, route: str, months: List[MonthlyPrice]) -> str:
         """Format monthly price results"""
         output = []
@@ -455,8 +539,44 @@ class PriceDropPredictor:
     - Seasonal patterns
     - Booking windows
     - Demand indicators
+    
+    Predictions come from DropModelTrainer, trained on the stored price
+    history (see price_drop_model). predict_batch() scores a whole
+    watchlist in one vectorized pass; routes without enough history fall
+    back to booking-window rules of thumb.
     """
     
+    # days ahead > limit: (price factor, drop probability, window, confidence)
+    BOOKING_WINDOWS = (
+        (60, 0.90, 0.70, 'wait_14d', 0.75),      # far out - prices tend to drop
+        (30, 0.95, 0.50, 'wait_7d', 0.80),       # sweet spot
+        (14, 1.00, 0.40, 'book_soon', 0.70),     # getting close
+        (-math.inf, 1.075, 0.20, 'book_now', 0.85),  # last minute - prices going up
+    )
+    NO_DATE = (1.00, 0.50, 'book_soon', 0.50)
+    
+    def __init__(self, history: Optional[PriceHistoryStore] = None,
+                 rollups: Optional[PriceRollups] = None,
+                 model: Optional[DropModelTrainer] = None):
+        """
+        Args:
+            history: Price history (shared store if None)
+            rollups: Rollups over history (attached to it if None)
+            model: Trained model; the shared, disk-cached one (fitted in the
+                background) for the shared store, otherwise an in-memory
+                model over rollups, fitted here
+        
+        Until a model is fitted, every route uses the booking windows.
+        """
+        self.rollups = rollups or rollups_for(history)
+        if model is None:
+            if history is None and rollups is None:
+                model = get_drop_model()
+            else:
+                model = DropModelTrainer(self.rollups, path=None)
+                model.ensure_trained()
+        self.model = model
+    
     def predict_price_drop(
         self,
         route: str,
@@ -464,53 +584,78 @@ class PriceDropPredictor:
         departure_date: str
     ) -> PriceAlert:
         """Predict if price will drop"""
-        
-        # Days until departure
-        dep_date = datetime.strptime(departure_date, '%Y-%m-%d')
-        days_ahead = (dep_date - datetime.now()).days
-        
-        # ML prediction (simplified)
-        if days_ahead > 60:
-            # Far out - prices tend to drop
-            predicted_price = current_price * random.uniform(0.85, 0.95)
-            drop_probability = random.uniform(0.6, 0.8)
-            recommendation = "wait_14d"
-            confidence = 0.75
-        
-        elif days_ahead > 30:
-            # Sweet spot
-            predicted_price = current_price * random.uniform(0.9, 1.0)
-            drop_probability = random.uniform(0.4, 0.6)
-            recommendation = "wait_7d"
-            confidence = 0.80
-        
-        elif days_ahead > 14:
-            # Getting close
-            predicted_price = current_price * random.uniform(0.95, 1.05)
-            drop_probability = random.uniform(0.3, 0.5)
-            recommendation = "book_soon"
-            confidence = 0.70
-        
-        else:
-            # Last minute - prices going up
-            predicted_price = current_price * random.uniform(1.0, 1.15)
-            drop_probability = random.uniform(0.1, 0.3)
-            recommendation = "book_now"
-            confidence = 0.85
-        
-        alert = PriceAlert(
-            route=route,
-            current_price=current_price,
-            predicted_price=predicted_price,
-            drop_probability=drop_probability,
-            best_booking_window=recommendation,
-            confidence=confidence,
-            recommendation=self._generate_recommendation(
-                drop_probability, recommendation, predicted_price - current_price
+        return self.predict_batch([route], [current_price], [departure_date])[0]
+    
+    def predict_batch(
+        self,
+        routes: List[str],
+        current_prices: List[float],
+        departure_dates: Optional[List[Optional[str]]] = None,
+        now=None
+    ) -> List[PriceAlert]:
+        """
+        Predict drops for many routes at once
+        
+        Args:
+            routes: 'ORIGIN-DEST' keys
+            current_prices: Current price per route
+            departure_dates: YYYY-MM-DD per route, or None where unknown
+            now: Reference time (default: now)
+        """
+        routes = [r.strip().upper() for r in routes]
+        prices = np.asarray(current_prices, dtype=np.float64)
+        now_ts = to_epoch(now)
+        dates = departure_dates or [None] * len(routes)
+        days_ahead = np.array([np.nan if d is None else (to_epoch(d) - now_ts) // 86400
+                               for d in dates], dtype=np.float64)
+        
+        # rule-of-thumb values by booking window
+        known = ~np.isnan(days_ahead)
+        tier = np.full(len(routes), len(self.BOOKING_WINDOWS))
+        for i, window in reversed(list(enumerate(self.BOOKING_WINDOWS))):
+            tier[known & (days_ahead > window[0])] = i
+        table = [w[1:] for w in self.BOOKING_WINDOWS] + [self.NO_DATE]
+        factor, probability, window_names, confidence = (np.array(column) for column in zip(*table))
+        
+        scores = self.model.score(routes, prices, now_ts)
+        scored = scores['scored']
+        predicted = np.where(scored, scores['predicted_price'], prices * factor[tier])
+        drop = np.where(scored, scores['probability'], probability[tier])
+        confidence = np.where(scored, scores['confidence'], confidence[tier])
+        windows = np.where(scored, self._windows(drop, days_ahead), window_names[tier])
+        
+        return [
+            PriceAlert(
+                route=route,
+                current_price=float(price),
+                predicted_price=float(pred),
+                drop_probability=float(prob),
+                best_booking_window=str(window),
+                confidence=float(conf),
+                recommendation=self._generate_recommendation(prob, window, pred - price)
             )
+            for route, price, pred, prob, window, conf
+            in zip(routes, prices, predicted, drop, windows, confidence)
+        ]
+    
+    def predict_watchlist(self, items: List, now=None) -> List[PriceAlert]:
+        """Predictions for the active items of a watchlist (WatchlistItem-like)"""
+        active = [item for item in items if getattr(item, 'active', True)]
+        return self.predict_batch([item.route for item in active],
+                                  [item.last_price or item.threshold for item in active], now=now)
+    
+    @staticmethod
+    def _windows(drop: np.ndarray, days_ahead: np.ndarray) -> np.ndarray:
+        """Booking window from model drop probability and days to departure"""
+        unknown = np.isnan(days_ahead)
+        return np.select(
+            [~unknown & (days_ahead <= 14),
+             (drop >= 0.6) & (unknown | (days_ahead > 60)),
+             drop >= 0.4,
+             drop >= 0.25],
+            ['book_now', 'wait_14d', 'wait_7d', 'book_soon'],
+            default='book_now'
         )
-        
-        return alert
     
     def _generate_recommendation(self, prob: float, window: str, diff: float) -> str:
         """Generate human-readable recommendation"""
@@ -623,6 +768,7 @@ if __name__ == '__main__':
     stopover = StopoverOptimizer()
     routes = stopover.find_best_stopovers('MAD', 'SIN', max_stopovers=3)
     print(stopover.format_results(routes))
+    print(stopover.format_itineraries(stopover.find_cheapest_itineraries('MAD', 'SIN', k=5)))
     print("\n" + "="*70 + "\n")
     
     # Test 2: Cheapest Month Finder
@@ -15,6 +15,7 @@ Integrates 10 advanced search methods with Telegram bot:
 - LastMinuteDeals
 - SeasonalTrendsAnalysis
 - GroupBookingSearch
+- RoundTripCalendar
 
 Author: @Juanka_Spain
 Version: 14.0.0
@@ -35,12 +36,20 @@ try:
         FlexibleDatesCalendar,
         MultiCitySearch,
         BudgetSearch,
-        SearchResult
+        SearchResult,
+        SearchTimeoutError
     )
+    from fare_planner import FareSetPlanner
     ADVANCED_SEARCH_AVAILABLE = True
 except ImportError:
     ADVANCED_SEARCH_AVAILABLE = False
 
+try:
+    from search_cache import SearchCacheManager
+    SEARCH_CACHE_AVAILABLE = True
+except ImportError:
+    SEARCH_CACHE_AVAILABLE = False
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -54,10 +63,38 @@ class AdvancedSearchCommandHandler:
     Handles all advanced search commands for Telegram bot
     """
     
-    def __init__(self):
+    TIMEOUT_MESSAGE = "⏱️ La búsqueda está tardando demasiado. Inténtalo de nuevo en unos minutos."
+    
+    def __init__(self, cache_manager: Optional['SearchCacheManager'] = None):
+        """
+        Args:
+            cache_manager: Shared SearchCacheManager (created if not given)
+        """
         self.logger = logging.getLogger(self.__class__.__name__)
         self.factory = SearchMethodFactory() if ADVANCED_SEARCH_AVAILABLE else None
         self.active_searches: Dict[int, Any] = {}  # user_id -> search result
+        
+        if cache_manager is None and SEARCH_CACHE_AVAILABLE:
+            cache_manager = SearchCacheManager()
+        self.cache_manager = cache_manager
+        
+        # Filter searches share fare sets through the same cache
+        self.planner = None
+        if cache_manager is not None and ADVANCED_SEARCH_AVAILABLE:
+            self.planner = FareSetPlanner(cache_manager)
+    
+    async def _run_search(self, method_name: str, **params) -> 'SearchResult':
+        """
+        Run a search through the cache.
+        
+        Identical concurrent queries share one computation (single-flight).
+        """
+        method = self.factory.create(method_name, planner=self.planner)
+        if self.cache_manager is None:
+            return await method.asearch(**params)
+        return await self.cache_manager.aget_or_compute(
+            method_name, lambda: method.asearch(**params), **params
+        )
     
     # ========================================================================
     # COMMAND: /search_flex - Flexible Dates Calendar
@@ -96,7 +133,8 @@ class AdvancedSearchCommandHandler:
         try:
             # Execute search
             calendar_search = self.factory.create('flexible_dates')
-            result = calendar_search.search(origin=origin, destination=destination, month=month)
+            result = await self._run_search('flexible_dates', origin=origin,
+                                            destination=destination, month=month)
             
             # Format and send response
             response = calendar_search.format_output(result)
@@ -120,6 +158,9 @@ class AdvancedSearchCommandHandler:
             
             self.logger.info(f"Flexible dates search: {user.id} - {origin} to {destination} ({month})")
             
+        except SearchTimeoutError as e:
+            self.logger.warning(f"Flexible dates search timeout: {e}")
+            await msg.reply_text(self.TIMEOUT_MESSAGE)
         except Exception as e:
             self.logger.error(f"Flexible dates search failed: {e}")
             await msg.reply_text(f"❌ Error al buscar: {str(e)}")
@@ -183,7 +224,8 @@ class AdvancedSearchCommandHandler:
         
         try:
             multi_search = self.factory.create('multi_city')
-            result = multi_search.search(cities=cities, start_date=start_date, stay_days=stay_days)
+            result = await self._run_search('multi_city', cities=cities,
+                                            start_date=start_date, stay_days=stay_days)
             response = multi_search.format_output(result)
             
             keyboard = InlineKeyboardMarkup([
@@ -202,6 +244,9 @@ class AdvancedSearchCommandHandler:
             
             self.logger.info(f"Multi-city search: {user.id} - {cities}")
             
+        except SearchTimeoutError as e:
+            self.logger.warning(f"Multi-city search timeout: {e}")
+            await msg.reply_text(self.TIMEOUT_MESSAGE)
         except Exception as e:
             self.logger.error(f"Multi-city search failed: {e}")
             await msg.reply_text(f"❌ Error: {str(e)}")
@@ -261,7 +306,7 @@ class AdvancedSearchCommandHandler:
         
         try:
             budget_search = self.factory.create('budget')
-            result = budget_search.search(origin=origin, budget=budget, month=month)
+            result = await self._run_search('budget', origin=origin, budget=budget, month=month)
             response = budget_search.format_output(result)
             
             keyboard = InlineKeyboardMarkup([
@@ -280,6 +325,9 @@ class AdvancedSearchCommandHandler:
             
             self.logger.info(f"Budget search: {user.id} - {origin} max €{budget}")
             
+        except SearchTimeoutError as e:
+            self.logger.warning(f"Budget search timeout: {e}")
+            await msg.reply_text(self.TIMEOUT_MESSAGE)
         except Exception as e:
             self.logger.error(f"Budget search failed: {e}")
             await msg.reply_text(f"❌ Error: {str(e)}")
@@ -302,6 +350,87 @@ class AdvancedSearchCommandHandler:
         )
         await msg.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
     
+    # ========================================================================
+    # COMMAND: /search_roundtrip - Round-Trip Calendar
+    # ========================================================================
+    
+    async def cmd_search_roundtrip(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """
+        /search_roundtrip MAD BCN 2026-03 5-9
+        Cheapest round trip departing in a month, staying N-M nights
+        """
+        msg = update.effective_message
+        user = update.effective_user
+        
+        args = context.args
+        if len(args) < 3:
+            await self._send_roundtrip_help(msg)
+            return
+        
+        origin = args[0].upper()
+        destination = args[1].upper()
+        month = args[2]
+        
+        if not self._validate_iata(origin) or not self._validate_iata(destination):
+            await msg.reply_text("❌ Códigos IATA inválidos. Usa 3 letras (ej: MAD)")
+            return
+        
+        if not self._validate_month(month):
+            await msg.reply_text("❌ Formato de mes inválido. Usa YYYY-MM (ej: 2026-03)")
+            return
+        
+        stay = self._parse_stay(args[3] if len(args) > 3 else '5-9')
+        if stay is None:
+            await msg.reply_text("❌ Estancia inválida. Usa noches mín-máx (ej: 5-9), hasta 30 noches")
+            return
+        min_stay, max_stay = stay
+        
+        await context.bot.send_chat_action(chat_id=msg.chat_id, action=ChatAction.TYPING)
+        
+        try:
+            roundtrip_search = self.factory.create('roundtrip')
+            result = await self._run_search('roundtrip', origin=origin, destination=destination,
+                                            month=month, min_stay=min_stay, max_stay=max_stay)
+            response = roundtrip_search.format_output(result)
+            
+            keyboard = InlineKeyboardMarkup([
+                [
+                    InlineKeyboardButton("⚡ Reservar mejor opción", callback_data=f"roundtrip_book_{user.id}"),
+                    InlineKeyboardButton("🔔 Crear alerta", callback_data=f"roundtrip_alert_{user.id}")
+                ]
+            ])
+            
+            await msg.reply_text(response, reply_markup=keyboard)
+            self.active_searches[user.id] = result
+            
+            self.logger.info(f"Round-trip search: {user.id} - {origin} <-> {destination} "
+                             f"({month}, {min_stay}-{max_stay})")
+            
+        except SearchTimeoutError as e:
+            self.logger.warning(f"Round-trip search timeout: {e}")
+            await msg.reply_text(self.TIMEOUT_MESSAGE)
+        except Exception as e:
+            self.logger.error(f"Round-trip search failed: {e}")
+            await msg.reply_text(f"❌ Error al buscar: {str(e)}")
+    
+    async def _send_roundtrip_help(self, msg):
+        help_text = (
+            "🔁 *Búsqueda Ida y Vuelta*\n\n"
+            "*Uso:* `/search_roundtrip [origen] [destino] [mes] [noches]`\n\n"
+            "*Ejemplo:*\n"
+            "`/search_roundtrip MAD BCN 2026-03 5-9`\n\n"
+            "*Parámetros:*\n"
+            "• `origen`: Código IATA (3 letras)\n"
+            "• `destino`: Código IATA (3 letras)\n"
+            "• `mes`: Mes de salida YYYY-MM\n"
+            "• `noches`: Estancia mín-máx (por defecto 5-9)\n\n"
+            "*Características:*\n"
+            "💰 Combinación ida + vuelta más barata\n"
+            "📅 Todas las fechas de salida del mes\n"
+            "📊 Mejor precio por duración de estancia"
+        )
+        await msg.reply_text(help_text, parse_mode=ParseMode.MARKDOWN)
+    
     # ========================================================================
     # SIMPLIFIED COMMANDS (4-10)
     # ========================================================================
@@ -370,6 +499,9 @@ class AdvancedSearchCommandHandler:
         elif data.startswith('budget_'):
             await self._handle_budget_callback(query, context)
             return True
+        elif data.startswith('roundtrip_'):
+            await self._handle_roundtrip_callback(query, context)
+            return True
         
         return False
     
@@ -418,10 +550,33 @@ class AdvancedSearchCommandHandler:
         elif action == 'share':
             await query.message.reply_text("📤 Compartiendo...")
     
+    async def _handle_roundtrip_callback(self, query, context):
+        """Handle round-trip search callbacks"""
+        await query.answer()
+        
+        action = query.data.split('_')[1]
+        
+        if action == 'book':
+            await query.message.reply_text("⚡ Redirigiendo a reserva...")
+        elif action == 'alert':
+            await query.message.reply_text("🔔 Alerta creada con éxito")
+    
     # ========================================================================
     # VALIDATION HELPERS
     # ========================================================================
     
+    @staticmethod
+    def _parse_stay(stay_str: str, max_nights: int = 30) -> Optional[tuple]:
+        """Parse 'N-M' (or 'N') nights into (min_stay, max_stay)"""
+        match = re.match(r'^(\d{1,2})(?:-(\d{1,2}))?$', stay_str)
+        if not match:
+            return None
+        min_stay = int(match.group(1))
+        max_stay = int(match.group(2) or min_stay)
+        if not 1 <= min_stay <= max_stay <= max_nights:
+            return None
+        return min_stay, max_stay
+    
     @staticmethod
     def _validate_iata(code: str) -> bool:
         """Validate IATA code (3 letters)"""
@@ -461,6 +616,7 @@ class AdvancedSearchCommandHandler:
         application.add_handler(CommandHandler('search_flex', self.cmd_search_flex))
         application.add_handler(CommandHandler('search_multi', self.cmd_search_multi))
         application.add_handler(CommandHandler('search_budget', self.cmd_search_budget))
+        application.add_handler(CommandHandler('search_roundtrip', self.cmd_search_roundtrip))
         application.add_handler(CommandHandler('search_airline', self.cmd_search_airline))
         application.add_handler(CommandHandler('search_nonstop', self.cmd_search_nonstop))
         application.add_handler(CommandHandler('search_redeye', self.cmd_search_redeye))
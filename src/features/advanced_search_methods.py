@@ -3,8 +3,8 @@
 """
 Advanced Search Methods Module - Cazador Supremo v14.0
 
-Implements 10 professional search methods:
-1. FlexibleDatesCalendar - Price matrix for entire month
+Implements 11 professional search methods:
+1. FlexibleDatesCalendar - Price matrix for entire month (NumPy calendar engine)
 2. MultiCitySearch - Multi-city itinerary optimization
 3. BudgetSearch - Find destinations within budget
 4. AirlineSpecificSearch - Filter by specific airlines
@@ -14,6 +14,14 @@ Implements 10 professional search methods:
 8. LastMinuteDeals - Deals for next 7 days
 9. SeasonalTrendsAnalysis - Historical analysis + ML prediction
 10. GroupBookingSearch - Group reservations (2-9 pax)
+11. RoundTripCalendar - Cheapest round trip for a month and stay range
+
+All methods expose asearch() for asyncio handlers: sync searches run on a
+bounded executor with per-method timeouts and concurrency limits.
+SearchMethodFactory.asearch_batch() / search_batch() run many queries at
+once: deduplicated, grouped by route and date, streamed as they finish.
+Large FlightResult lists convert to a columnar flight_results.FlightResultSet for
+vectorized filtering, sorting and top-k.
 
 Author: @Juanka_Spain
 Version: 14.0.0
@@ -21,14 +29,34 @@ Date: 2026-01-17
 """
 
 import json
+import time
+import asyncio
 import logging
+import queue
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime, timedelta
-from typing import List, Dict, Any, Optional, Tuple
-from dataclasses import dataclass
+from functools import partial
+from typing import List, Dict, Any, Callable, Optional, Tuple, Iterator, AsyncIterator
+from dataclasses import dataclass, field
 from abc import ABC, abstractmethod
 import calendar
 import math
 
+import numpy as np
+
+from price_calendar import PriceCalendarEngine, PriceMatrix
+from itinerary_optimizer import SegmentPriceMemo, optimize_itinerary
+from airport_index import AirportIndex, get_airport_index, haversine_km
+from budget_index import BudgetIndexStore
+from search_cache import canonical_params, register_json_type
+import fare_planner
+from fare_planner import FareSetPlanner, get_fare_planner
+from flight_results import is_redeye_clock
+from price_history import PriceHistoryStore, route_key
+from price_rollups import PriceRollups, rollups_for
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -37,6 +65,7 @@ logger = logging.getLogger(__name__)
 # DATA CLASSES
 # ============================================================================
 
+@register_json_type
 @dataclass
 class FlightResult:
     """Single flight result"""
@@ -57,15 +86,10 @@ class FlightResult:
     
     def is_redeye(self) -> bool:
         """Check if flight is overnight (22:00-06:00)"""
-        if not self.departure_time:
-            return False
-        try:
-            hour = int(self.departure_time.split(':')[0])
-            return hour >= 22 or hour <= 6
-        except:
-            return False
+        return is_redeye_clock(self.departure_time)
 
 
+@register_json_type
 @dataclass
 class SearchResult:
     """Search result container"""
@@ -74,6 +98,7 @@ class SearchResult:
     results: List[Any]
     metadata: Dict[str, Any]
     timestamp: str
+    timing: Dict[str, float] = field(default_factory=dict)  # queue_ms / run_ms (async path)
     
     def to_dict(self) -> Dict:
         return {
@@ -81,7 +106,8 @@ class SearchResult:
             'query': self.query,
             'results': self.results,
             'metadata': self.metadata,
-            'timestamp': self.timestamp
+            'timestamp': self.timestamp,
+            'timing': self.timing
         }
 
 
@@ -92,6 +118,14 @@ class SearchResult:
 class AdvancedSearchMethod(ABC):
     """Base class for all advanced search methods"""
     
+    # Async execution limits (see SearchExecutor)
+    search_timeout: float = 15.0   # seconds before asearch() gives up
+    max_concurrency: int = 4       # concurrent searches per method
+    
+    # Methods backed by an async provider set this to a coroutine function
+    # with the same signature as search(); sync methods run on the executor.
+    search_async = None
+    
     def __init__(self, name: str):
         self.name = name
         self.logger = logging.getLogger(f"{__name__}.{name}")
@@ -101,6 +135,18 @@ class AdvancedSearchMethod(ABC):
         """Execute search - must be implemented by subclasses"""
         pass
     
+    async def asearch(self, **kwargs) -> SearchResult:
+        """
+        Execute search without blocking the event loop.
+        
+        Applies the per-method timeout and concurrency limit and records
+        queue/run timings in result.timing.
+        
+        Raises:
+            SearchTimeoutError: if the search exceeds search_timeout
+        """
+        return await get_search_executor().run(self, **kwargs)
+    
     def validate_inputs(self, **kwargs) -> bool:
         """Validate search inputs"""
         return True
@@ -110,6 +156,203 @@ class AdvancedSearchMethod(ABC):
         return str(result.to_dict())
 
 
+# ============================================================================
+# ASYNC EXECUTION
+# ============================================================================
+
+class SearchTimeoutError(asyncio.TimeoutError):
+    """Raised when an async search exceeds its method timeout"""
+    
+    def __init__(self, method: str, timeout: float):
+        super().__init__(f"{method} search timed out after {timeout:.1f}s")
+        self.method = method
+        self.timeout = timeout
+
+
+class SearchExecutor:
+    """
+    Runs search methods from asyncio handlers without blocking the loop.
+    
+    - Sync search() implementations run on a bounded thread pool
+    - Native search_async coroutines are awaited directly
+    - Per-method concurrency limits (asyncio semaphores, one per loop)
+    - Per-method timeouts
+    - Queue wait / run time metrics per method
+    """
+    
+    def __init__(self, max_workers: int = 8):
+        self.max_workers = max_workers
+        self._pool = ThreadPoolExecutor(max_workers=max_workers,
+                                        thread_name_prefix="search")
+        self._semaphores: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+        self.lock = threading.Lock()
+        
+        # Metrics per method name
+        self.stats: Dict[str, Dict[str, float]] = {}
+    
+    def _get_semaphore(self, method: AdvancedSearchMethod) -> asyncio.Semaphore:
+        """Get the concurrency semaphore for a method in the running loop"""
+        loop = asyncio.get_running_loop()
+        with self.lock:
+            per_loop = self._semaphores.setdefault(loop, {})
+            if method.name not in per_loop:
+                per_loop[method.name] = asyncio.Semaphore(max(1, method.max_concurrency))
+            return per_loop[method.name]
+    
+    async def run(self, method: AdvancedSearchMethod, **kwargs) -> SearchResult:
+        """Run method search with timeout and concurrency limit"""
+        loop = asyncio.get_running_loop()
+        semaphore = self._get_semaphore(method)
+        timeout = method.search_timeout
+        queued_at = time.perf_counter()
+        started = {}
+        
+        await semaphore.acquire()
+        
+        try:
+            if method.search_async is not None:
+                started['at'] = time.perf_counter()
+                future = asyncio.ensure_future(method.search_async(**kwargs))
+            else:
+                def timed_search():
+                    started['at'] = time.perf_counter()
+                    return method.search(**kwargs)
+                future = loop.run_in_executor(self._pool, timed_search)
+        except BaseException:
+            # no future to release the slot (bad kwargs, pool shut down)
+            semaphore.release()
+            self._record_failure(method.name, queued_at, started)
+            raise
+        
+        # Keep the slot until the work really finishes: a timed-out thread
+        # keeps running and must still count against the limit.
+        future.add_done_callback(lambda _: semaphore.release())
+        
+        try:
+            if method.search_async is not None:
+                result = await asyncio.wait_for(future, timeout)
+            else:
+                result = await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            queue_ms = (started.get('at', time.perf_counter()) - queued_at) * 1000
+            self._record(method.name, queue_ms, timeout * 1000, timed_out=True)
+            method.logger.warning(f"Search timed out after {timeout:.1f}s")
+            raise SearchTimeoutError(method.name, timeout)
+        except Exception:
+            self._record_failure(method.name, queued_at, started)
+            raise
+        
+        finished = time.perf_counter()
+        queue_ms = (started['at'] - queued_at) * 1000
+        run_ms = (finished - started['at']) * 1000
+        self._record(method.name, queue_ms, run_ms)
+        
+        if isinstance(result, SearchResult):
+            result.timing = {'queue_ms': round(queue_ms, 2), 'run_ms': round(run_ms, 2)}
+        return result
+    
+    def run_sync(self, method: AdvancedSearchMethod, call: Callable[[], Any]) -> Any:
+        """
+        Run call (a search of method) on the pool from a blocking caller,
+        waiting at most method.search_timeout. Like run(), a timed-out
+        call keeps its worker until it finishes.
+        
+        Raises:
+            SearchTimeoutError: if call exceeds search_timeout
+        """
+        timeout = method.search_timeout
+        started = time.perf_counter()
+        future = self._pool.submit(call)
+        try:
+            result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._record(method.name, 0.0, timeout * 1000, timed_out=True)
+            method.logger.warning(f"Search timed out after {timeout:.1f}s")
+            raise SearchTimeoutError(method.name, timeout)
+        except Exception:
+            self._record(method.name, 0.0, (time.perf_counter() - started) * 1000, failed=True)
+            raise
+        self._record(method.name, 0.0, (time.perf_counter() - started) * 1000)
+        return result
+    
+    def _record_failure(self, name: str, queued_at: float, started: Dict[str, float]):
+        """Record a search that raised (started['at'] is unset if it never ran)"""
+        now = time.perf_counter()
+        at = started.get('at', now)
+        self._record(name, (at - queued_at) * 1000, (now - at) * 1000, failed=True)
+    
+    def _record(self, name: str, queue_ms: float, run_ms: float, timed_out: bool = False,
+                failed: bool = False):
+        """Accumulate timing metrics for a method"""
+        with self.lock:
+            s = self.stats.setdefault(name, {
+                'calls': 0, 'timeouts': 0, 'failures': 0,
+                'queue_ms_total': 0.0, 'run_ms_total': 0.0,
+                'queue_ms_max': 0.0, 'run_ms_max': 0.0
+            })
+            s['calls'] += 1
+            if timed_out:
+                s['timeouts'] += 1
+            if failed:
+                s['failures'] += 1
+            s['queue_ms_total'] += queue_ms
+            s['run_ms_total'] += run_ms
+            s['queue_ms_max'] = max(s['queue_ms_max'], queue_ms)
+            s['run_ms_max'] = max(s['run_ms_max'], run_ms)
+    
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Get queue/run statistics per method"""
+        with self.lock:
+            return {
+                name: {
+                    'calls': s['calls'],
+                    'timeouts': s['timeouts'],
+                    'failures': s['failures'],
+                    'avg_queue_ms': round(s['queue_ms_total'] / s['calls'], 2),
+                    'avg_run_ms': round(s['run_ms_total'] / s['calls'], 2),
+                    'max_queue_ms': round(s['queue_ms_max'], 2),
+                    'max_run_ms': round(s['run_ms_max'], 2)
+                }
+                for name, s in self.stats.items()
+            }
+    
+    def shutdown(self, wait: bool = False):
+        """Stop the worker pool"""
+        self._pool.shutdown(wait=wait)
+
+
+_search_executor: Optional[SearchExecutor] = None
+_search_executor_lock = threading.Lock()
+
+
+def get_search_executor() -> SearchExecutor:
+    """Get the shared search executor (created on first use)"""
+    global _search_executor
+    with _search_executor_lock:
+        if _search_executor is None:
+            _search_executor = SearchExecutor()
+        return _search_executor
+
+
+FARE_POOL_WORKERS = 8
+_fare_pool: Optional[ThreadPoolExecutor] = None
+
+
+def get_fare_pool() -> ThreadPoolExecutor:
+    """
+    Get the shared pool for fare queries fanned out inside one search
+    (created on first use). It is separate from the search executor, so
+    searches waiting on it cannot deadlock that pool, and its size caps
+    the extra threads however many searches run at once.
+    """
+    global _fare_pool
+    with _search_executor_lock:
+        if _fare_pool is None:
+            _fare_pool = ThreadPoolExecutor(max_workers=FARE_POOL_WORKERS,
+                                            thread_name_prefix="fares")
+        return _fare_pool
+
+
 # ============================================================================
 # 1. FLEXIBLE DATES CALENDAR
 # ============================================================================
@@ -117,8 +360,11 @@ class AdvancedSearchMethod(ABC):
 class FlexibleDatesCalendar(AdvancedSearchMethod):
     """Display price matrix for entire month"""
     
-    def __init__(self):
+    search_timeout = 20.0  # one provider query per day of the month
+    
+    def __init__(self, engine: Optional[PriceCalendarEngine] = None):
         super().__init__("FlexibleDatesCalendar")
+        self.engine = engine or PriceCalendarEngine()
     
     def search(self, origin: str, destination: str, month: str) -> SearchResult:
         """
@@ -137,20 +383,17 @@ class FlexibleDatesCalendar(AdvancedSearchMethod):
         # Generate calendar
         cal = calendar.monthcalendar(year, month_num)
         
-        # Mock price data (in production, fetch real prices)
-        prices = self._generate_mock_prices(origin, destination, year, month_num)
+        # One-row view over the calendar engine
+        matrix = self.calendar_matrix([(origin, destination)], [month])
+        prices = matrix.month_prices(origin, destination, month)
         
-        # Calculate statistics
-        price_values = [p for p in prices.values() if p > 0]
-        stats = {
-            'min': min(price_values) if price_values else 0,
-            'max': max(price_values) if price_values else 0,
-            'avg': sum(price_values) / len(price_values) if price_values else 0,
-            'median': sorted(price_values)[len(price_values)//2] if price_values else 0
-        }
+        route_stats = matrix.stats()
+        stats = {name: float(np.nan_to_num(route_stats[name][0]))
+                 for name in ('min', 'max', 'avg', 'median')}
         
-        # Find best day
-        best_day = min(prices.items(), key=lambda x: x[1] if x[1] > 0 else float('inf'))
+        best_days, best_prices = matrix.best_days(1)
+        best_day = (best_days[0, 0].astype(object).day, float(best_prices[0, 0])) \
+            if not np.isnan(best_prices[0, 0]) else (1, 0)
         
         return SearchResult(
             method="flexible_dates_calendar",
@@ -164,23 +407,9 @@ class FlexibleDatesCalendar(AdvancedSearchMethod):
             timestamp=datetime.now().isoformat()
         )
     
-    def _generate_mock_prices(self, origin: str, dest: str, year: int, month: int) -> Dict[int, float]:
-        """Generate mock prices for demo (replace with real API)"""
-        import random
-        days_in_month = calendar.monthrange(year, month)[1]
-        prices = {}
-        base_price = 485
-        
-        for day in range(1, days_in_month + 1):
-            # Weekend premium
-            weekday = datetime(year, month, day).weekday()
-            multiplier = 1.1 if weekday >= 5 else 1.0
-            
-            # Random variation
-            variation = random.uniform(0.9, 1.15)
-            prices[day] = round(base_price * multiplier * variation, 2)
-        
-        return prices
+    def calendar_matrix(self, routes: List[Tuple[str, str]], months: List[str]) -> PriceMatrix:
+        """(route × day) fare matrix for several routes and months in one build"""
+        return self.engine.build(routes, months)
     
     def format_output(self, result: SearchResult) -> str:
         """Format calendar with heat map"""
@@ -229,10 +458,14 @@ class FlexibleDatesCalendar(AdvancedSearchMethod):
 class MultiCitySearch(AdvancedSearchMethod):
     """Optimize multi-city itineraries using TSP"""
     
+    search_timeout = 20.0
+    max_concurrency = 2  # one provider query per segment
+    
     def __init__(self):
         super().__init__("MultiCitySearch")
     
-    def search(self, cities: List[str], start_date: str, stay_days: List[int]) -> SearchResult:
+    def search(self, cities: List[str], start_date: str, stay_days: List[int],
+               optimize: bool = True) -> SearchResult:
         """
         Optimize multi-city route
         
@@ -240,19 +473,29 @@ class MultiCitySearch(AdvancedSearchMethod):
             cities: List of IATA codes (first is origin/return)
             start_date: Departure date YYYY-MM-DD
             stay_days: Days to stay in each city (excluding first)
+            optimize: Reorder intermediate cities for the lowest total fare
         """
         self.logger.info(f"Multi-city search: {cities}")
         
+        # Each origin-destination fare is fetched at most once per query
+        fares = SegmentPriceMemo(self._calculate_segment_price)
+        if optimize:
+            plan = optimize_itinerary(cities, fares.price)
+            order, route = plan['order'], plan['cities']
+        else:
+            order, route = list(range(len(cities))), list(cities)
+        # stay_days[i] belongs to cities[i + 1]; keep it with its city
+        stays = [stay_days[k - 1] if 0 < k <= len(stay_days) else 2 for k in order[1:]]
+        
         # Calculate route segments
         segments = []
         current_date = datetime.strptime(start_date, '%Y-%m-%d')
         
-        for i in range(len(cities) - 1):
-            origin = cities[i]
-            dest = cities[i + 1]
+        for i in range(len(route) - 1):
+            origin = route[i]
+            dest = route[i + 1]
             
-            # Mock price (replace with real API)
-            price = self._calculate_segment_price(origin, dest)
+            price = fares.price(origin, dest)
             
             segment = {
                 'origin': origin,
@@ -263,25 +506,35 @@ class MultiCitySearch(AdvancedSearchMethod):
             }
             segments.append(segment)
             
-            # Add stay days for next city (if not last)
-            if i < len(cities) - 1:
-                current_date += timedelta(days=stay_days[i] if i < len(stay_days) else 2)
+            # Add stay days for next city
+            current_date += timedelta(days=stays[i])
         
         # Calculate totals
         total_price = sum(s['price'] for s in segments)
         separate_price = total_price * 1.15  # Assume 15% discount for multi-city
         savings = separate_price - total_price
         
+        metadata = {
+            'total_price': total_price,
+            'separate_price': separate_price,
+            'savings': savings,
+            'savings_pct': (savings / separate_price) * 100 if separate_price else 0.0,
+            'stay_days': stays
+        }
+        if optimize:
+            metadata['optimization'] = {
+                'algorithm': plan['algorithm'],
+                'original_order': list(cities),
+                'original_price': plan['original_total'],
+                'reorder_savings': plan['original_total'] - plan['total'],
+                'fares_fetched': fares.fetches
+            }
+        
         return SearchResult(
             method="multi_city_search",
             query={'cities': cities, 'start_date': start_date, 'stay_days': stay_days},
             results=segments,
-            metadata={
-                'total_price': total_price,
-                'separate_price': separate_price,
-                'savings': savings,
-                'savings_pct': (savings / separate_price) * 100
-            },
+            metadata=metadata,
             timestamp=datetime.now().isoformat()
         )
     
@@ -300,12 +553,14 @@ class MultiCitySearch(AdvancedSearchMethod):
         meta = result.metadata
         query = result.query
         
+        stays = meta.get('stay_days', query['stay_days'])
+        
         output = f"🌍 ITINERARIO OPTIMIZADO\n\n"
         
         for i, seg in enumerate(segments, 1):
             output += f"{i}. {seg['origin']} → {seg['destination']} ({seg['date']}) - €{seg['price']:.0f}  ✈️ {seg['duration']}\n"
             if i < len(segments):
-                days = query['stay_days'][i-1] if i-1 < len(query['stay_days']) else 2
+                days = stays[i-1] if i-1 < len(stays) else 2
                 output += f"   📍 {self._get_city_name(seg['destination'])} ({days} días)\n\n"
         
         output += f"\n💰 RESUMEN:\n"
@@ -313,6 +568,10 @@ class MultiCitySearch(AdvancedSearchMethod):
         output += f"Vuelos separados: €{meta['separate_price']:.0f}\n"
         output += f"Ahorro: €{meta['savings']:.0f} ({meta['savings_pct']:.0f}%)\n"
         
+        opt = meta.get('optimization')
+        if opt and opt['reorder_savings'] > 0:
+            output += f"Reordenando ciudades: -€{opt['reorder_savings']:.0f} (antes €{opt['original_price']:.0f})\n"
+        
         return output
     
     def _get_city_name(self, iata: str) -> str:
@@ -332,8 +591,20 @@ class MultiCitySearch(AdvancedSearchMethod):
 class BudgetSearch(AdvancedSearchMethod):
     """Find destinations within budget"""
     
-    def __init__(self):
+    # One index store for all instances (the factory creates one per search)
+    _shared_store: Optional[BudgetIndexStore] = None
+    _store_lock = threading.Lock()
+    
+    def __init__(self, store: Optional[BudgetIndexStore] = None):
         super().__init__("BudgetSearch")
+        self.store = store or self._default_store()
+    
+    @classmethod
+    def _default_store(cls) -> BudgetIndexStore:
+        with cls._store_lock:
+            if cls._shared_store is None:
+                cls._shared_store = BudgetIndexStore(cls._get_mock_destinations)
+            return cls._shared_store
     
     def search(self, origin: str, budget: float, month: str) -> SearchResult:
         """
@@ -346,16 +617,8 @@ class BudgetSearch(AdvancedSearchMethod):
         """
         self.logger.info(f"Budget search: {origin} max €{budget} ({month})")
         
-        # Mock destination data
-        destinations = self._get_mock_destinations(origin, budget)
-        
-        # Group by country
-        by_country = {}
-        for dest in destinations:
-            country = dest['country']
-            if country not in by_country:
-                by_country[country] = []
-            by_country[country].append(dest)
+        # Bisect the price-sorted index; rows are fresh dicts per query
+        destinations, by_country = self.store.get(origin, month).query(budget)
         
         return SearchResult(
             method="budget_search",
@@ -365,9 +628,10 @@ class BudgetSearch(AdvancedSearchMethod):
             timestamp=datetime.now().isoformat()
         )
     
-    def _get_mock_destinations(self, origin: str, budget: float) -> List[Dict]:
+    @staticmethod
+    def _get_mock_destinations(origin: str, month: str) -> List[Dict]:
         """Get mock destination data"""
-        all_dests = [
+        return [
             {'code': 'BCN', 'city': 'Barcelona', 'country': '🇪🇸 ESPAÑA', 'price': 75, 'rating': 4.9},
             {'code': 'AGP', 'city': 'Málaga', 'country': '🇪🇸 ESPAÑA', 'price': 95, 'rating': 4.7},
             {'code': 'IBZ', 'city': 'Ibiza', 'country': '🇪🇸 ESPAÑA', 'price': 120, 'rating': 4.6},
@@ -379,15 +643,6 @@ class BudgetSearch(AdvancedSearchMethod):
             {'code': 'CDG', 'city': 'París', 'country': '🇫🇷 FRANCIA', 'price': 190, 'rating': 4.8},
             {'code': 'NCE', 'city': 'Niza', 'country': '🇫🇷 FRANCIA', 'price': 205, 'rating': 4.7},
         ]
-        
-        # Filter by budget and calculate savings
-        filtered = []
-        for dest in all_dests:
-            if dest['price'] <= budget:
-                dest['savings_pct'] = (budget - dest['price']) / budget * 100
-                filtered.append(dest)
-        
-        return sorted(filtered, key=lambda x: x['price'])
     
     def format_output(self, result: SearchResult) -> str:
         """Format budget search results"""
@@ -416,65 +671,172 @@ class BudgetSearch(AdvancedSearchMethod):
 # 4-10: REMAINING METHODS (Simplified implementations)
 # ============================================================================
 
-class AirlineSpecificSearch(AdvancedSearchMethod):
+class FareSetFilterSearch(AdvancedSearchMethod):
+    """
+    Search answered by filtering the shared fare set of a route and date
+    
+    Subclasses call _filter() with their predicates; the planner fetches
+    the fare set once per route/date/TTL for all filters together.
+    """
+    
+    def __init__(self, name: str, planner: Optional[FareSetPlanner] = None):
+        super().__init__(name)
+        self._planner = planner
+    
+    @property
+    def planner(self) -> FareSetPlanner:
+        return self._planner or get_fare_planner()
+    
+    def _filter(self, method: str, query: Dict[str, Any], predicates: List,
+                transform=None) -> SearchResult:
+        rows = self.planner.search(query['origin'], query['destination'], query['date'],
+                                   predicates, transform)
+        return fare_planner.fare_view_result(method, query, rows)
+
+
+class AirlineSpecificSearch(FareSetFilterSearch):
     """Filter by specific airlines"""
-    def __init__(self):
-        super().__init__("AirlineSpecificSearch")
+    def __init__(self, planner: Optional[FareSetPlanner] = None):
+        super().__init__("AirlineSpecificSearch", planner)
     
     def search(self, origin: str, destination: str, date: str, airlines: List[str]) -> SearchResult:
-        # Implementation here
-        return SearchResult(
-            method="airline_specific",
-            query={'origin': origin, 'destination': destination, 'date': date, 'airlines': airlines},
-            results=[],
-            metadata={},
-            timestamp=datetime.now().isoformat()
+        return self._filter(
+            "airline_specific",
+            {'origin': origin, 'destination': destination, 'date': date, 'airlines': airlines},
+            [fare_planner.airlines(airlines)]
         )
 
 
-class NonstopOnlySearch(AdvancedSearchMethod):
+class NonstopOnlySearch(FareSetFilterSearch):
     """Direct flights only"""
-    def __init__(self):
-        super().__init__("NonstopOnlySearch")
+    def __init__(self, planner: Optional[FareSetPlanner] = None):
+        super().__init__("NonstopOnlySearch", planner)
     
     def search(self, origin: str, destination: str, date: str) -> SearchResult:
-        return SearchResult(
-            method="nonstop_only",
-            query={'origin': origin, 'destination': destination, 'date': date},
-            results=[],
-            metadata={},
-            timestamp=datetime.now().isoformat()
+        return self._filter(
+            "nonstop_only",
+            {'origin': origin, 'destination': destination, 'date': date},
+            [fare_planner.nonstop()]
         )
 
 
-class RedEyeFlightsSearch(AdvancedSearchMethod):
+class RedEyeFlightsSearch(FareSetFilterSearch):
     """Overnight flights (22:00-06:00)"""
-    def __init__(self):
-        super().__init__("RedEyeFlightsSearch")
+    def __init__(self, planner: Optional[FareSetPlanner] = None):
+        super().__init__("RedEyeFlightsSearch", planner)
     
     def search(self, origin: str, destination: str, date: str) -> SearchResult:
-        return SearchResult(
-            method="redeye_flights",
-            query={'origin': origin, 'destination': destination, 'date': date},
-            results=[],
-            metadata={},
-            timestamp=datetime.now().isoformat()
+        return self._filter(
+            "redeye_flights",
+            {'origin': origin, 'destination': destination, 'date': date},
+            [fare_planner.redeye()]
         )
 
 
 class NearbyAirportsSearch(AdvancedSearchMethod):
     """Include alternative airports"""
-    def __init__(self):
+    
+    search_timeout = 20.0  # one fare query per airport pair
+    
+    def __init__(self, index: Optional[AirportIndex] = None):
         super().__init__("NearbyAirportsSearch")
+        self._index = index
+    
+    @property
+    def index(self) -> AirportIndex:
+        if self._index is None:
+            self._index = get_airport_index()
+        return self._index
     
-    def search(self, city_origin: str, city_dest: str, date: str, max_distance_km: int = 100) -> SearchResult:
+    def search(self, city_origin: str, city_dest: str, date: str, max_distance_km: int = 100,
+               top: int = 10) -> SearchResult:
+        """
+        Search every airport pair within max_distance_km of both cities
+        
+        Args:
+            city_origin: Airport or city code (e.g. 'MAD', 'LON')
+            city_dest: Airport or city code
+            date: YYYY-MM-DD
+            max_distance_km: Radius around each city
+            top: Number of pairs to return
+        """
+        self.logger.info(f"Nearby airports search: {city_origin} → {city_dest} "
+                         f"({date}, {max_distance_km} km)")
+        query = {'city_origin': city_origin, 'city_dest': city_dest, 'date': date,
+                 'max_distance_km': max_distance_km}
+        
+        unknown = [code for code in (city_origin, city_dest) if code not in self.index]
+        if unknown:
+            return SearchResult(method="nearby_airports", query=query, results=[],
+                                metadata={'unknown_codes': unknown},
+                                timestamp=datetime.now().isoformat())
+        
+        origins = self.index.within(city_origin, max_distance_km)
+        dests = self.index.within(city_dest, max_distance_km)
+        pairs = [(o, d) for o in origins for d in dests if o['code'] != d['code']]
+        
+        # Fan the fare queries out on the shared fare pool; results keep pair order
+        fares = list(get_fare_pool().map(
+            lambda p: self._get_fare(p[0]['code'], p[1]['code'], date), pairs))
+        
+        options = [{
+            'origin': o['code'],
+            'destination': d['code'],
+            'origin_distance_km': o['distance_km'],
+            'dest_distance_km': d['distance_km'],
+            'price': price
+        } for (o, d), price in zip(pairs, fares) if price is not None]
+        options.sort(key=lambda x: x['price'])
+        
+        # Baseline: the pair closest to both city centres
+        baseline = min(options, key=lambda x: x['origin_distance_km'] + x['dest_distance_km'],
+                       default=None)
+        savings = baseline['price'] - options[0]['price'] if baseline else 0
+        
         return SearchResult(
             method="nearby_airports",
-            query={'city_origin': city_origin, 'city_dest': city_dest, 'date': date},
-            results=[],
-            metadata={},
+            query=query,
+            results=options[:top],
+            metadata={
+                'origin_airports': [a['code'] for a in origins],
+                'dest_airports': [a['code'] for a in dests],
+                'pairs_searched': len(pairs),
+                'baseline': baseline,
+                'savings': savings
+            },
             timestamp=datetime.now().isoformat()
         )
+    
+    def _get_fare(self, origin: str, dest: str, date: str) -> Optional[float]:
+        """One-way fare for an airport pair (mock: distance-based)"""
+        index = self.index
+        i, j = index.by_code[origin], index.by_code[dest]
+        km = float(haversine_km(index.lat[i], index.lon[i], index.lat[j], index.lon[j]))
+        return round((35 + 0.08 * km) * random.uniform(0.75, 1.3), 2)
+    
+    def format_output(self, result: SearchResult) -> str:
+        """Format alternative airport pairs"""
+        query = result.query
+        meta = result.metadata
+        output = (f"📍 AEROPUERTOS CERCANOS - {query['city_origin']} → {query['city_dest']} "
+                  f"({query['date']}, radio {query['max_distance_km']} km)\n\n")
+        
+        if meta.get('unknown_codes'):
+            return output + f"❓ Código desconocido: {', '.join(meta['unknown_codes'])}\n"
+        if not result.results:
+            return output + "😔 No hay vuelos entre aeropuertos cercanos\n"
+        
+        for i, option in enumerate(result.results, 1):
+            output += (f"{i}. {option['origin']} → {option['destination']} - €{option['price']:.0f}  "
+                       f"({option['origin_distance_km']:.0f} km / {option['dest_distance_km']:.0f} km)\n")
+        
+        if meta['savings'] > 0:
+            baseline = meta['baseline']
+            output += (f"\n💰 Ahorro vs {baseline['origin']} → {baseline['destination']}: "
+                       f"€{meta['savings']:.0f}\n")
+        output += f"🔎 {meta['pairs_searched']} combinaciones consultadas\n"
+        
+        return output
 
 
 class LastMinuteDeals(AdvancedSearchMethod):
@@ -494,32 +856,200 @@ class LastMinuteDeals(AdvancedSearchMethod):
 
 class SeasonalTrendsAnalysis(AdvancedSearchMethod):
     """Historical analysis + ML prediction"""
-    def __init__(self):
+    def __init__(self, history: Optional[PriceHistoryStore] = None,
+                 rollups: Optional[PriceRollups] = None):
         super().__init__("SeasonalTrendsAnalysis")
+        self.rollups = rollups or rollups_for(history)
     
-    def search(self, origin: str, destination: str) -> SearchResult:
+    def search(self, origin: str, destination: str, months: int = 24) -> SearchResult:
+        """
+        Monthly price history of a route
+        
+        Args:
+            origin: IATA code
+            destination: IATA code
+            months: Months of history to analyze (up to the current one)
+        """
+        this_month = np.datetime64(datetime.now().strftime('%Y-%m'), 'M')
+        start = str((this_month - (months - 1)).astype('datetime64[D]'))
+        monthly = self.rollups.monthly(route_key(origin, destination), start=start)
+        
+        metadata = {'observations': sum(m['count'] for m in monthly), 'months': len(monthly)}
+        if monthly:
+            averages = np.array([m['avg_price'] for m in monthly])
+            metadata['cheapest_month'] = min(monthly, key=lambda m: m['avg_price'])['month']
+            metadata['most_expensive_month'] = max(monthly, key=lambda m: m['avg_price'])['month']
+            # €/month slope of the monthly averages
+            metadata['trend_per_month'] = (
+                float(np.polyfit(np.arange(len(averages)), averages, 1)[0]) if len(averages) > 1 else 0.0
+            )
+        
         return SearchResult(
             method="seasonal_trends",
-            query={'origin': origin, 'destination': destination},
-            results=[],
-            metadata={},
+            query={'origin': origin, 'destination': destination, 'months': months},
+            results=monthly,
+            metadata=metadata,
             timestamp=datetime.now().isoformat()
         )
+    
+    def format_output(self, result: SearchResult) -> str:
+        """Format monthly history"""
+        query = result.query
+        output = f"📊 TENDENCIAS DE PRECIO - {query['origin']} → {query['destination']}\n\n"
+        
+        if not result.results:
+            return output + "😔 Aún no hay histórico de precios para esta ruta\n"
+        
+        for month in result.results:
+            output += (f"• {month['month']}: €{month['min_price']:.0f} - €{month['max_price']:.0f} "
+                       f"(media €{month['avg_price']:.0f}, {month['count']} precios)\n")
+        
+        meta = result.metadata
+        trend = meta['trend_per_month']
+        arrow = '📈' if trend > 1 else '📉' if trend < -1 else '➡️'
+        output += (f"\n🔥 Mes más barato: {meta['cheapest_month']}\n"
+                   f"💸 Mes más caro: {meta['most_expensive_month']}\n"
+                   f"{arrow} Tendencia: {trend:+.1f} €/mes\n")
+        return output
 
 
-class GroupBookingSearch(AdvancedSearchMethod):
+class GroupBookingSearch(FareSetFilterSearch):
     """Group reservations (2-9 pax)"""
-    def __init__(self):
-        super().__init__("GroupBookingSearch")
+    def __init__(self, planner: Optional[FareSetPlanner] = None):
+        super().__init__("GroupBookingSearch", planner)
     
     def search(self, origin: str, destination: str, date: str, passengers: int) -> SearchResult:
+        def group_total(row):
+            row['total_price'] = round(row['price'] * passengers, 2)
+            return row
+        
+        return self._filter(
+            "group_booking",
+            {'origin': origin, 'destination': destination, 'date': date, 'passengers': passengers},
+            [fare_planner.seats_for(passengers)],
+            group_total
+        )
+
+
+# ============================================================================
+# 11. ROUND-TRIP CALENDAR
+# ============================================================================
+
+class RoundTripCalendar(AdvancedSearchMethod):
+    """Cheapest round trips for a month under min/max stay constraints"""
+    
+    search_timeout = 20.0  # outbound month + return month(s)
+    
+    def __init__(self, engine: Optional[PriceCalendarEngine] = None):
+        super().__init__("RoundTripCalendar")
+        self.engine = engine or PriceCalendarEngine()
+    
+    def search(self, origin: str, destination: str, month: str,
+               min_stay: int = 5, max_stay: int = 9, top: int = 5) -> SearchResult:
+        """
+        Search round trips departing in month
+        
+        Args:
+            origin: IATA code (e.g. 'MAD')
+            destination: IATA code (e.g. 'BCN')
+            month: Departure month, YYYY-MM
+            min_stay: Minimum nights at destination
+            max_stay: Maximum nights at destination
+            top: Number of options to return
+        """
+        self.logger.info(f"Round-trip search: {origin} <-> {destination} ({month}, "
+                         f"{min_stay}-{max_stay} nights)")
+        
+        grid = self.engine.round_trip([(origin, destination)], month, min_stay, max_stay)
+        options = grid.options(origin, destination, top)
+        
+        by_stay = grid.best_by_stay()[0]
+        best_by_stay = {int(n): float(p) for n, p in zip(grid.stays, by_stay) if not np.isnan(p)}
+        
         return SearchResult(
-            method="group_booking",
-            query={'origin': origin, 'destination': destination, 'date': date, 'passengers': passengers},
-            results=[],
-            metadata={},
+            method="roundtrip_calendar",
+            query={'origin': origin, 'destination': destination, 'month': month,
+                   'min_stay': min_stay, 'max_stay': max_stay},
+            results=options,
+            metadata={
+                'best_by_stay': best_by_stay,
+                'combinations': int(np.count_nonzero(~np.isnan(grid.totals)))
+            },
             timestamp=datetime.now().isoformat()
         )
+    
+    def format_output(self, result: SearchResult) -> str:
+        """Format round-trip options"""
+        query = result.query
+        output = (f"🔁 IDA Y VUELTA - {query['origin']} ⇄ {query['destination']} "
+                  f"({query['month']}, {query['min_stay']}-{query['max_stay']} noches)\n\n")
+        
+        if not result.results:
+            return output + "😔 No hay combinaciones disponibles para esas fechas\n"
+        
+        for i, option in enumerate(result.results, 1):
+            medal = '🥇' if i == 1 else '🥈' if i == 2 else '🥉' if i == 3 else f"{i}."
+            output += (f"{medal} €{option['total']:.0f} · {option['outbound']} → {option['return']} "
+                       f"({option['nights']} noches)\n"
+                       f"    Ida €{option['outbound_price']:.0f} + Vuelta €{option['return_price']:.0f}\n")
+        
+        output += "\n📊 Mejor precio por duración:\n"
+        for nights, price in result.metadata['best_by_stay'].items():
+            output += f"• {nights} noches: €{price:.0f}\n"
+        
+        return output
+
+
+# ============================================================================
+# BATCH SEARCH
+# ============================================================================
+
+@dataclass
+class BatchItem:
+    """One distinct query of a batch and its outcome"""
+    method: str
+    params: Dict[str, Any]
+    indexes: List[int]                     # positions in the request list
+    result: Optional[SearchResult] = None
+    error: Optional[Exception] = None
+    
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _fare_group(params: Dict[str, Any]) -> Optional[Tuple[str, str, str]]:
+    """(origin, destination, date or month) of a route query, else None"""
+    origin = params.get('origin', params.get('city_origin'))
+    destination = params.get('destination', params.get('city_dest'))
+    when = next((params[p] for p in ('date', 'month', 'start_date') if p in params), None)
+    if origin and destination and when:
+        return (str(origin), str(destination), str(when))
+    return None
+
+
+def plan_batch(requests: List[Tuple[str, Dict[str, Any]]]) -> List[List[BatchItem]]:
+    """
+    Deduplicate requests and group them by fare set.
+    
+    Identical queries (after canonicalization) become one BatchItem that
+    lists every position asking for it. Queries on the same route and
+    date share a group and run one after another, so the first one fills
+    the cache that the rest derive from; queries without a route run
+    alone.
+    """
+    items: Dict[str, BatchItem] = {}
+    groups: Dict[Any, List[BatchItem]] = {}
+    for position, (method, params) in enumerate(requests):
+        canonical = canonical_params(params)
+        key = f"{method}:{json.dumps(canonical, sort_keys=True, default=str)}"
+        if key in items:
+            items[key].indexes.append(position)
+            continue
+        item = items[key] = BatchItem(method=method, params=dict(params), indexes=[position])
+        group = _fare_group(canonical) or key
+        groups.setdefault(group, []).append(item)
+    return list(groups.values())
 
 
 # ============================================================================
@@ -540,20 +1070,110 @@ class SearchMethodFactory:
         'lastminute': LastMinuteDeals,
         'seasonal_trends': SeasonalTrendsAnalysis,
         'group_booking': GroupBookingSearch,
+        'roundtrip': RoundTripCalendar,
     }
     
     @classmethod
-    def create(cls, method_name: str) -> AdvancedSearchMethod:
-        """Create search method instance"""
+    def create(cls, method_name: str,
+               planner: Optional[FareSetPlanner] = None) -> AdvancedSearchMethod:
+        """
+        Create search method instance
+        
+        Args:
+            method_name: Registered method name
+            planner: FareSetPlanner for fare-set filter searches (the
+                default planner if None)
+        """
         method_class = cls._methods.get(method_name)
         if not method_class:
             raise ValueError(f"Unknown search method: {method_name}")
+        if planner is not None and issubclass(method_class, FareSetFilterSearch):
+            return method_class(planner)
         return method_class()
     
     @classmethod
     def list_methods(cls) -> List[str]:
         """List available methods"""
         return list(cls._methods.keys())
+    
+    @classmethod
+    async def asearch_batch(cls, requests: List[Tuple[str, Dict[str, Any]]],
+                            max_parallel: int = 8, cache_manager=None,
+                            planner: Optional[FareSetPlanner] = None) -> AsyncIterator[BatchItem]:
+        """
+        Run many searches, yielding BatchItems in completion order.
+        
+        Args:
+            requests: (method name, params) pairs
+            max_parallel: Fare groups running at once (each search still
+                obeys its method's max_concurrency and search_timeout)
+            cache_manager: Optional SearchCacheManager to read and fill
+            planner: FareSetPlanner for fare-set filter searches
+        
+        Failed searches are yielded with error set instead of raising.
+        """
+        groups = plan_batch(requests)
+        done: asyncio.Queue = asyncio.Queue()
+        slots = asyncio.Semaphore(max(1, max_parallel))
+        
+        async def run_group(group: List[BatchItem]):
+            async with slots:
+                for item in group:
+                    try:
+                        method = cls.create(item.method, planner)
+                        if cache_manager is None:
+                            item.result = await method.asearch(**item.params)
+                        else:
+                            item.result = await cache_manager.aget_or_compute(
+                                item.method, partial(method.asearch, **item.params), **item.params
+                            )
+                    except Exception as e:
+                        item.error = e
+                    done.put_nowait(item)
+        
+        tasks = [asyncio.ensure_future(run_group(group)) for group in groups]
+        try:
+            for _ in range(sum(len(group) for group in groups)):
+                yield await done.get()
+        finally:
+            for task in tasks:
+                task.cancel()
+    
+    @classmethod
+    def search_batch(cls, requests: List[Tuple[str, Dict[str, Any]]],
+                     max_parallel: int = 8, cache_manager=None,
+                     planner: Optional[FareSetPlanner] = None) -> Iterator[BatchItem]:
+        """
+        Sync version of asearch_batch() on a thread pool.
+        
+        Searches run on the shared SearchExecutor and each waits at most
+        its method's search_timeout; a search that times out is yielded
+        with a SearchTimeoutError.
+        """
+        groups = plan_batch(requests)
+        done: "queue.Queue[BatchItem]" = queue.Queue()
+        executor = get_search_executor()
+        
+        def run_group(group: List[BatchItem]):
+            for item in group:
+                try:
+                    method = cls.create(item.method, planner)
+                    call = partial(method.search, **item.params)
+                    if cache_manager is not None:
+                        call = partial(cache_manager.get_or_compute, item.method, call, **item.params)
+                    item.result = executor.run_sync(method, call)
+                except Exception as e:
+                    item.error = e
+                done.put(item)
+        
+        pool = ThreadPoolExecutor(max_workers=max(1, max_parallel), thread_name_prefix="batch")
+        try:
+            for group in groups:
+                pool.submit(run_group, group)
+            for _ in range(sum(len(group) for group in groups)):
+                yield done.get()
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
 
 
 # ============================================================================
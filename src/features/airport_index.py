@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Airport Spatial Index - Cazador Supremo v14.0
+
+Nearby-airport lookups over the bundled data/airports.csv table:
+- Coordinates kept as NumPy arrays (lat/lon + 3-D unit vectors)
+- Array-backed KD-tree over unit vectors: radius and k-nearest queries
+  in O(log n + k)
+- Vectorized haversine distances
+- City codes (PAR, LON, NYC...) resolve to the centroid of their airports
+
+On the unit sphere the straight-line (chord) distance grows monotonically
+with the great-circle distance, so a Euclidean ball of radius
+2·sin(d / 2R) in the KD-tree holds exactly the airports within d km.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import os
+import csv
+import heapq
+import logging
+import threading
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EARTH_RADIUS_KM = 6371.0
+DEFAULT_AIRPORTS_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'airports.csv'
+)
+
+
+# ============================================================================
+# GEOMETRY
+# ============================================================================
+
+def haversine_km(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Great-circle distance in km; all arguments broadcast"""
+    lat1, lon1, lat2, lon2 = (np.radians(np.asarray(a, dtype=float))
+                              for a in (lat1, lon1, lat2, lon2))
+    a = (np.sin((lat2 - lat1) / 2) ** 2
+         + np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+
+
+def unit_vectors(lat, lon) -> np.ndarray:
+    """(n, 3) points on the unit sphere"""
+    lat, lon = np.radians(np.asarray(lat, dtype=float)), np.radians(np.asarray(lon, dtype=float))
+    cos_lat = np.cos(lat)
+    return np.stack([cos_lat * np.cos(lon), cos_lat * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def km_to_chord(km: float) -> float:
+    return 2 * np.sin(min(km / EARTH_RADIUS_KM, np.pi) / 2)
+
+
+def chord_to_km(chord):
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2, 0.0, 1.0))
+
+
+# ============================================================================
+# KD-TREE
+# ============================================================================
+
+class SphericalKDTree:
+    """
+    Implicit balanced KD-tree over unit vectors.
+
+    The tree is a permutation of the points: the node covering order[lo:hi]
+    splits at mid = (lo + hi) // 2 along split_dim[mid], with the left
+    subtree in [lo, mid) and the right one in (mid, hi). Ranges of at most
+    leaf_size points are scanned with one vectorized distance call.
+    """
+
+    def __init__(self, lat, lon, leaf_size: int = 8):
+        xyz = unit_vectors(lat, lon)
+        n = len(xyz)
+        self.leaf_size = max(1, leaf_size)
+        self.order = np.arange(n)
+        self.split_dim = np.zeros(n, dtype=np.int8)
+
+        stack = [(0, n)]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= self.leaf_size:
+                continue
+            idx = self.order[lo:hi]
+            pts = xyz[idx]
+            dim = int(np.ptp(pts, axis=0).argmax())
+            mid = (lo + hi) // 2
+            self.order[lo:hi] = idx[np.argpartition(pts[:, dim], mid - lo)]
+            self.split_dim[mid] = dim
+            stack += [(lo, mid), (mid + 1, hi)]
+
+        self.points = xyz[self.order]
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def query_radius(self, point: np.ndarray, chord: float) -> Tuple[np.ndarray, np.ndarray]:
+        """(indexes, chord distances) of points within chord of point"""
+        found, dists = [], []
+        stack = [(0, len(self.points))]
+        while stack:
+            lo, hi = stack.pop()
+            if hi - lo <= self.leaf_size:
+                d = np.linalg.norm(self.points[lo:hi] - point, axis=1)
+                hit = np.nonzero(d <= chord)[0]
+                found.append(hit + lo)
+                dists.append(d[hit])
+                continue
+            mid = (lo + hi) // 2
+            diff = point[self.split_dim[mid]] - self.points[mid, self.split_dim[mid]]
+            d = float(np.linalg.norm(self.points[mid] - point))
+            if d <= chord:
+                found.append(np.array([mid]))
+                dists.append(np.array([d]))
+            if diff <= chord:
+                stack.append((lo, mid))
+            if -diff <= chord:
+                stack.append((mid + 1, hi))
+
+        if not found:
+            return np.empty(0, dtype=np.int64), np.empty(0)
+        positions = np.concatenate(found)
+        return self.order[positions], np.concatenate(dists)
+
+    def query_knn(self, point: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """(indexes, chord distances) of the k nearest points, nearest first"""
+        k = min(k, len(self.points))
+        heap: List[Tuple[float, int]] = []  # max-heap of (-distance, position)
+
+        def offer(d: float, position: int):
+            if len(heap) < k:
+                heapq.heappush(heap, (-d, position))
+            elif d < -heap[0][0]:
+                heapq.heapreplace(heap, (-d, position))
+
+        stack = [(0, len(self.points), 0.0)]  # (lo, hi, lower bound)
+        while stack and k:
+            lo, hi, bound = stack.pop()
+            if len(heap) == k and bound > -heap[0][0]:
+                continue
+            if hi - lo <= self.leaf_size:
+                d = np.linalg.norm(self.points[lo:hi] - point, axis=1)
+                for j in np.argsort(d)[:k]:
+                    offer(float(d[j]), lo + int(j))
+                continue
+            mid = (lo + hi) // 2
+            diff = float(point[self.split_dim[mid]] - self.points[mid, self.split_dim[mid]])
+            offer(float(np.linalg.norm(self.points[mid] - point)), mid)
+            near, far = ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            stack.append((*far, abs(diff)))  # visited after near
+            stack.append((*near, bound))
+
+        ranked = sorted((-d, position) for d, position in heap)
+        positions = np.array([p for _, p in ranked], dtype=np.int64)
+        return self.order[positions], np.array([d for d, _ in ranked])
+
+
+# ============================================================================
+# AIRPORT INDEX
+# ============================================================================
+
+class AirportIndex:
+    """
+    Airport table plus KD-tree, with code/city resolution
+    """
+
+    def __init__(self, path: str = DEFAULT_AIRPORTS_FILE, leaf_size: int = 8):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            rows = list(csv.DictReader(f))
+
+        self.codes = np.array([r['iata'] for r in rows])
+        self.names = [r['name'] for r in rows]
+        self.cities = [r['city'] for r in rows]
+        self.countries = [r['country'] for r in rows]
+        self.lat = np.array([float(r['lat']) for r in rows])
+        self.lon = np.array([float(r['lon']) for r in rows])
+        self.tree = SphericalKDTree(self.lat, self.lon, leaf_size)
+
+        self.by_code = {str(code): i for i, code in enumerate(self.codes)}
+        self.metros: Dict[str, List[int]] = {}
+        for i, r in enumerate(rows):
+            if r['metro']:
+                self.metros.setdefault(r['metro'], []).append(i)
+
+        logger.info(f"Airport index loaded: {len(rows)} airports")
+
+    def __contains__(self, code: str) -> bool:
+        code = code.upper()
+        return code in self.metros or code in self.by_code
+
+    def locate(self, code: str) -> Tuple[float, float]:
+        """
+        (lat, lon) of an airport, or the centroid of a city's airports
+
+        Raises:
+            KeyError: unknown code
+        """
+        code = code.upper()
+        if code in self.metros:
+            xyz = unit_vectors(self.lat[self.metros[code]], self.lon[self.metros[code]]).sum(axis=0)
+            x, y, z = xyz / np.linalg.norm(xyz)
+            return float(np.degrees(np.arcsin(z))), float(np.degrees(np.arctan2(y, x)))
+        if code in self.by_code:
+            i = self.by_code[code]
+            return float(self.lat[i]), float(self.lon[i])
+        raise KeyError(code)
+
+    def _airports(self, idx: np.ndarray, lat: float, lon: float) -> List[Dict[str, Any]]:
+        distances = haversine_km(lat, lon, self.lat[idx], self.lon[idx])
+        ranked = np.argsort(distances, kind='stable')
+        return [{
+            'code': str(self.codes[idx[j]]),
+            'name': self.names[idx[j]],
+            'city': self.cities[idx[j]],
+            'country': self.countries[idx[j]],
+            'distance_km': round(float(distances[j]), 1)
+        } for j in ranked]
+
+    def within(self, code: str, radius_km: float) -> List[Dict[str, Any]]:
+        """Airports within radius_km of code, nearest first"""
+        lat, lon = self.locate(code)
+        point = unit_vectors(lat, lon)
+        idx, _ = self.tree.query_radius(point, km_to_chord(radius_km))
+        return self._airports(idx, lat, lon)
+
+    def nearest(self, code: str, k: int = 5) -> List[Dict[str, Any]]:
+        """The k airports closest to code, nearest first"""
+        lat, lon = self.locate(code)
+        idx, _ = self.tree.query_knn(unit_vectors(lat, lon), k)
+        return self._airports(idx, lat, lon)
+
+
+_index: Optional[AirportIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_airport_index() -> AirportIndex:
+    """Shared index over the bundled airport table (loaded once)"""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = AirportIndex()
+        return _index
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("AIRPORT INDEX - TESTING")
+    print("=" * 70)
+
+    index = get_airport_index()
+    for code, radius in (('BCN', 100), ('LON', 80), ('NYC', 50)):
+        airports = index.within(code, radius)
+        listed = ', '.join(f"{a['code']} ({a['distance_km']:.0f} km)" for a in airports)
+        print(f"\n{code} ≤ {radius} km: {listed}")
+
+    print(f"\n5 nearest to MAD: {[a['code'] for a in index.nearest('MAD', 5)]}")
@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Budget Price Index - Cazador Supremo v14.0
+
+Per-(origin, month) destination index for BudgetSearch:
+- Destinations sorted by price, prices in a NumPy array
+- "Everything under €X" is one searchsorted (bisect) plus a slice
+- Group-by-country views precomputed as price-sorted position arrays
+- Immutable once built; refreshed fares build a new index that replaces
+  the old one in a single reference swap
+
+Rows are stored as read-only mappings and every query returns fresh
+dicts, so concurrent searches never share or mutate result rows.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import time
+import logging
+import threading
+from types import MappingProxyType
+from typing import List, Dict, Any, Callable, Mapping, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+
+# ============================================================================
+# INDEX
+# ============================================================================
+
+class DestinationPriceIndex:
+    """
+    Immutable price-sorted destinations for one origin and month
+    """
+
+    def __init__(self, origin: str, month: str, destinations: List[Dict[str, Any]]):
+        self.origin = origin
+        self.month = month
+        self.built_at = time.time()
+
+        prices = np.array([float(d['price']) for d in destinations])
+        order = np.argsort(prices, kind='stable')
+        self.rows: Tuple[Mapping[str, Any], ...] = tuple(
+            MappingProxyType(dict(destinations[i])) for i in order
+        )
+        self.prices = prices[order]
+        self.prices.flags.writeable = False
+
+        # country -> positions into rows (ascending price); countries in
+        # order of their cheapest destination
+        positions: Dict[str, List[int]] = {}
+        for i, row in enumerate(self.rows):
+            positions.setdefault(row['country'], []).append(i)
+        self.countries = tuple(positions)
+        self.country_positions = {c: np.array(p, dtype=np.int64) for c, p in positions.items()}
+        for array in self.country_positions.values():
+            array.flags.writeable = False
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def count_under(self, budget: float) -> int:
+        """Number of destinations priced at or below budget"""
+        return int(np.searchsorted(self.prices, budget, side='right'))
+
+    def query(self, budget: float) -> Tuple[List[Dict[str, Any]], Dict[str, List[Dict[str, Any]]]]:
+        """
+        Destinations within budget, cheapest first, and the same rows
+        grouped by country; every row gets savings_pct against budget
+        """
+        n = self.count_under(budget)
+        rows = [dict(row, savings_pct=(budget - row['price']) / budget * 100)
+                for row in self.rows[:n]]
+        grouped = {}
+        for country in self.countries:
+            positions = self.country_positions[country]
+            cut = int(np.searchsorted(positions, n))  # positions below n are in budget
+            if cut:
+                grouped[country] = [rows[i] for i in positions[:cut]]
+        return rows, grouped
+
+    def under(self, budget: float) -> List[Dict[str, Any]]:
+        return self.query(budget)[0]
+
+    def by_country(self, budget: float) -> Dict[str, List[Dict[str, Any]]]:
+        return self.query(budget)[1]
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class BudgetIndexStore:
+    """
+    Holds the current index per (origin, month) and rebuilds from fare_source
+    """
+
+    def __init__(self, fare_source: Callable[[str, str], List[Dict[str, Any]]],
+                 max_age: float = 3600):
+        """
+        Args:
+            fare_source: fare_source(origin, month) -> destination dicts with
+                'code', 'city', 'country', 'price'
+            max_age: Seconds before get() rebuilds an index
+        """
+        self.fare_source = fare_source
+        self.max_age = max_age
+        self._indexes: Dict[Tuple[str, str], DestinationPriceIndex] = {}
+        self._lock = threading.Lock()
+        self.stats = {'builds': 0, 'hits': 0}
+
+    def get(self, origin: str, month: str) -> DestinationPriceIndex:
+        """Current index, building it if missing or older than max_age"""
+        index = self._indexes.get((origin, month))
+        if index is not None and time.time() - index.built_at < self.max_age:
+            with self._lock:
+                self.stats['hits'] += 1
+            return index
+        return self.refresh(origin, month)
+
+    def refresh(self, origin: str, month: str) -> DestinationPriceIndex:
+        """Build from fresh fares, then swap it in; readers keep the old one meanwhile"""
+        index = DestinationPriceIndex(origin, month, self.fare_source(origin, month))
+        with self._lock:
+            self._indexes[(origin, month)] = index
+            self.stats['builds'] += 1
+        logger.debug(f"Budget index rebuilt: {origin} {month} ({len(index)} destinations)")
+        return index
+
+    def refresh_all(self) -> int:
+        """Rebuild every known index; returns how many were rebuilt"""
+        with self._lock:
+            keys = list(self._indexes)
+        for origin, month in keys:
+            self.refresh(origin, month)
+        return len(keys)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {**self.stats, 'indexes': len(self._indexes)}
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("BUDGET INDEX - TESTING")
+    print("=" * 70)
+
+    fares = [
+        {'code': 'BCN', 'city': 'Barcelona', 'country': 'ES', 'price': 75},
+        {'code': 'LIS', 'city': 'Lisboa', 'country': 'PT', 'price': 110},
+        {'code': 'AGP', 'city': 'Málaga', 'country': 'ES', 'price': 95},
+        {'code': 'FCO', 'city': 'Roma', 'country': 'IT', 'price': 145},
+    ]
+    store = BudgetIndexStore(lambda origin, month: fares)
+    index = store.get('MAD', '2026-03')
+
+    for budget in (100, 120, 200):
+        print(f"\n≤ €{budget}: {[d['code'] for d in index.under(budget)]}")
+        print(f"  by country: { {c: [d['code'] for d in ds] for c, ds in index.by_country(budget).items()} }")
+    print(f"\nStats: {store.get_stats()}")
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache Warming Scheduler - Cazador Supremo v14.0 Phase 3
+
+Precomputes expensive searches for the routes users are about to ask for:
+- Route ranking by recent search frequency (SearchAnalyticsTracker)
+- Seed routes from POPULAR_ROUTES and the config.json flights list
+- flexible_dates, budget and cheapest_month warmed into SearchCacheManager
+- Full warm-up in off-peak windows, refresh-before-expiry the rest of the day
+- Concurrency cap and hit-rate impact report
+
+Usage:
+    warmer = CacheWarmer(cache_manager, analytics=tracker,
+                         seed_routes=routes_from_popular(POPULAR_ROUTES)
+                                     + load_config_routes('config.json'))
+    asyncio.create_task(warmer.run_forever())
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import json
+import asyncio
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import List, Dict, Any, Optional, Tuple, Iterable, Callable, Awaitable
+
+try:
+    from advanced_search_methods import SearchMethodFactory
+    ADVANCED_SEARCH_AVAILABLE = True
+except ImportError:
+    ADVANCED_SEARCH_AVAILABLE = False
+
+try:
+    from additional_search_methods import CheapestMonthFinder
+    ADDITIONAL_SEARCH_AVAILABLE = True
+except ImportError:
+    ADDITIONAL_SEARCH_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+Route = Tuple[str, str]
+
+
+# ============================================================================
+# ROUTE SOURCES
+# ============================================================================
+
+def routes_from_popular(popular_routes: Iterable[Dict[str, Any]]) -> List[Route]:
+    """Convert POPULAR_ROUTES entries ({'from': 'MAD', 'to': 'BCN', ...}) to routes"""
+    return [(r['from'], r['to']) for r in popular_routes if r.get('from') and r.get('to')]
+
+
+def load_config_routes(config_path: str = "config.json") -> List[Route]:
+    """Load the 'flights' list of config.json as routes"""
+    try:
+        with open(config_path, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+    except (OSError, json.JSONDecodeError) as e:
+        logger.warning(f"Could not load routes from {config_path}: {e}")
+        return []
+
+    return [
+        (f['origin'], f['dest'])
+        for f in config.get('flights', [])
+        if f.get('origin') and f.get('dest')
+    ]
+
+
+# ============================================================================
+# WARMING JOBS
+# ============================================================================
+
+class WarmJob:
+    """One search to precompute"""
+
+    __slots__ = ('method', 'params')
+
+    def __init__(self, method: str, **params):
+        self.method = method
+        self.params = params
+
+    def __repr__(self) -> str:
+        return f"WarmJob({self.method}, {self.params})"
+
+
+# ============================================================================
+# CACHE WARMER
+# ============================================================================
+
+class CacheWarmer:
+    """
+    Keeps SearchCacheManager warm for the most searched routes
+    """
+
+    WARM_METHODS = ('flexible_dates', 'budget', 'cheapest_month')
+
+    def __init__(self, cache_manager,
+                 analytics=None,
+                 seed_routes: Optional[List[Route]] = None,
+                 top_n: int = 20,
+                 peak_top_n: int = 5,
+                 months_ahead: int = 2,
+                 default_budgets: Tuple[float, ...] = (300, 500),
+                 off_peak_hours: Tuple[int, ...] = (1, 2, 3, 4, 5, 6),
+                 max_concurrency: int = 2,
+                 refresh_margin: float = 0.2,
+                 interval: int = 600,
+                 history_days: int = 7):
+        """
+        Args:
+            cache_manager: SearchCacheManager to fill
+            analytics: SearchAnalyticsTracker used to rank routes (optional)
+            seed_routes: Routes always considered, ranked after searched ones
+            top_n: Routes warmed in off-peak windows
+            peak_top_n: Routes kept fresh outside off-peak windows
+            months_ahead: Months of flexible_dates/budget to warm (from current)
+            default_budgets: Budget levels used when analytics has none
+            off_peak_hours: Local hours considered off-peak
+            max_concurrency: Warming searches running at once
+            refresh_margin: Refresh when less than this fraction of the TTL is left
+            interval: Seconds between scheduler passes
+            history_days: Search history window for ranking
+        """
+        self.cache_manager = cache_manager
+        self.analytics = analytics
+        self.seed_routes = list(dict.fromkeys(seed_routes or []))
+        self.top_n = top_n
+        self.peak_top_n = peak_top_n
+        self.months_ahead = months_ahead
+        self.default_budgets = default_budgets
+        self.off_peak_hours = set(off_peak_hours)
+        self.max_concurrency = max_concurrency
+        self.refresh_margin = refresh_margin
+        self.interval = interval
+        self.history_days = history_days
+
+        self.factory = SearchMethodFactory() if ADVANCED_SEARCH_AVAILABLE else None
+        self.month_finder = CheapestMonthFinder() if ADDITIONAL_SEARCH_AVAILABLE else None
+        self.running = False
+
+        self.stats = {
+            'runs': 0,
+            'jobs_run': 0,
+            'jobs_skipped': 0,
+            'failures': 0,
+            'last_run': None,
+            'last_run_routes': 0
+        }
+
+    # ========================================================================
+    # RANKING
+    # ========================================================================
+
+    def _recent_events(self) -> List[Any]:
+        if self.analytics is None:
+            return []
+        cutoff = datetime.now() - timedelta(days=self.history_days)
+        with self.analytics.lock:
+            return [e for e in self.analytics.events if e.timestamp >= cutoff]
+
+    def rank_routes(self, limit: Optional[int] = None) -> List[Route]:
+        """Routes ordered by recent search count, then seed order"""
+        counts = Counter()
+        for event in self._recent_events():
+            origin = event.params.get('origin')
+            destination = event.params.get('destination')
+            if origin and destination:
+                counts[(origin.upper(), destination.upper())] += 1
+
+        ranked = [route for route, _ in counts.most_common()]
+        seen = set(ranked)
+        ranked += [r for r in self.seed_routes if r not in seen]
+        return ranked[:limit or self.top_n]
+
+    def popular_budgets(self, origin: str, limit: int = 2) -> List[float]:
+        """Most requested budget levels for an origin"""
+        counts = Counter(
+            float(e.params['budget'])
+            for e in self._recent_events()
+            if e.params.get('origin', '').upper() == origin and e.params.get('budget')
+        )
+        budgets = [b for b, _ in counts.most_common(limit)]
+        return budgets or list(self.default_budgets)
+
+    # ========================================================================
+    # JOBS
+    # ========================================================================
+
+    def _months(self, now: datetime) -> List[str]:
+        months = []
+        year, month = now.year, now.month
+        for _ in range(self.months_ahead):
+            months.append(f"{year:04d}-{month:02d}")
+            year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+        return months
+
+    def build_jobs(self, routes: List[Route], now: Optional[datetime] = None) -> List[WarmJob]:
+        """Searches to warm for the given routes"""
+        now = now or datetime.now()
+        months = self._months(now)
+        jobs = []
+        origins = []
+
+        for origin, destination in routes:
+            for month in months:
+                jobs.append(WarmJob('flexible_dates', origin=origin,
+                                    destination=destination, month=month))
+            jobs.append(WarmJob('cheapest_month', origin=origin,
+                                destination=destination, months_ahead=12))
+            if origin not in origins:
+                origins.append(origin)
+
+        for origin in origins:
+            for budget in self.popular_budgets(origin):
+                for month in months:
+                    jobs.append(WarmJob('budget', origin=origin, budget=budget, month=month))
+
+        return jobs
+
+    def needs_warming(self, job: WarmJob) -> bool:
+        """True if the job's entry is missing or close to its soft TTL"""
+        remaining = self.cache_manager.time_to_stale(job.method, **job.params)
+        if remaining is None:
+            return True
+        ttl = self.cache_manager.ttl_config.get(job.method, 300)
+        return remaining < ttl * self.refresh_margin
+
+    def _compute(self, job: WarmJob) -> Callable[[], Awaitable[Any]]:
+        """Zero-argument coroutine factory running the job's search"""
+        if job.method == 'cheapest_month':
+            finder = self.month_finder
+            return lambda: asyncio.to_thread(finder.find_cheapest_months, **job.params)
+
+        method = self.factory.create(job.method)
+        return lambda: method.asearch(**job.params)
+
+    def _can_run(self, job: WarmJob) -> bool:
+        if job.method == 'cheapest_month':
+            return self.month_finder is not None
+        return self.factory is not None
+
+    # ========================================================================
+    # EXECUTION
+    # ========================================================================
+
+    def is_off_peak(self, now: Optional[datetime] = None) -> bool:
+        """True inside an off-peak window"""
+        return (now or datetime.now()).hour in self.off_peak_hours
+
+    async def warm(self, routes: List[Route], only_cached: bool = False) -> Dict[str, int]:
+        """
+        Warm the given routes.
+
+        Args:
+            routes: Routes to warm
+            only_cached: Only refresh entries that are already cached
+                (keeps hot entries alive without adding new ones)
+        """
+        jobs = [j for j in self.build_jobs(routes) if self._can_run(j)]
+        due = []
+        for job in jobs:
+            cached = self.cache_manager.time_to_stale(job.method, **job.params) is not None
+            if self.needs_warming(job) and (cached or not only_cached):
+                due.append(job)
+
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+
+        async def run(job: WarmJob) -> bool:
+            async with semaphore:
+                try:
+                    await self.cache_manager.arefresh(job.method, self._compute(job),
+                                                      warmed=True, **job.params)
+                    return True
+                except Exception as e:
+                    logger.warning(f"Cache warming failed for {job}: {e}")
+                    return False
+
+        results = await asyncio.gather(*(run(job) for job in due))
+
+        succeeded = sum(results)
+        self.stats['runs'] += 1
+        self.stats['jobs_run'] += succeeded
+        self.stats['failures'] += len(due) - succeeded
+        self.stats['jobs_skipped'] += len(jobs) - len(due)
+        self.stats['last_run'] = datetime.now().isoformat()
+        self.stats['last_run_routes'] = len(routes)
+
+        logger.info(f"Cache warming: {succeeded}/{len(due)} searches for {len(routes)} routes "
+                    f"({len(jobs) - len(due)} still fresh)")
+        return {'due': len(due), 'succeeded': succeeded, 'skipped': len(jobs) - len(due)}
+
+    async def run_once(self, now: Optional[datetime] = None) -> Dict[str, int]:
+        """One scheduler pass: full warm off-peak, keep-alive otherwise"""
+        if self.is_off_peak(now):
+            return await self.warm(self.rank_routes(self.top_n))
+        return await self.warm(self.rank_routes(self.peak_top_n), only_cached=True)
+
+    async def run_forever(self):
+        """Run scheduler passes every interval seconds until stop()"""
+        self.running = True
+        logger.info("🔥 Cache warmer started")
+        while self.running:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"Cache warming pass failed: {e}")
+            await asyncio.sleep(self.interval)
+
+    def stop(self):
+        """Stop run_forever() after the current pass"""
+        self.running = False
+
+    # ========================================================================
+    # REPORTING
+    # ========================================================================
+
+    def get_report(self) -> Dict[str, Any]:
+        """
+        Warming activity and its effect on the cache hit rate.
+
+        hit_rate_without_warming counts hits on warmed entries as misses,
+        i.e. what the hit rate would have been without them.
+        """
+        lookups = self.cache_manager.get_stats().get('lookups', {})
+        hits = lookups.get('hits', 0)
+        misses = lookups.get('misses', 0)
+        warm_hits = lookups.get('warm_hits', 0)
+        total = hits + misses
+
+        return {
+            **self.stats,
+            'warmed_entries': lookups.get('warmed_entries', 0),
+            'warm_hits': warm_hits,
+            'hit_rate': f"{hits / total * 100:.1f}%" if total else "0.0%",
+            'hit_rate_without_warming': f"{(hits - warm_hits) / total * 100:.1f}%" if total else "0.0%",
+            'warm_hit_share': f"{warm_hits / hits * 100:.1f}%" if hits else "0.0%"
+        }
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    from search_cache import SearchCacheManager
+
+    print("=" * 70)
+    print("CACHE WARMING - TESTING")
+    print("=" * 70)
+
+    mgr = SearchCacheManager()
+    warmer = CacheWarmer(mgr, seed_routes=[('MAD', 'BCN'), ('MAD', 'MIA')], top_n=2)
+
+    print(f"\nRanked routes: {warmer.rank_routes()}")
+    print(f"Warm result: {asyncio.run(warmer.warm(warmer.rank_routes()))}")
+
+    month = datetime.now().strftime('%Y-%m')
+    mgr.get_cached_result('flexible_dates', origin='MAD', destination='BCN', month=month)
+    print(f"\nReport: {json.dumps(warmer.get_report(), indent=2)}")
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fare Set Query Planner - Cazador Supremo v14.0
+
+Filter-style searches (airline, nonstop, red-eye, group) are all views of
+one fare list per (origin, destination, date). The planner turns each of
+them into:
+
+    fetch fare set once  →  predicate pipeline  →  optional row mapping
+
+The fare set is read through SearchCacheManager under the 'fare_set'
+method, so it is shared by every filter on the route, and concurrent
+first requests wait on one provider call (single-flight). The planner
+also registers nonstop/red-eye subsumption rules on that cache; they run
+the same pipeline, so a derived hit equals a planned search.
+
+Fare set rows are dicts: airline, flight_number, departure ('HH:MM'),
+arrival, duration_minutes, stops, price, seats.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import zlib
+import random
+import logging
+import threading
+from datetime import datetime
+from typing import List, Dict, Any, Callable, Iterable, Optional
+
+from search_cache import SearchCacheManager, SubsumptionRule, canonical_params
+from flight_results import is_redeye_clock
+
+logger = logging.getLogger(__name__)
+
+FareRow = Dict[str, Any]
+Predicate = Callable[[FareRow], bool]
+
+
+# ============================================================================
+# PREDICATES
+# ============================================================================
+
+def nonstop() -> Predicate:
+    return lambda row: row.get('stops', 0) == 0
+
+
+def redeye() -> Predicate:
+    """Departures between 22:00 and 06:00; rows without a clock time never match"""
+    return lambda row: is_redeye_clock(row.get('departure'))
+
+
+def airlines(codes: Iterable[str]) -> Predicate:
+    wanted = {c.strip().upper() for c in codes}
+    return lambda row: str(row.get('airline', '')).upper() in wanted
+
+
+def seats_for(passengers: int) -> Predicate:
+    return lambda row: row.get('seats', 0) >= passengers
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+def apply_pipeline(rows: Iterable[FareRow], predicates: Iterable[Predicate] = (),
+                   transform: Optional[Callable[[FareRow], FareRow]] = None) -> List[FareRow]:
+    """
+    Copies of the rows passing every predicate, cheapest first.
+
+    Rows are copied (and passed through transform) so callers never
+    touch the cached fare set.
+    """
+    predicates = list(predicates)
+    rows = [dict(row) for row in rows if all(p(row) for p in predicates)]
+    if transform is not None:
+        rows = [transform(row) for row in rows]
+    return sorted(rows, key=lambda r: r.get('total_price', r['price']))
+
+
+def fare_view_result(method: str, query: Dict[str, Any], rows: List[FareRow]):
+    """SearchResult for a fare set or a filtered view of one"""
+    from advanced_search_methods import SearchResult  # avoid a circular import
+    return SearchResult(
+        method=method,
+        query=dict(query),
+        results=rows,
+        metadata={'total_found': len(rows)},
+        timestamp=datetime.now().isoformat()
+    )
+
+
+def _route_and_date(params: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: params[k] for k in ('origin', 'destination', 'date') if k in params}
+
+
+def _view_rule(method: str, result_method: str, predicate: Callable[[], Predicate]) -> SubsumptionRule:
+    """Answer method queries from the cached fare set of the route and date"""
+    def derive(result: Any, params: Dict[str, Any]) -> Any:
+        rows = apply_pipeline(getattr(result, 'results', result), [predicate()])
+        return fare_view_result(result_method, params, rows)
+    return SubsumptionRule(method, 'fare_set', derive, source_params=_route_and_date)
+
+
+# Cache method name -> SearchResult.method as the search classes report it
+FARE_SET_RULES = [
+    _view_rule('nonstop_only', 'nonstop_only', nonstop),
+    _view_rule('redeye', 'redeye_flights', redeye),
+]
+
+
+# ============================================================================
+# PLANNER
+# ============================================================================
+
+class FareSetPlanner:
+    """
+    Fetches fare sets through the cache and runs predicate pipelines on them
+    """
+
+    def __init__(self, cache_manager: SearchCacheManager,
+                 fare_source: Optional[Callable[[str, str, str], List[FareRow]]] = None):
+        """
+        Args:
+            cache_manager: Cache holding 'fare_set' entries
+            fare_source: fare_source(origin, destination, date) -> fare rows
+        """
+        self.cache_manager = cache_manager
+        self.fare_source = fare_source or mock_fare_set
+        self.lock = threading.Lock()
+        self.stats = {'provider_calls': 0, 'queries': 0}
+
+        registered = self.cache_manager.subsumption_rules
+        for rule in FARE_SET_RULES:
+            if rule not in registered.get(rule.method, ()):
+                self.cache_manager.add_subsumption_rule(rule)
+
+    def fetch(self, origin: str, destination: str, date: str) -> List[FareRow]:
+        """Unfiltered fares for the route and date (one provider call per TTL)"""
+        params = canonical_params({'origin': origin, 'destination': destination, 'date': date})
+
+        def compute():
+            with self.lock:
+                self.stats['provider_calls'] += 1
+            rows = self.fare_source(params['origin'], params['destination'], params['date'])
+            logger.debug(f"Fare set fetched: {params['origin']}-{params['destination']} "
+                         f"{params['date']} ({len(rows)} fares)")
+            return fare_view_result('fare_set', params, rows)
+
+        result = self.cache_manager.get_or_compute('fare_set', compute, **params)
+        return list(getattr(result, 'results', result))
+
+    def search(self, origin: str, destination: str, date: str,
+               predicates: Iterable[Predicate] = (),
+               transform: Optional[Callable[[FareRow], FareRow]] = None) -> List[FareRow]:
+        """Rows of the fare set through apply_pipeline()"""
+        with self.lock:
+            self.stats['queries'] += 1
+        return apply_pipeline(self.fetch(origin, destination, date), predicates, transform)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return dict(self.stats)
+
+
+# ============================================================================
+# MOCK PROVIDER
+# ============================================================================
+
+AIRLINES = ['IB', 'VY', 'UX', 'FR', 'U2', 'AF', 'KL', 'LH', 'TP']
+
+
+def mock_fare_set(origin: str, destination: str, date: str, size: int = 24) -> List[FareRow]:
+    """Deterministic mock fares for a route and date (replace with real API)"""
+    rng = random.Random(zlib.crc32(f"{origin}-{destination}-{date}".encode()))
+    rows = []
+    for _ in range(size):
+        hour, minute = rng.randint(0, 23), rng.choice((0, 15, 30, 45))
+        stops = rng.choices((0, 1, 2), weights=(5, 4, 1))[0]
+        duration = rng.randint(70, 180) + stops * rng.randint(60, 180)
+        arrival = (hour * 60 + minute + duration) % (24 * 60)
+        airline = rng.choice(AIRLINES)
+        rows.append({
+            'airline': airline,
+            'flight_number': f"{airline}{rng.randint(100, 9999)}",
+            'departure': f"{hour:02d}:{minute:02d}",
+            'arrival': f"{arrival // 60:02d}:{arrival % 60:02d}",
+            'duration_minutes': duration,
+            'stops': stops,
+            'price': round(rng.uniform(45, 320) * (0.85 if stops else 1.0), 2),
+            'seats': rng.randint(1, 9)
+        })
+    return rows
+
+
+# ============================================================================
+# SHARED PLANNER
+# ============================================================================
+
+_planner: Optional[FareSetPlanner] = None
+_planner_lock = threading.Lock()
+
+
+def get_fare_planner() -> FareSetPlanner:
+    """
+    Get the default planner (created on first use).
+
+    It has its own cache; code holding a SearchCacheManager should build
+    a FareSetPlanner on it and pass that to the searches instead.
+    """
+    global _planner
+    with _planner_lock:
+        if _planner is None:
+            _planner = FareSetPlanner(SearchCacheManager(max_size=500))
+        return _planner
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("FARE SET PLANNER - TESTING")
+    print("=" * 70)
+
+    planner = get_fare_planner()
+    for name, predicates in (('nonstop', [nonstop()]), ('red-eye', [redeye()]),
+                             ('IB/VY', [airlines(['IB', 'VY'])]), ('4 pax', [seats_for(4)])):
+        rows = planner.search('MAD', 'BCN', '2026-03-15', predicates)
+        cheapest = f"€{rows[0]['price']:.0f} {rows[0]['flight_number']}" if rows else '-'
+        print(f"  {name:<8} {len(rows):>2} fares, cheapest {cheapest}")
+
+    print(f"\nStats: {planner.get_stats()}")
@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Columnar Flight Results - Cazador Supremo v14.0
+
+Struct-of-arrays container for large FlightResult lists:
+- NumPy columns for price, stops, departure minute, duration and airline id
+- Vectorized filters (price, stops, duration, airlines, departure window,
+  red-eye), multi-key sort and top-k via argpartition
+- Lossless round trip to and from the FlightResult dataclass: text fields
+  are kept verbatim next to the numeric columns derived from them
+
+departure_minute is minutes after midnight, or -1 when departure_time is
+empty or not a clock time; such flights never match time-based filters.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import re
+import logging
+from typing import List, Dict, Any, Iterable, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+REDEYE_START = 22 * 60  # red-eye window 22:00-06:00, in minutes
+REDEYE_END = 6 * 60
+
+TEXT_FIELDS = ('origin', 'destination', 'date', 'currency',
+               'flight_number', 'departure_time', 'arrival_time')
+SORT_KEYS = ('price', 'stops', 'departure_minute', 'duration_minutes')
+
+_CLOCK = re.compile(r'(?:^|[T\s])(\d{1,2}):(\d{2})')
+
+Clock = Union[str, int]
+
+
+# ============================================================================
+# CLOCK PARSING
+# ============================================================================
+
+def clock_minutes(value: Optional[str]) -> Optional[int]:
+    """
+    Minutes after midnight of 'HH:MM', 'HH:MM:SS' or an ISO datetime
+    ('2026-03-15T23:10'); None if empty or not a valid clock time
+    """
+    if not value:
+        return None
+    match = _CLOCK.search(str(value).strip())
+    if match is None:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+    return hour * 60 + minute
+
+
+def is_redeye_clock(value: Optional[str]) -> bool:
+    """Departure clock time in the red-eye window (False if not a clock time)"""
+    minute = clock_minutes(value)
+    return minute is not None and (minute >= REDEYE_START or minute < REDEYE_END)
+
+
+def _minutes(value: Clock) -> int:
+    minute = value if isinstance(value, int) else clock_minutes(value)
+    if minute is None:
+        raise ValueError(f"Invalid clock time: {value!r}")
+    return minute
+
+
+# ============================================================================
+# RESULT SET
+# ============================================================================
+
+class FlightResultSet:
+    """
+    Immutable columnar view of flight results.
+
+    Every operation returns a new set; columns are shared read-only arrays
+    so narrowing a set never copies more than the selected rows.
+    """
+
+    def __init__(self, columns: Dict[str, np.ndarray], airlines: Sequence[str]):
+        """
+        Args:
+            columns: price, stops, departure_minute, duration_minutes,
+                airline_id plus the TEXT_FIELDS object arrays, equal length
+            airlines: Airline codes indexed by airline_id
+        """
+        lengths = {len(array) for array in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Column lengths differ: {sorted(lengths)}")
+        self.columns = columns
+        self.airlines = tuple(airlines)
+        for array in columns.values():
+            array.flags.writeable = False
+
+    # ------------------------------------------------------------------
+    # Conversion
+    # ------------------------------------------------------------------
+
+    @classmethod
+    def from_results(cls, results: Iterable[Any]) -> 'FlightResultSet':
+        """Build from FlightResult objects (or anything with the same fields)"""
+        results = list(results)
+        n = len(results)
+
+        vocabulary: Dict[str, int] = {}
+        airline_id = np.fromiter((vocabulary.setdefault(r.airline, len(vocabulary)) for r in results),
+                                 dtype=np.int32, count=n)
+        departure = (clock_minutes(r.departure_time) for r in results)
+
+        columns = {
+            'price': np.fromiter((r.price for r in results), dtype=np.float64, count=n),
+            'stops': np.fromiter((r.stops for r in results), dtype=np.int16, count=n),
+            'departure_minute': np.fromiter((-1 if m is None else m for m in departure),
+                                            dtype=np.int16, count=n),
+            'duration_minutes': np.fromiter((r.duration_minutes for r in results),
+                                            dtype=np.int32, count=n),
+            'airline_id': airline_id,
+        }
+        for name in TEXT_FIELDS:
+            column = np.empty(n, dtype=object)
+            column[:] = [getattr(r, name) for r in results]
+            columns[name] = column
+        return cls(columns, vocabulary)
+
+    def to_results(self) -> List[Any]:
+        """FlightResult objects equal to the ones the set was built from"""
+        from advanced_search_methods import FlightResult  # avoid a circular import
+
+        c = self.columns
+        airline = [self.airlines[i] for i in c['airline_id'].tolist()]
+        rows = zip(*(c[name].tolist() for name in TEXT_FIELDS), airline,
+                   c['price'].tolist(), c['duration_minutes'].tolist(), c['stops'].tolist())
+        return [
+            FlightResult(origin=origin, destination=destination, date=date, price=price,
+                         currency=currency, airline=code, flight_number=number,
+                         departure_time=departure, arrival_time=arrival,
+                         duration_minutes=duration, stops=stops)
+            for (origin, destination, date, currency, number, departure, arrival, code,
+                 price, duration, stops) in rows
+        ]
+
+    # ------------------------------------------------------------------
+    # Access
+    # ------------------------------------------------------------------
+
+    def __len__(self) -> int:
+        return len(self.columns['price'])
+
+    def __getitem__(self, i: int):
+        return self.take(np.array([range(len(self))[i]])).to_results()[0]
+
+    @property
+    def price(self) -> np.ndarray:
+        return self.columns['price']
+
+    @property
+    def stops(self) -> np.ndarray:
+        return self.columns['stops']
+
+    @property
+    def departure_minute(self) -> np.ndarray:
+        return self.columns['departure_minute']
+
+    @property
+    def duration_minutes(self) -> np.ndarray:
+        return self.columns['duration_minutes']
+
+    @property
+    def airline_id(self) -> np.ndarray:
+        return self.columns['airline_id']
+
+    def column(self, name: str) -> np.ndarray:
+        return self.columns[name]
+
+    def take(self, indexes: np.ndarray) -> 'FlightResultSet':
+        """Rows at indexes (positions or a boolean mask), in that order"""
+        return FlightResultSet({name: array[indexes] for name, array in self.columns.items()},
+                               self.airlines)
+
+    # ------------------------------------------------------------------
+    # Masks and filters
+    # ------------------------------------------------------------------
+
+    def nonstop_mask(self) -> np.ndarray:
+        return self.stops == 0
+
+    def redeye_mask(self) -> np.ndarray:
+        """Departures between 22:00 and 06:00 (unknown times excluded)"""
+        minute = self.departure_minute
+        return (minute >= 0) & ((minute >= REDEYE_START) | (minute < REDEYE_END))
+
+    def airline_mask(self, codes: Iterable[str]) -> np.ndarray:
+        wanted = {c.strip().upper() for c in codes}
+        ids = [i for i, code in enumerate(self.airlines) if code.upper() in wanted]
+        return np.isin(self.airline_id, ids)
+
+    def departure_mask(self, start: Clock, end: Clock) -> np.ndarray:
+        """Departures in [start, end); wraps past midnight when start > end"""
+        start, end = _minutes(start), _minutes(end)
+        minute = self.departure_minute
+        if start <= end:
+            return (minute >= start) & (minute < end)
+        return (minute >= 0) & ((minute >= start) | (minute < end))
+
+    def filter(self, max_price: Optional[float] = None, min_price: Optional[float] = None,
+               max_stops: Optional[int] = None, max_duration: Optional[int] = None,
+               airlines: Optional[Iterable[str]] = None,
+               departure_between: Optional[Tuple[Clock, Clock]] = None,
+               redeye: Optional[bool] = None) -> 'FlightResultSet':
+        """Rows matching every given condition, in their current order"""
+        mask = np.ones(len(self), dtype=bool)
+        if max_price is not None:
+            mask &= self.price <= max_price
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_stops is not None:
+            mask &= self.stops <= max_stops
+        if max_duration is not None:
+            mask &= self.duration_minutes <= max_duration
+        if airlines is not None:
+            mask &= self.airline_mask(airlines)
+        if departure_between is not None:
+            mask &= self.departure_mask(*departure_between)
+        if redeye is not None:
+            mask &= self.redeye_mask() == redeye
+        return self.take(mask)
+
+    # ------------------------------------------------------------------
+    # Ordering
+    # ------------------------------------------------------------------
+
+    def _key(self, name: str, descending: bool) -> np.ndarray:
+        if name not in SORT_KEYS:
+            raise ValueError(f"Cannot sort by {name!r}; use one of {SORT_KEYS}")
+        key = self.columns[name]
+        return -key.astype(np.float64) if descending else key
+
+    def argsort(self, by: Union[str, Sequence[str]] = 'price',
+                descending: bool = False) -> np.ndarray:
+        """Stable order by one key or several (first key most significant)"""
+        keys = [by] if isinstance(by, str) else list(by)
+        if len(keys) == 1:
+            return np.argsort(self._key(keys[0], descending), kind='stable')
+        return np.lexsort([self._key(name, descending) for name in reversed(keys)])
+
+    def sort(self, by: Union[str, Sequence[str]] = 'price',
+             descending: bool = False) -> 'FlightResultSet':
+        return self.take(self.argsort(by, descending))
+
+    def top_k(self, k: int, by: str = 'price', descending: bool = False) -> 'FlightResultSet':
+        """
+        First k rows of sort(by), in O(n + k log k).
+
+        argpartition finds the k-th key; rows tied with it are taken in
+        their current order so the result matches a stable sort exactly.
+        """
+        n = len(self)
+        if k <= 0:
+            return self.take(np.empty(0, dtype=np.int64))
+        if k >= n:
+            return self.sort(by, descending)
+
+        key = self._key(by, descending)
+        kth = key[np.argpartition(key, k - 1)[k - 1]]
+        below = np.flatnonzero(key < kth)
+        ties = np.flatnonzero(key == kth)[:k - len(below)]
+        chosen = np.concatenate([below, ties])
+        return self.take(chosen[np.argsort(key[chosen], kind='stable')])
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    import random
+    import time
+    from advanced_search_methods import FlightResult
+
+    print("=" * 70)
+    print("FLIGHT RESULT SET - TESTING")
+    print("=" * 70)
+
+    rng = random.Random(3)
+    flights = [FlightResult(origin='MAD', destination='BCN', date='2026-03-15',
+                            price=round(rng.uniform(40, 300), 2),
+                            airline=rng.choice(['IB', 'VY', 'UX', 'FR']),
+                            flight_number=f"XX{i}",
+                            departure_time=f"{rng.randint(0, 23):02d}:{rng.choice((0, 30)):02d}",
+                            duration_minutes=rng.randint(70, 400), stops=rng.choice((0, 0, 1, 2)))
+               for i in range(100_000)]
+
+    start = time.perf_counter()
+    results = FlightResultSet.from_results(flights)
+    print(f"\nBuilt {len(results)} rows in {(time.perf_counter() - start) * 1000:.0f} ms")
+
+    start = time.perf_counter()
+    cheap = results.filter(max_price=120, max_stops=0, airlines=['IB', 'VY'], redeye=False)
+    best = cheap.top_k(5)
+    print(f"Filter + top-5 in {(time.perf_counter() - start) * 1000:.1f} ms "
+          f"({len(cheap)} matches)")
+    for flight in best.to_results():
+        print(f"  {flight.airline} {flight.departure_time} €{flight.price:.2f}")
+    assert FlightResultSet.from_results(flights[:1000]).to_results() == flights[:1000]
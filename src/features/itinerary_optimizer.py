@@ -0,0 +1,240 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Itinerary Optimizer - Cazador Supremo v14.0
+
+Orders the intermediate cities of a multi-city trip for the lowest total
+fare, keeping the first and last city fixed:
+- Exact Held-Karp bitmask DP up to EXACT_LIMIT cities
+- Nearest-neighbour start + 2-opt / Or-opt local search beyond that
+- Memoized segment prices: each origin-destination pair is fetched at
+  most once per query
+
+Fares are directional (MAD→PAR need not cost the same as PAR→MAD), so
+every move is evaluated on the full asymmetric cost matrix.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import logging
+from typing import List, Dict, Any, Callable, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+EXACT_LIMIT = 12  # cities (endpoints included) solved exactly
+
+
+# ============================================================================
+# SEGMENT PRICES
+# ============================================================================
+
+class SegmentPriceMemo:
+    """
+    Memoizes price_fn(origin, destination) for one query
+    """
+
+    def __init__(self, price_fn: Callable[[str, str], float]):
+        self.price_fn = price_fn
+        self.prices: Dict[Tuple[str, str], float] = {}
+        self.fetches = 0
+
+    def price(self, origin: str, destination: str) -> float:
+        pair = (origin, destination)
+        if pair not in self.prices:
+            self.prices[pair] = float(self.price_fn(origin, destination))
+            self.fetches += 1
+        return self.prices[pair]
+
+    def matrix(self, cities: List[str]) -> np.ndarray:
+        """n×n fare matrix (diagonal 0); repeated cities share fetches"""
+        n = len(cities)
+        cost = np.zeros((n, n))
+        for i in range(n):
+            for j in range(n):
+                if i != j and cities[i] != cities[j]:
+                    cost[i, j] = self.price(cities[i], cities[j])
+        return cost
+
+
+def path_cost(cost: np.ndarray, path: List[int]) -> float:
+    """Total fare of visiting path in order"""
+    idx = np.asarray(path)
+    return float(cost[idx[:-1], idx[1:]].sum())
+
+
+# ============================================================================
+# EXACT: HELD-KARP
+# ============================================================================
+
+def held_karp(cost: np.ndarray) -> Tuple[List[int], float]:
+    """
+    Cheapest path 0 → ... → n-1 through every node (O(2^m · m²), m = n-2).
+
+    dp[mask, k] is the cheapest way to leave node 0, visit exactly the
+    intermediate nodes in mask and stand on intermediate node k. Each
+    mask is relaxed with one vectorized (m × m) step.
+    """
+    n = len(cost)
+    if n <= 2:
+        return list(range(n)), path_cost(cost, list(range(n))) if n == 2 else 0.0
+
+    m = n - 2
+    inner = cost[1:-1, 1:-1]           # intermediate → intermediate
+    full = 1 << m
+    dp = np.full((full, m), np.inf)
+    parent = np.full((full, m), -1, dtype=np.int64)
+    bits = 1 << np.arange(m)
+
+    dp[bits, np.arange(m)] = cost[0, 1:-1]
+
+    for mask in range(1, full):
+        row = dp[mask]
+        if not np.isfinite(row).any():
+            continue
+        # best predecessor j in mask for every next node k
+        step = row[:, None] + inner
+        best_j = step.argmin(axis=0)
+        best = step[best_j, np.arange(m)]
+        for k in np.nonzero((mask & bits) == 0)[0]:
+            nxt = mask | (1 << k)
+            if best[k] < dp[nxt, k]:
+                dp[nxt, k] = best[k]
+                parent[nxt, k] = best_j[k]
+
+    totals = dp[full - 1] + cost[1:-1, -1]
+    last = int(totals.argmin())
+    order = []
+    mask = full - 1
+    while last >= 0:
+        order.append(last + 1)
+        prev = int(parent[mask, last])
+        mask &= ~(1 << last)
+        last = prev
+    path = [0] + order[::-1] + [n - 1]
+    return path, float(totals.min())
+
+
+# ============================================================================
+# HEURISTIC: NEAREST NEIGHBOUR + 2-OPT / OR-OPT
+# ============================================================================
+
+def nearest_neighbour(cost: np.ndarray) -> List[int]:
+    """Greedy path from 0 to n-1 taking the cheapest next hop"""
+    n = len(cost)
+    remaining = set(range(1, n - 1))
+    path = [0]
+    while remaining:
+        here = path[-1]
+        nxt = min(remaining, key=lambda k: cost[here, k])
+        path.append(nxt)
+        remaining.remove(nxt)
+    return path + [n - 1]
+
+
+def local_search(cost: np.ndarray, path: List[int], max_rounds: int = 50) -> List[int]:
+    """
+    Improve path until no 2-opt reversal or Or-opt move (relocating a
+    run of 1-3 cities) lowers the total. Endpoints never move.
+    """
+    best = list(path)
+    best_cost = path_cost(cost, best)
+    n = len(best)
+
+    for _ in range(max_rounds):
+        improved = False
+
+        # 2-opt: reverse best[i..j]
+        for i in range(1, n - 2):
+            for j in range(i + 1, n - 1):
+                candidate = best[:i] + best[i:j + 1][::-1] + best[j + 1:]
+                c = path_cost(cost, candidate)
+                if c < best_cost - 1e-9:
+                    best, best_cost, improved = candidate, c, True
+
+        # Or-opt: move a run of 1-3 cities elsewhere
+        for length in (1, 2, 3):
+            for i in range(1, n - 1 - length + 1):
+                run = best[i:i + length]
+                rest = best[:i] + best[i + length:]
+                for j in range(1, len(rest)):
+                    if j == i:
+                        continue
+                    candidate = rest[:j] + run + rest[j:]
+                    c = path_cost(cost, candidate)
+                    if c < best_cost - 1e-9:
+                        best, best_cost, improved = candidate, c, True
+                        break
+
+        if not improved:
+            break
+    return best
+
+
+# ============================================================================
+# ENTRY POINT
+# ============================================================================
+
+def optimize_itinerary(cities: List[str], price_fn: Callable[[str, str], float],
+                       exact_limit: int = EXACT_LIMIT) -> Dict[str, Any]:
+    """
+    Reorder cities[1:-1] for the cheapest total fare.
+
+    Args:
+        cities: IATA codes; first and last stay in place (may be equal)
+        price_fn: price_fn(origin, destination) -> fare
+        exact_limit: Use Held-Karp up to this many cities
+
+    Returns:
+        {'order': indexes into cities, 'cities': reordered codes,
+         'total': fare, 'original_total': fare in the given order,
+         'algorithm': 'held_karp' | 'local_search', 'fetches': price_fn calls}
+    """
+    memo = SegmentPriceMemo(price_fn)
+    cost = memo.matrix(cities)
+    given = list(range(len(cities)))
+
+    if len(cities) <= exact_limit:
+        order, total = held_karp(cost)
+        algorithm = 'held_karp'
+    else:
+        start = min((nearest_neighbour(cost), given), key=lambda p: path_cost(cost, p))
+        order = local_search(cost, start)
+        total = path_cost(cost, order)
+        algorithm = 'local_search'
+
+    return {
+        'order': order,
+        'cities': [cities[i] for i in order],
+        'total': total,
+        'original_total': path_cost(cost, given) if len(cities) > 1 else 0.0,
+        'algorithm': algorithm,
+        'fetches': memo.fetches
+    }
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    import random
+
+    print("=" * 70)
+    print("ITINERARY OPTIMIZER - TESTING")
+    print("=" * 70)
+
+    rng = random.Random(4)
+    fares = {}
+
+    def fare(o, d):
+        return fares.setdefault((o, d), rng.randint(40, 200))
+
+    trip = ['MAD', 'BER', 'PAR', 'ROM', 'AMS', 'LIS', 'MAD']
+    result = optimize_itinerary(trip, fare)
+    print(f"\nGiven:     {' → '.join(trip)}  €{result['original_total']:.0f}")
+    print(f"Optimized: {' → '.join(result['cities'])}  €{result['total']:.0f} "
+          f"({result['algorithm']}, {result['fetches']} fares fetched)")
@@ -0,0 +1,335 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Price Calendar Engine - Cazador Supremo v14.0
+
+Vectorized (route × day) fare matrices for flexible-date searches:
+- One NumPy matrix for many routes and months, built in a single pass
+- Per-route min / max / avg / median without Python loops
+- Best day(s) per route, percentiles and cheap-day masks
+- Month views used by FlexibleDatesCalendar.search()
+- Round-trip outbound × return grids under min/max stay constraints
+
+Missing fares (no flight, days outside a route's months) are NaN and are
+ignored by every statistic.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import calendar
+import logging
+from typing import List, Dict, Optional, Tuple, Callable, Sequence
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+Route = Tuple[str, str]
+
+# price_source(routes, days) -> float array of shape (len(routes), len(days))
+PriceSource = Callable[[List[Route], np.ndarray], np.ndarray]
+
+
+def month_days(months: Sequence[str]) -> np.ndarray:
+    """Every day of the given YYYY-MM months, sorted, as datetime64[D]"""
+    chunks = []
+    for month in sorted(set(months)):
+        year, month_num = map(int, month.split('-'))
+        start = np.datetime64(f"{year:04d}-{month_num:02d}-01", 'D')
+        chunks.append(start + np.arange(calendar.monthrange(year, month_num)[1]))
+    return np.concatenate(chunks) if chunks else np.array([], dtype='datetime64[D]')
+
+
+# ============================================================================
+# PRICE MATRIX
+# ============================================================================
+
+class PriceMatrix:
+    """
+    Fares for routes (rows) × days (columns)
+    """
+
+    def __init__(self, routes: List[Route], days: np.ndarray, prices: np.ndarray):
+        self.routes = list(routes)
+        self.days = days.astype('datetime64[D]')
+        self.prices = np.asarray(prices, dtype=float)
+        self._row = {route: i for i, route in enumerate(self.routes)}
+
+        if self.prices.shape != (len(self.routes), len(self.days)):
+            raise ValueError(f"prices shape {self.prices.shape} does not match "
+                             f"{len(self.routes)} routes × {len(self.days)} days")
+
+    @property
+    def available(self) -> np.ndarray:
+        """Boolean mask of days with a fare"""
+        return ~np.isnan(self.prices)
+
+    def row(self, origin: str, destination: str) -> int:
+        return self._row[(origin, destination)]
+
+    # ------------------------------------------------------------------
+    # Vectorized queries (one value per route)
+    # ------------------------------------------------------------------
+
+    def stats(self) -> Dict[str, np.ndarray]:
+        """min / max / avg / median per route (NaN for routes without fares)"""
+        prices = self.prices
+        has_fares = self.available.any(axis=1)
+        safe = np.where(has_fares[:, None], prices, 0.0)  # keep nan-reductions quiet
+        return {
+            'min': np.where(has_fares, np.nanmin(safe, axis=1), np.nan),
+            'max': np.where(has_fares, np.nanmax(safe, axis=1), np.nan),
+            'avg': np.where(has_fares, np.nanmean(safe, axis=1), np.nan),
+            # upper median, as the calendar has always reported it
+            'median': np.where(has_fares,
+                               np.nanpercentile(safe, 50, axis=1, method='higher'), np.nan),
+            'days': self.available.sum(axis=1)
+        }
+
+    def percentiles(self, q: Sequence[float]) -> np.ndarray:
+        """Fare percentiles per route, shape (len(routes), len(q))"""
+        has_fares = self.available.any(axis=1)
+        safe = np.where(has_fares[:, None], self.prices, 0.0)
+        result = np.nanpercentile(safe, q, axis=1).T
+        result[~has_fares] = np.nan
+        return result
+
+    def best_days(self, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        k cheapest days per route.
+
+        Returns (days, prices), both shape (len(routes), k), cheapest
+        first; slots beyond a route's available days are NaT / NaN.
+        """
+        k = min(k, len(self.days))
+        filled = np.where(self.available, self.prices, np.inf)
+        if k < len(self.days):
+            idx = np.argpartition(filled, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.tile(np.arange(len(self.days)), (len(self.routes), 1))
+        order = np.argsort(np.take_along_axis(filled, idx, axis=1), axis=1, kind='stable')
+        idx = np.take_along_axis(idx, order, axis=1)
+
+        prices = np.take_along_axis(filled, idx, axis=1)
+        days = self.days[idx]
+        missing = np.isinf(prices)
+        prices[missing] = np.nan
+        days[missing] = np.datetime64('NaT')
+        return days, prices
+
+    def cheap_days(self, percentile: float = 25) -> np.ndarray:
+        """Mask of days priced at or below the route's given percentile"""
+        threshold = self.percentiles([percentile])[:, 0]
+        return self.available & (self.prices <= threshold[:, None])
+
+    # ------------------------------------------------------------------
+    # Views
+    # ------------------------------------------------------------------
+
+    def month_slice(self, month: str) -> slice:
+        """Column range of a YYYY-MM month"""
+        start = np.datetime64(f"{month}-01", 'D')
+        end = (np.datetime64(month, 'M') + 1).astype('datetime64[D]')
+        return slice(int(np.searchsorted(self.days, start)), int(np.searchsorted(self.days, end)))
+
+    def submatrix(self, month: str) -> 'PriceMatrix':
+        """Same routes restricted to one month"""
+        cols = self.month_slice(month)
+        return PriceMatrix(self.routes, self.days[cols], self.prices[:, cols])
+
+    def month_prices(self, origin: str, destination: str, month: str) -> Dict[int, float]:
+        """{day of month: price} for one route, days without fares left out"""
+        cols = self.month_slice(month)
+        row = self.prices[self.row(origin, destination), cols]
+        day_numbers = self.days[cols].astype(object)
+        return {d.day: float(p) for d, p in zip(day_numbers, row) if not np.isnan(p)}
+
+
+# ============================================================================
+# ROUND-TRIP GRID
+# ============================================================================
+
+class RoundTripGrid:
+    """
+    Round-trip totals as a band of the outbound × return day matrix
+    
+    Only returns min_stay..max_stay nights after departure are valid, so
+    the grid is stored banded: totals[r, i, j] is the price of leaving on
+    outbound day i and returning min_stay + j nights later. The band is a
+    strided window view over the return fares, so building it is a single
+    broadcast add with no Python loops.
+    """
+    
+    def __init__(self, outbound: PriceMatrix, inbound: PriceMatrix,
+                 min_stay: int, max_stay: int):
+        """
+        Args:
+            outbound: Fares for routes over the departure days
+            inbound: Fares for the reversed routes, starting on the same
+                first day and covering at least max_stay extra days
+        """
+        self.routes = outbound.routes
+        self.outbound = outbound
+        self.inbound = inbound
+        self.min_stay = min_stay
+        self.max_stay = max_stay
+        self.stays = np.arange(min_stay, max_stay + 1)
+        
+        n_days = len(outbound.days)
+        windows = np.lib.stride_tricks.sliding_window_view(
+            inbound.prices[:, min_stay:], len(self.stays), axis=1)[:, :n_days, :]
+        self.totals = outbound.prices[:, :, None] + windows  # (routes, days, stays)
+    
+    def best_by_stay(self) -> np.ndarray:
+        """Cheapest total per route and stay length, shape (routes, stays)"""
+        return self._nanmin(self.totals, axis=1)
+    
+    def best_by_outbound(self) -> np.ndarray:
+        """Cheapest total per route and departure day, shape (routes, days)"""
+        return self._nanmin(self.totals, axis=2)
+    
+    def cheapest(self, k: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        k cheapest trips per route.
+        
+        Returns (outbound_index, stay_nights, total), each shape
+        (routes, k), cheapest first; missing slots have total NaN.
+        """
+        flat = np.where(np.isnan(self.totals), np.inf, self.totals).reshape(len(self.routes), -1)
+        k = min(k, flat.shape[1])
+        if k < flat.shape[1]:
+            idx = np.argpartition(flat, k - 1, axis=1)[:, :k]
+        else:
+            idx = np.tile(np.arange(flat.shape[1]), (len(self.routes), 1))
+        idx = np.take_along_axis(idx, np.argsort(np.take_along_axis(flat, idx, axis=1),
+                                                 axis=1, kind='stable'), axis=1)
+        totals = np.take_along_axis(flat, idx, axis=1)
+        totals[np.isinf(totals)] = np.nan
+        day_idx, stay_idx = np.divmod(idx, len(self.stays))
+        return day_idx, self.stays[stay_idx], totals
+    
+    def dense(self, origin: str, destination: str) -> np.ndarray:
+        """Full outbound × return day matrix for one route, NaN outside the band"""
+        r = self.outbound.row(origin, destination)
+        n_days = len(self.outbound.days)
+        grid = np.full((n_days, len(self.inbound.days)), np.nan)
+        rows = np.repeat(np.arange(n_days), len(self.stays))
+        cols = rows + np.tile(self.stays, n_days)
+        grid[rows, cols] = self.totals[r].ravel()
+        return grid
+    
+    def options(self, origin: str, destination: str, k: int = 5) -> List[Dict[str, object]]:
+        """The k cheapest trips for one route as plain dicts"""
+        r = self.outbound.row(origin, destination)
+        day_idx, nights, totals = self.cheapest(k)
+        options = []
+        for i, n, total in zip(day_idx[r], nights[r], totals[r]):
+            if np.isnan(total):
+                continue
+            out_price = float(self.outbound.prices[r, i])
+            options.append({
+                'outbound': str(self.outbound.days[i]),
+                'return': str(self.inbound.days[i + n]),
+                'nights': int(n),
+                'outbound_price': out_price,
+                'return_price': round(float(total) - out_price, 2),
+                'total': round(float(total), 2)
+            })
+        return options
+    
+    @staticmethod
+    def _nanmin(values: np.ndarray, axis: int) -> np.ndarray:
+        result = np.where(np.isnan(values), np.inf, values).min(axis=axis)
+        result[np.isinf(result)] = np.nan
+        return result
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+class PriceCalendarEngine:
+    """
+    Builds PriceMatrix objects for many routes and months at once
+    """
+
+    BASE_PRICE = 485
+    WEEKEND_MULTIPLIER = 1.1
+    VARIATION = (0.9, 1.15)
+
+    def __init__(self, price_source: Optional[PriceSource] = None,
+                 seed: Optional[int] = None):
+        """
+        Args:
+            price_source: Returns a (routes × days) fare array for the
+                requested routes and datetime64 days; NaN where no fare.
+                Defaults to the mock fare model.
+            seed: Seed for the mock model (None = random each build)
+        """
+        self.price_source = price_source or self._mock_prices
+        self.rng = np.random.default_rng(seed)
+        self.stats = {'builds': 0, 'cells': 0}
+
+    def build(self, routes: List[Route], months: Sequence[str]) -> PriceMatrix:
+        """Fare matrix for routes over every day of months"""
+        return self.build_days(routes, month_days(months))
+    
+    def build_days(self, routes: List[Route], days: np.ndarray) -> PriceMatrix:
+        """Fare matrix for routes over an explicit datetime64[D] day axis"""
+        prices = np.asarray(self.price_source(list(routes), days), dtype=float)
+        self.stats['builds'] += 1
+        self.stats['cells'] += prices.size
+        return PriceMatrix(routes, days, prices)
+
+    def round_trip(self, routes: List[Route], month: str,
+                   min_stay: int, max_stay: int) -> 'RoundTripGrid':
+        """
+        Round trips departing in month and staying min_stay..max_stay nights.
+        
+        Outbound fares are fetched once for the month and return fares
+        once for the reversed routes, extended max_stay days past month end.
+        """
+        if not 0 <= min_stay <= max_stay:
+            raise ValueError(f"Invalid stay range: {min_stay}-{max_stay}")
+        outbound = self.build(routes, [month])
+        return_days = outbound.days[0] + np.arange(len(outbound.days) + max_stay)
+        inbound = self.build_days([(d, o) for o, d in routes], return_days)
+        return RoundTripGrid(outbound, inbound, min_stay, max_stay)
+    
+    def _mock_prices(self, routes: List[Route], days: np.ndarray) -> np.ndarray:
+        """Mock fares (replace with real API): weekend premium and ±variation"""
+        weekday = (days.astype('int64') + 3) % 7  # 1970-01-01 was a Thursday
+        multiplier = np.where(weekday >= 5, self.WEEKEND_MULTIPLIER, 1.0)
+        variation = self.rng.uniform(*self.VARIATION, size=(len(routes), len(days)))
+        return np.round(self.BASE_PRICE * multiplier * variation, 2)
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    import time
+
+    print("=" * 70)
+    print("PRICE CALENDAR ENGINE - TESTING")
+    print("=" * 70)
+
+    engine = PriceCalendarEngine(seed=1)
+    routes = [('MAD', 'BCN'), ('MAD', 'MIA'), ('BCN', 'LIS')]
+    matrix = engine.build(routes, ['2026-03', '2026-04'])
+
+    stats = matrix.stats()
+    days, prices = matrix.best_days(3)
+    for i, route in enumerate(routes):
+        print(f"\n{route[0]}-{route[1]}: min €{stats['min'][i]:.0f} avg €{stats['avg'][i]:.0f} "
+              f"median €{stats['median'][i]:.0f}")
+        print(f"  Best days: {', '.join(f'{d} €{p:.0f}' for d, p in zip(days[i], prices[i]))}")
+
+    many = [(f"R{i:03d}", 'MAD') for i in range(500)]
+    start = time.perf_counter()
+    big = engine.build(many, [f"2026-{m:02d}" for m in range(1, 13)])
+    big.stats(), big.best_days(5), big.percentiles([10, 50, 90])
+    print(f"\n500 routes × {len(big.days)} days: {(time.perf_counter() - start) * 1000:.1f} ms")
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Price Drop Model - Cazador Supremo v14.0
+
+History-trained model behind PriceDropPredictor:
+- Training samples come from the daily rollups of every stored route:
+  one per route-day, with features computed as NumPy sliding windows
+- Two linear models on the same features: logistic regression for
+  "a day within HORIZON_DAYS averages DROP_THRESHOLD below today's
+  price" and ridge regression for the log change to the cheapest of
+  those days (the predicted price)
+- score() builds one feature matrix for a whole batch (e.g. every active
+  watchlist item) and evaluates both models with two matrix products;
+  it never trains, it uses the last fitted model
+- Parameters are cached on disk (.npz) and refitted incrementally on a
+  background thread (first fit right after start()): only route-days
+  newer than the training watermark are added. Ridge keeps X'X / X'y so its update is exact; the logistic
+  model takes Newton steps on the new samples around a Gaussian prior
+  from its previous fit (online Laplace approximation).
+
+Observations backfilled behind the watermark are not learned until the
+model file is deleted and retrained from scratch.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import os
+import io
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional, Sequence, Tuple
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from price_history import to_epoch, Timestamp
+from price_rollups import PriceRollups, rollups_for
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'models', 'price_drop_model.npz'
+)
+
+FEATURES = ('bias', 'vs_mean30', 'vs_min30', 'momentum7', 'volatility30', 'season')
+WINDOW_DAYS = 30
+HORIZON_DAYS = 14
+DROP_THRESHOLD = 0.03
+MIN_WINDOW_DAYS = 7     # observed days in the window needed to score a route
+MIN_SAMPLES = 50        # training samples before the model is trusted
+
+DAY = 86400
+
+
+# ============================================================================
+# FEATURES
+# ============================================================================
+
+def daily_series(rollups: PriceRollups, route: str, end_day: int) -> Optional[Dict[str, Any]]:
+    """
+    Dense daily average series of route up to (excluding) end_day;
+    unobserved days carry the previous day's average forward
+    """
+    columns = rollups.arrays(route, 'day', end=end_day * DAY)
+    if len(columns['key']) == 0:
+        return None
+    first = int(columns['key'][0])
+    observed = np.zeros(end_day - first, dtype=bool)
+    observed[columns['key'] - first] = True
+    raw = np.full(len(observed), np.nan)
+    raw[columns['key'] - first] = columns['avg']
+    carried = raw[np.maximum.accumulate(np.where(observed, np.arange(len(raw)), 0))]
+    return {'first_day': first, 'avg': carried, 'raw': raw, 'observed': observed}
+
+
+def season_factors(rollups: PriceRollups, route: str) -> np.ndarray:
+    """Per calendar month (index 0-11): month average / average of months - 1"""
+    profile = rollups.calendar_profile(route)
+    factors = np.zeros(12)
+    if profile:
+        overall = np.mean([m['avg_price'] for m in profile.values()])
+        for number, month in profile.items():
+            factors[number - 1] = month['avg_price'] / overall - 1
+    return factors
+
+
+def window_stats(avg: np.ndarray, observed: np.ndarray) -> Dict[str, np.ndarray]:
+    """
+    Trailing WINDOW_DAYS statistics ending at every day. The series is
+    edge-padded at the front, so early days get shorter effective windows
+    (observed counts only real days).
+    """
+    pad = WINDOW_DAYS - 1
+    windows = sliding_window_view(np.concatenate([np.full(pad, avg[0]), avg]), WINDOW_DAYS)
+    counts = sliding_window_view(np.concatenate([np.zeros(pad, dtype=bool), observed]), WINDOW_DAYS)
+    mean30 = windows.mean(axis=1)
+    return {
+        'mean30': mean30,
+        'min30': windows.min(axis=1),
+        'mean7': windows[:, -7:].mean(axis=1),
+        'std30': windows.std(axis=1),
+        'observed30': counts.sum(axis=1)
+    }
+
+
+def design_matrix(prices: np.ndarray, mean30: np.ndarray, min30: np.ndarray,
+                  mean7: np.ndarray, std30: np.ndarray, season: np.ndarray) -> np.ndarray:
+    """(n, len(FEATURES)) feature matrix; every argument is an (n,) array"""
+    return np.column_stack([
+        np.ones(len(prices)),
+        np.clip(prices / mean30 - 1, -1, 1),
+        np.clip(prices / min30 - 1, -1, 1),
+        np.clip(mean7 / mean30 - 1, -1, 1),
+        np.clip(std30 / mean30, 0, 1),
+        np.clip(season, -1, 1)
+    ])
+
+
+def training_samples(series: Dict[str, Any], season: np.ndarray, after_day: Optional[int],
+                     until_day: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    (X, dropped, log_change) for observed days t with after_day < t and
+    t + HORIZON_DAYS < until_day, whose trailing window is complete
+    """
+    avg, raw, observed = series['avg'], series['raw'], series['observed']
+    first = series['first_day']
+    n = len(avg)
+    days = np.arange(n)
+
+    # cheapest observed daily average over the next HORIZON_DAYS days
+    future = np.concatenate([np.where(observed, raw, np.inf)[1:], np.full(HORIZON_DAYS, np.inf)])
+    future_min = sliding_window_view(future, HORIZON_DAYS).min(axis=1)[:n]
+
+    stats = window_stats(avg, observed)
+    keep = (observed & (days >= WINDOW_DAYS - 1) & (stats['observed30'] >= MIN_WINDOW_DAYS)
+            & (first + days + HORIZON_DAYS < until_day) & np.isfinite(future_min))
+    if after_day is not None:
+        keep &= first + days > after_day
+    idx = np.flatnonzero(keep)
+
+    months = (np.asarray(first + idx, dtype='datetime64[D]').astype('datetime64[M]').astype(np.int64)) % 12
+    prices = avg[idx]
+    X = design_matrix(prices, stats['mean30'][idx], stats['min30'][idx], stats['mean7'][idx],
+                      stats['std30'][idx], season[months])
+    dropped = (future_min[idx] < prices * (1 - DROP_THRESHOLD)).astype(np.float64)
+    log_change = np.clip(np.log(future_min[idx] / prices), -1, 1)
+    return X, dropped, log_change
+
+
+# ============================================================================
+# MODEL PARAMETERS
+# ============================================================================
+
+def _sigmoid(z: np.ndarray) -> np.ndarray:
+    return 1 / (1 + np.exp(-np.clip(z, -30, 30)))
+
+
+class PriceDropModel:
+    """
+    Logistic (drop) + ridge (log change) weights with the statistics
+    needed to keep fitting them incrementally
+    """
+
+    def __init__(self, l2: float = 1.0):
+        d = len(FEATURES)
+        self.weights = np.zeros(d)          # logistic
+        self.precision = l2 * np.eye(d)     # logistic posterior precision (Hessian)
+        self.xtx = l2 * np.eye(d)           # ridge
+        self.xty = np.zeros(d)
+        self.coef = np.zeros(d)
+        self.samples = 0
+        self.trained_until: Optional[int] = None  # epoch day watermark
+
+    @property
+    def trained(self) -> bool:
+        return self.samples >= MIN_SAMPLES
+
+    def copy(self) -> 'PriceDropModel':
+        model = PriceDropModel()
+        for name in ('weights', 'precision', 'xtx', 'xty', 'coef'):
+            setattr(model, name, getattr(self, name).copy())
+        model.samples, model.trained_until = self.samples, self.trained_until
+        return model
+
+    def partial_fit(self, X: np.ndarray, dropped: np.ndarray, log_change: np.ndarray,
+                    iterations: int = 20):
+        """Fold a batch of samples into both models"""
+        if len(X) == 0:
+            return
+        self.xtx += X.T @ X
+        self.xty += X.T @ log_change
+        self.coef = np.linalg.solve(self.xtx, self.xty)
+
+        prior_w, prior = self.weights, self.precision
+        w = prior_w.copy()
+        for _ in range(iterations):
+            p = _sigmoid(X @ w)
+            gradient = prior @ (w - prior_w) + X.T @ (p - dropped)
+            hessian = prior + (X.T * (p * (1 - p))) @ X
+            step = np.linalg.solve(hessian, gradient)
+            w -= step
+            if np.abs(step).max() < 1e-8:
+                break
+        p = _sigmoid(X @ w)
+        self.weights = w
+        self.precision = prior + (X.T * (p * (1 - p))) @ X
+        self.samples += len(X)
+
+    def predict(self, X: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """(drop probability, expected log change) per row"""
+        return _sigmoid(X @ self.weights), X @ self.coef
+
+    def save(self, path: str):
+        """Write atomically (tmp file + rename)"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        buffer = io.BytesIO()
+        np.savez(buffer, features=np.array(FEATURES), weights=self.weights,
+                 precision=self.precision, xtx=self.xtx, xty=self.xty, coef=self.coef,
+                 samples=self.samples,
+                 trained_until=-1 if self.trained_until is None else self.trained_until)
+        tmp = path + '.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(buffer.getvalue())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional['PriceDropModel']:
+        """Cached model, or None if missing or built for other features"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path) as data:
+            if tuple(data['features'].tolist()) != FEATURES:
+                logger.warning(f"Ignoring price drop model with old features: {path}")
+                return None
+            model = cls()
+            for name in ('weights', 'precision', 'xtx', 'xty', 'coef'):
+                setattr(model, name, data[name].astype(np.float64))
+            model.samples = int(data['samples'])
+            until = int(data['trained_until'])
+            model.trained_until = None if until < 0 else until
+        return model
+
+
+# ============================================================================
+# TRAINER / SCORER
+# ============================================================================
+
+class DropModelTrainer:
+    """
+    Owns the current PriceDropModel: trains it from rollups, caches it on
+    disk, refits it in the background and scores batches with it
+    """
+
+    def __init__(self, rollups: PriceRollups, path: Optional[str] = DEFAULT_MODEL_FILE,
+                 refit_interval: int = 6 * 3600):
+        """
+        Args:
+            rollups: Source of daily price series
+            path: Model cache file (None keeps the model in memory only)
+            refit_interval: Seconds between background refits
+        """
+        self.rollups = rollups
+        self.path = path
+        self.refit_interval = refit_interval
+        self.model = (PriceDropModel.load(path) if path else None) or PriceDropModel()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {'refits': 0, 'scored': 0}
+
+    def refit(self, now: Timestamp = None) -> PriceDropModel:
+        """Add samples whose horizon has fully passed since the last fit, then save"""
+        until_day = to_epoch(now) // DAY
+        with self._lock:
+            model = self.model.copy()
+            X, dropped, change = [], [], []
+            for route in self.rollups.routes():
+                series = daily_series(self.rollups, route, until_day)
+                if series is None:
+                    continue
+                x, d, c = training_samples(series, season_factors(self.rollups, route),
+                                           model.trained_until, until_day)
+                X.append(x)
+                dropped.append(d)
+                change.append(c)
+            if X:
+                model.partial_fit(np.concatenate(X), np.concatenate(dropped), np.concatenate(change))
+            # every sample ending before until_day is now in the model
+            model.trained_until = until_day - HORIZON_DAYS - 1
+            self.model = model
+            self.stats['refits'] += 1
+            if self.path:
+                model.save(self.path)
+            logger.info(f"Price drop model refitted: {model.samples} samples")
+            return model
+
+    def ensure_trained(self, now: Timestamp = None) -> PriceDropModel:
+        """Fit once synchronously if nothing was ever trained (start-up only)"""
+        if self.model.trained_until is None:
+            self.refit(now)
+        return self.model
+
+    def score(self, routes: Sequence[str], prices: Sequence[float],
+              now: Timestamp = None) -> Dict[str, np.ndarray]:
+        """
+        Score a batch in one pass.
+
+        Uses the last fitted model and never trains. Returns arrays
+        aligned with routes: 'probability', 'predicted_price', 'confidence'
+        and 'scored' (False where the route lacks history or no model is
+        trained yet; those rows hold NaN)
+        """
+        model = self.model
+        today = to_epoch(now) // DAY
+        prices = np.asarray(prices, dtype=np.float64)
+        names, inverse = np.unique(np.asarray(routes, dtype=str), return_inverse=True)
+
+        # last-day window statistics per distinct route
+        stats = np.full((len(names), 5), np.nan)  # mean30, min30, mean7, std30, season
+        observed = np.zeros(len(names))
+        month = int(np.datetime64(today, 'D').astype('datetime64[M]').astype(np.int64)) % 12
+        for i, route in enumerate(names.tolist()):
+            series = daily_series(self.rollups, route, today + 1)
+            if series is None:
+                continue
+            window = window_stats(series['avg'][-WINDOW_DAYS:], series['observed'][-WINDOW_DAYS:])
+            stats[i, :4] = [window[k][-1] for k in ('mean30', 'min30', 'mean7', 'std30')]
+            stats[i, 4] = season_factors(self.rollups, route)[month]
+            observed[i] = window['observed30'][-1]
+
+        rows = stats[inverse]
+        scored = (observed[inverse] >= MIN_WINDOW_DAYS) & model.trained
+        X = design_matrix(prices, *rows.T)
+        probability, change = model.predict(np.nan_to_num(X))
+        self.stats['scored'] += len(prices)
+        return {
+            'probability': np.where(scored, probability, np.nan),
+            'predicted_price': np.where(scored, prices * np.exp(change), np.nan),
+            'confidence': np.where(scored, np.minimum(0.95, 0.5 + 0.45 * observed[inverse] / WINDOW_DAYS),
+                                   np.nan),
+            'scored': scored
+        }
+
+    def start(self):
+        """
+        Refit every refit_interval seconds on a daemon thread, starting
+        at once if no model was ever trained
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def refit_loop():
+            wait = 0 if self.model.trained_until is None else self.refit_interval
+            while not self._stop.wait(wait):
+                wait = self.refit_interval
+                try:
+                    self.refit()
+                except Exception as e:
+                    logger.error(f"Price drop model refit failed: {e}")
+
+        self._thread = threading.Thread(target=refit_loop, daemon=True)
+        self._thread.start()
+        logger.info("Price drop model refit thread started")
+
+    def stop(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        model = self.model
+        return {**self.stats, 'samples': model.samples, 'trained_until': model.trained_until}
+
+
+_trainer: Optional[DropModelTrainer] = None
+_trainer_lock = threading.Lock()
+
+
+def get_drop_model() -> DropModelTrainer:
+    """
+    Shared trainer over the shared price history, cached in data/models;
+    started on first use, so it trains and refits in the background
+    """
+    global _trainer
+    with _trainer_lock:
+        if _trainer is None:
+            _trainer = DropModelTrainer(rollups_for())
+            _trainer.start()
+        return _trainer
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    import tempfile
+    from price_history import PriceHistoryStore
+
+    print("=" * 70)
+    print("PRICE DROP MODEL - TESTING")
+    print("=" * 70)
+
+    rng = np.random.default_rng(9)
+    with tempfile.TemporaryDirectory() as root:
+        store = PriceHistoryStore(root)
+        now = time.time()
+        days = np.arange(-400, 0)
+        for route in ('MAD-BCN', 'MAD-NYC', 'BCN-LIS', 'MAD-CDG'):
+            # mean-reverting daily prices, 20 observations a day
+            level, series = 150.0, []
+            for _ in days:
+                level += 0.3 * (150 - level) + rng.normal(0, 12)
+                series.append(level)
+            stamps = np.repeat(now + days * DAY, 20) + rng.integers(0, DAY // 2, 20 * len(days))
+            store.append_batch([route] * len(stamps), np.repeat(series, 20) + rng.normal(0, 5, len(stamps)),
+                               stamps.astype(np.int64))
+
+        trainer = DropModelTrainer(rollups_for(store), path=os.path.join(root, 'model.npz'))
+        t0 = time.perf_counter()
+        trainer.refit()
+        print(f"\nTrained on {trainer.model.samples} route-days in {time.perf_counter() - t0:.2f} s")
+        print("Weights: " + ", ".join(f"{f}={w:+.2f}" for f, w in zip(FEATURES, trainer.model.weights)))
+
+        routes = rng.choice(['MAD-BCN', 'MAD-NYC', 'BCN-LIS', 'MAD-CDG', 'XXX-YYY'], 10_000)
+        prices = rng.uniform(110, 190, len(routes))
+        t0 = time.perf_counter()
+        scores = trainer.score(routes, prices)
+        print(f"Scored {len(routes):,} watchlist items in {(time.perf_counter() - t0) * 1000:.1f} ms "
+              f"({int(scores['scored'].sum()):,} with history)")
+        for price in (120, 150, 180):
+            s = trainer.score(['MAD-BCN'], [price])
+            print(f"  MAD-BCN @ €{price}: drop {s['probability'][0]:.0%}, "
+                  f"expected €{s['predicted_price'][0]:.0f}")
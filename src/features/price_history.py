@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Price History Store - Cazador Supremo v14.0
+
+Append-only columnar store for observed fares:
+- Fixed-width little-endian records: route id, timestamp, price (cents),
+  source id, stops (18 bytes each)
+- One segment file per UTC month (prices-YYYY-MM.seg); appends only ever
+  touch the segments their timestamps fall in
+- Reads go through numpy.memmap: a range query opens just the segments
+  overlapping the range and copies out the matching records
+- Route and source names map to small integer ids kept in registry.json
+
+Listeners (e.g. price_rollups) subscribe to receive every appended batch.
+
+Writers are serialized by a lock; readers never lock. A crash mid-append
+can leave a partial record at the end of a segment: readers ignore it and
+the next append truncates it away.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import os
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Dict, Any, Callable, Iterable, Optional, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HISTORY_DIR = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), '..', '..', 'data', 'price_history'
+)
+
+RECORD_DTYPE = np.dtype([
+    ('route', '<u4'),
+    ('ts', '<i8'),      # seconds since epoch, UTC
+    ('cents', '<u4'),
+    ('source', 'u1'),
+    ('stops', 'u1'),
+])
+
+Timestamp = Union[int, float, str, datetime, None]
+Listener = Callable[[np.ndarray, List[str]], None]  # (records, route names)
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def route_key(origin: str, destination: str) -> str:
+    return f"{origin.strip().upper()}-{destination.strip().upper()}"
+
+
+def to_epoch(value: Timestamp) -> int:
+    """Seconds since epoch; None is now, naive datetimes and ISO strings are UTC"""
+    if value is None:
+        return int(time.time())
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return int(value.timestamp())
+    return int(value)
+
+
+def month_of(ts: np.ndarray) -> np.ndarray:
+    """datetime64[M] month of each epoch timestamp"""
+    return np.asarray(ts, dtype='<i8').astype('datetime64[s]').astype('datetime64[M]')
+
+
+def _array(values: Iterable) -> np.ndarray:
+    return values if isinstance(values, np.ndarray) else np.asarray(list(values))
+
+
+def monthly_summary(records: np.ndarray) -> List[Dict[str, Any]]:
+    """
+    Per-month min/avg/max/count of ts-sorted records, plus the date of
+    each month's cheapest observation
+    """
+    if len(records) == 0:
+        return []
+    months = month_of(records['ts'])
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]])
+    prices = records['cents'] / 100.0
+    counts = np.diff(np.r_[starts, len(records)])
+    sums = np.add.reduceat(prices, starts)
+
+    summary = []
+    for i, start in enumerate(starts):
+        end = start + counts[i]
+        cheapest = start + int(np.argmin(prices[start:end]))
+        summary.append({
+            'month': str(months[start]),
+            'min_price': float(prices[start:end].min()),
+            'avg_price': float(sums[i] / counts[i]),
+            'max_price': float(prices[start:end].max()),
+            'count': int(counts[i]),
+            'best_day': str(records['ts'][cheapest].astype('datetime64[s]').astype('datetime64[D]'))
+        })
+    return summary
+
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class PriceHistoryStore:
+    """
+    Month-partitioned append-only price observations
+    """
+
+    SEGMENT_PREFIX = 'prices-'
+    SEGMENT_SUFFIX = '.seg'
+
+    def __init__(self, root: str = DEFAULT_HISTORY_DIR, fsync: bool = False):
+        """
+        Args:
+            root: Directory holding segments and registry.json (created on
+                first append)
+            fsync: fsync every append (durable, slower)
+        """
+        self.root = root
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._maps: Dict[str, Tuple[int, np.ndarray]] = {}
+        self._listeners: List[Listener] = []
+
+        self.route_names: List[str] = []
+        self.source_names: List[str] = []
+        registry = os.path.join(root, 'registry.json')
+        if os.path.exists(registry):
+            with open(registry, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.route_names = data.get('routes', [])
+            self.source_names = data.get('sources', [])
+        self.route_ids = {name: i for i, name in enumerate(self.route_names)}
+        self.source_ids = {name: i for i, name in enumerate(self.source_names)}
+
+        self.stats = {'appended': 0, 'queries': 0, 'segments_scanned': 0}
+
+    # ------------------------------------------------------------------
+    # Registry
+    # ------------------------------------------------------------------
+
+    def _id(self, name: str, ids: Dict[str, int], names: List[str], limit: int) -> Tuple[int, bool]:
+        if name in ids:
+            return ids[name], False
+        if len(names) >= limit:
+            raise ValueError(f"Too many distinct names (limit {limit}): {name!r}")
+        ids[name] = len(names)
+        names.append(name)
+        return ids[name], True
+
+    def _save_registry(self):
+        path = os.path.join(self.root, 'registry.json')
+        tmp = path + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump({'routes': self.route_names, 'sources': self.source_names}, f)
+        os.replace(tmp, path)
+
+    def routes(self) -> List[str]:
+        return list(self.route_names)
+
+    def sources(self) -> List[str]:
+        return list(self.source_names)
+
+    # ------------------------------------------------------------------
+    # Writing
+    # ------------------------------------------------------------------
+
+    def _segment_path(self, month: str) -> str:
+        return os.path.join(self.root, f"{self.SEGMENT_PREFIX}{month}{self.SEGMENT_SUFFIX}")
+
+    def append(self, route: str, price: float, ts: Timestamp = None,
+               source: str = 'api', stops: int = 0) -> int:
+        """Record one observation; returns records written (1)"""
+        return self.append_batch([route], [price], [to_epoch(ts)], source, stops)
+
+    def append_batch(self, routes: Iterable[str], prices: Iterable[float],
+                     timestamps: Optional[Iterable[Timestamp]] = None,
+                     sources: Union[str, Iterable[str]] = 'api',
+                     stops: Union[int, Iterable[int]] = 0) -> int:
+        """
+        Record many observations in one write per touched segment.
+
+        Args:
+            routes: 'ORIGIN-DEST' keys (see route_key)
+            prices: Prices in euros
+            timestamps: Epoch seconds, datetimes or ISO strings (None: now)
+            sources: One source name for all rows, or one per row
+            stops: One stop count for all rows, or one per row
+        """
+        routes = _array(routes).astype(str)
+        n = len(routes)
+        if n == 0:
+            return 0
+        records = np.zeros(n, dtype=RECORD_DTYPE)
+        records['cents'] = np.rint(_array(prices).astype(np.float64) * 100)
+        if timestamps is None:
+            records['ts'] = int(time.time())
+        else:
+            stamps = _array(timestamps)
+            numeric = stamps.dtype.kind in 'iuf'
+            records['ts'] = stamps if numeric else [to_epoch(t) for t in stamps.tolist()]
+        records['stops'] = stops if isinstance(stops, int) else _array(stops)
+        sources = np.full(n, sources) if isinstance(sources, str) else _array(sources).astype(str)
+        if len(sources) != n:
+            raise ValueError("routes, prices, timestamps and sources must have equal length")
+
+        route_names, route_index = np.unique(routes, return_inverse=True)
+        source_names, source_index = np.unique(sources, return_inverse=True)
+        with self._lock:
+            added = False
+            route_ids, source_ids = [], []
+            for name in route_names.tolist():
+                rid, new = self._id(name, self.route_ids, self.route_names, 2 ** 32)
+                route_ids.append(rid)
+                added |= new
+            for name in source_names.tolist():
+                sid, new = self._id(name, self.source_ids, self.source_names, 256)
+                source_ids.append(sid)
+                added |= new
+            records['route'] = np.asarray(route_ids, dtype=np.uint32)[route_index]
+            records['source'] = np.asarray(source_ids, dtype=np.uint8)[source_index]
+
+            os.makedirs(self.root, exist_ok=True)
+            if added:
+                self._save_registry()
+
+            months = month_of(records['ts'])
+            for month in np.unique(months):
+                self._write(self._segment_path(str(month)), records[months == month])
+            self.stats['appended'] += n
+            self._notify(records)
+        return n
+
+    def subscribe(self, listener: Listener, replay: bool = True):
+        """
+        Call listener(records, route_names) after every append; with
+        replay, existing segments are fed to it first. Appends wait while
+        it replays, so the listener sees every record exactly once.
+        """
+        with self._lock:
+            if replay:
+                for month in self.segments():
+                    listener(np.asarray(self.segment(month)), self.route_names)
+            self._listeners.append(listener)
+
+    def _notify(self, records: np.ndarray):
+        for listener in self._listeners:
+            try:
+                listener(records, self.route_names)
+            except Exception as e:
+                logger.error(f"Price history listener failed: {e}")
+
+    def _write(self, path: str, records: np.ndarray):
+        if os.path.exists(path):
+            size = os.path.getsize(path)
+            torn = size % RECORD_DTYPE.itemsize
+            if torn:
+                logger.warning(f"Dropping {torn} bytes of a partial record in {path}")
+                os.truncate(path, size - torn)
+        with open(path, 'ab') as f:
+            f.write(records.tobytes())
+            if self.fsync:
+                f.flush()
+                os.fsync(f.fileno())
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def segments(self) -> List[str]:
+        """Months (YYYY-MM) that have a segment, oldest first"""
+        if not os.path.isdir(self.root):
+            return []
+        prefix, suffix = self.SEGMENT_PREFIX, self.SEGMENT_SUFFIX
+        return sorted(name[len(prefix):-len(suffix)] for name in os.listdir(self.root)
+                      if name.startswith(prefix) and name.endswith(suffix))
+
+    def segment(self, month: str) -> np.ndarray:
+        """Read-only memmap over a month's complete records"""
+        path = self._segment_path(month)
+        n = os.path.getsize(path) // RECORD_DTYPE.itemsize if os.path.exists(path) else 0
+        cached = self._maps.get(path)
+        if cached is not None and cached[0] == n:
+            return cached[1]
+        if n == 0:
+            records = np.empty(0, dtype=RECORD_DTYPE)
+        else:
+            records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', shape=(n,))
+        self._maps[path] = (n, records)
+        return records
+
+    def query(self, route: Optional[str] = None, start: Timestamp = None,
+              end: Timestamp = None) -> np.ndarray:
+        """
+        Records of route (all routes if None) with start <= ts < end,
+        sorted by timestamp. Only segments overlapping the range are read.
+        """
+        self.stats['queries'] += 1
+        rid = None
+        if route is not None:
+            rid = self.route_ids.get(route)
+            if rid is None:
+                return np.empty(0, dtype=RECORD_DTYPE)
+        lo = None if start is None else to_epoch(start)
+        hi = None if end is None else to_epoch(end)
+        first = None if lo is None else month_of(lo)
+        last = None if hi is None else month_of(hi - 1)
+
+        parts = []
+        for month in self.segments():
+            m = np.datetime64(month, 'M')
+            if (first is not None and m < first) or (last is not None and m > last):
+                continue
+            records = self.segment(month)
+            self.stats['segments_scanned'] += 1
+            mask = np.ones(len(records), dtype=bool)
+            if rid is not None:
+                mask &= records['route'] == rid
+            if lo is not None:
+                mask &= records['ts'] >= lo
+            if hi is not None:
+                mask &= records['ts'] < hi
+            parts.append(np.asarray(records[mask]))
+
+        if not parts:
+            return np.empty(0, dtype=RECORD_DTYPE)
+        result = np.concatenate(parts)
+        return result[np.argsort(result['ts'], kind='stable')]
+
+    def prices(self, route: str, start: Timestamp = None,
+               end: Timestamp = None) -> Tuple[np.ndarray, np.ndarray]:
+        """(timestamps, prices in euros) of route in [start, end)"""
+        records = self.query(route, start, end)
+        return records['ts'].copy(), records['cents'] / 100.0
+
+    def __len__(self) -> int:
+        return sum(len(self.segment(month)) for month in self.segments())
+
+    def get_stats(self) -> Dict[str, Any]:
+        segments = self.segments()
+        return {
+            **self.stats,
+            'routes': len(self.route_names),
+            'segments': len(segments),
+            'records': sum(len(self.segment(month)) for month in segments)
+        }
+
+
+_store: Optional[PriceHistoryStore] = None
+_store_lock = threading.Lock()
+
+
+def get_price_history() -> PriceHistoryStore:
+    """Shared store under data/price_history"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PriceHistoryStore()
+        return _store
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    import tempfile
+
+    print("=" * 70)
+    print("PRICE HISTORY STORE - TESTING")
+    print("=" * 70)
+
+    rng = np.random.default_rng(5)
+    with tempfile.TemporaryDirectory() as root:
+        store = PriceHistoryStore(root)
+        n = 1_000_000
+        start_ts = to_epoch('2025-01-01')
+        routes = rng.choice(['MAD-BCN', 'MAD-LIS', 'MAD-NYC', 'BCN-ROM'], n)
+        stamps = np.sort(rng.integers(start_ts, start_ts + 365 * 86400, n))
+
+        t0 = time.perf_counter()
+        store.append_batch(routes, rng.uniform(40, 600, n).round(2), stamps)
+        print(f"\nAppended {n:,} records in {time.perf_counter() - t0:.2f} s "
+              f"({len(store.segments())} segments)")
+
+        t0 = time.perf_counter()
+        march = store.query('MAD-NYC', '2025-03-01', '2025-04-01')
+        print(f"MAD-NYC March: {len(march):,} records in {(time.perf_counter() - t0) * 1000:.1f} ms")
+        for month in monthly_summary(store.query('MAD-NYC'))[:3]:
+            print(f"  {month['month']}: €{month['min_price']:.0f}-€{month['max_price']:.0f} "
+                  f"(avg €{month['avg_price']:.0f}, {month['count']:,} obs)")
+        print(f"\nStats: {store.get_stats()}")
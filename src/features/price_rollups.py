@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Route Price Rollups - Cazador Supremo v14.0
+
+Incrementally maintained per-route aggregates over the price history:
+- Hourly, daily and monthly buckets with min / avg / max / count and the
+  time of the cheapest observation
+- Monthly buckets also carry a log-bucket quantile sketch (relative
+  error ≤ 1% by default), so medians and "what share of fares was below
+  €X" need no raw data
+- Each new price updates one bucket per granularity in O(1); batches are
+  applied with vectorized scatter updates
+
+Rollups subscribe to a PriceHistoryStore: existing segments are replayed
+once, then every append is folded in as it is written. Analysis queries
+read bucket rows only, so their cost grows with months, not observations.
+
+Hourly and daily buckets carry no sketch: a dense sketch row is ~2 KB,
+far more than the bucket itself, and hours or days hold too few fares
+for useful quantiles. Quantile queries therefore resolve date ranges to
+whole months.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import math
+import logging
+import threading
+import weakref
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from price_history import PriceHistoryStore, get_price_history, to_epoch, Timestamp
+
+logger = logging.getLogger(__name__)
+
+GRANULARITIES = ('hour', 'day', 'month')
+SKETCHED = ('month',)
+
+
+# ============================================================================
+# QUANTILE SKETCH
+# ============================================================================
+
+class LogHistogram:
+    """
+    Bucket layout shared by every sketch: bucket i holds prices in
+    (min_value·γ^(i-1), min_value·γ^i], γ = (1 + α) / (1 - α). Any value
+    reported from a bucket is within α of every price it holds.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01,
+                 min_value: float = 1.0, max_value: float = 100_000.0):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.min_value = min_value
+        self.bins = int(math.ceil(math.log(max_value / min_value) / self.log_gamma)) + 1
+
+    def index(self, prices) -> np.ndarray:
+        """Bucket of each price (clamped to the covered range)"""
+        ratio = np.maximum(np.asarray(prices, dtype=np.float64) / self.min_value, 1.0)
+        return np.clip(np.ceil(np.log(ratio) / self.log_gamma), 0, self.bins - 1).astype(np.int64)
+
+    def value(self, i: int) -> float:
+        """Representative price of bucket i"""
+        if i == 0:
+            return self.min_value
+        return self.min_value * 2 * self.gamma ** i / (self.gamma + 1)
+
+    def quantile(self, counts: np.ndarray, q: float) -> Optional[float]:
+        total = int(counts.sum())
+        if total == 0:
+            return None
+        rank = min(total - 1, max(0, int(math.floor(q * (total - 1)))))
+        return self.value(int(np.searchsorted(np.cumsum(counts), rank, side='right')))
+
+    def share_below(self, counts: np.ndarray, price: float) -> float:
+        """Share of sketched prices in buckets entirely below price"""
+        total = counts.sum()
+        if total == 0:
+            return 0.0
+        return float(counts[:int(self.index(price))].sum() / total)
+
+
+# ============================================================================
+# ROLLUP TABLE
+# ============================================================================
+
+class RollupTable:
+    """
+    Bucket key -> row of growable column arrays (min, max, sum, count,
+    time of min, optional sketch counts)
+
+    Rows are appended in arrival order; sorted_keys / order keep the keys
+    sorted (with their rows) so range lookups are two binary searches.
+    """
+
+    def __init__(self, sketch_bins: int = 0, capacity: int = 16):
+        self.index: Dict[int, int] = {}
+        self.sketch_bins = sketch_bins
+        self.keys = np.zeros(capacity, dtype=np.int64)
+        self.sorted_keys = np.zeros(capacity, dtype=np.int64)
+        self.order = np.zeros(capacity, dtype=np.int64)
+        self.mins = np.full(capacity, np.inf)
+        self.maxs = np.full(capacity, -np.inf)
+        self.sums = np.zeros(capacity)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.min_ts = np.zeros(capacity, dtype=np.int64)
+        self.sketch = np.zeros((capacity, sketch_bins), dtype=np.int32) if sketch_bins else None
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def _grow(self):
+        extra = len(self.keys)
+        self.keys = np.concatenate([self.keys, np.zeros(extra, dtype=np.int64)])
+        self.sorted_keys = np.concatenate([self.sorted_keys, np.zeros(extra, dtype=np.int64)])
+        self.order = np.concatenate([self.order, np.zeros(extra, dtype=np.int64)])
+        self.mins = np.concatenate([self.mins, np.full(extra, np.inf)])
+        self.maxs = np.concatenate([self.maxs, np.full(extra, -np.inf)])
+        self.sums = np.concatenate([self.sums, np.zeros(extra)])
+        self.counts = np.concatenate([self.counts, np.zeros(extra, dtype=np.int64)])
+        self.min_ts = np.concatenate([self.min_ts, np.zeros(extra, dtype=np.int64)])
+        if self.sketch is not None:
+            self.sketch = np.concatenate([self.sketch, np.zeros_like(self.sketch)])
+
+    def _row(self, key: int) -> int:
+        row = self.index.get(key)
+        if row is None:
+            row = len(self.index)
+            if row == len(self.keys):
+                self._grow()
+            self.index[key] = row
+            self.keys[row] = key
+            at = int(np.searchsorted(self.sorted_keys[:row], key))
+            if at < row:  # older bucket than the newest: shift the tail
+                self.sorted_keys[at + 1:row + 1] = self.sorted_keys[at:row]
+                self.order[at + 1:row + 1] = self.order[at:row]
+            self.sorted_keys[at] = key
+            self.order[at] = row
+        return row
+
+    def add(self, key: int, price: float, ts: int, bucket: int = 0):
+        """Fold one price into its bucket, O(1) amortized"""
+        row = self._row(key)
+        if price < self.mins[row]:
+            self.mins[row] = price
+            self.min_ts[row] = ts
+        if price > self.maxs[row]:
+            self.maxs[row] = price
+        self.sums[row] += price
+        self.counts[row] += 1
+        if self.sketch is not None:
+            self.sketch[row, bucket] += 1
+
+    def add_many(self, keys: np.ndarray, prices: np.ndarray, ts: np.ndarray,
+                 buckets: Optional[np.ndarray] = None):
+        """Vectorized add(): one scatter update per column"""
+        unique, inverse = np.unique(keys, return_inverse=True)
+        rows = np.array([self._row(int(k)) for k in unique], dtype=np.int64)[inverse]
+
+        # cheapest (earliest on ties) observation per row in this batch
+        order = np.lexsort((ts, prices, rows))
+        sorted_rows = rows[order]
+        first = np.flatnonzero(np.r_[True, sorted_rows[1:] != sorted_rows[:-1]])
+        batch_rows, batch_min = sorted_rows[first], prices[order][first]
+        better = batch_min < self.mins[batch_rows]
+        self.mins[batch_rows[better]] = batch_min[better]
+        self.min_ts[batch_rows[better]] = ts[order][first][better]
+
+        np.maximum.at(self.maxs, rows, prices)
+        np.add.at(self.sums, rows, prices)
+        np.add.at(self.counts, rows, 1)
+        if self.sketch is not None:
+            np.add.at(self.sketch, (rows, buckets), 1)
+
+    def rows(self, start_key: Optional[int] = None, end_key: Optional[int] = None) -> np.ndarray:
+        """Rows with start_key <= key < end_key, in key order"""
+        keys = self.sorted_keys[:len(self.index)]
+        lo = 0 if start_key is None else int(np.searchsorted(keys, start_key))
+        hi = len(keys) if end_key is None else int(np.searchsorted(keys, end_key))
+        return self.order[lo:max(lo, hi)].copy()
+
+
+# ============================================================================
+# ROUTE ROLLUPS
+# ============================================================================
+
+def bucket_keys(ts, granularity: str):
+    """Bucket key of epoch timestamps: hours, days or months since 1970"""
+    ts = np.asarray(ts, dtype=np.int64)
+    if granularity == 'hour':
+        return ts // 3600
+    if granularity == 'day':
+        return ts // 86400
+    if granularity == 'month':
+        return ts.astype('datetime64[s]').astype('datetime64[M]').astype(np.int64)
+    raise ValueError(f"Unknown granularity {granularity!r}; use one of {GRANULARITIES}")
+
+
+def bucket_label(key: int, granularity: str) -> str:
+    unit = {'hour': 'h', 'day': 'D', 'month': 'M'}[granularity]
+    return str(np.datetime64(int(key), unit))
+
+
+class PriceRollups:
+    """
+    Per-route hourly / daily / monthly rollup tables
+    """
+
+    SCALAR_BATCH = 8  # smaller batches skip the vectorized path
+
+    def __init__(self, relative_accuracy: float = 0.01):
+        self.histogram = LogHistogram(relative_accuracy)
+        self.tables: Dict[Tuple[str, str], RollupTable] = {}
+        self._lock = threading.Lock()
+        self.stats = {'ingested': 0, 'batches': 0}
+
+    def _table(self, route: str, granularity: str) -> RollupTable:
+        table = self.tables.get((route, granularity))
+        if table is None:
+            bins = self.histogram.bins if granularity in SKETCHED else 0
+            table = self.tables[(route, granularity)] = RollupTable(bins)
+        return table
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    def ingest(self, route: str, price: float, ts: Timestamp = None):
+        """Fold one observation into every granularity"""
+        ts = to_epoch(ts)
+        bucket = int(self.histogram.index(price))
+        with self._lock:
+            for granularity in GRANULARITIES:
+                key = int(bucket_keys(ts, granularity))
+                self._table(route, granularity).add(key, float(price), ts, bucket)
+            self.stats['ingested'] += 1
+
+    def ingest_records(self, records: np.ndarray, route_names: List[str]):
+        """Fold store records (see price_history.RECORD_DTYPE) in; store listener"""
+        if len(records) <= self.SCALAR_BATCH:
+            for record in records.tolist():
+                self.ingest(route_names[record[0]], record[2] / 100.0, record[1])
+            return
+        ts = records['ts'].astype(np.int64)
+        prices = records['cents'] / 100.0
+        buckets = self.histogram.index(prices)
+        keys = {g: bucket_keys(ts, g) for g in GRANULARITIES}
+        with self._lock:
+            for rid in np.unique(records['route']).tolist():
+                mine = records['route'] == rid
+                for granularity in GRANULARITIES:
+                    self._table(route_names[rid], granularity).add_many(
+                        keys[granularity][mine], prices[mine], ts[mine], buckets[mine])
+            self.stats['ingested'] += len(records)
+            self.stats['batches'] += 1
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def routes(self) -> List[str]:
+        return sorted({route for route, _ in self.tables})
+
+    def buckets(self, route: str, granularity: str = 'month',
+                start: Timestamp = None, end: Timestamp = None) -> List[Dict[str, Any]]:
+        """
+        Buckets of route overlapping [start, end), oldest first; sketched
+        granularities include median_price
+        """
+        with self._lock:
+            table = self.tables.get((route, granularity))
+            if table is None:
+                bucket_keys(0, granularity)  # validate
+                return []
+            start_key = None if start is None else int(bucket_keys(to_epoch(start), granularity))
+            end_key = None if end is None else int(bucket_keys(to_epoch(end) - 1, granularity)) + 1
+            rows = table.rows(start_key, end_key)
+
+            result = []
+            for row in rows.tolist():
+                bucket = {
+                    'bucket': bucket_label(table.keys[row], granularity),
+                    'min_price': float(table.mins[row]),
+                    'avg_price': float(table.sums[row] / table.counts[row]),
+                    'max_price': float(table.maxs[row]),
+                    'count': int(table.counts[row]),
+                    'min_ts': int(table.min_ts[row])
+                }
+                if table.sketch is not None:
+                    bucket['median_price'] = self.histogram.quantile(table.sketch[row], 0.5)
+                result.append(bucket)
+            return result
+
+    def arrays(self, route: str, granularity: str = 'day', start: Timestamp = None,
+               end: Timestamp = None) -> Dict[str, np.ndarray]:
+        """Columns (key, min, avg, max, count) of route's buckets in [start, end), key order"""
+        with self._lock:
+            table = self.tables.get((route, granularity))
+            if table is None:
+                bucket_keys(0, granularity)  # validate
+                rows = np.empty(0, dtype=np.int64)
+                table = RollupTable()
+            else:
+                start_key = None if start is None else int(bucket_keys(to_epoch(start), granularity))
+                end_key = None if end is None else int(bucket_keys(to_epoch(end) - 1, granularity)) + 1
+                rows = table.rows(start_key, end_key)
+            return {
+                'key': table.keys[rows],
+                'min': table.mins[rows],
+                'avg': table.sums[rows] / np.maximum(table.counts[rows], 1),
+                'max': table.maxs[rows],
+                'count': table.counts[rows]
+            }
+
+    def monthly(self, route: str, start: Timestamp = None,
+                end: Timestamp = None) -> List[Dict[str, Any]]:
+        """Monthly rows in price_history.monthly_summary format (plus median_price)"""
+        months = self.buckets(route, 'month', start, end)
+        for month in months:
+            month['month'] = month.pop('bucket')
+            month['best_day'] = str(np.datetime64(month.pop('min_ts'), 's').astype('datetime64[D]'))
+        return months
+
+    def sketch(self, route: str, granularity: str = 'month', start: Timestamp = None,
+               end: Timestamp = None) -> np.ndarray:
+        """Merged sketch counts of route's buckets in [start, end)"""
+        if granularity not in SKETCHED:
+            raise ValueError(f"{granularity!r} buckets have no sketch; use one of {SKETCHED}")
+        with self._lock:
+            table = self.tables.get((route, granularity))
+            if table is None:
+                return np.zeros(self.histogram.bins, dtype=np.int64)
+            start_key = None if start is None else int(bucket_keys(to_epoch(start), granularity))
+            end_key = None if end is None else int(bucket_keys(to_epoch(end) - 1, granularity)) + 1
+            return table.sketch[table.rows(start_key, end_key)].sum(axis=0, dtype=np.int64)
+
+    def quantile(self, route: str, q: float, granularity: str = 'month',
+                 start: Timestamp = None, end: Timestamp = None) -> Optional[float]:
+        return self.histogram.quantile(self.sketch(route, granularity, start, end), q)
+
+    def share_below(self, route: str, price: float, granularity: str = 'month',
+                    start: Timestamp = None, end: Timestamp = None) -> float:
+        return self.histogram.share_below(self.sketch(route, granularity, start, end), price)
+
+    def calendar_profile(self, route: str) -> Dict[int, Dict[str, Any]]:
+        """
+        Calendar month (1-12) -> min / avg / max / count and cheapest day
+        over every stored year, merged from the monthly rows
+        """
+        profile: Dict[int, Dict[str, Any]] = {}
+        for month in self.monthly(route):
+            number = int(month['month'][5:7])
+            entry = profile.get(number)
+            if entry is None:
+                profile[number] = dict(month, total=month['avg_price'] * month['count'])
+                continue
+            entry['total'] += month['avg_price'] * month['count']
+            entry['count'] += month['count']
+            entry['max_price'] = max(entry['max_price'], month['max_price'])
+            if month['min_price'] < entry['min_price']:
+                entry['min_price'], entry['best_day'] = month['min_price'], month['best_day']
+        for entry in profile.values():
+            entry['avg_price'] = entry['total'] / entry['count']
+        return profile
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                'routes': len({route for route, _ in self.tables}),
+                'buckets': {g: sum(len(t) for (_, tg), t in self.tables.items() if tg == g)
+                            for g in GRANULARITIES}
+            }
+
+
+# ============================================================================
+# STORE ATTACHMENT
+# ============================================================================
+
+_attached: 'weakref.WeakKeyDictionary[PriceHistoryStore, PriceRollups]' = weakref.WeakKeyDictionary()
+_attached_lock = threading.Lock()
+
+
+def rollups_for(store: Optional[PriceHistoryStore] = None) -> PriceRollups:
+    """
+    Rollups kept in sync with store (the shared store if None): built
+    from its segments on first use, then updated on every append
+    """
+    store = store or get_price_history()
+    with _attached_lock:
+        rollups = _attached.get(store)
+        if rollups is None:
+            rollups = PriceRollups()
+            store.subscribe(rollups.ingest_records)
+            _attached[store] = rollups
+            logger.info(f"Price rollups built: {rollups.get_stats()['ingested']} observations")
+        return rollups
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    import time
+    import tempfile
+
+    print("=" * 70)
+    print("PRICE ROLLUPS - TESTING")
+    print("=" * 70)
+
+    rng = np.random.default_rng(5)
+    with tempfile.TemporaryDirectory() as root:
+        store = PriceHistoryStore(root)
+        n = 1_000_000
+        first = to_epoch('2025-01-01')
+        store.append_batch(rng.choice(['MAD-BCN', 'MAD-NYC'], n), rng.uniform(40, 600, n).round(2),
+                           np.sort(rng.integers(first, first + 365 * 86400, n)))
+
+        t0 = time.perf_counter()
+        rollups = rollups_for(store)
+        print(f"\nReplayed {n:,} records in {time.perf_counter() - t0:.2f} s")
+
+        t0 = time.perf_counter()
+        for _ in range(1000):
+            store.append('MAD-NYC', 199.0, '2025-06-15T10:00')
+        print(f"1,000 single appends (store + rollups) in {time.perf_counter() - t0:.2f} s")
+
+        t0 = time.perf_counter()
+        months = rollups.monthly('MAD-NYC')
+        print(f"Monthly MAD-NYC in {(time.perf_counter() - t0) * 1000:.2f} ms:")
+        for month in months[:3]:
+            print(f"  {month['month']}: €{month['min_price']:.0f}-€{month['max_price']:.0f} "
+                  f"avg €{month['avg_price']:.0f} median €{month['median_price']:.0f} "
+                  f"({month['count']:,} obs)")
+        print(f"\nStats: {rollups.get_stats()}")
@@ -0,0 +1,307 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Route Graph Index - Cazador Supremo v14.0
+
+Precomputed flight graph for stopover queries:
+- Adjacency lists with cached leg prices and hub layover windows
+- Immutable snapshots, rebuilt and swapped atomically in the background
+- Yen's algorithm for the k cheapest 1- and 2-stop itineraries
+
+Endpoints (origin/destination airports) join the graph on first query;
+their legs to and from every hub are fetched once and then served from
+the snapshot until the next refresh.
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import heapq
+import random
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from typing import List, Dict, Any, Callable, Iterable, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+Window = Tuple[int, int]  # layover hours (min, max)
+
+
+# ============================================================================
+# DATA CLASSES
+# ============================================================================
+
+@dataclass(frozen=True)
+class Itinerary:
+    """Priced path origin → stops → destination"""
+    path: Tuple[str, ...]
+    leg_prices: Tuple[float, ...]
+    total_price: float
+    layovers: Tuple[Window, ...]  # one window per stop
+
+    @property
+    def stops(self) -> Tuple[str, ...]:
+        return self.path[1:-1]
+
+    def __str__(self) -> str:
+        return f"{' → '.join(self.path)}: €{self.total_price:.0f}"
+
+
+# ============================================================================
+# GRAPH SNAPSHOT
+# ============================================================================
+
+class RouteGraph:
+    """
+    Read-only adjacency snapshot; queries never fetch prices
+    """
+
+    def __init__(self, adjacency: Dict[str, Dict[str, float]],
+                 layovers: Dict[str, Window], built_at: Optional[float] = None):
+        self.adjacency = adjacency
+        self.layovers = layovers
+        self.built_at = built_at or time.time()
+
+    @property
+    def leg_count(self) -> int:
+        return sum(len(edges) for edges in self.adjacency.values())
+
+    def price(self, origin: str, destination: str) -> Optional[float]:
+        return self.adjacency.get(origin, {}).get(destination)
+
+    def has_node(self, code: str) -> bool:
+        return code in self.adjacency
+
+    def _cheapest(self, source: str, target: str, max_legs: int,
+                  banned_nodes: Set[str], banned_edges: Set[Tuple[str, str]]
+                  ) -> Optional[Tuple[float, Tuple[str, ...]]]:
+        """
+        Cheapest path with at most max_legs legs, by layered relaxation.
+
+        Paths that reach target are not extended and source is never
+        re-entered, so with up to three legs every path is loop-free.
+        """
+        frontier = {source: (0.0, (source,))}
+        best = None
+        for _ in range(max_legs):
+            layer = {}
+            for node, (cost, path) in frontier.items():
+                for nxt, price in self.adjacency.get(node, {}).items():
+                    if nxt in banned_nodes or nxt in path or (node, nxt) in banned_edges:
+                        continue
+                    total = cost + price
+                    if nxt == target:
+                        if best is None or total < best[0]:
+                            best = (total, path + (nxt,))
+                    elif nxt not in layer or total < layer[nxt][0]:
+                        layer[nxt] = (total, path + (nxt,))
+            frontier = layer
+        return best
+
+    def _path_cost(self, path: Tuple[str, ...]) -> float:
+        return sum(self.adjacency[a][b] for a, b in zip(path, path[1:]))
+
+    def k_cheapest(self, origin: str, destination: str, k: int = 5,
+                   max_stops: int = 2) -> List[Itinerary]:
+        """
+        Yen's k shortest loopless paths with 1..max_stops stops.
+
+        The direct leg is banned at the root so every result has a stop.
+        """
+        if max_stops > 2:
+            raise ValueError("max_stops must be 1 or 2")
+        max_legs = max_stops + 1
+        direct = {(origin, destination)}
+
+        first = self._cheapest(origin, destination, max_legs, set(), direct)
+        if first is None:
+            return []
+        found = [first]
+        candidates: List[Tuple[float, Tuple[str, ...]]] = []
+        seen = {first[1]}
+
+        while len(found) < k:
+            _, previous = found[-1]
+            for i in range(len(previous) - 1):
+                spur, root = previous[i], previous[:i + 1]
+                banned_edges = {(p[i], p[i + 1]) for _, p in found
+                                if p[:i + 1] == root and len(p) > i + 1}
+                if i == 0:
+                    banned_edges |= direct
+                spur_path = self._cheapest(spur, destination, max_legs - i,
+                                           set(root[:-1]), banned_edges)
+                if spur_path is None:
+                    continue
+                path = root[:-1] + spur_path[1]
+                if path not in seen:
+                    seen.add(path)
+                    heapq.heappush(candidates, (self._path_cost(path), path))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates))
+
+        return [self._itinerary(path) for _, path in found]
+
+    def _itinerary(self, path: Tuple[str, ...]) -> Itinerary:
+        legs = tuple(self.adjacency[a][b] for a, b in zip(path, path[1:]))
+        return Itinerary(
+            path=path,
+            leg_prices=legs,
+            total_price=sum(legs),
+            layovers=tuple(self.layovers.get(stop, (2, 6)) for stop in path[1:-1])
+        )
+
+
+# ============================================================================
+# BACKGROUND-REFRESHED INDEX
+# ============================================================================
+
+class RouteGraphIndex:
+    """
+    Owns the current RouteGraph and rebuilds it from price_fn.
+
+    Hubs are fully connected; endpoints connect to every hub and to the
+    destinations they were queried with.
+    """
+
+    def __init__(self, price_fn: Callable[[str, str], float], hubs: Iterable[str],
+                 layover_fn: Optional[Callable[[str], Window]] = None,
+                 refresh_interval: int = 3600):
+        self.price_fn = price_fn
+        self.hubs = list(hubs)
+        self.layover_fn = layover_fn or self._mock_layover
+        self.refresh_interval = refresh_interval
+
+        self.endpoints: Set[str] = set()
+        self.direct_pairs: Set[Tuple[str, str]] = set()
+        self._graph: Optional[RouteGraph] = None
+        self._lock = threading.Lock()  # serializes builders, not readers
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.stats = {'refreshes': 0, 'extensions': 0, 'fetches': 0, 'queries': 0}
+
+    @property
+    def graph(self) -> RouteGraph:
+        graph = self._graph
+        if graph is None:
+            graph = self.refresh()
+        return graph
+
+    def _fetch(self, origin: str, destination: str) -> float:
+        self.stats['fetches'] += 1
+        return float(self.price_fn(origin, destination))
+
+    @staticmethod
+    def _mock_layover(hub: str) -> Window:
+        shortest = random.randint(4, 8)
+        return (shortest, shortest + 4)
+
+    def _legs(self, endpoint: str) -> List[Tuple[str, str]]:
+        legs = []
+        for hub in self.hubs:
+            if hub != endpoint:
+                legs += [(endpoint, hub), (hub, endpoint)]
+        return legs
+
+    def refresh(self) -> RouteGraph:
+        """Fetch every leg and swap in a new snapshot"""
+        with self._lock:
+            pairs = [(a, b) for a in self.hubs for b in self.hubs if a != b]
+            for endpoint in sorted(self.endpoints):
+                pairs += self._legs(endpoint)
+            pairs += sorted(self.direct_pairs)
+
+            adjacency: Dict[str, Dict[str, float]] = {}
+            for origin, dest in pairs:
+                adjacency.setdefault(origin, {})[dest] = self._fetch(origin, dest)
+            layovers = {hub: self.layover_fn(hub) for hub in self.hubs}
+
+            self._graph = RouteGraph(adjacency, layovers)
+            self.stats['refreshes'] += 1
+            logger.info(f"Route graph rebuilt: {len(adjacency)} airports, "
+                        f"{self._graph.leg_count} legs")
+            return self._graph
+
+    def ensure(self, origin: str, destination: str) -> RouteGraph:
+        """Graph containing origin, destination and their direct leg"""
+        graph = self.graph
+        if graph.price(origin, destination) is not None:
+            return graph
+
+        with self._lock:
+            graph = self._graph
+            adjacency = {node: dict(edges) for node, edges in graph.adjacency.items()}
+            for endpoint in (origin, destination):
+                if endpoint not in self.endpoints and endpoint not in self.hubs:
+                    for a, b in self._legs(endpoint):
+                        adjacency.setdefault(a, {})[b] = self._fetch(a, b)
+                    self.endpoints.add(endpoint)
+            if (origin, destination) not in self.direct_pairs:
+                adjacency.setdefault(origin, {})[destination] = self._fetch(origin, destination)
+                self.direct_pairs.add((origin, destination))
+
+            self._graph = RouteGraph(adjacency, graph.layovers, graph.built_at)
+            self.stats['extensions'] += 1
+            return self._graph
+
+    def k_cheapest(self, origin: str, destination: str, k: int = 5,
+                   max_stops: int = 2) -> List[Itinerary]:
+        """k cheapest itineraries with 1..max_stops stops"""
+        self.stats['queries'] += 1
+        return self.ensure(origin, destination).k_cheapest(origin, destination, k, max_stops)
+
+    def start(self):
+        """Rebuild the graph every refresh_interval seconds on a daemon thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def refresh_loop():
+            while not self._stop.wait(self.refresh_interval):
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logger.error(f"Route graph refresh failed: {e}")
+
+        self._thread = threading.Thread(target=refresh_loop, daemon=True)
+        self._thread.start()
+        logger.info("Route graph refresh thread started")
+
+    def stop(self):
+        self._stop.set()
+
+    def get_stats(self) -> Dict[str, Any]:
+        graph = self._graph
+        return {
+            **self.stats,
+            'airports': len(graph.adjacency) if graph else 0,
+            'legs': graph.leg_count if graph else 0,
+            'age_seconds': round(time.time() - graph.built_at, 1) if graph else None
+        }
+
+
+# ============================================================================
+# TESTING
+# ============================================================================
+
+if __name__ == "__main__":
+    print("=" * 70)
+    print("ROUTE GRAPH - TESTING")
+    print("=" * 70)
+
+    index = RouteGraphIndex(lambda o, d: random.randint(80, 600),
+                            ['AMS', 'FRA', 'CDG', 'LHR', 'IST', 'DXB', 'DOH', 'SIN', 'HKG'])
+    index.k_cheapest('MAD', 'BKK')  # builds the graph
+
+    start = time.perf_counter()
+    itineraries = index.k_cheapest('MAD', 'BKK', k=8)
+    elapsed = (time.perf_counter() - start) * 1000
+
+    for itinerary in itineraries:
+        print(f"  {itinerary}")
+    print(f"\n{len(itineraries)} itineraries in {elapsed:.2f} ms")
+    print(f"Stats: {index.get_stats()}")
@@ -5,8 +5,19 @@ Search Cache System - Cazador Supremo v14.0 Phase 3
 
 Intelligent caching layer for advanced search methods:
 - LRU Cache with TTL (Time To Live)
-- Redis adapter (optional, falls back to local)
-- Cache invalidation strategies
+- Lock-striped sharded LRU for multi-threaded access
+- Memory budget mode (total and per-method byte quotas)
+- Optional TinyLFU admission (count-min frequency sketch with aging)
+- Optional SQLite L2 tier that survives restarts
+- Redis adapter (optional, falls back to local) with batched
+  MGET/pipeline I/O, compressed JSON values and a key namespace
+- Cache invalidation strategies (exact, full, by route/origin/month tag)
+- Query canonicalization and subsumption (narrow queries answered from
+  broader cached results)
+- Single-flight coalescing of concurrent identical searches
+- Stale-while-revalidate (soft/hard TTL per method)
+- Negative caching of empty results with a short TTL
+- Sync/async cached_search decorator with analytics metrics
 - Performance monitoring
 - Hit/miss rate tracking
 
@@ -15,14 +26,28 @@ Version: 14.0.3
 Date: 2026-01-17
 """
 
+import re
+import sys
 import json
 import time
+import heapq
+import bisect
+import queue
+import pickle
+import sqlite3
+import asyncio
 import hashlib
+import hmac
+import inspect
 import logging
-from typing import Optional, Dict, Any, Callable
+import os
+import zlib
+from typing import Optional, Dict, Any, Callable, Awaitable, Tuple, List
 from collections import OrderedDict
+from concurrent.futures import Future
+from dataclasses import fields, is_dataclass, replace
 from datetime import datetime, timedelta
-from functools import wraps
+from functools import wraps, partial
 import threading
 
 # Optional Redis support
@@ -35,6 +60,271 @@ except ImportError:
 logger = logging.getLogger(__name__)
 
 
+# ============================================================================
+# SIZE ESTIMATION
+# ============================================================================
+
+def estimate_size(obj: Any) -> int:
+    """
+    Estimate the memory footprint of obj in bytes.
+    
+    Walks containers, dataclasses and plain objects, counting each object
+    once (sys.getsizeof of every reachable object).
+    """
+    seen = set()
+    stack = [obj]
+    total = 0
+    while stack:
+        item = stack.pop()
+        if id(item) in seen:
+            continue
+        seen.add(id(item))
+        total += sys.getsizeof(item)
+        
+        if isinstance(item, (str, bytes, bytearray, int, float, bool, type(None))):
+            continue
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, (list, tuple, set, frozenset)):
+            stack.extend(item)
+        elif hasattr(item, '__dict__'):
+            stack.append(vars(item))
+    return total
+
+
+def is_empty_result(result: Any) -> bool:
+    """True for "nothing found" answers: empty containers or an empty .results"""
+    rows = getattr(result, 'results', result)
+    try:
+        return len(rows) == 0
+    except TypeError:
+        return False
+
+
+def method_from_key(key: str) -> str:
+    """Get the search method from a 'search:{method}:{hash}' cache key"""
+    parts = key.split(':', 2)
+    return parts[1] if len(parts) == 3 else ''
+
+
+def cache_tags(params: Dict[str, Any]) -> frozenset:
+    """
+    Invalidation tags for a search's parameters.
+
+    - 'MAD-BCN' for every origin/destination pair (each leg for multi-city)
+    - 'MAD-*' for origin-only searches (budget, last minute), whose results
+      may include any destination from that origin
+    - 'MAD' for the origin of any search
+    - '2026-03' for the month searched (month, date or start_date)
+    - the return route ('BCN-MAD') as well for round trips (min_stay/max_stay)
+    """
+    params = canonical_params(params)
+    tags = set()
+    origin = params.get('origin') or params.get('city_origin')
+    destination = params.get('destination') or params.get('city_dest')
+    
+    if origin:
+        origin = str(origin).upper()
+        tags.add(origin)
+        tags.add(f"{origin}-{str(destination).upper()}" if destination else f"{origin}-*")
+        if destination and ('min_stay' in params or 'max_stay' in params):
+            tags.add(f"{str(destination).upper()}-{origin}")
+    
+    cities = params.get('cities')
+    if cities:
+        legs = [str(c).upper() for c in cities]
+        tags.update(legs[:1])
+        tags.update(f"{a}-{b}" for a, b in zip(legs, legs[1:]))
+    
+    for name in ('month', 'date', 'start_date'):
+        value = params.get(name)
+        if value:
+            tags.add(str(value)[:7])
+            break
+    
+    return frozenset(tags)
+
+
+def expand_tag(tag: str) -> List[str]:
+    """Tags an invalidation of tag must clear ('MAD-BCN' also clears 'MAD-*')"""
+    tag = tag.upper()
+    origin, sep, destination = tag.partition('-')
+    if sep and len(origin) == 3 and destination not in ('', '*'):
+        return [tag, f"{origin}-*"]
+    return [tag]
+
+
+# ============================================================================
+# QUERY CANONICALIZATION & SUBSUMPTION
+# ============================================================================
+
+# List parameters whose order is meaningful (route order, stays per city)
+ORDERED_LIST_PARAMS = {'cities', 'stay_days'}
+
+_IATA_RE = re.compile(r'^[A-Za-z]{2,3}$')
+_MONTH_RE = re.compile(r'^(\d{4})-(\d{1,2})$')
+_DATE_RE = re.compile(r'^(\d{4})-(\d{1,2})-(\d{1,2})$')
+
+
+def _canonical_value(name: str, value: Any) -> Any:
+    if isinstance(value, str):
+        value = value.strip()
+        if _IATA_RE.match(value):
+            return value.upper()
+        match = _MONTH_RE.match(value)
+        if match:
+            return f"{match.group(1)}-{int(match.group(2)):02d}"
+        match = _DATE_RE.match(value)
+        if match:
+            y, m, d = match.groups()
+            return f"{y}-{int(m):02d}-{int(d):02d}"
+        return value
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, (list, tuple)):
+        items = [_canonical_value(name, v) for v in value]
+        if name not in ORDERED_LIST_PARAMS:
+            items.sort(key=repr)
+        return items
+    return value
+
+
+def canonical_params(params: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalize search parameters so equivalent queries share a cache key:
+    IATA codes upper-cased, months/dates zero-padded, whole floats as
+    ints and unordered lists (e.g. airlines) sorted.
+    """
+    return {name: _canonical_value(name, value) for name, value in params.items()}
+
+
+class SubsumptionRule:
+    """
+    Answer queries of method from a broader cached query of source.
+
+    With bound_param, any cached source query with the same other
+    parameters and a bound at least as large is broader (a €300 budget
+    search covers €150). Otherwise source_params maps the query to the
+    single broader source query. derive(result, params) builds the
+    narrower result without mutating the cached one.
+    """
+
+    def __init__(self, method: str, source: str,
+                 derive: Callable[[Any, Dict[str, Any]], Any],
+                 bound_param: Optional[str] = None,
+                 source_params: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None):
+        self.method = method
+        self.source = source
+        self.derive = derive
+        self.bound_param = bound_param
+        self.source_params = source_params
+
+
+def _rows(result: Any) -> List[Any]:
+    return list(getattr(result, 'results', result) or [])
+
+
+def _with_rows(result: Any, rows: List[Any], query: Dict[str, Any],
+               method: Optional[str] = None, **metadata) -> Any:
+    """Copy of a SearchResult-like result with new rows, or just the rows"""
+    if not is_dataclass(result):
+        return rows
+    changes = {
+        'results': rows,
+        'query': dict(query),
+        'metadata': {**metadata, 'derived_from': getattr(result, 'query', None)}
+    }
+    if method:
+        changes['method'] = method
+    return replace(result, **changes)
+
+
+def _derive_budget(result: Any, params: Dict[str, Any]) -> Any:
+    """Destinations within a lower budget, with savings against that budget"""
+    budget = float(params['budget'])
+    rows = [
+        dict(dest, savings_pct=(budget - dest['price']) / budget * 100)
+        for dest in _rows(result) if dest['price'] <= budget
+    ]
+    by_country = {}
+    for dest in rows:
+        by_country.setdefault(dest.get('country'), []).append(dest)
+    return _with_rows(result, rows, params, by_country=by_country, total_found=len(rows))
+
+
+DEFAULT_SUBSUMPTION_RULES = [
+    SubsumptionRule('budget', 'budget', _derive_budget, bound_param='budget'),
+]
+
+
+# ============================================================================
+# FREQUENCY SKETCH (TinyLFU ADMISSION)
+# ============================================================================
+
+class FrequencySketch:
+    """
+    Count-min sketch of recent key access frequency
+    
+    depth rows of width saturating counters (max 15) in bytearrays. A
+    key's estimate is the minimum of its depth counters, so it can only
+    over-count. Every sample_size increments all counters are halved,
+    which ages out keys that were popular long ago.
+    """
+    
+    MAX_COUNT = 15
+    _SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0x27D4EB2F165667C5)
+    
+    def __init__(self, capacity: int, depth: int = 4, sample_factor: int = 10):
+        """
+        Args:
+            capacity: Cache entries the sketch serves (sizes the rows)
+            depth: Hash rows (at most 4)
+            sample_factor: Age after sample_factor * capacity increments
+        """
+        self.width = 1 << max(6, (max(1, capacity) - 1).bit_length())
+        self.mask = self.width - 1
+        self.depth = max(1, min(depth, len(self._SEEDS)))
+        self.rows = [bytearray(self.width) for _ in range(self.depth)]
+        self.sample_size = max(1, sample_factor * capacity)
+        self.additions = 0
+        self.resets = 0
+    
+    def _indexes(self, key: str) -> List[int]:
+        # crc32 rather than hash(): str hashing is salted per process, which
+        # would make admission decisions differ from run to run
+        h = zlib.crc32(key.encode('utf-8'))
+        return [((h * seed) >> 17 ^ h) & self.mask for seed in self._SEEDS[:self.depth]]
+    
+    def increment(self, key: str):
+        """Record one access to key"""
+        for row, i in zip(self.rows, self._indexes(key)):
+            if row[i] < self.MAX_COUNT:
+                row[i] += 1
+        self.additions += 1
+        if self.additions >= self.sample_size:
+            self._age()
+    
+    def frequency(self, key: str) -> int:
+        """Estimated recent accesses to key"""
+        return min(row[i] for row, i in zip(self.rows, self._indexes(key)))
+    
+    def _age(self):
+        """Halve every counter"""
+        halve = bytes(c >> 1 for c in range(256))
+        self.rows = [row.translate(halve) for row in self.rows]
+        self.additions //= 2
+        self.resets += 1
+    
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'width': self.width,
+            'depth': self.depth,
+            'bytes': self.width * self.depth,
+            'resets': self.resets
+        }
+
+
 # ============================================================================
 # LRU CACHE WITH TTL
 # ============================================================================
@@ -42,28 +332,78 @@ logger = logging.getLogger(__name__)
 class LRUCacheWithTTL:
     """
     Thread-safe LRU cache with Time-To-Live support
+    
+    Expiry is indexed with a min-heap of (expiry, key) so expired entries
+    are found in O(log n) each and removed in small batches instead of
+    scanning every key under the lock. Heap entries are invalidated lazily:
+    one only counts if it still matches ttl_map.
+    
+    Byte-budget mode (max_bytes and/or byte_quotas) estimates the size of
+    each value and evicts least recently used entries until the total,
+    and the entry's method quota, fit. Entries larger than their budget
+    are not stored.
+    
+    With admission enabled (TinyLFU), every get() is counted in a
+    FrequencySketch and, when the cache is full, a new key is only stored
+    if it has been requested at least as often as the LRU victim it would
+    replace. One-off queries then no longer push out hot entries.
     """
     
-    def __init__(self, max_size: int = 1000, default_ttl: int = 300):
+    CLEANUP_BATCH_SIZE = 256  # max heap entries popped per lock acquisition
+    SET_EXPIRE_BUDGET = 4     # expired entries reclaimed on each set()
+    
+    def __init__(self, max_size: int = 1000, default_ttl: int = 300,
+                 max_bytes: Optional[int] = None,
+                 byte_quotas: Optional[Dict[str, int]] = None,
+                 size_estimator: Callable[[Any], int] = estimate_size,
+                 on_evict: Optional[Callable[[str, Any, float], None]] = None,
+                 admission: bool = False):
         """
         Args:
             max_size: Maximum number of items in cache
             default_ttl: Default time-to-live in seconds
+            max_bytes: Maximum estimated bytes across all entries
+            byte_quotas: Maximum estimated bytes per search method
+            size_estimator: Function returning the byte size of a value
+            on_evict: Called as on_evict(key, value, expires_at) for live
+                entries evicted for capacity (not for expiry or delete);
+                runs under the cache lock, so it must not block
+            admission: Filter new keys with a TinyLFU frequency sketch
         """
         self.max_size = max_size
         self.default_ttl = default_ttl
         self.cache: OrderedDict = OrderedDict()
         self.ttl_map: Dict[str, float] = {}  # key -> expiry timestamp
+        self.expiry_heap: List[Tuple[float, str]] = []  # (expiry, key), lazy
         self.lock = threading.RLock()
+        self.on_evict = on_evict
+        
+        # Byte budget (only tracked when a budget is configured)
+        self.max_bytes = max_bytes
+        self.byte_quotas = dict(byte_quotas or {})
+        self.size_estimator = size_estimator
+        self.track_bytes = max_bytes is not None or bool(self.byte_quotas)
+        self.sizes: Dict[str, int] = {}                 # key -> estimated bytes
+        self.bytes_used = 0
+        self.method_bytes: Dict[str, int] = {}          # method -> bytes
+        self.method_keys: Dict[str, OrderedDict] = {}   # method -> LRU keys (quotas)
+        
+        # TinyLFU admission filter
+        self.sketch = FrequencySketch(max_size) if admission else None
+        self.admission_rejected = 0
         
         # Metrics
         self.hits = 0
         self.misses = 0
         self.evictions = 0
+        self.rejected = 0  # values larger than their byte budget
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache if exists and not expired"""
         with self.lock:
+            if self.sketch is not None:
+                self.sketch.increment(key)
+            
             # Check if key exists
             if key not in self.cache:
                 self.misses += 1
@@ -77,29 +417,56 @@ class LRUCacheWithTTL:
             
             # Move to end (most recently used)
             self.cache.move_to_end(key)
+            if self.byte_quotas:
+                self.method_keys[method_from_key(key)].move_to_end(key)
             self.hits += 1
             return self.cache[key]
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """Set value in cache with optional custom TTL"""
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set value in cache with optional custom TTL; False if not stored"""
+        size = self.size_estimator(value) if self.track_bytes else 0
+        
         with self.lock:
-            # Remove if already exists
+            # Remove if already exists; new keys must pass admission
             if key in self.cache:
-                del self.cache[key]
+                if self.track_bytes:
+                    self._remove(key)
+                else:
+                    del self.cache[key]
+            elif self.sketch is not None and not self._admit(key):
+                self.admission_rejected += 1
+                return False
+            
+            if self.track_bytes and not self._fits_budget(key, size):
+                self.rejected += 1
+                logger.debug(f"Not cached (too large: {size} bytes): {key}")
+                return False
             
             # Add new item
             self.cache[key] = value
             self.cache.move_to_end(key)
+            if self.track_bytes:
+                self._account(key, size)
             
             # Set expiry
             ttl_seconds = ttl if ttl is not None else self.default_ttl
-            self.ttl_map[key] = time.time() + ttl_seconds
+            now = time.time()
+            expiry = now + ttl_seconds
+            self.ttl_map[key] = expiry
+            heapq.heappush(self.expiry_heap, (expiry, key))
             
-            # Evict if over capacity
+            # Reclaim a few expired entries, then evict if over capacity
+            self._expire_batch(now, self.SET_EXPIRE_BUDGET)
             if len(self.cache) > self.max_size:
-                oldest_key = next(iter(self.cache))
-                self._remove(oldest_key)
-                self.evictions += 1
+                self._evict(next(iter(self.cache)))
+            if self.track_bytes:
+                self._evict_over_budget(key)
+            
+            # Overwrites leave dead heap entries behind; rebuild when they
+            # outnumber live ones so the heap stays O(size)
+            if len(self.expiry_heap) > 2 * len(self.ttl_map) + 64:
+                self._rebuild_heap()
+            return True
     
     def delete(self, key: str) -> bool:
         """Delete specific key from cache"""
@@ -114,6 +481,11 @@ class LRUCacheWithTTL:
         with self.lock:
             self.cache.clear()
             self.ttl_map.clear()
+            self.expiry_heap.clear()
+            self.sizes.clear()
+            self.method_bytes.clear()
+            self.method_keys.clear()
+            self.bytes_used = 0
             logger.info("Cache cleared")
     
     def _is_expired(self, key: str) -> bool:
@@ -122,25 +494,118 @@ class LRUCacheWithTTL:
             return True
         return time.time() > self.ttl_map[key]
     
+    def _admit(self, key: str) -> bool:
+        """TinyLFU: may a new key replace the LRU victim? (lock held)"""
+        if len(self.cache) < self.max_size:
+            return True
+        self._expire_batch(time.time(), self.SET_EXPIRE_BUDGET)
+        if len(self.cache) < self.max_size:
+            return True
+        victim = next(iter(self.cache))
+        return self.sketch.frequency(key) >= self.sketch.frequency(victim)
+    
+    def _evict(self, key: str):
+        """Evict a live entry for capacity (lock held)"""
+        if self.on_evict is not None:
+            self.on_evict(key, self.cache[key], self.ttl_map[key])
+        self._remove(key)
+        self.evictions += 1
+    
+    def items_snapshot(self) -> List[Tuple[str, Any, float]]:
+        """Get (key, value, expires_at) for every live entry"""
+        now = time.time()
+        with self.lock:
+            return [
+                (key, value, self.ttl_map[key])
+                for key, value in self.cache.items()
+                if self.ttl_map.get(key, 0) > now
+            ]
+    
     def _remove(self, key: str):
         """Remove key from cache and TTL map"""
         if key in self.cache:
             del self.cache[key]
         if key in self.ttl_map:
             del self.ttl_map[key]
+        if key in self.sizes:
+            size = self.sizes.pop(key)
+            method = method_from_key(key)
+            self.bytes_used -= size
+            self.method_bytes[method] -= size
+            if method in self.method_keys:
+                self.method_keys[method].pop(key, None)
     
-    def cleanup_expired(self):
-        """Remove all expired entries"""
-        with self.lock:
-            expired_keys = [
-                key for key in self.cache
-                if self._is_expired(key)
-            ]
-            for key in expired_keys:
+    # ========================================================================
+    # BYTE BUDGET
+    # ========================================================================
+    
+    def _fits_budget(self, key: str, size: int) -> bool:
+        """Check a single value is not larger than its budgets"""
+        if self.max_bytes is not None and size > self.max_bytes:
+            return False
+        quota = self.byte_quotas.get(method_from_key(key))
+        return quota is None or size <= quota
+    
+    def _account(self, key: str, size: int):
+        """Record the size of a newly inserted key (lock held)"""
+        method = method_from_key(key)
+        self.sizes[key] = size
+        self.bytes_used += size
+        self.method_bytes[method] = self.method_bytes.get(method, 0) + size
+        if self.byte_quotas:
+            self.method_keys.setdefault(method, OrderedDict())[key] = None
+    
+    def _evict_over_budget(self, key: str):
+        """Evict LRU entries until method quota and total budget fit (lock held)"""
+        method = method_from_key(key)
+        quota = self.byte_quotas.get(method)
+        if quota is not None:
+            keys = self.method_keys[method]
+            while self.method_bytes[method] > quota:
+                self._evict(next(iter(keys)))
+        
+        if self.max_bytes is not None:
+            while self.bytes_used > self.max_bytes:
+                self._evict(next(iter(self.cache)))
+    
+    def _expire_batch(self, now: float, limit: int) -> int:
+        """Pop up to limit expired heap entries and remove them (lock held)"""
+        heap = self.expiry_heap
+        removed = 0
+        for _ in range(limit):
+            if not heap or heap[0][0] >= now:
+                break
+            expiry, key = heapq.heappop(heap)
+            if self.ttl_map.get(key) == expiry:  # skip superseded entries
                 self._remove(key)
-            
-            if expired_keys:
-                logger.info(f"Cleaned up {len(expired_keys)} expired entries")
+                removed += 1
+        return removed
+    
+    def _rebuild_heap(self):
+        """Rebuild the expiry heap from live entries (lock held)"""
+        self.expiry_heap = [(expiry, key) for key, expiry in self.ttl_map.items()]
+        heapq.heapify(self.expiry_heap)
+    
+    def cleanup_expired(self, batch_size: Optional[int] = None) -> int:
+        """
+        Remove all expired entries.
+        
+        Works in batches of batch_size entries, releasing the lock between
+        batches so concurrent get/set calls are never blocked for long.
+        """
+        batch_size = batch_size or self.CLEANUP_BATCH_SIZE
+        now = time.time()
+        total = 0
+        while True:
+            with self.lock:
+                total += self._expire_batch(now, batch_size)
+                pending = bool(self.expiry_heap) and self.expiry_heap[0][0] < now
+            if not pending:
+                break
+        
+        if total:
+            logger.info(f"Cleaned up {total} expired entries")
+        return total
     
     def get_stats(self) -> Dict[str, Any]:
         """Get cache statistics"""
@@ -148,7 +613,7 @@ class LRUCacheWithTTL:
             total_requests = self.hits + self.misses
             hit_rate = (self.hits / total_requests * 100) if total_requests > 0 else 0
             
-            return {
+            stats = {
                 'size': len(self.cache),
                 'max_size': self.max_size,
                 'hits': self.hits,
@@ -157,33 +622,626 @@ class LRUCacheWithTTL:
                 'hit_rate': f"{hit_rate:.1f}%",
                 'usage': f"{len(self.cache) / self.max_size * 100:.1f}%"
             }
+            if self.track_bytes:
+                stats.update(self._byte_stats())
+            if self.sketch is not None:
+                stats['admission'] = dict(self.sketch.get_stats(),
+                                          rejected=self.admission_rejected)
+            return stats
+    
+    def _byte_stats(self, top: int = 5) -> Dict[str, Any]:
+        """Byte budget statistics (lock held)"""
+        largest = heapq.nlargest(top, self.sizes.items(), key=lambda kv: kv[1])
+        return {
+            'bytes_used': self.bytes_used,
+            'max_bytes': self.max_bytes,
+            'bytes_by_method': {m: b for m, b in self.method_bytes.items() if b},
+            'byte_quotas': dict(self.byte_quotas),
+            'rejected': self.rejected,
+            'largest_entries': [{'key': k, 'bytes': b} for k, b in largest]
+        }
+
+
+# ============================================================================
+# SHARDED LRU CACHE
+# ============================================================================
+
+class ShardedLRUCache:
+    """
+    Lock-striped LRU cache: N independent LRUCacheWithTTL segments
+    
+    Keys are routed to a shard by hash, so get/set on different shards
+    never contend for the same lock and cleanup only blocks one shard at
+    a time. LRU order and max_size are per shard.
+    """
+    
+    def __init__(self, max_size: int = 1000, default_ttl: int = 300, shards: int = 8,
+                 max_bytes: Optional[int] = None,
+                 byte_quotas: Optional[Dict[str, int]] = None,
+                 on_evict: Optional[Callable[[str, Any, float], None]] = None,
+                 admission: bool = False):
+        """
+        Args:
+            max_size: Maximum number of items across all shards
+            default_ttl: Default time-to-live in seconds
+            shards: Number of independent segments
+            max_bytes: Maximum estimated bytes across all shards
+            byte_quotas: Maximum estimated bytes per search method
+            on_evict: Capacity eviction callback (see LRUCacheWithTTL)
+            admission: TinyLFU admission filter per shard
+        
+        Size and byte budgets are split evenly between shards.
+        """
+        self.num_shards = max(1, shards)
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.max_bytes = max_bytes
+        
+        def split(total: int) -> int:
+            return -(-total // self.num_shards)  # ceil
+        
+        self.shards = [
+            LRUCacheWithTTL(
+                max_size=split(max_size),
+                default_ttl=default_ttl,
+                max_bytes=split(max_bytes) if max_bytes is not None else None,
+                byte_quotas={m: split(q) for m, q in (byte_quotas or {}).items()},
+                on_evict=on_evict,
+                admission=admission
+            )
+            for _ in range(self.num_shards)
+        ]
+    
+    def _shard(self, key: str) -> LRUCacheWithTTL:
+        return self.shards[hash(key) % self.num_shards]
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get value from the key's shard"""
+        return self._shard(key).get(key)
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set value in the key's shard; False if not stored"""
+        return self._shard(key).set(key, value, ttl)
+    
+    def delete(self, key: str) -> bool:
+        """Delete key from its shard"""
+        return self._shard(key).delete(key)
+    
+    def clear(self):
+        """Clear every shard"""
+        for shard in self.shards:
+            shard.clear()
+    
+    def cleanup_expired(self, batch_size: Optional[int] = None) -> int:
+        """Remove expired entries shard by shard"""
+        return sum(shard.cleanup_expired(batch_size) for shard in self.shards)
+    
+    def items_snapshot(self) -> List[Tuple[str, Any, float]]:
+        """Get (key, value, expires_at) for every live entry"""
+        return [item for shard in self.shards for item in shard.items_snapshot()]
+    
+    def __len__(self) -> int:
+        return sum(len(shard.cache) for shard in self.shards)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get cache statistics aggregated across shards"""
+        hits = misses = evictions = size = admission_rejected = 0
+        byte_stats = []
+        for shard in self.shards:
+            with shard.lock:
+                hits += shard.hits
+                misses += shard.misses
+                evictions += shard.evictions
+                size += len(shard.cache)
+                admission_rejected += shard.admission_rejected
+                if shard.track_bytes:
+                    byte_stats.append(shard._byte_stats())
+        
+        total_requests = hits + misses
+        hit_rate = (hits / total_requests * 100) if total_requests > 0 else 0
+        
+        stats = {
+            'size': size,
+            'max_size': self.max_size,
+            'shards': self.num_shards,
+            'hits': hits,
+            'misses': misses,
+            'evictions': evictions,
+            'hit_rate': f"{hit_rate:.1f}%",
+            'usage': f"{size / self.max_size * 100:.1f}%"
+        }
+        if byte_stats:
+            by_method: Dict[str, int] = {}
+            for b in byte_stats:
+                for method, used in b['bytes_by_method'].items():
+                    by_method[method] = by_method.get(method, 0) + used
+            largest = sorted((e for b in byte_stats for e in b['largest_entries']),
+                             key=lambda e: e['bytes'], reverse=True)[:5]
+            stats.update({
+                'bytes_used': sum(b['bytes_used'] for b in byte_stats),
+                'max_bytes': self.max_bytes,
+                'bytes_by_method': by_method,
+                'rejected': sum(b['rejected'] for b in byte_stats),
+                'largest_entries': largest
+            })
+        if self.shards[0].sketch is not None:
+            stats['admission'] = {'rejected': admission_rejected}
+        return stats
+
+
+# ============================================================================
+# DISK L2 TIER
+# ============================================================================
+
+class SQLiteL2Cache:
+    """
+    Local on-disk cache tier backed by SQLite
+    
+    Rows keep their absolute expiry so TTLs survive restarts. Writes are
+    queued and committed in batches by a background thread; reads see
+    queued writes through an in-memory pending map, so a get() never
+    returns a value older than the last put()/delete().
+    
+    Values are pickled behind an HMAC-SHA256 of the pickle; rows whose
+    signature does not verify are ignored without being unpickled.
+    
+    Each row may carry index metadata (the manager's invalidation tags
+    and subsumption bound), stored as JSON; tags are also indexed in
+    their own table so keys_with_tags() finds rows never promoted to L1.
+    """
+    
+    WRITE_BATCH_SIZE = 256
+    SIGNATURE_SIZE = hashlib.sha256().digest_size
+    
+    def __init__(self, path: str, secret: Optional[bytes] = None):
+        """
+        Args:
+            path: SQLite database file (created if missing)
+            secret: HMAC key for values; by default a random key kept in
+                path + '.key' (owner read/write only)
+        """
+        self.path = path
+        self.secret = secret if secret is not None else self._load_secret(path + '.key')
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL NOT NULL, meta TEXT)"
+        )
+        columns = [row[1] for row in self.conn.execute("PRAGMA table_info(entries)")]
+        if 'meta' not in columns:  # database from before index metadata
+            self.conn.execute("ALTER TABLE entries ADD COLUMN meta TEXT")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_expires ON entries (expires_at)")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entry_tags ("
+            "tag TEXT NOT NULL, key TEXT NOT NULL, PRIMARY KEY (tag, key))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_tag_key ON entry_tags (key)")
+        self.conn.commit()
+        
+        # key -> (value, expires_at, meta) or None (pending delete)
+        self._pending: Dict[str, Optional[Tuple[Any, float, Optional[Dict[str, Any]]]]] = {}
+        self._generation = 0  # bumped by clear() to drop queued writes
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.write_errors = 0
+        
+        self._writer = threading.Thread(target=self._write_loop, daemon=True,
+                                        name="search-cache-l2")
+        self._writer.start()
+    
+    def get(self, key: str) -> Optional[Tuple[Any, float, Optional[Dict[str, Any]]]]:
+        """Get (value, expires_at, meta) if present and not expired"""
+        now = time.time()
+        with self.lock:
+            if key in self._pending:
+                entry = self._pending[key]
+            else:
+                row = self.conn.execute(
+                    "SELECT value, expires_at, meta FROM entries WHERE key = ?", (key,)
+                ).fetchone()
+                entry = None
+                if row is not None:
+                    try:
+                        entry = (self._loads(row[0]), row[1], json.loads(row[2]) if row[2] else None)
+                    except Exception as e:
+                        logger.warning(f"L2 cache entry unreadable, ignoring: {e}")
+            
+            if entry is None or entry[1] <= now:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry
+    
+    @staticmethod
+    def _load_secret(path: str) -> bytes:
+        """Read the HMAC key file, creating it on first use"""
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            with open(path, 'rb') as f:
+                return f.read()
+        secret = os.urandom(32)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(secret)
+        return secret
+    
+    def _dumps(self, value: Any) -> bytes:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        return hmac.new(self.secret, payload, hashlib.sha256).digest() + payload
+    
+    def _loads(self, blob: bytes) -> Any:
+        signature, payload = blob[:self.SIGNATURE_SIZE], blob[self.SIGNATURE_SIZE:]
+        expected = hmac.new(self.secret, payload, hashlib.sha256).digest()
+        if not hmac.compare_digest(signature, expected):
+            raise ValueError("bad signature")
+        return pickle.loads(payload)
+    
+    def put(self, key: str, value: Any, expires_at: float,
+            meta: Optional[Dict[str, Any]] = None):
+        """Queue a write; meta['tags'] lists the row's invalidation tags"""
+        self._enqueue(key, (value, expires_at, meta))
+    
+    def delete(self, key: str):
+        """Queue a delete"""
+        self._enqueue(key, None)
+    
+    def keys_with_tags(self, tags: List[str]) -> List[str]:
+        """Keys of rows (including queued writes) carrying any of tags"""
+        tags = list(tags)
+        if not tags:
+            return []
+        wanted = set(tags)
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT DISTINCT key FROM entry_tags WHERE tag IN ({','.join('?' * len(tags))})",
+                tags
+            ).fetchall()
+            keys = {key for (key,) in rows if key not in self._pending}
+            for key, entry in self._pending.items():
+                if entry is not None and entry[2] and wanted.intersection(entry[2].get('tags', ())):
+                    keys.add(key)
+        return sorted(keys)
+    
+    def _enqueue(self, key: str, entry: Optional[Tuple[Any, float, Optional[Dict[str, Any]]]]):
+        with self.lock:
+            self._pending[key] = entry
+            generation = self._generation
+        self._queue.put((key, entry, generation))
+    
+    def clear(self):
+        """Delete every entry, including queued writes"""
+        with self.lock:
+            self._generation += 1
+            self._pending.clear()
+            self.conn.execute("DELETE FROM entries")
+            self.conn.execute("DELETE FROM entry_tags")
+            self.conn.commit()
+    
+    def purge_expired(self) -> int:
+        """Delete expired rows"""
+        now = time.time()
+        with self.lock:
+            self.conn.execute(
+                "DELETE FROM entry_tags WHERE key IN (SELECT key FROM entries WHERE expires_at <= ?)",
+                (now,)
+            )
+            cursor = self.conn.execute("DELETE FROM entries WHERE expires_at <= ?", (now,))
+            self.conn.commit()
+            return cursor.rowcount
+    
+    def flush(self):
+        """Block until every queued write is committed"""
+        self._queue.join()
+    
+    def close(self):
+        """Commit queued writes and close the database"""
+        if self._closed:
+            return
+        self.flush()
+        self._closed = True
+        self._queue.put(None)
+        self._writer.join(timeout=5)
+        with self.lock:
+            self.conn.close()
+    
+    def _write_loop(self):
+        """Commit queued writes in batches"""
+        while True:
+            item = self._queue.get()
+            if item is None:
+                self._queue.task_done()
+                return
+            
+            batch = [item]
+            while len(batch) < self.WRITE_BATCH_SIZE:
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._queue.put(None)  # handle after this batch
+                    self._queue.task_done()
+                    break
+                batch.append(item)
+            
+            try:
+                self._write_batch(batch)
+            except Exception as e:
+                self.write_errors += 1
+                logger.error(f"L2 cache write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+    
+    def _write_batch(self, batch: List[Tuple[str, Optional[Tuple[Any, float, Any]], int]]):
+        # Serialize outside the lock; only the latest op per key matters
+        latest: Dict[str, Tuple[Optional[Tuple[Any, float, Any]], int]] = {}
+        for key, entry, generation in batch:
+            latest[key] = (entry, generation)
+        rows = []
+        for key, (entry, generation) in latest.items():
+            blob = self._dumps(entry[0]) if entry else None
+            meta = json.dumps(entry[2]) if entry and entry[2] else None
+            rows.append((key, entry, generation, blob, meta))
+        
+        with self.lock:
+            for key, entry, generation, blob, meta in rows:
+                if generation != self._generation:
+                    continue  # cleared after this write was queued
+                self.conn.execute("DELETE FROM entry_tags WHERE key = ?", (key,))
+                if entry is None:
+                    self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                else:
+                    self.conn.execute(
+                        "INSERT OR REPLACE INTO entries (key, value, expires_at, meta) "
+                        "VALUES (?, ?, ?, ?)",
+                        (key, blob, entry[1], meta)
+                    )
+                    tags = entry[2].get('tags', ()) if entry[2] else ()
+                    self.conn.executemany("INSERT OR IGNORE INTO entry_tags (tag, key) VALUES (?, ?)",
+                                          [(tag, key) for tag in tags])
+                # Drop the pending entry unless a newer op replaced it
+                if key in self._pending and self._pending[key] is entry:
+                    del self._pending[key]
+            self.conn.commit()
+            self.writes += len(rows)
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Get L2 statistics"""
+        with self.lock:
+            size = self.conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            return {
+                'path': self.path,
+                'size': size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'writes': self.writes,
+                'write_errors': self.write_errors,
+                'pending_writes': len(self._pending)
+            }
+
+
+class TieredCache:
+    """
+    In-memory LRU (L1) in front of a SQLite L2 tier
+    
+    - L1 misses fall through to L2; L2 hits are promoted into L1 with
+      their remaining TTL
+    - Entries evicted from L1 for capacity are demoted to L2 asynchronously
+    - flush() checkpoints live L1 entries so a restart starts warm
+    - Rows written to L2 carry metadata from meta_for(key), handed back
+      to on_promote so the owner can rebuild its indexes
+    """
+    
+    def __init__(self, l1_factory: Callable[..., Any], l2: SQLiteL2Cache,
+                 on_promote: Optional[Callable[[str, float, Optional[Dict[str, Any]]], None]] = None,
+                 meta_for: Optional[Callable[[str], Optional[Dict[str, Any]]]] = None):
+        """
+        Args:
+            l1_factory: Builds the L1 cache; called with on_evict=...
+            l2: Disk tier
+            on_promote: Called as on_promote(key, expires_at, meta) after an L2 hit
+            meta_for: Returns the L2 row metadata of a key (see SQLiteL2Cache);
+                called under the L1 lock on demotion, so it must not block
+        """
+        self.l1 = l1_factory(on_evict=self._demote)
+        self.l2 = l2
+        self.on_promote = on_promote
+        self.meta_for = meta_for
+        self.lock = threading.Lock()
+        self.promotions = 0
+        self.demotions = 0
+    
+    def _demote(self, key: str, value: Any, expires_at: float):
+        """L1 eviction hook: queue the entry for L2 (non-blocking)"""
+        self.l2.put(key, value, expires_at, self._meta(key))
+        with self.lock:
+            self.demotions += 1
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Get from L1, then L2 (promoting hits)"""
+        value = self.l1.get(key)
+        if value is not None:
+            return value
+        
+        entry = self.l2.get(key)
+        if entry is None:
+            return None
+        
+        value, expires_at, meta = entry
+        self.l1.set(key, value, expires_at - time.time())
+        with self.lock:
+            self.promotions += 1
+        if self.on_promote is not None:
+            self.on_promote(key, expires_at, meta)
+        return value
+    
+    def _meta(self, key: str) -> Optional[Dict[str, Any]]:
+        return self.meta_for(key) if self.meta_for is not None else None
+    
+    def keys_with_tags(self, tags: List[str]) -> List[str]:
+        """Keys in L2 carrying any of tags (L1 entries are the owner's to track)"""
+        return self.l2.keys_with_tags(tags)
+    
+    def set(self, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """Set in L1 (reaches L2 on demotion or flush); False if not stored"""
+        return self.l1.set(key, value, ttl)
+    
+    def delete(self, key: str) -> bool:
+        """Delete from both tiers"""
+        deleted = self.l1.delete(key)
+        self.l2.delete(key)
+        return deleted
+    
+    def clear(self):
+        """Clear both tiers"""
+        self.l1.clear()
+        self.l2.clear()
+    
+    def cleanup_expired(self, batch_size: Optional[int] = None) -> int:
+        """Remove expired entries from both tiers"""
+        return self.l1.cleanup_expired(batch_size) + self.l2.purge_expired()
+    
+    def flush(self):
+        """Write every live L1 entry to L2 and wait for the writes"""
+        for key, value, expires_at in self.l1.items_snapshot():
+            self.l2.put(key, value, expires_at, self._meta(key))
+        self.l2.flush()
+    
+    def close(self):
+        """Flush and close the disk tier"""
+        self.flush()
+        self.l2.close()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """L1 statistics plus an 'l2' section"""
+        stats = self.l1.get_stats()
+        with self.lock:
+            stats['l2'] = dict(self.l2.get_stats(),
+                               promotions=self.promotions, demotions=self.demotions)
+        return stats
 
 
 # ============================================================================
 # REDIS CACHE ADAPTER
 # ============================================================================
 
+_JSON_TYPES: Dict[str, type] = {}
+_JSON_TAG = '__cache_type__'
+
+
+def register_json_type(cls: type) -> type:
+    """
+    Let RedisCacheAdapter store instances of dataclass cls as JSON
+    (usable as a class decorator). Types are matched by class name.
+    """
+    _JSON_TYPES[cls.__name__] = cls
+    return cls
+
+
+def _to_json(value: Any) -> Any:
+    """
+    JSON-ready form of value: registered dataclasses, tuples and dicts
+    with non-string keys become tagged objects so they round-trip
+    """
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    if isinstance(value, list):
+        return [_to_json(v) for v in value]
+    if isinstance(value, tuple):
+        return {_JSON_TAG: 'tuple', 'items': [_to_json(v) for v in value]}
+    if isinstance(value, dict):
+        if _JSON_TAG not in value and all(isinstance(k, str) for k in value):
+            return {k: _to_json(v) for k, v in value.items()}
+        return {_JSON_TAG: 'dict', 'items': [[_to_json(k), _to_json(v)] for k, v in value.items()]}
+    cls = type(value)
+    if is_dataclass(value) and _JSON_TYPES.get(cls.__name__) is cls:
+        return {_JSON_TAG: cls.__name__,
+                'fields': {f.name: _to_json(getattr(value, f.name)) for f in fields(value) if f.init}}
+    raise TypeError(f"{cls.__name__} is not JSON-serializable")
+
+
+def _from_json(value: Any) -> Any:
+    """Inverse of _to_json()"""
+    if isinstance(value, list):
+        return [_from_json(v) for v in value]
+    if not isinstance(value, dict):
+        return value
+    tag = value.get(_JSON_TAG)
+    if tag is None:
+        return {k: _from_json(v) for k, v in value.items()}
+    if tag == 'tuple':
+        return tuple(_from_json(v) for v in value['items'])
+    if tag == 'dict':
+        return {_from_json(k): _from_json(v) for k, v in value['items']}
+    cls = _JSON_TYPES.get(tag)
+    if cls is None:
+        raise ValueError(f"Unknown cached type: {tag!r}")
+    return cls(**{name: _from_json(v) for name, v in value['fields'].items()})
+
+
 class RedisCacheAdapter:
     """
     Redis-based cache adapter (optional)
     Falls back to LRU cache if Redis unavailable
+
+    Values are stored as JSON behind a one-byte format tag and compressed
+    with zlib above compress_min_bytes. JSON rather than pickle: anyone
+    who can write to a shared Redis must not be able to run code in the
+    bot. Dataclasses registered with register_json_type() (SearchResult,
+    FlightResult) are encoded field by field; any other value that JSON
+    cannot hold stays in the local fallback cache. All keys live under
+    prefix, so clear() only removes this adapter's entries. Batch
+    operations cost one round trip: get_many() is a single MGET and
+    set_many()/delete_many() go through one non-transactional pipeline.
     """
     
+    FORMAT_JSON = b'\x00'
+    FORMAT_ZLIB = b'\x01'
+    CLEAR_BATCH_SIZE = 500
+    
     def __init__(self, host: str = 'localhost', port: int = 6379, 
                  db: int = 0, password: Optional[str] = None,
-                 default_ttl: int = 300):
+                 default_ttl: int = 300, prefix: str = 'vuelos:search:',
+                 compress_min_bytes: Optional[int] = 1024,
+                 client: Optional[Any] = None):
+        """
+        Args:
+            prefix: Namespace prepended to every key
+            compress_min_bytes: Compress payloads at least this large (None = never)
+            client: Pre-built redis.Redis-compatible client (skips connecting)
+        """
         self.default_ttl = default_ttl
+        self.prefix = prefix
+        self.compress_min_bytes = compress_min_bytes
         self.redis_client = None
         self.fallback_cache = LRUCacheWithTTL(default_ttl=default_ttl)
+        self.io_stats = {
+            'round_trips': 0,
+            'keys_read': 0,
+            'keys_written': 0,
+            'bytes_written': 0,
+            'compressed': 0,
+            'unserializable': 0,
+            'errors': 0
+        }
         
-        if REDIS_AVAILABLE:
+        if client is not None:
+            self.redis_client = client
+        elif REDIS_AVAILABLE:
             try:
                 self.redis_client = redis.Redis(
                     host=host,
                     port=port,
                     db=db,
                     password=password,
-                    decode_responses=True,
                     socket_timeout=2
                 )
                 # Test connection
@@ -195,51 +1253,158 @@ class RedisCacheAdapter:
         else:
             logger.warning("Redis not available. Using fallback cache.")
     
+    # ------------------------------------------------------------------
+    # Serialization
+    # ------------------------------------------------------------------
+    
+    def _dumps(self, value: Any) -> bytes:
+        payload = json.dumps(_to_json(value), separators=(',', ':')).encode('utf-8')
+        if self.compress_min_bytes is not None and len(payload) >= self.compress_min_bytes:
+            compressed = zlib.compress(payload, 1)
+            if len(compressed) < len(payload):
+                self.io_stats['compressed'] += 1
+                return self.FORMAT_ZLIB + compressed
+        return self.FORMAT_JSON + payload
+    
+    def _loads(self, data: bytes) -> Any:
+        tag, payload = data[:1], data[1:]
+        if tag == self.FORMAT_ZLIB:
+            payload = zlib.decompress(payload)
+        elif tag != self.FORMAT_JSON:
+            raise ValueError(f"Unknown cache payload format: {tag!r}")
+        return _from_json(json.loads(payload))
+    
+    def _key(self, key: str) -> str:
+        return self.prefix + key
+    
+    @staticmethod
+    def _ttl_ms(ttl: float) -> int:
+        return max(1, int(ttl * 1000))
+    
+    def _error(self, op: str, e: Exception):
+        self.io_stats['errors'] += 1
+        logger.error(f"Redis {op} error: {e}")
+    
+    # ------------------------------------------------------------------
+    # Single-key operations
+    # ------------------------------------------------------------------
+    
     def get(self, key: str) -> Optional[Any]:
         """Get from Redis or fallback"""
+        return self.get_many([key]).get(key)
+    
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> bool:
+        """Set in Redis or fallback; False if not stored"""
+        return self.set_many({key: value}, ttl) > 0
+    
+    def delete(self, key: str) -> bool:
+        """Delete from Redis or fallback"""
+        return self.delete_many([key]) > 0
+    
+    # ------------------------------------------------------------------
+    # Batch operations
+    # ------------------------------------------------------------------
+    
+    def get_many(self, keys: List[str]) -> Dict[str, Any]:
+        """Fetch several keys in one MGET; missing keys are left out"""
+        if not keys:
+            return {}
+        
         if self.redis_client:
             try:
-                value = self.redis_client.get(key)
-                if value:
-                    return json.loads(value)
-                return None
+                values = self.redis_client.mget([self._key(k) for k in keys])
+                self.io_stats['round_trips'] += 1
+                found = {}
+                for key, data in zip(keys, values):
+                    if data is not None:
+                        found[key] = self._loads(data)
+                self.io_stats['keys_read'] += len(found)
+                # values JSON cannot hold live in the local fallback
+                for key in keys:
+                    if key not in found:
+                        value = self.fallback_cache.get(key)
+                        if value is not None:
+                            found[key] = value
+                return found
             except Exception as e:
-                logger.error(f"Redis get error: {e}")
+                self._error('get', e)
         
-        return self.fallback_cache.get(key)
+        found = {}
+        for key in keys:
+            value = self.fallback_cache.get(key)
+            if value is not None:
+                found[key] = value
+        return found
     
-    def set(self, key: str, value: Any, ttl: Optional[int] = None):
-        """Set in Redis or fallback"""
+    def set_many(self, items: Dict[str, Any], ttl: Optional[float] = None) -> int:
+        """Store several keys with the same TTL in one pipeline; returns how many were stored"""
+        if not items:
+            return 0
         ttl_seconds = ttl if ttl is not None else self.default_ttl
         
         if self.redis_client:
             try:
-                serialized = json.dumps(value)
-                self.redis_client.setex(key, ttl_seconds, serialized)
-                return
+                pipe = self.redis_client.pipeline(transaction=False)
+                written, local = 0, 0
+                for key, value in items.items():
+                    try:
+                        data = self._dumps(value)
+                    except (TypeError, ValueError) as e:
+                        # keep it locally; drop any older Redis copy so it can't win on reads
+                        self.io_stats['unserializable'] += 1
+                        logger.debug(f"Cached locally (not JSON-serializable): {key}: {e}")
+                        pipe.delete(self._key(key))
+                        local += self.fallback_cache.set(key, value, ttl_seconds)
+                        continue
+                    self.io_stats['bytes_written'] += len(data)
+                    pipe.set(self._key(key), data, px=self._ttl_ms(ttl_seconds))
+                    self.fallback_cache.delete(key)
+                    written += 1
+                pipe.execute()
+                self.io_stats['round_trips'] += 1
+                self.io_stats['keys_written'] += written
+                return written + local
             except Exception as e:
-                logger.error(f"Redis set error: {e}")
+                self._error('set', e)
         
-        self.fallback_cache.set(key, value, ttl_seconds)
+        return sum(1 for key, value in items.items()
+                   if self.fallback_cache.set(key, value, ttl_seconds))
     
-    def delete(self, key: str) -> bool:
-        """Delete from Redis or fallback"""
+    def delete_many(self, keys: List[str]) -> int:
+        """Delete several keys in one round trip; returns how many existed"""
+        if not keys:
+            return 0
+        
         if self.redis_client:
             try:
-                return bool(self.redis_client.delete(key))
+                removed = self.redis_client.delete(*[self._key(k) for k in keys])
+                self.io_stats['round_trips'] += 1
+                local = sum(1 for key in keys if self.fallback_cache.delete(key))
+                return int(removed) + local
             except Exception as e:
-                logger.error(f"Redis delete error: {e}")
+                self._error('delete', e)
         
-        return self.fallback_cache.delete(key)
+        return sum(1 for key in keys if self.fallback_cache.delete(key))
     
     def clear(self):
-        """Clear cache"""
+        """Delete every key under this adapter's prefix"""
         if self.redis_client:
             try:
-                self.redis_client.flushdb()
+                batch = []
+                for key in self.redis_client.scan_iter(match=f"{self.prefix}*",
+                                                       count=self.CLEAR_BATCH_SIZE):
+                    batch.append(key)
+                    if len(batch) >= self.CLEAR_BATCH_SIZE:
+                        self.redis_client.delete(*batch)
+                        self.io_stats['round_trips'] += 1
+                        batch = []
+                if batch:
+                    self.redis_client.delete(*batch)
+                    self.io_stats['round_trips'] += 1
+                self.fallback_cache.clear()
                 return
             except Exception as e:
-                logger.error(f"Redis clear error: {e}")
+                self._error('clear', e)
         
         self.fallback_cache.clear()
     
@@ -250,9 +1415,11 @@ class RedisCacheAdapter:
                 info = self.redis_client.info('stats')
                 return {
                     'backend': 'redis',
+                    'prefix': self.prefix,
                     'hits': info.get('keyspace_hits', 0),
                     'misses': info.get('keyspace_misses', 0),
-                    'memory_used': info.get('used_memory_human', 'N/A')
+                    'memory_used': info.get('used_memory_human', 'N/A'),
+                    **self.io_stats
                 }
             except:
                 pass
@@ -271,13 +1438,45 @@ class SearchCacheManager:
     High-level cache manager for search operations
     """
     
-    def __init__(self, use_redis: bool = False, **redis_config):
+    PRUNE_BATCH_SIZE = 256  # expiry records dropped per _inflight_lock acquisition
+    
+    def __init__(self, use_redis: bool = False, max_size: int = 1000,
+                 shards: int = 1, max_bytes: Optional[int] = None,
+                 byte_quotas: Optional[Dict[str, int]] = None,
+                 l2_path: Optional[str] = None, admission: bool = False,
+                 negative_ttl: float = 60, **redis_config):
+        """
+        Args:
+            use_redis: Use RedisCacheAdapter instead of the in-memory LRU
+            max_size: Maximum number of in-memory entries
+            shards: Lock-striped segments for the in-memory LRU (1 = single lock)
+            max_bytes: Memory budget for the in-memory LRU (estimated bytes)
+            byte_quotas: Per-method memory budgets, e.g. {'flexible_dates': 8_000_000}
+            l2_path: SQLite file for a persistent L2 tier behind the in-memory LRU
+            admission: TinyLFU admission filter on the in-memory LRU
+            negative_ttl: TTL for empty ("no flights found") results
+            **redis_config: Passed to RedisCacheAdapter
+        """
         if use_redis:
             self.cache = RedisCacheAdapter(**redis_config)
         else:
-            self.cache = LRUCacheWithTTL(max_size=1000, default_ttl=300)
+            if shards > 1:
+                l1_factory = partial(ShardedLRUCache, max_size=max_size, default_ttl=300,
+                                     shards=shards, max_bytes=max_bytes,
+                                     byte_quotas=byte_quotas, admission=admission)
+            else:
+                l1_factory = partial(LRUCacheWithTTL, max_size=max_size, default_ttl=300,
+                                     max_bytes=max_bytes, byte_quotas=byte_quotas,
+                                     admission=admission)
+            
+            if l2_path:
+                self.cache = TieredCache(l1_factory, SQLiteL2Cache(l2_path),
+                                         on_promote=self._on_promote,
+                                         meta_for=self._index_meta)
+            else:
+                self.cache = l1_factory(on_evict=self._on_evict)
         
-        # TTL configurations by search type
+        # Soft TTL by search type: results are fresh for this long
         self.ttl_config = {
             'flexible_dates': 1800,  # 30 min
             'multi_city': 900,       # 15 min
@@ -288,26 +1487,89 @@ class SearchCacheManager:
             'nearby_airports': 3600, # 1 hour (rarely changes)
             'lastminute': 300,       # 5 min (frequently updated)
             'seasonal_trends': 86400,# 24 hours
-            'group_booking': 600     # 10 min
+            'group_booking': 600,    # 10 min
+            'cheapest_month': 21600, # 6 hours
+            'fare_set': 600,         # 10 min
+            'roundtrip': 1800        # 30 min
+        }
+        
+        # Hard TTL by search type: between soft and hard TTL a stale result
+        # is served while one background refresh runs. Methods not listed
+        # expire at their soft TTL.
+        self.hard_ttl_config = {
+            'flexible_dates': 3600,  # 1 hour
+            'multi_city': 1800,      # 30 min
+            'budget': 3600,          # 1 hour
+            'airline_specific': 1200,# 20 min
+            'nonstop_only': 1800,    # 30 min
+            'redeye': 3600,          # 1 hour
+            'nearby_airports': 7200, # 2 hours
+            'lastminute': 900,       # 15 min
+            'seasonal_trends': 172800,# 48 hours
+            'group_booking': 1200,   # 20 min
+            'cheapest_month': 43200, # 12 hours
+            'fare_set': 1200,        # 20 min
+            'roundtrip': 3600        # 1 hour
         }
         
+        # Empty results are cached too, but only briefly
+        self.negative_ttl = negative_ttl
+        self._negative: set = set()
+        
+        # key -> (soft expiry, hard expiry); the heap of (hard expiry, key)
+        # is lazy like LRUCacheWithTTL.expiry_heap
+        self._expiry: Dict[str, Tuple[float, float]] = {}
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._refresh_tasks: set = set()  # keeps async refresh tasks alive
+        self.swr_stats = {'stale_hits': 0, 'refreshes': 0, 'refresh_failures': 0}
+        
+        # Lookup accounting; warm_hits are hits on entries written by a warmer
+        self._warmed: set = set()
+        self.lookup_stats = {'hits': 0, 'misses': 0, 'warm_hits': 0, 'derived_hits': 0,
+                             'negative_hits': 0}
+        
+        # Subsumption: method -> rules; range-rule families keep
+        # sorted (bound, key) lists of cached broader queries
+        self.subsumption_rules: Dict[str, List[SubsumptionRule]] = {}
+        self._bound_params: Dict[str, str] = {}
+        self._bounds: Dict[str, List[Tuple[float, str]]] = {}
+        self._key_bound: Dict[str, Tuple[str, float]] = {}
+        for rule in DEFAULT_SUBSUMPTION_RULES:
+            self.add_subsumption_rule(rule)
+        
+        # Tag index: tag -> keys and key -> tags (see cache_tags)
+        self._tag_index: Dict[str, set] = {}
+        self._key_tags: Dict[str, frozenset] = {}
+        self.tag_stats = {'invalidations': 0, 'keys_invalidated': 0}
+        
+        # Single-flight: cache key -> Future shared by concurrent callers
+        self._inflight: Dict[str, Future] = {}
+        self._inflight_lock = threading.Lock()
+        self.flight_stats = {'computations': 0, 'coalesced': 0, 'failures': 0}
+        
         # Start cleanup thread
         self._start_cleanup_thread()
     
     def _make_cache_key(self, method: str, **params) -> str:
-        """Generate cache key from method and parameters"""
+        """Generate cache key from method and canonical parameters"""
         # Sort parameters for consistent key
-        sorted_params = sorted(params.items())
+        sorted_params = sorted(canonical_params(params).items())
         key_string = f"{method}:" + ":".join(f"{k}={v}" for k, v in sorted_params)
         
         # Hash for shorter keys
         key_hash = hashlib.md5(key_string.encode()).hexdigest()
         return f"search:{method}:{key_hash}"
     
-    def get_cached_result(self, method: str, **params) -> Optional[Any]:
-        """Get cached search result"""
+    def get_cached_result(self, method: str, allow_stale: bool = False,
+                          **params) -> Optional[Any]:
+        """
+        Get cached search result.
+        
+        Results past their soft TTL are a miss unless allow_stale is set
+        (only get_or_compute() can refresh them in the background).
+        """
         key = self._make_cache_key(method, **params)
-        result = self.cache.get(key)
+        result = self._lookup(key, allow_stale, method, params)
         
         if result:
             logger.debug(f"Cache HIT: {method}")
@@ -319,61 +1581,651 @@ class SearchCacheManager:
     def cache_result(self, method: str, result: Any, **params):
         """Cache search result with appropriate TTL"""
         key = self._make_cache_key(method, **params)
+        self._store(key, method, result, params)
+    
+    def _lookup(self, key: str, allow_stale: bool = True, method: Optional[str] = None,
+                params: Optional[Dict[str, Any]] = None) -> Optional[Any]:
+        """
+        Read key from the backend and count the hit or miss.
+        
+        With method and params, a miss falls back to deriving the result
+        from a broader fresh cached query (counted as a derived hit).
+        """
+        result = self.cache.get(key)
+        if result is not None and not allow_stale and self._is_stale(key):
+            result = None
+        
+        derived = None
+        if result is None and method in self.subsumption_rules and params is not None:
+            derived = self._derive(method, params)
+        
+        with self._inflight_lock:
+            if result is not None:
+                self.lookup_stats['hits'] += 1
+                if key in self._warmed:
+                    self.lookup_stats['warm_hits'] += 1
+                if key in self._negative:
+                    self.lookup_stats['negative_hits'] += 1
+            elif derived is not None:
+                self.lookup_stats['derived_hits'] += 1
+            else:
+                self.lookup_stats['misses'] += 1
+        return result if result is not None else derived
+    
+    def _store(self, key: str, method: str, result: Any, params: Dict[str, Any],
+               warmed: bool = False):
+        """
+        Write result under key with the method soft/hard TTL and index it.
+        
+        Empty results expire after negative_ttl (soft and hard) instead.
+        """
         ttl = self.ttl_config.get(method, 300)
+        hard_ttl = max(ttl, self.hard_ttl_config.get(method, ttl))
+        negative = is_empty_result(result)
+        if negative:
+            ttl = hard_ttl = min(ttl, self.negative_ttl)
         
-        self.cache.set(key, result, ttl)
-        logger.debug(f"Cached: {method} (TTL: {ttl}s)")
+        now = time.time()
+        if not self.cache.set(key, result, hard_ttl):
+            # Rejected (byte budget or admission); an overwritten key is gone
+            with self._inflight_lock:
+                self._forget(key)
+            logger.debug(f"Not cached: {method}")
+            return
+        with self._inflight_lock:
+            self._set_expiry(key, now + ttl, now + hard_ttl)
+            if negative:
+                self._negative.add(key)
+            else:
+                self._negative.discard(key)
+            self._index_tags(key, cache_tags(params))
+            self._index_bound(key, method, params)
+            if warmed:
+                self._warmed.add(key)
+            else:
+                self._warmed.discard(key)
+        logger.debug(f"Cached: {method} (TTL: {ttl}s, hard: {hard_ttl}s)")
+    
+    def time_to_stale(self, method: str, **params) -> Optional[float]:
+        """Seconds until the cached result passes its soft TTL (None if not cached)"""
+        key = self._make_cache_key(method, **params)
+        expiry = self._expiry.get(key)
+        if expiry is None or time.time() > expiry[1]:
+            return None
+        return expiry[0] - time.time()
+    
+    def _on_promote(self, key: str, expires_at: float, meta: Optional[Dict[str, Any]] = None):
+        """Restore soft expiry, negative flag, tags and bound of an entry loaded from the L2 tier"""
+        meta = meta or {}
+        soft = meta.get('soft')
+        if soft is None:  # rows written without it: derive from the method TTLs
+            method = method_from_key(key)
+            ttl = self.ttl_config.get(method, 300)
+            hard_ttl = max(ttl, self.hard_ttl_config.get(method, ttl))
+            soft = expires_at - (hard_ttl - ttl)
+        with self._inflight_lock:
+            self._set_expiry(key, min(soft, expires_at), expires_at)
+            if meta.get('negative'):
+                self._negative.add(key)
+            else:
+                self._negative.discard(key)
+            self._index_tags(key, frozenset(meta.get('tags', ())))
+            bound = meta.get('bound')
+            if bound and key not in self._key_bound:
+                family, value = bound
+                bisect.insort(self._bounds.setdefault(family, []), (value, key))
+                self._key_bound[key] = (family, value)
+    
+    def _index_meta(self, key: str) -> Optional[Dict[str, Any]]:
+        """Soft expiry, negative flag, tags and bound of key, persisted with its L2 row"""
+        with self._inflight_lock:
+            expiry = self._expiry.get(key)
+            tags = self._key_tags.get(key)
+            bound = self._key_bound.get(key)
+            negative = key in self._negative
+        if expiry is None and not tags and bound is None:
+            return None
+        return {
+            'soft': expiry[0] if expiry else None,
+            'negative': negative,
+            'tags': sorted(tags or ()),
+            'bound': list(bound) if bound else None
+        }
+    
+    def _set_expiry(self, key: str, soft: float, hard: float):
+        """Record soft/hard expiry and index it by hard expiry (caller holds _inflight_lock)"""
+        self._expiry[key] = (soft, hard)
+        heapq.heappush(self._expiry_heap, (hard, key))
+        if len(self._expiry_heap) > 2 * len(self._expiry) + 64:
+            self._expiry_heap = [(h, k) for k, (_, h) in self._expiry.items()]
+            heapq.heapify(self._expiry_heap)
+    
+    def _is_stale(self, key: str) -> bool:
+        """Check if key is past its soft TTL"""
+        expiry = self._expiry.get(key)
+        return expiry is not None and time.time() > expiry[0]
+    
+    # ========================================================================
+    # SUBSUMPTION
+    # ========================================================================
+    
+    def add_subsumption_rule(self, rule: SubsumptionRule):
+        """Let rule.method queries be answered from cached rule.source results"""
+        self.subsumption_rules.setdefault(rule.method, []).append(rule)
+        if rule.bound_param:
+            self._bound_params[rule.source] = rule.bound_param
+    
+    def _family_key(self, method: str, params: Dict[str, Any], bound_param: str) -> str:
+        rest = {k: v for k, v in params.items() if k != bound_param}
+        return self._make_cache_key(method, **rest)
+    
+    def _index_bound(self, key: str, method: str, params: Dict[str, Any]):
+        """Record key in its range family (caller holds _inflight_lock)"""
+        bound_param = self._bound_params.get(method)
+        if bound_param is None or key in self._key_bound:
+            return
+        try:
+            bound = float(params[bound_param])
+        except (KeyError, TypeError, ValueError):
+            return
+        family = self._family_key(method, params, bound_param)
+        bisect.insort(self._bounds.setdefault(family, []), (bound, key))
+        self._key_bound[key] = (family, bound)
+    
+    def _unbound(self, key: str):
+        """Remove key from its range family (caller holds _inflight_lock)"""
+        entry = self._key_bound.pop(key, None)
+        if entry is None:
+            return
+        family, bound = entry
+        members = self._bounds.get(family)
+        if members is not None:
+            members.remove((bound, key))
+            if not members:
+                del self._bounds[family]
+    
+    def _derive(self, method: str, params: Dict[str, Any]) -> Optional[Any]:
+        """Answer a query from a broader fresh cached query, if any"""
+        params = canonical_params(params)
+        for rule in self.subsumption_rules.get(method, ()):
+            if rule.bound_param:
+                try:
+                    bound = float(params[rule.bound_param])
+                except (KeyError, TypeError, ValueError):
+                    continue
+                family = self._family_key(rule.source, params, rule.bound_param)
+                with self._inflight_lock:
+                    members = self._bounds.get(family, [])
+                    start = bisect.bisect_left(members, (bound, ''))
+                    candidates = [key for _, key in members[start:]]
+            else:
+                source_params = rule.source_params(params) if rule.source_params else params
+                candidates = [self._make_cache_key(rule.source, **source_params)]
+            
+            for key in candidates:
+                source = self.cache.get(key)
+                if source is None or self._is_stale(key):
+                    continue
+                try:
+                    return rule.derive(source, params)
+                except (KeyError, TypeError, ValueError, ZeroDivisionError) as e:
+                    logger.debug(f"Could not derive {method} from {key}: {e}")
+        return None
+    
+    # ========================================================================
+    # SINGLE-FLIGHT
+    # ========================================================================
+    
+    def get_or_compute(self, method: str, compute: Callable[[], Any], **params) -> Any:
+        """
+        Get cached result or compute it once for all concurrent callers.
+        
+        Callers asking for the same key while a computation is in flight
+        wait for it instead of recomputing; only that computation writes
+        to the cache. Errors are propagated to every waiter and not cached.
+        """
+        key = self._make_cache_key(method, **params)
+        result = self._lookup(key, True, method, params)
+        if result is not None:
+            if self._is_stale(key):
+                self._revalidate(key, method, compute, params)
+            return result
+        
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return flight.result()
+        
+        try:
+            result = compute()
+        except BaseException as e:
+            self._finish_flight(key, flight, error=e)
+            raise
+        
+        self._store(key, method, result, params)
+        self._finish_flight(key, flight, result=result)
+        return result
+    
+    async def aget_or_compute(self, method: str,
+                              compute: Callable[[], Awaitable[Any]], **params) -> Any:
+        """
+        Async version of get_or_compute().
+        
+        compute is a zero-argument callable returning an awaitable. Waiters
+        share the same in-flight table as sync callers.
+        """
+        key = self._make_cache_key(method, **params)
+        result = self._lookup(key, True, method, params)
+        if result is not None:
+            if self._is_stale(key):
+                self._arevalidate(key, method, compute, params)
+            return result
+        
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return await asyncio.wrap_future(flight)
+        
+        try:
+            result = await compute()
+        except BaseException as e:
+            self._finish_flight(key, flight, error=e)
+            raise
+        
+        self._store(key, method, result, params)
+        self._finish_flight(key, flight, result=result)
+        return result
+    
+    async def arefresh(self, method: str, compute: Callable[[], Awaitable[Any]],
+                       warmed: bool = False, **params) -> Any:
+        """
+        Recompute and store a result even if it is cached.
+        
+        Joins a computation already in flight for the key instead of
+        starting another. warmed marks the entry as written by a cache
+        warmer for hit accounting.
+        """
+        key = self._make_cache_key(method, **params)
+        flight, leader = self._join_flight(key)
+        if not leader:
+            return await asyncio.wrap_future(flight)
+        
+        try:
+            result = await compute()
+        except BaseException as e:
+            self._finish_flight(key, flight, error=e)
+            raise
+        
+        self._store(key, method, result, params, warmed=warmed)
+        self._finish_flight(key, flight, result=result)
+        return result
+    
+    # ========================================================================
+    # STALE-WHILE-REVALIDATE
+    # ========================================================================
+    
+    def _start_refresh(self, key: str) -> Optional[Future]:
+        """Count a stale hit; return a flight if this caller should refresh"""
+        with self._inflight_lock:
+            self.swr_stats['stale_hits'] += 1
+            if key in self._inflight:
+                return None  # refresh (or recompute) already running
+            
+            flight = Future()
+            self._inflight[key] = flight
+            self.swr_stats['refreshes'] += 1
+            return flight
+    
+    def _revalidate(self, key: str, method: str, compute: Callable[[], Any],
+                    params: Dict[str, Any]):
+        """Refresh a stale entry on a background thread"""
+        flight = self._start_refresh(key)
+        if flight is None:
+            return
+        
+        def refresh():
+            result, error = None, None
+            try:
+                result = compute()
+                self._store(key, method, result, params)
+            except Exception as e:
+                error = e
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self._end_refresh(key, flight, method, result, error)
+        
+        threading.Thread(target=refresh, daemon=True).start()
+    
+    def _arevalidate(self, key: str, method: str, compute: Callable[[], Awaitable[Any]],
+                     params: Dict[str, Any]):
+        """Refresh a stale entry as a task on the running loop"""
+        flight = self._start_refresh(key)
+        if flight is None:
+            return
+        
+        async def refresh():
+            result, error = None, None
+            try:
+                result = await compute()
+                self._store(key, method, result, params)
+            except Exception as e:
+                error = e
+            except BaseException as e:  # e.g. CancelledError
+                error = e
+                raise
+            finally:
+                self._end_refresh(key, flight, method, result, error)
+        
+        task = asyncio.get_running_loop().create_task(refresh())
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+        # A task cancelled before its first step never enters refresh()
+        task.add_done_callback(lambda _: flight.done() or self._end_refresh(
+            key, flight, method, None, asyncio.CancelledError()))
+    
+    def _end_refresh(self, key: str, flight: Future, method: str, result: Any,
+                     error: Optional[BaseException]):
+        """
+        Resolve and release a refresh flight, however the refresh ended.
+        
+        On failure the stale entry stays until its hard TTL.
+        """
+        if error is not None:
+            logger.warning(f"Cache refresh failed for {method}: {error!r}")
+            with self._inflight_lock:
+                self.swr_stats['refresh_failures'] += 1
+        self._finish_flight(key, flight, result=result, error=error)
+    
+    def _join_flight(self, key: str) -> Tuple[Future, bool]:
+        """Return (future, is_leader) for key"""
+        with self._inflight_lock:
+            flight = self._inflight.get(key)
+            if flight is not None:
+                self.flight_stats['coalesced'] += 1
+                logger.debug(f"Coalesced: {key}")
+                return flight, False
+            
+            flight = Future()
+            self._inflight[key] = flight
+            self.flight_stats['computations'] += 1
+            return flight, True
+    
+    def _finish_flight(self, key: str, flight: Future, result: Any = None,
+                       error: Optional[BaseException] = None):
+        """Publish the leader outcome and release the key"""
+        with self._inflight_lock:
+            self._inflight.pop(key, None)
+            if error is not None:
+                self.flight_stats['failures'] += 1
+        
+        if error is not None:
+            flight.set_exception(error)
+        else:
+            flight.set_result(result)
     
     def invalidate(self, method: Optional[str] = None, **params):
         """Invalidate cache for specific search or all"""
         if method:
             key = self._make_cache_key(method, **params)
             self.cache.delete(key)
+            with self._inflight_lock:
+                self._forget(key)
             logger.info(f"Invalidated cache: {method}")
         else:
             self.cache.clear()
+            with self._inflight_lock:
+                self._expiry.clear()
+                self._expiry_heap.clear()
+                self._warmed.clear()
+                self._negative.clear()
+                self._tag_index.clear()
+                self._key_tags.clear()
+                self._bounds.clear()
+                self._key_bound.clear()
             logger.info("Invalidated all cache")
     
+    def invalidate_tag(self, tag: str) -> int:
+        """
+        Invalidate every cached search carrying tag, across all methods.
+        
+        tag is a route ('MAD-BCN'), an origin ('MAD') or a month
+        ('2026-03'). A route also clears origin-only searches from its
+        origin, whose results may contain that route. Cost is proportional
+        to the number of affected entries, including entries only held in
+        an L2 tier. Returns how many were removed.
+        """
+        tags = expand_tag(tag)
+        keys_with_tags = getattr(self.cache, 'keys_with_tags', None)
+        persisted = keys_with_tags(tags) if keys_with_tags is not None else []
+        with self._inflight_lock:
+            keys = set(persisted)
+            for t in tags:
+                keys.update(self._tag_index.get(t, ()))
+            for key in keys:
+                self._forget(key)
+            self.tag_stats['invalidations'] += 1
+            self.tag_stats['keys_invalidated'] += len(keys)
+        
+        if keys:
+            delete_many = getattr(self.cache, 'delete_many', None)
+            if delete_many is not None:
+                delete_many(list(keys))
+            else:
+                for key in keys:
+                    self.cache.delete(key)
+        
+        logger.info(f"Invalidated tag {tag}: {len(keys)} entries")
+        return len(keys)
+    
+    def _index_tags(self, key: str, tags: frozenset):
+        """Point tags at key (caller holds _inflight_lock)"""
+        old = self._key_tags.get(key)
+        if old == tags:
+            return
+        if old:
+            self._untag(key)
+        if tags:
+            self._key_tags[key] = tags
+            for tag in tags:
+                self._tag_index.setdefault(tag, set()).add(key)
+    
+    def _untag(self, key: str):
+        """Remove key from the tag index (caller holds _inflight_lock)"""
+        for tag in self._key_tags.pop(key, ()):
+            keys = self._tag_index.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tag_index[tag]
+    
+    def _forget(self, key: str):
+        """Drop expiry, warm and tag records for key (caller holds _inflight_lock)"""
+        self._expiry.pop(key, None)
+        self._warmed.discard(key)
+        self._negative.discard(key)
+        self._untag(key)
+        self._unbound(key)
+    
+    def _on_evict(self, key: str, value: Any, expires_at: float):
+        """Capacity eviction in the in-memory backend"""
+        with self._inflight_lock:
+            self._forget(key)
+    
+    def _prune_expiry(self, batch_size: Optional[int] = None) -> int:
+        """
+        Drop soft/hard expiry, warm and tag records past their hard TTL.
+        
+        Pops the expiry heap in batches of batch_size, releasing
+        _inflight_lock between batches so lookups and single-flight
+        callers are never paused for a full pass.
+        """
+        batch_size = batch_size or self.PRUNE_BATCH_SIZE
+        now = time.time()
+        pruned = 0
+        while True:
+            with self._inflight_lock:
+                heap = self._expiry_heap
+                for _ in range(batch_size):
+                    if not heap or heap[0][0] >= now:
+                        break
+                    hard, key = heapq.heappop(heap)
+                    expiry = self._expiry.get(key)
+                    if expiry is not None and expiry[1] == hard:  # skip superseded entries
+                        self._forget(key)
+                        pruned += 1
+                pending = bool(heap) and heap[0][0] < now
+            if not pending:
+                return pruned
+    
     def _start_cleanup_thread(self):
         """Start background cleanup thread"""
         def cleanup_loop():
             while True:
                 time.sleep(300)  # Every 5 minutes
-                if isinstance(self.cache, LRUCacheWithTTL):
+                if isinstance(self.cache, (LRUCacheWithTTL, ShardedLRUCache, TieredCache)):
                     self.cache.cleanup_expired()
+                if isinstance(self.cache, TieredCache):
+                    self.cache.flush()  # checkpoint for warm restarts
+                self._prune_expiry()
         
         import threading
         cleanup_thread = threading.Thread(target=cleanup_loop, daemon=True)
         cleanup_thread.start()
         logger.info("Cache cleanup thread started")
     
+    def close(self):
+        """Persist the L2 tier (if any); call on shutdown"""
+        if isinstance(self.cache, TieredCache):
+            self.cache.close()
+    
     def get_stats(self) -> Dict[str, Any]:
         """Get comprehensive cache statistics"""
-        return self.cache.get_stats()
+        stats = self.cache.get_stats()
+        with self._inflight_lock:
+            stats['single_flight'] = dict(self.flight_stats, in_flight=len(self._inflight))
+            stats['stale_while_revalidate'] = dict(self.swr_stats)
+            lookups = self.lookup_stats
+            total = lookups['hits'] + lookups['derived_hits'] + lookups['misses']
+            stats['lookups'] = dict(
+                lookups,
+                warmed_entries=len(self._warmed),
+                negative_entries=len(self._negative),
+                exact_hit_rate=f"{lookups['hits'] / total * 100:.1f}%" if total else "0.0%",
+                derived_hit_rate=f"{lookups['derived_hits'] / total * 100:.1f}%" if total else "0.0%"
+            )
+            stats['tags'] = dict(self.tag_stats, tags=len(self._tag_index),
+                                 tagged_entries=len(self._key_tags))
+        return stats
 
 
 # ============================================================================
 # CACHE DECORATOR
 # ============================================================================
 
-def cached_search(cache_manager: SearchCacheManager):
-    """Decorator to automatically cache search method results"""
+def _bound_params(signature: inspect.Signature, args: tuple,
+                  kwargs: Dict[str, Any]) -> Dict[str, Any]:
+    """Every argument by name, defaults applied and self/cls left out"""
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    params = {}
+    for name, value in bound.arguments.items():
+        kind = signature.parameters[name].kind
+        if name in ('self', 'cls'):
+            continue
+        if kind is inspect.Parameter.VAR_KEYWORD:
+            params.update(value)
+        elif kind is inspect.Parameter.VAR_POSITIONAL:
+            params[name] = list(value)
+        else:
+            params[name] = value
+    return params
+
+
+def _result_count(result: Any) -> int:
+    rows = getattr(result, 'results', result)
+    try:
+        return len(rows)
+    except TypeError:
+        return 0 if result is None else 1
+
+
+def cached_search(cache_manager: SearchCacheManager, method: Optional[str] = None,
+                  analytics: Optional[Any] = None):
+    """
+    Decorator to automatically cache search method results.
+    
+    Works on sync and coroutine functions or methods. The cache key is
+    built from the full bound signature (positional and keyword
+    arguments, defaults applied), and lookups go through
+    get_or_compute()/aget_or_compute(), so concurrent calls share one
+    computation and stale entries are revalidated in the background.
+    Empty results are cached for the manager's negative_ttl.
+    
+    Args:
+        cache_manager: SearchCacheManager to use
+        method: Cache method type (defaults to self.name, then the function name)
+        analytics: SearchAnalyticsTracker receiving one track_search() per
+            call with its latency and whether it was served from cache
+    """
     def decorator(func: Callable) -> Callable:
-        @wraps(func)
-        def wrapper(self, **kwargs):
-            method_name = self.name if hasattr(self, 'name') else func.__name__
-            
-            # Try to get from cache
-            cached_result = cache_manager.get_cached_result(method_name, **kwargs)
-            if cached_result:
-                return cached_result
+        signature = inspect.signature(func)
+        
+        def resolve(args: tuple, kwargs: Dict[str, Any]) -> Tuple[str, Dict[str, Any]]:
+            params = _bound_params(signature, args, kwargs)
+            if method:
+                return method, params
+            owner = args[0] if args and next(iter(signature.parameters), None) in ('self', 'cls') else None
+            return getattr(owner, 'name', None) or func.__name__, params
+        
+        def record(method_name: str, params: Dict[str, Any], started: float,
+                   result: Any, cached: bool):
+            if analytics is None:
+                return
+            analytics.track_search(
+                user_id=params.get('user_id', 0),
+                method=method_name,
+                params=params,
+                duration_ms=(time.perf_counter() - started) * 1000,
+                result_count=_result_count(result),
+                cached=cached
+            )
+        
+        if inspect.iscoroutinefunction(func):
+            @wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                method_name, params = resolve(args, kwargs)
+                started = time.perf_counter()
+                caller = asyncio.current_task()
+                computed = []
+                
+                def compute():
+                    # Background revalidation runs in another task; only
+                    # a computation for this call makes it a miss
+                    if asyncio.current_task() is caller:
+                        computed.append(True)
+                    return func(*args, **kwargs)
+                
+                result = await cache_manager.aget_or_compute(method_name, compute, **params)
+                record(method_name, params, started, result, cached=not computed)
+                return result
             
-            # Execute search
-            result = func(self, **kwargs)
+            return async_wrapper
+        
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            method_name, params = resolve(args, kwargs)
+            started = time.perf_counter()
+            caller = threading.get_ident()
+            computed = []
             
-            # Cache result
-            cache_manager.cache_result(method_name, result, **kwargs)
+            def compute():
+                # Background revalidation runs on another thread
+                if threading.get_ident() == caller:
+                    computed.append(True)
+                return func(*args, **kwargs)
             
+            result = cache_manager.get_or_compute(method_name, compute, **params)
+            record(method_name, params, started, result, cached=not computed)
             return result
         
         return wrapper
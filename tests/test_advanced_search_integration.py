@@ -12,13 +12,17 @@ Date: 2026-01-17
 """
 
 import unittest
+import asyncio
 import sys
 import os
+import time
 from datetime import datetime
 from unittest.mock import Mock, AsyncMock, patch
 
-# Add parent directory to path
-sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add parent directory and feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
 
 try:
     from advanced_search_methods import (
@@ -27,8 +31,13 @@ try:
         MultiCitySearch,
         BudgetSearch,
         FlightResult,
-        SearchResult
+        SearchResult,
+        AdvancedSearchMethod,
+        SearchTimeoutError,
+        get_search_executor,
+        plan_batch
     )
+    from search_cache import SearchCacheManager
     from advanced_search_commands import (
         AdvancedSearchCommandHandler,
         get_advanced_search_menu
@@ -190,6 +199,16 @@ class TestCommandHandler(unittest.TestCase):
             self.assertFalse(self.handler._validate_month(month))
         
         print("✅ Month validation test passed")
+    
+    def test_stay_parsing(self):
+        """Test round-trip stay range parsing"""
+        self.assertEqual(self.handler._parse_stay('5-9'), (5, 9))
+        self.assertEqual(self.handler._parse_stay('7'), (7, 7))
+        
+        for stay in ['9-5', '0-3', '5-45', 'cinco', '5-']:
+            self.assertIsNone(self.handler._parse_stay(stay))
+        
+        print("✅ Stay parsing test passed")
 
 
 class TestMenuGeneration(unittest.TestCase):
@@ -211,6 +230,117 @@ class TestMenuGeneration(unittest.TestCase):
         print("✅ Menu generation test passed")
 
 
+class TestBatchSearch(unittest.TestCase):
+    """Test SearchMethodFactory batch execution"""
+    
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.calls = []
+        
+        calls = self.calls
+        
+        class DelaySearch(AdvancedSearchMethod):
+            max_concurrency = 16
+            active = 0
+            peak = 0
+            
+            def __init__(self):
+                super().__init__("DelaySearch")
+            
+            def search(self, origin, destination, date, delay=0.0):
+                cls = type(self)
+                cls.active += 1
+                cls.peak = max(cls.peak, cls.active)
+                calls.append((origin, destination, date))
+                time.sleep(delay)
+                cls.active -= 1
+                if origin == 'ERR':
+                    raise RuntimeError("provider down")
+                return SearchResult('delay', {'origin': origin}, [delay], {}, '')
+        
+        self.method = DelaySearch
+        patcher = patch.dict(SearchMethodFactory._methods, {'delay': DelaySearch})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+    
+    def request(self, origin, destination='BCN', date='2026-03-01', delay=0.0):
+        return ('delay', {'origin': origin, 'destination': destination, 'date': date, 'delay': delay})
+    
+    def collect(self, requests, **kwargs):
+        async def main():
+            return [item async for item in SearchMethodFactory.asearch_batch(requests, **kwargs)]
+        return asyncio.run(main())
+    
+    def test_plan_dedupes_and_groups(self):
+        """Identical queries merge; route/date groups run together"""
+        groups = plan_batch([
+            self.request('MAD'),
+            self.request('mad'),                                  # same after canonicalization
+            ('nonstop_only', {'origin': 'MAD', 'destination': 'BCN', 'date': '2026-03-01'}),
+            self.request('MAD', date='2026-03-02'),
+            ('budget', {'origin': 'MAD', 'budget': 300, 'month': '2026-03'}),
+        ])
+        
+        self.assertEqual([[item.indexes for item in group] for group in groups],
+                         [[[0, 1], [2]], [[3]], [[4]]])
+    
+    def test_results_stream_in_completion_order(self):
+        """Fast searches are yielded before slow ones"""
+        items = self.collect([self.request('SLOW', delay=0.2), self.request('FAST', delay=0.01)])
+        
+        self.assertEqual([item.params['origin'] for item in items], ['FAST', 'SLOW'])
+        self.assertTrue(all(item.ok for item in items))
+    
+    def test_duplicates_run_once(self):
+        """Each distinct query reaches the provider once"""
+        items = self.collect([self.request('MAD')] * 5 + [self.request('BCN', 'MAD')])
+        
+        self.assertEqual(len(items), 2)
+        self.assertEqual(len(self.calls), 2)
+        self.assertEqual(sorted(i for item in items for i in item.indexes), list(range(6)))
+    
+    def test_bounded_parallelism(self):
+        """At most max_parallel groups run at once"""
+        requests = [self.request(f"A{i:02d}", delay=0.03) for i in range(8)]
+        
+        items = self.collect(requests, max_parallel=3)
+        
+        self.assertEqual(len(items), 8)
+        self.assertEqual(self.method.peak, 3)
+    
+    def test_errors_are_yielded(self):
+        """A failing search does not stop the batch"""
+        items = self.collect([self.request('ERR'), self.request('MAD'), ('unknown', {})])
+        
+        errors = {item.params.get('origin', item.method): type(item.error) for item in items if not item.ok}
+        self.assertEqual(errors, {'ERR': RuntimeError, 'unknown': ValueError})
+    
+    def test_sync_batch_uses_cache(self):
+        """search_batch reads through the cache manager"""
+        mgr = SearchCacheManager()
+        requests = [self.request('MAD'), self.request('LIS')]
+        
+        first = list(SearchMethodFactory.search_batch(requests, cache_manager=mgr))
+        second = list(SearchMethodFactory.search_batch(requests, cache_manager=mgr))
+        
+        self.assertEqual(len(first), 2)
+        self.assertEqual(len(second), 2)
+        self.assertEqual(len(self.calls), 2)
+    
+    def test_sync_batch_applies_search_timeout(self):
+        """A hung search is yielded as a timeout instead of blocking the batch"""
+        self.method.search_timeout = 0.05
+        
+        started = time.perf_counter()
+        items = list(SearchMethodFactory.search_batch([self.request('HUNG', delay=0.5),
+                                                       self.request('MAD')]))
+        
+        self.assertLess(time.perf_counter() - started, 0.4)
+        errors = {item.params['origin']: type(item.error) for item in items}
+        self.assertEqual(errors, {'HUNG': SearchTimeoutError, 'MAD': type(None)})
+
+
 class TestEndToEndScenarios(unittest.TestCase):
     """Test complete user scenarios"""
     
@@ -310,6 +440,125 @@ class TestPerformance(unittest.TestCase):
         print(f"✅ Multi-city completed in {duration:.3f}s")
 
 
+class TestAsyncSearch(unittest.TestCase):
+    """Test non-blocking asearch() execution"""
+    
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+    
+    def _make_slow_method(self, delay, timeout=5.0, concurrency=2):
+        class SlowSearch(AdvancedSearchMethod):
+            search_timeout = timeout
+            max_concurrency = concurrency
+            active = 0
+            peak = 0
+            
+            def __init__(self):
+                super().__init__(f"SlowSearch_{id(self)}")
+            
+            def search(self, origin):
+                cls = type(self)
+                cls.active += 1
+                cls.peak = max(cls.peak, cls.active)
+                time.sleep(delay)
+                cls.active -= 1
+                return SearchResult('slow', {'origin': origin}, [], {}, '')
+        
+        return SlowSearch()
+    
+    def test_asearch_reports_timing(self):
+        """asearch returns the sync result with queue/run timings"""
+        calendar = FlexibleDatesCalendar()
+        result = asyncio.run(calendar.asearch(origin='MAD', destination='MIA', month='2026-03'))
+        
+        self.assertIsInstance(result, SearchResult)
+        self.assertIn('queue_ms', result.timing)
+        self.assertIn('run_ms', result.timing)
+        self.assertIn('FlexibleDatesCalendar', get_search_executor().get_stats())
+    
+    def test_asearch_does_not_block_loop(self):
+        """Other coroutines keep running while a sync search executes"""
+        method = self._make_slow_method(0.3)
+        ticks = []
+        
+        async def ticker():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+        
+        async def main():
+            await asyncio.gather(method.asearch(origin='MAD'), ticker())
+        
+        asyncio.run(main())
+        self.assertEqual(len(ticks), 5)
+        self.assertLess(ticks[-1] - ticks[0], 0.25)
+    
+    def test_asearch_timeout(self):
+        """Slow searches raise SearchTimeoutError"""
+        method = self._make_slow_method(0.5, timeout=0.05)
+        
+        with self.assertRaises(SearchTimeoutError):
+            asyncio.run(method.asearch(origin='MAD'))
+        
+        stats = get_search_executor().get_stats()[method.name]
+        self.assertEqual(stats['timeouts'], 1)
+    
+    def test_failed_searches_release_slot(self):
+        """Searches that raise, even before starting, free their slot and are counted"""
+        class AsyncSearch(AdvancedSearchMethod):
+            max_concurrency = 1
+            
+            def __init__(self):
+                super().__init__(f"AsyncSearch_{id(self)}")
+            
+            def search(self, origin):
+                raise AssertionError("sync path should not be used")
+            
+            async def search_async(self, origin):
+                return SearchResult('async', {'origin': origin}, [], {}, '')
+        
+        for method in (self._make_slow_method(0.01, concurrency=1), AsyncSearch()):
+            async def main():
+                for _ in range(3):
+                    with self.assertRaises(TypeError):
+                        await asyncio.wait_for(method.asearch(destination='BCN'), 1.0)
+                return await asyncio.wait_for(method.asearch(origin='MAD'), 1.0)
+            
+            self.assertEqual(asyncio.run(main()).query, {'origin': 'MAD'})
+            stats = get_search_executor().get_stats()[method.name]
+            self.assertEqual((stats['calls'], stats['failures']), (4, 3))
+    
+    def test_asearch_concurrency_limit(self):
+        """No more than max_concurrency searches run at once"""
+        method = self._make_slow_method(0.05, concurrency=2)
+        
+        async def main():
+            return await asyncio.gather(*(method.asearch(origin='MAD') for _ in range(6)))
+        
+        results = asyncio.run(main())
+        self.assertEqual(len(results), 6)
+        self.assertLessEqual(type(method).peak, 2)
+        self.assertGreater(max(r.timing['queue_ms'] for r in results), 0)
+    
+    def test_native_async_method(self):
+        """Methods with search_async are awaited directly"""
+        class AsyncSearch(AdvancedSearchMethod):
+            def __init__(self):
+                super().__init__("AsyncSearch")
+            
+            def search(self, origin):
+                raise AssertionError("sync path should not be used")
+            
+            async def search_async(self, origin):
+                await asyncio.sleep(0.01)
+                return SearchResult('async', {'origin': origin}, [1], {}, '')
+        
+        result = asyncio.run(AsyncSearch().asearch(origin='MAD'))
+        self.assertEqual(result.results, [1])
+        self.assertGreaterEqual(result.timing['run_ms'], 5)
+
+
 def run_tests():
     """Run all tests"""
     print("\n" + "="*70)
@@ -324,8 +573,10 @@ def run_tests():
     suite.addTests(loader.loadTestsFromTestCase(TestAdvancedSearchMethods))
     suite.addTests(loader.loadTestsFromTestCase(TestCommandHandler))
     suite.addTests(loader.loadTestsFromTestCase(TestMenuGeneration))
+    suite.addTests(loader.loadTestsFromTestCase(TestBatchSearch))
     suite.addTests(loader.loadTestsFromTestCase(TestEndToEndScenarios))
     suite.addTests(loader.loadTestsFromTestCase(TestPerformance))
+    suite.addTests(loader.loadTestsFromTestCase(TestAsyncSearch))
     
     # Run tests
     runner = unittest.TextTestRunner(verbosity=2)
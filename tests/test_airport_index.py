@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Airport Spatial Index
+Cazador Supremo v14.0
+
+Tests the KD-tree against brute force, the bundled table and NearbyAirportsSearch
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import threading
+import time
+import sys
+import os
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    import numpy as np
+    from airport_index import (
+        SphericalKDTree, get_airport_index, haversine_km, km_to_chord, unit_vectors
+    )
+    from advanced_search_methods import NearbyAirportsSearch, FARE_POOL_WORKERS
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+class TestSphericalKDTree(unittest.TestCase):
+    """Test radius and kNN queries against brute-force haversine"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        rng = np.random.default_rng(1)
+        self.lat = np.degrees(np.arcsin(rng.uniform(-1, 1, 2000)))
+        self.lon = rng.uniform(-180, 180, 2000)
+        self.tree = SphericalKDTree(self.lat, self.lon, leaf_size=4)
+        self.queries = [(40.47, -3.56), (-33.9, 151.2), (64.0, -22.6), (0.0, 179.9)]
+
+    def test_radius_matches_brute_force(self):
+        """Ball queries return exactly the points within the radius"""
+        for lat, lon in self.queries:
+            for radius in (150, 900, 4000):
+                idx, _ = self.tree.query_radius(unit_vectors(lat, lon), km_to_chord(radius))
+                expected = np.nonzero(haversine_km(lat, lon, self.lat, self.lon) <= radius)[0]
+                self.assertEqual(sorted(idx.tolist()), expected.tolist())
+
+    def test_knn_matches_brute_force(self):
+        """k nearest come back nearest first"""
+        for lat, lon in self.queries:
+            idx, _ = self.tree.query_knn(unit_vectors(lat, lon), 7)
+            distances = haversine_km(lat, lon, self.lat, self.lon)
+            self.assertEqual(idx.tolist(), np.argsort(distances)[:7].tolist())
+
+    def test_haversine(self):
+        """Vectorized haversine gives known distances"""
+        self.assertAlmostEqual(float(haversine_km(0, 0, 0, 90)), 6371.0 * np.pi / 2, places=6)
+        np.testing.assert_allclose(haversine_km(10, 20, [10, -10], [20, -160]),
+                                   [0.0, 6371.0 * np.pi], atol=1e-6)
+
+
+class TestAirportIndex(unittest.TestCase):
+    """Test the bundled airport table"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.index = get_airport_index()
+
+    def test_city_codes_cover_their_airports(self):
+        """A city code resolves to the middle of its airports"""
+        london = [a['code'] for a in self.index.within('LON', 80)]
+        self.assertTrue({'LHR', 'LGW', 'STN', 'LTN', 'LCY'} <= set(london))
+        self.assertEqual(set(a['code'] for a in self.index.within('nyc', 50)), {'JFK', 'EWR', 'LGA'})
+
+    def test_airport_radius_and_nearest(self):
+        """Radius results are sorted; the airport itself is nearest"""
+        barcelona = self.index.within('BCN', 100)
+        self.assertEqual([a['code'] for a in barcelona], ['BCN', 'REU', 'GRO'])
+        self.assertEqual(barcelona[0]['distance_km'], 0.0)
+        self.assertAlmostEqual(self.index.nearest('MAD', 2)[1]['distance_km'], 175, delta=5)
+
+    def test_unknown_code(self):
+        """Unknown codes raise KeyError"""
+        self.assertNotIn('XXX', self.index)
+        with self.assertRaises(KeyError):
+            self.index.locate('XXX')
+
+
+class TestNearbyAirportsSearch(unittest.TestCase):
+    """Test the parallel fare fan-out"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.search = NearbyAirportsSearch()
+
+    def test_every_pair_priced_in_parallel(self):
+        """Each origin × destination pair is priced once, on worker threads"""
+        calls, threads = [], set()
+
+        def fare(origin, dest, date):
+            calls.append((origin, dest))
+            threads.add(threading.current_thread().name)
+            return 100.0 if (origin, dest) == ('GRO', 'ORY') else 150.0
+
+        self.search._get_fare = fare
+        result = self.search.search('BCN', 'PAR', '2026-03-10', max_distance_km=100)
+
+        self.assertEqual(len(calls), 9)
+        self.assertEqual(len(set(calls)), 9)
+        self.assertTrue(all(name.startswith('fares') for name in threads))
+        self.assertEqual((result.results[0]['origin'], result.results[0]['destination']), ('GRO', 'ORY'))
+        self.assertEqual(result.metadata['savings'], 50.0)
+        self.assertIn('Ahorro', self.search.format_output(result))
+
+    def test_concurrent_searches_share_fare_pool(self):
+        """Concurrent searches never use more than FARE_POOL_WORKERS fare threads"""
+        threads = set()
+
+        def fare(origin, dest, date):
+            threads.add(threading.current_thread().name)
+            time.sleep(0.002)
+            return 150.0
+
+        self.search._get_fare = fare
+        results = []
+        searches = [threading.Thread(target=lambda: results.append(
+            self.search.search('BCN', 'PAR', '2026-03-10'))) for _ in range(6)]
+        for t in searches:
+            t.start()
+        for t in searches:
+            t.join()
+        self.assertEqual(len(results), 6)
+        self.assertLessEqual(len(threads), FARE_POOL_WORKERS)
+
+    def test_unknown_city(self):
+        """Unknown codes produce an empty result, not an exception"""
+        result = self.search.search('XXX', 'MAD', '2026-03-10')
+        self.assertEqual(result.results, [])
+        self.assertEqual(result.metadata['unknown_codes'], ['XXX'])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Budget Price Index
+Cazador Supremo v14.0
+
+Tests the bisect-backed budget lookup, country views and atomic rebuilds
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import random
+import sys
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from budget_index import BudgetIndexStore, DestinationPriceIndex
+    from advanced_search_methods import BudgetSearch
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+def random_fares(n, seed):
+    rng = random.Random(seed)
+    return [{'code': f"D{i:03d}", 'city': f"City {i}", 'country': rng.choice('ABCD'),
+             'price': rng.randint(40, 400)} for i in range(n)]
+
+
+class TestDestinationPriceIndex(unittest.TestCase):
+    """Test lookups against the linear filter"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.fares = random_fares(200, 3)
+        self.index = DestinationPriceIndex('MAD', '2026-03', self.fares)
+
+    def test_under_matches_linear_filter(self):
+        """Bisect + slice equals filter-then-sort, ties in input order"""
+        for budget in (0, 39, 40, 150, 150.5, 400, 1000):
+            expected = sorted((d for d in self.fares if d['price'] <= budget), key=lambda d: d['price'])
+            rows = self.index.under(budget)
+            self.assertEqual([r['code'] for r in rows], [d['code'] for d in expected])
+            for row in rows:
+                self.assertAlmostEqual(row['savings_pct'], (budget - row['price']) / budget * 100)
+
+    def test_country_views(self):
+        """Groups hold the in-budget rows, cheapest country first"""
+        rows, grouped = self.index.query(150)
+
+        self.assertEqual(sum(len(v) for v in grouped.values()), len(rows))
+        for country, dests in grouped.items():
+            self.assertTrue(all(d['country'] == country for d in dests))
+            self.assertEqual([d['price'] for d in dests], sorted(d['price'] for d in dests))
+            self.assertTrue(any(d is r for d in dests for r in rows))  # same row objects
+        firsts = [dests[0]['price'] for dests in grouped.values()]
+        self.assertEqual(firsts, sorted(firsts))
+
+    def test_index_is_immutable(self):
+        """Results never write through to the index"""
+        row = self.index.under(400)[0]
+        row['price'] = -1
+        self.assertNotEqual(self.index.rows[0]['price'], -1)
+        with self.assertRaises(TypeError):
+            self.index.rows[0]['price'] = -1
+        with self.assertRaises(ValueError):
+            self.index.prices[0] = 0
+
+
+class TestBudgetIndexStore(unittest.TestCase):
+    """Test reuse and atomic rebuilds"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.version = [0]
+
+        def source(origin, month):
+            self.version[0] += 1
+            return [{'code': 'BCN', 'country': 'ES', 'price': 50 + self.version[0]}]
+
+        self.store = BudgetIndexStore(source)
+
+    def test_index_reused_until_refresh(self):
+        """get() reuses the index; refresh() swaps in a new one"""
+        first = self.store.get('MAD', '2026-03')
+        self.assertIs(self.store.get('MAD', '2026-03'), first)
+
+        second = self.store.refresh('MAD', '2026-03')
+
+        self.assertIsNot(second, first)
+        self.assertIs(self.store.get('MAD', '2026-03'), second)
+        self.assertEqual(first.rows[0]['price'], 51)  # old readers unaffected
+        self.assertEqual(second.rows[0]['price'], 52)
+
+    def test_max_age(self):
+        """Stale indexes are rebuilt on access"""
+        self.store.max_age = 0
+        first = self.store.get('MAD', '2026-03')
+        self.assertIsNot(self.store.get('MAD', '2026-03'), first)
+
+
+class TestBudgetSearchConcurrency(unittest.TestCase):
+    """Test BudgetSearch on the shared index"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_concurrent_budgets_do_not_interfere(self):
+        """Each search sees savings against its own budget"""
+        def run(budget):
+            result = BudgetSearch().search(origin='MAD', budget=budget, month='2026-03')
+            return budget, result.results
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            outcomes = list(pool.map(run, [100, 200, 300, 150] * 25))
+
+        for budget, rows in outcomes:
+            for row in rows:
+                self.assertLessEqual(row['price'], budget)
+                self.assertAlmostEqual(row['savings_pct'], (budget - row['price']) / budget * 100)
+
+    def test_factory_instances_share_index(self):
+        """Instances share one store, so the index is built once"""
+        self.assertIs(BudgetSearch().store, BudgetSearch().store)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Cache Warming Scheduler
+Cazador Supremo v14.0
+
+Tests CacheWarmer route ranking, refresh-before-expiry and reporting
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import asyncio
+import json
+import sys
+import os
+import tempfile
+from datetime import datetime
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from cache_warming import CacheWarmer, load_config_routes, routes_from_popular
+    from search_cache import SearchCacheManager
+    from search_analytics import SearchAnalyticsTracker
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+class TestRouteRanking(unittest.TestCase):
+    """Test route sources and frequency ranking"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.tracker = SearchAnalyticsTracker(os.path.join(self.tmpdir.name, 'analytics.json'))
+
+    def test_route_sources(self):
+        """POPULAR_ROUTES and config.json flights become (origin, dest) routes"""
+        popular = [{'from': 'MAD', 'to': 'MIA', 'price': 680}, {'from': 'BCN'}]
+        self.assertEqual(routes_from_popular(popular), [('MAD', 'MIA')])
+
+        path = os.path.join(self.tmpdir.name, 'config.json')
+        with open(path, 'w') as f:
+            json.dump({'flights': [{'origin': 'MAD', 'dest': 'BOG', 'name': 'x'}]}, f)
+        self.assertEqual(load_config_routes(path), [('MAD', 'BOG')])
+        self.assertEqual(load_config_routes(os.path.join(self.tmpdir.name, 'missing.json')), [])
+
+    def test_searched_routes_rank_first(self):
+        """Recently searched routes outrank seed routes"""
+        for _ in range(3):
+            self.tracker.track_search(1, 'flexible_dates', {'origin': 'mad', 'destination': 'lis'}, 10, 5)
+        self.tracker.track_search(1, 'budget', {'origin': 'BCN', 'destination': 'ROM'}, 10, 5)
+
+        warmer = CacheWarmer(SearchCacheManager(), analytics=self.tracker,
+                             seed_routes=[('MAD', 'BCN'), ('BCN', 'ROM')], top_n=3)
+
+        self.assertEqual(warmer.rank_routes(), [('MAD', 'LIS'), ('BCN', 'ROM'), ('MAD', 'BCN')])
+
+    def test_popular_budgets(self):
+        """Budget levels come from analytics, defaults otherwise"""
+        for budget in (400, 400, 250):
+            self.tracker.track_search(1, 'budget', {'origin': 'MAD', 'budget': budget}, 10, 5)
+
+        warmer = CacheWarmer(SearchCacheManager(), analytics=self.tracker)
+
+        self.assertEqual(warmer.popular_budgets('MAD'), [400.0, 250.0])
+        self.assertEqual(warmer.popular_budgets('BCN'), [300, 500])
+
+
+class TestCacheWarmer(unittest.TestCase):
+    """Test warming runs against a real cache manager"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.mgr = SearchCacheManager()
+        self.warmer = CacheWarmer(self.mgr, seed_routes=[('MAD', 'BCN')],
+                                  months_ahead=1, default_budgets=(300,))
+        self.month = datetime.now().strftime('%Y-%m')
+
+    def test_warm_fills_cache(self):
+        """A run caches flexible_dates, budget and cheapest_month results"""
+        result = asyncio.run(self.warmer.warm(self.warmer.rank_routes()))
+
+        self.assertEqual(result, {'due': 3, 'succeeded': 3, 'skipped': 0})
+        self.assertIsNotNone(self.mgr.get_cached_result(
+            'flexible_dates', origin='MAD', destination='BCN', month=self.month))
+        self.assertIsNotNone(self.mgr.get_cached_result(
+            'budget', origin='MAD', budget=300, month=self.month))
+        self.assertIsNotNone(self.mgr.get_cached_result(
+            'cheapest_month', origin='MAD', destination='BCN', months_ahead=12))
+
+    def test_fresh_entries_are_skipped(self):
+        """Entries far from expiry are not recomputed"""
+        asyncio.run(self.warmer.warm(self.warmer.rank_routes()))
+        result = asyncio.run(self.warmer.warm(self.warmer.rank_routes()))
+
+        self.assertEqual(result['due'], 0)
+        self.assertEqual(result['skipped'], 3)
+
+    def test_refresh_before_expiry(self):
+        """Entries inside the refresh margin are warmed again"""
+        self.mgr.ttl_config['budget'] = 10
+        self.warmer.refresh_margin = 1.1  # everything counts as near expiry
+        asyncio.run(self.warmer.warm(self.warmer.rank_routes()))
+
+        result = asyncio.run(self.warmer.warm(self.warmer.rank_routes()))
+
+        self.assertEqual(result['due'], 3)
+
+    def test_peak_pass_only_refreshes_cached(self):
+        """Outside off-peak windows no new entries are added"""
+        peak = datetime(2026, 1, 17, 14, 0)
+        result = asyncio.run(self.warmer.run_once(now=peak))
+        self.assertEqual(result['due'], 0)
+
+        off_peak = datetime(2026, 1, 17, 3, 0)
+        result = asyncio.run(self.warmer.run_once(now=off_peak))
+        self.assertEqual(result['due'], 3)
+
+    def test_concurrency_cap(self):
+        """No more than max_concurrency searches run at once"""
+        self.warmer.max_concurrency = 2
+        self.warmer.default_budgets = (100, 200, 300, 400)
+        running = [0]
+        peak = [0]
+
+        def slow_compute(job):
+            async def compute():
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+                await asyncio.sleep(0.01)
+                running[0] -= 1
+                return {'job': repr(job)}
+            return compute
+
+        self.warmer._compute = slow_compute
+        asyncio.run(self.warmer.warm(self.warmer.rank_routes()))
+
+        self.assertEqual(peak[0], 2)
+
+    def test_report_hit_rate_effect(self):
+        """Hits on warmed entries are reported separately"""
+        asyncio.run(self.warmer.warm(self.warmer.rank_routes()))
+        self.mgr.get_cached_result('flexible_dates', origin='MAD', destination='BCN', month=self.month)
+        self.mgr.get_cached_result('flexible_dates', origin='MAD', destination='LIS', month=self.month)
+
+        report = self.warmer.get_report()
+
+        self.assertEqual(report['warm_hits'], 1)
+        self.assertEqual(report['hit_rate'], '50.0%')
+        self.assertEqual(report['hit_rate_without_warming'], '0.0%')
+        self.assertEqual(report['jobs_run'], 3)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
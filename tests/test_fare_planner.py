@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Fare Set Query Planner
+Cazador Supremo v14.0
+
+Tests shared fare-set fetching and the filter-style search methods
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import asyncio
+import threading
+import time
+import sys
+import os
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from fare_planner import FareSetPlanner, get_fare_planner, mock_fare_set, nonstop, redeye
+    from flight_results import is_redeye_clock
+    from advanced_search_methods import (
+        SearchMethodFactory, NonstopOnlySearch, RedEyeFlightsSearch,
+        AirlineSpecificSearch, GroupBookingSearch, BudgetSearch
+    )
+    from search_cache import SearchCacheManager
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+class TestFareSetPlanner(unittest.TestCase):
+    """Test one provider call per route and date"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.calls = []
+
+        def source(origin, destination, date):
+            self.calls.append((origin, destination, date))
+            time.sleep(0.02)
+            return mock_fare_set(origin, destination, date)
+
+        self.mgr = SearchCacheManager()
+        self.planner = FareSetPlanner(self.mgr, source)
+        self.fares = mock_fare_set('MAD', 'BCN', '2026-03-15')
+
+    def test_filters_share_one_fetch(self):
+        """Three filters on one route cause one provider call"""
+        args = ('MAD', 'BCN', '2026-03-15')
+        direct = NonstopOnlySearch(self.planner).search(*args)
+        night = RedEyeFlightsSearch(self.planner).search(*args)
+        iberia = AirlineSpecificSearch(self.planner).search(*args, airlines=['ib'])
+
+        self.assertEqual(self.calls, [args])
+        self.assertEqual([r['flight_number'] for r in direct.results],
+                         [r['flight_number'] for r in sorted(self.fares, key=lambda r: r['price'])
+                          if r['stops'] == 0])
+        self.assertTrue(all(is_redeye_clock(r['departure']) for r in night.results))
+        self.assertTrue(all(r['airline'] == 'IB' for r in iberia.results))
+
+    def test_canonical_route_and_concurrent_fetch(self):
+        """Lower-case codes and concurrent first requests share the fetch"""
+        threads = [threading.Thread(target=self.planner.fetch, args=(o, 'bcn', '2026-03-15'))
+                   for o in ('MAD', 'mad', 'MAD', 'mad')]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(self.calls), 1)
+
+    def test_results_do_not_alias_cache(self):
+        """Transforms work on copies of the cached rows"""
+        result = GroupBookingSearch(self.planner).search('MAD', 'BCN', '2026-03-15', passengers=3)
+
+        self.assertTrue(all(r['seats'] >= 3 for r in result.results))
+        self.assertTrue(all(r['total_price'] == round(r['price'] * 3, 2) for r in result.results))
+        totals = [r['total_price'] for r in result.results]
+        self.assertEqual(totals, sorted(totals))
+        self.assertNotIn('total_price', self.planner.fetch('MAD', 'BCN', '2026-03-15')[0])
+
+    def test_cache_derives_from_planner_fare_set(self):
+        """Derived nonstop/red-eye hits equal the planned searches"""
+        self.planner.fetch('MAD', 'BCN', '2026-03-15')
+
+        for method, search in (('nonstop_only', NonstopOnlySearch), ('redeye', RedEyeFlightsSearch)):
+            derived = self.mgr.get_cached_result(method, origin='mad', destination='bcn',
+                                                 date='2026-03-15')
+            expected = search(self.planner).search('MAD', 'BCN', '2026-03-15')
+
+            self.assertEqual(derived.method, expected.method)
+            self.assertEqual(derived.results, expected.results)
+            self.assertEqual(derived.metadata, expected.metadata)
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(len(self.mgr.subsumption_rules['redeye']), 1)
+
+    def test_batch_of_filters(self):
+        """A batch of filters on one route hits the provider once"""
+        route = {'origin': 'MAD', 'destination': 'LIS', 'date': '2026-04-01'}
+        requests = [('nonstop_only', route), ('redeye', route),
+                    ('airline_specific', dict(route, airlines=['TP'])),
+                    ('group_booking', dict(route, passengers=4))]
+
+        async def main():
+            return [item async for item in SearchMethodFactory.asearch_batch(requests, planner=self.planner)]
+
+        items = asyncio.run(main())
+        self.assertTrue(all(item.ok for item in items))
+        self.assertEqual(len(self.calls), 1)
+
+
+    def test_factory_injects_planner(self):
+        """Filter searches get the given planner; the default is left alone"""
+        default = get_fare_planner()
+        nonstop_search = SearchMethodFactory.create('nonstop_only', planner=self.planner)
+        budget_search = SearchMethodFactory.create('budget', planner=self.planner)
+
+        self.assertIs(nonstop_search.planner, self.planner)
+        self.assertIsInstance(budget_search, BudgetSearch)
+        self.assertIs(SearchMethodFactory.create('nonstop_only').planner, default)
+        self.assertIsNot(default.cache_manager, self.mgr)
+
+
+class TestPredicates(unittest.TestCase):
+    """Test predicate semantics"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_redeye_window(self):
+        """22:00-05:59 departures are red-eye; ISO datetimes work too"""
+        is_redeye = redeye()
+        self.assertTrue(is_redeye({'departure': '23:10'}))
+        self.assertTrue(is_redeye({'departure': '2026-03-15T05:59'}))
+        self.assertFalse(is_redeye({'departure': '06:00'}))
+        self.assertFalse(nonstop()({'stops': 1}))
+
+    def test_malformed_departures_are_skipped(self):
+        """Rows without a clock time drop out instead of failing the search"""
+        rows = [{'price': 90, 'departure': '23:30'}, {'price': 40, 'departure': 'TBD'},
+                {'price': 60, 'departure': None}, {'price': 50}]
+        planner = FareSetPlanner(SearchCacheManager(), lambda o, d, date: rows)
+
+        night = RedEyeFlightsSearch(planner).search('MAD', 'BCN', '2026-03-15')
+        derived = planner.cache_manager.get_cached_result('redeye', origin='MAD', destination='BCN',
+                                                          date='2026-03-15')
+
+        self.assertEqual([r['price'] for r in night.results], [90])
+        self.assertEqual(derived.results, night.results)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Columnar Flight Results
+Cazador Supremo v14.0
+
+Tests the FlightResult round trip and vectorized filter/sort/top-k
+against the equivalent list comprehensions
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import random
+import heapq
+import sys
+import os
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from flight_results import FlightResultSet, clock_minutes
+    from advanced_search_methods import FlightResult
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+def random_flights(n, seed):
+    rng = random.Random(seed)
+    times = ['', 'n/a', '25:00', '2026-03-15T23:10', '06:00', '05:59:30']
+    flights = []
+    for i in range(n):
+        departure = (rng.choice(times) if rng.random() < 0.2
+                     else f"{rng.randint(0, 23):02d}:{rng.choice((0, 15, 30, 45)):02d}")
+        flights.append(FlightResult(
+            origin=rng.choice(['MAD', 'BCN']), destination=rng.choice(['LIS', 'CDG', 'FCO']),
+            date='2026-03-15', price=float(rng.randint(40, 120)),
+            currency=rng.choice(['EUR', 'USD']), airline=rng.choice(['IB', 'VY', 'ux', '']),
+            flight_number=f"XX{i}", departure_time=departure,
+            arrival_time=rng.choice(['', '12:00', '2026-03-16T01:30']),
+            duration_minutes=rng.randint(60, 600), stops=rng.choice((0, 0, 1, 2))
+        ))
+    return flights
+
+
+class TestClockParsing(unittest.TestCase):
+    """Test departure time parsing and FlightResult.is_redeye"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_clock_formats(self):
+        self.assertEqual(clock_minutes('07:45'), 465)
+        self.assertEqual(clock_minutes('7:05:59'), 425)
+        self.assertEqual(clock_minutes('2026-03-15T23:10'), 1390)
+        self.assertEqual(clock_minutes('2026-03-15 00:30:00'), 30)
+        for invalid in ('', None, 'n/a', '24:00', '12:75', '2026-03-15'):
+            self.assertIsNone(clock_minutes(invalid), invalid)
+
+    def test_is_redeye(self):
+        def flight(departure):
+            return FlightResult('MAD', 'BCN', '2026-03-15', 50.0, departure_time=departure)
+
+        self.assertTrue(flight('23:10').is_redeye())
+        self.assertTrue(flight('2026-03-15T05:59').is_redeye())
+        self.assertFalse(flight('06:00').is_redeye())
+        self.assertFalse(flight('21:59').is_redeye())
+        self.assertFalse(flight('').is_redeye())
+        self.assertFalse(flight('late').is_redeye())
+
+
+class TestFlightResultSet(unittest.TestCase):
+    """Test the columnar set against the dataclass list"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.flights = random_flights(2000, seed=11)
+        self.results = FlightResultSet.from_results(self.flights)
+
+    def numbers(self, flights):
+        return [f.flight_number for f in flights]
+
+    def test_round_trip_is_lossless(self):
+        self.assertEqual(len(self.results), len(self.flights))
+        self.assertEqual(self.results.to_results(), self.flights)
+        self.assertEqual(self.results[5], self.flights[5])
+        self.assertEqual(self.results[-1], self.flights[-1])
+
+    def test_empty_set(self):
+        empty = FlightResultSet.from_results([])
+        self.assertEqual(len(empty), 0)
+        self.assertEqual(empty.filter(max_price=100).sort().top_k(3).to_results(), [])
+
+    def test_columns_are_read_only(self):
+        with self.assertRaises(ValueError):
+            self.results.price[0] = 1.0
+
+    def test_filter_matches_list_comprehension(self):
+        expected = [f for f in self.flights
+                    if f.price <= 80 and f.stops <= 1 and f.airline.upper() in ('IB', 'UX')
+                    and not f.is_redeye()]
+        actual = self.results.filter(max_price=80, max_stops=1, airlines=['ib', 'UX'], redeye=False)
+        self.assertEqual(actual.to_results(), expected)
+
+        redeyes = [f for f in self.flights if f.is_redeye()]
+        self.assertEqual(self.results.filter(redeye=True).to_results(), redeyes)
+
+    def test_departure_window_wraps_midnight(self):
+        def in_window(f):
+            minute = clock_minutes(f.departure_time)
+            return minute is not None and (minute >= 23 * 60 or minute < 60)
+
+        actual = self.results.filter(departure_between=('23:00', '01:00'))
+        self.assertEqual(self.numbers(actual.to_results()),
+                         self.numbers(f for f in self.flights if in_window(f)))
+        with self.assertRaises(ValueError):
+            self.results.filter(departure_between=('late', '01:00'))
+
+    def test_sort_is_stable_and_multi_key(self):
+        by_price = sorted(self.flights, key=lambda f: f.price)
+        self.assertEqual(self.numbers(self.results.sort('price').to_results()),
+                         self.numbers(by_price))
+
+        by_stops_price = sorted(self.flights, key=lambda f: (f.stops, f.price))
+        self.assertEqual(self.numbers(self.results.sort(('stops', 'price')).to_results()),
+                         self.numbers(by_stops_price))
+        descending = sorted(self.flights, key=lambda f: (-f.stops, -f.price))
+        self.assertEqual(self.numbers(self.results.sort(('stops', 'price'), descending=True).to_results()),
+                         self.numbers(descending))
+
+        with self.assertRaises(ValueError):
+            self.results.sort('airline')
+
+    def test_top_k_matches_stable_sort_with_ties(self):
+        # prices are whole euros, so the k-th price is tied many times over
+        for k in (1, 10, 57, 1999, 2000, 5000):
+            expected = heapq.nsmallest(k, self.flights, key=lambda f: f.price)
+            self.assertEqual(self.numbers(self.results.top_k(k).to_results()),
+                             self.numbers(expected), k)
+
+        longest = sorted(self.flights, key=lambda f: -f.duration_minutes)[:20]
+        self.assertEqual(self.numbers(self.results.top_k(20, 'duration_minutes',
+                                                         descending=True).to_results()),
+                         self.numbers(longest))
+        self.assertEqual(len(self.results.top_k(0)), 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Itinerary Optimizer
+Cazador Supremo v14.0
+
+Tests Held-Karp against brute force, local search and MultiCitySearch reordering
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import random
+import sys
+import os
+from itertools import permutations
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    import numpy as np
+    from itinerary_optimizer import (
+        held_karp, local_search, nearest_neighbour, optimize_itinerary, path_cost
+    )
+    from advanced_search_methods import MultiCitySearch
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+def random_costs(n, seed):
+    """Asymmetric fare matrix"""
+    rng = np.random.default_rng(seed)
+    cost = rng.integers(40, 300, (n, n)).astype(float)
+    np.fill_diagonal(cost, 0)
+    return cost
+
+
+def brute_force(cost):
+    n = len(cost)
+    return min(path_cost(cost, [0, *p, n - 1]) for p in permutations(range(1, n - 1)))
+
+
+class TestOptimizers(unittest.TestCase):
+    """Test exact and heuristic orderings"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_held_karp_matches_brute_force(self):
+        """Exact DP finds the optimum with fixed endpoints"""
+        for n in range(2, 8):
+            for seed in range(5):
+                cost = random_costs(n, seed)
+                path, total = held_karp(cost)
+                self.assertEqual((path[0], path[-1]), (0, n - 1))
+                self.assertEqual(sorted(path), list(range(n)))
+                self.assertAlmostEqual(path_cost(cost, path), total)
+                self.assertAlmostEqual(total, brute_force(cost))
+
+    def test_local_search_is_valid_and_no_worse(self):
+        """Heuristic keeps endpoints and never beats the optimum"""
+        cost = random_costs(8, 11)
+        start = nearest_neighbour(cost)
+        path = local_search(cost, start)
+        self.assertEqual((path[0], path[-1]), (0, 7))
+        self.assertEqual(sorted(path), list(range(8)))
+        self.assertLessEqual(path_cost(cost, path), path_cost(cost, start))
+        self.assertGreaterEqual(path_cost(cost, path), brute_force(cost) - 1e-9)
+
+    def test_large_trip_uses_heuristic(self):
+        """Above the exact limit the local search runs"""
+        cities = [f"C{i:02d}" for i in range(16)]
+        rng = random.Random(3)
+        result = optimize_itinerary(cities, lambda o, d: rng.randint(40, 300))
+        self.assertEqual(result['algorithm'], 'local_search')
+        self.assertLessEqual(result['total'], result['original_total'])
+
+    def test_each_pair_fetched_once(self):
+        """Repeated cities and DP relaxations share one fetch per pair"""
+        calls = []
+
+        def fare(o, d):
+            calls.append((o, d))
+            return 100
+
+        result = optimize_itinerary(['MAD', 'PAR', 'AMS', 'BER', 'MAD'], fare)
+
+        self.assertEqual(len(calls), len(set(calls)))
+        self.assertEqual(result['fetches'], 4 * 3)
+
+
+class TestMultiCityReordering(unittest.TestCase):
+    """Test MultiCitySearch with the optimizer"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.search = MultiCitySearch()
+        fares = {('MAD', 'PAR'): 50, ('PAR', 'AMS'): 40, ('AMS', 'BER'): 30, ('BER', 'MAD'): 60}
+        self.search._calculate_segment_price = lambda o, d: fares.get((o, d), 200)
+
+    def test_reorders_for_lowest_total(self):
+        """Cities are reordered and stays move with their city"""
+        result = self.search.search(['MAD', 'BER', 'AMS', 'PAR', 'MAD'], '2026-03-01', [4, 3, 2])
+
+        route = [s['origin'] for s in result.results] + [result.results[-1]['destination']]
+        self.assertEqual(route, ['MAD', 'PAR', 'AMS', 'BER', 'MAD'])
+        self.assertEqual(result.metadata['total_price'], 180)
+        self.assertEqual(result.metadata['stay_days'][:3], [2, 3, 4])
+        self.assertEqual([s['date'] for s in result.results],
+                         ['2026-03-01', '2026-03-03', '2026-03-06', '2026-03-10'])
+        self.assertEqual(result.metadata['optimization']['reorder_savings'], 800 - 180)
+        self.assertIn('Reordenando', self.search.format_output(result))
+
+    def test_optimize_off_keeps_order(self):
+        """optimize=False books the cities as given"""
+        result = self.search.search(['MAD', 'BER', 'AMS'], '2026-03-01', [4], optimize=False)
+
+        self.assertEqual([s['destination'] for s in result.results], ['BER', 'AMS'])
+        self.assertNotIn('optimization', result.metadata)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
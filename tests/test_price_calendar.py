@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Price Calendar Engine
+Cazador Supremo v14.0
+
+Tests PriceMatrix vectorized queries and the FlexibleDatesCalendar view
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import sys
+import os
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    import numpy as np
+    from price_calendar import PriceCalendarEngine, RoundTripGrid, month_days
+    from advanced_search_methods import FlexibleDatesCalendar, RoundTripCalendar, SearchMethodFactory
+    from search_cache import SearchCacheManager
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+class TestPriceMatrix(unittest.TestCase):
+    """Test vectorized stats, best days and percentiles"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.routes = [('MAD', 'BCN'), ('MAD', 'MIA'), ('BCN', 'LIS')]
+        self.matrix = PriceCalendarEngine(seed=3).build(self.routes, ['2026-02', '2026-03'])
+        self.matrix.prices[1, 5:40] = np.nan   # MAD-MIA has gaps
+        self.matrix.prices[2, :] = np.nan      # BCN-LIS has no fares
+
+    def test_day_axis(self):
+        """Days span every day of the months, in order"""
+        days = month_days(['2026-03', '2026-02'])
+        self.assertEqual(len(days), 28 + 31)
+        self.assertEqual(str(days[0]), '2026-02-01')
+        self.assertEqual(str(days[-1]), '2026-03-31')
+
+    def test_stats_match_python_reference(self):
+        """Per-route stats equal the list-based computation"""
+        stats = self.matrix.stats()
+        for i in range(2):
+            values = [p for p in self.matrix.prices[i] if not np.isnan(p)]
+            self.assertAlmostEqual(stats['min'][i], min(values))
+            self.assertAlmostEqual(stats['max'][i], max(values))
+            self.assertAlmostEqual(stats['avg'][i], sum(values) / len(values))
+            self.assertAlmostEqual(stats['median'][i], sorted(values)[len(values) // 2])
+            self.assertEqual(stats['days'][i], len(values))
+        self.assertTrue(np.isnan(stats['min'][2]))
+
+    def test_best_days(self):
+        """k cheapest days per route, cheapest first"""
+        days, prices = self.matrix.best_days(3)
+
+        for i in range(2):
+            row = self.matrix.prices[i]
+            expected = sorted(p for p in row if not np.isnan(p))[:3]
+            self.assertEqual(list(prices[i]), expected)
+            col = int(np.searchsorted(self.matrix.days, days[i, 0]))
+            self.assertEqual(row[col], prices[i, 0])
+        self.assertTrue(np.isnan(prices[2]).all())
+        self.assertTrue(np.isnat(days[2]).all())
+
+    def test_percentiles_and_cheap_days(self):
+        """Percentiles are per route; cheap days sit under the threshold"""
+        q = self.matrix.percentiles([10, 50, 90])
+        self.assertEqual(q.shape, (3, 3))
+        self.assertTrue((np.diff(q[:2], axis=1) >= 0).all())
+
+        cheap = self.matrix.cheap_days(25)
+        self.assertFalse(cheap[2].any())
+        threshold = self.matrix.percentiles([25])[0, 0]
+        self.assertTrue((self.matrix.prices[0, cheap[0]] <= threshold).all())
+        self.assertLess(cheap[0].sum(), self.matrix.available[0].sum())
+
+    def test_month_views(self):
+        """Month slices and per-day dicts"""
+        march = self.matrix.submatrix('2026-03')
+        self.assertEqual(march.prices.shape, (3, 31))
+
+        prices = self.matrix.month_prices('MAD', 'BCN', '2026-02')
+        self.assertEqual(sorted(prices), list(range(1, 29)))
+        self.assertEqual(prices[1], self.matrix.prices[0, 0])
+
+    def test_shape_validated(self):
+        """A price source returning the wrong shape is rejected"""
+        engine = PriceCalendarEngine(price_source=lambda routes, days: np.zeros((1, 3)))
+        with self.assertRaises(ValueError):
+            engine.build(self.routes, ['2026-02'])
+
+
+class TestFlexibleDatesView(unittest.TestCase):
+    """Test FlexibleDatesCalendar.search() over the engine"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_search_is_view_over_engine(self):
+        """search() reports the engine's prices, stats and best day"""
+        def fares(routes, days):
+            prices = 400 + (days.astype('int64') % 17).astype(float)
+            prices[3] = np.nan  # no flight on the 4th
+            return prices[None, :].repeat(len(routes), axis=0)
+
+        method = FlexibleDatesCalendar(engine=PriceCalendarEngine(price_source=fares))
+        result = method.search(origin='MAD', destination='BCN', month='2026-04')
+
+        prices = result.metadata['prices']
+        values = list(prices.values())
+        self.assertEqual(len(prices), 29)
+        self.assertNotIn(4, prices)
+        self.assertEqual(result.metadata['stats']['min'], min(values))
+        self.assertEqual(result.metadata['stats']['median'], sorted(values)[len(values) // 2])
+        self.assertEqual(result.metadata['best_day']['price'], min(values))
+        self.assertEqual(prices[result.metadata['best_day']['day']], min(values))
+        self.assertIn('CALENDARIO DE PRECIOS', method.format_output(result))
+
+
+class TestRoundTripGrid(unittest.TestCase):
+    """Test outbound × return grids under stay constraints"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.routes = [('MAD', 'BCN'), ('MAD', 'MIA')]
+        grid = PriceCalendarEngine(seed=5).round_trip(self.routes, '2026-03', 5, 9)
+        grid.outbound.prices[1, 10] = np.nan  # no MAD-MIA flight on 11 March
+        self.grid = RoundTripGrid(grid.outbound, grid.inbound, 5, 9)
+
+    def brute_force(self, r):
+        """Nested-loop reference: {(outbound index, nights): total}"""
+        out, back = self.grid.outbound.prices[r], self.grid.inbound.prices[r]
+        return {(i, n): out[i] + back[i + n]
+                for i in range(len(out)) for n in range(5, 10)
+                if not np.isnan(out[i]) and not np.isnan(back[i + n])}
+
+    def test_return_axis_covers_longest_stay(self):
+        """Return fares are the reversed route, past month end"""
+        self.assertEqual(self.grid.inbound.routes, [('BCN', 'MAD'), ('MIA', 'MAD')])
+        self.assertEqual(str(self.grid.inbound.days[-1]), '2026-04-09')
+        self.assertEqual(self.grid.totals.shape, (2, 31, 5))
+
+    def test_cheapest_matches_nested_loops(self):
+        """k cheapest trips equal the brute-force ranking"""
+        day_idx, nights, totals = self.grid.cheapest(4)
+        for r in range(2):
+            reference = sorted(self.brute_force(r).values())[:4]
+            np.testing.assert_allclose(totals[r], reference)
+            for i, n, total in zip(day_idx[r], nights[r], totals[r]):
+                self.assertAlmostEqual(self.brute_force(r)[(i, n)], total)
+                self.assertTrue(5 <= n <= 9)
+
+    def test_best_by_stay_and_outbound(self):
+        """Per-stay and per-departure minima"""
+        reference = self.brute_force(1)
+        by_stay = self.grid.best_by_stay()[1]
+        for j, n in enumerate(range(5, 10)):
+            self.assertAlmostEqual(by_stay[j], min(v for (i, m), v in reference.items() if m == n))
+        self.assertTrue(np.isnan(self.grid.best_by_outbound()[1, 10]))
+
+    def test_dense_grid_is_banded(self):
+        """The full matrix only has values inside the stay band"""
+        dense = self.grid.dense('MAD', 'BCN')
+        rows, cols = np.nonzero(~np.isnan(dense))
+        self.assertTrue(((cols - rows >= 5) & (cols - rows <= 9)).all())
+        self.assertEqual(len(rows), 31 * 5)
+
+    def test_invalid_stay_range(self):
+        """min_stay must not exceed max_stay"""
+        with self.assertRaises(ValueError):
+            PriceCalendarEngine().round_trip(self.routes, '2026-03', 9, 5)
+
+
+class TestRoundTripCalendar(unittest.TestCase):
+    """Test the round-trip search method and its cache type"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_search_and_format(self):
+        """Options are sorted by total and respect the stay range"""
+        result = RoundTripCalendar(engine=PriceCalendarEngine(seed=2)).search(
+            origin='MAD', destination='BCN', month='2026-03', min_stay=3, max_stay=4, top=3)
+
+        totals = [o['total'] for o in result.results]
+        self.assertEqual(totals, sorted(totals))
+        self.assertTrue(all(o['nights'] in (3, 4) for o in result.results))
+        self.assertEqual(set(result.metadata['best_by_stay']), {3, 4})
+        self.assertEqual(result.metadata['best_by_stay'][result.results[0]['nights']], totals[0])
+        self.assertIn('IDA Y VUELTA', RoundTripCalendar().format_output(result))
+
+    def test_cached_method_type(self):
+        """'roundtrip' is a factory method with its own cache TTL and tags"""
+        self.assertIsInstance(SearchMethodFactory.create('roundtrip'), RoundTripCalendar)
+
+        mgr = SearchCacheManager()
+        self.assertIn('roundtrip', mgr.ttl_config)
+        mgr.cache_result('roundtrip', 'r', origin='MAD', destination='BCN', month='2026-03',
+                         min_stay=5, max_stay=9)
+        self.assertEqual(mgr.invalidate_tag('BCN-MAD'), 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for History-Driven Price Drop Prediction
+Cazador Supremo v14.0
+
+Tests training from rollups, incremental refits, the on-disk cache and
+batched PriceDropPredictor scoring
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import tempfile
+import shutil
+import time
+import sys
+import os
+from types import SimpleNamespace
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from price_history import PriceHistoryStore
+    from price_rollups import rollups_for
+    from price_drop_model import DropModelTrainer, PriceDropModel, FEATURES, DAY
+    from additional_search_methods import PriceDropPredictor
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+ROUTES = ('MAD-BCN', 'MAD-NYC', 'BCN-LIS')
+
+
+def mean_reverting_history(store, end, days=300, seed=4):
+    """Daily prices pulled back towards €150, 10 observations per day"""
+    rng = np.random.default_rng(seed)
+    for route in ROUTES:
+        level, levels = 150.0, []
+        for _ in range(days):
+            level += 0.3 * (150 - level) + rng.normal(0, 12)
+            levels.append(level)
+        day_starts = (end // DAY - days + np.arange(days)) * DAY
+        stamps = np.repeat(day_starts, 10) + rng.integers(0, DAY, 10 * days)
+        store.append_batch([route] * len(stamps), np.repeat(levels, 10) + rng.normal(0, 4, len(stamps)),
+                           stamps)
+
+
+class TestDropModelTrainer(unittest.TestCase):
+    """Test fitting, incremental updates and persistence"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.root = tempfile.mkdtemp()
+        self.store = PriceHistoryStore(os.path.join(self.root, 'history'))
+        self.now = int(time.time())
+        mean_reverting_history(self.store, self.now)
+        self.rollups = rollups_for(self.store)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_learns_mean_reversion(self):
+        trainer = DropModelTrainer(self.rollups, path=None)
+        model = trainer.refit(self.now)
+        self.assertTrue(model.trained)
+        self.assertGreater(model.weights[FEATURES.index('vs_mean30')], 0)
+
+        scores = trainer.score(['MAD-BCN', 'MAD-BCN'], [115.0, 185.0], self.now)
+        self.assertTrue(scores['scored'].all())
+        low, high = scores['probability']
+        self.assertGreater(high, low + 0.3)
+        self.assertLess(scores['predicted_price'][1], 185.0)
+
+    def test_incremental_refit_matches_full_fit(self):
+        incremental = DropModelTrainer(self.rollups, path=None)
+        first = incremental.refit(self.now - 100 * DAY)
+        second = incremental.refit(self.now)
+        self.assertGreater(second.samples, first.samples)
+        self.assertEqual(incremental.refit(self.now).samples, second.samples)  # nothing new
+
+        full = DropModelTrainer(self.rollups, path=None).refit(self.now)
+        self.assertEqual(second.samples, full.samples)
+        self.assertEqual(second.trained_until, full.trained_until)
+        np.testing.assert_allclose(second.coef, full.coef, rtol=1e-8, atol=1e-10)
+
+        X = np.column_stack([np.ones(50), np.random.default_rng(0).uniform(-0.3, 0.3, (50, len(FEATURES) - 1))])
+        np.testing.assert_allclose(second.predict(X)[0], full.predict(X)[0], atol=0.05)
+
+    def test_model_cached_on_disk(self):
+        path = os.path.join(self.root, 'models', 'drop.npz')
+        trained = DropModelTrainer(self.rollups, path=path).refit(self.now)
+        self.assertTrue(os.path.exists(path))
+
+        reloaded = DropModelTrainer(self.rollups, path=path).model
+        self.assertEqual(reloaded.samples, trained.samples)
+        self.assertEqual(reloaded.trained_until, trained.trained_until)
+        np.testing.assert_array_equal(reloaded.weights, trained.weights)
+        np.testing.assert_array_equal(reloaded.coef, trained.coef)
+
+        stale = os.path.join(self.root, 'stale.npz')
+        np.savez(stale, features=np.array(['bias', 'old_feature']))
+        self.assertIsNone(PriceDropModel.load(stale))
+        self.assertIsNone(PriceDropModel.load(os.path.join(self.root, 'missing.npz')))
+
+    def test_score_never_trains(self):
+        trainer = DropModelTrainer(self.rollups, path=None)
+        scores = trainer.score(['MAD-BCN'], [185.0], self.now)
+        self.assertFalse(scores['scored'].any())
+        self.assertTrue(np.isnan(scores['probability']).all())
+        self.assertEqual(trainer.stats['refits'], 0)
+
+        trainer.refit(self.now)
+        self.assertTrue(trainer.score(['MAD-BCN'], [185.0], self.now)['scored'].all())
+
+    def test_start_trains_untrained_model_at_once(self):
+        trainer = DropModelTrainer(self.rollups, path=None, refit_interval=3600)
+        trainer.start()
+        try:
+            deadline = time.time() + 5
+            while trainer.stats['refits'] < 1 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            trainer.stop()
+        self.assertEqual(trainer.stats['refits'], 1)
+        self.assertTrue(trainer.model.trained)
+
+    def test_background_refit(self):
+        trainer = DropModelTrainer(self.rollups, path=None, refit_interval=0.02)
+        trainer.start()
+        try:
+            deadline = time.time() + 5
+            while trainer.stats['refits'] < 2 and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            trainer.stop()
+        self.assertGreaterEqual(trainer.stats['refits'], 2)
+        self.assertTrue(trainer.model.trained)
+
+
+class TestPriceDropPredictor(unittest.TestCase):
+    """Test batched predictions against single calls and fallbacks"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.root = tempfile.mkdtemp()
+        self.store = PriceHistoryStore(self.root)
+        mean_reverting_history(self.store, int(time.time()))
+        self.predictor = PriceDropPredictor(self.store)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def departure(self, days):
+        return (datetime.now() + timedelta(days=days)).strftime('%Y-%m-%d')
+
+    def test_batch_matches_single_calls(self):
+        routes = ['MAD-BCN', 'mad-nyc', 'BCN-LIS', 'XXX-YYY']
+        prices = [120.0, 160.0, 190.0, 150.0]
+        dates = [self.departure(d) for d in (90, 45, 20, 45)]
+
+        batch = self.predictor.predict_batch(routes, prices, dates)
+        singles = [self.predictor.predict_price_drop(r, p, d) for r, p, d in zip(routes, prices, dates)]
+        self.assertEqual(batch, singles)
+        self.assertEqual(batch[1].route, 'MAD-NYC')
+
+    def test_routes_without_history_use_booking_windows(self):
+        far, close, unknown = self.predictor.predict_batch(
+            ['XXX-YYY'] * 3, [200.0] * 3, [self.departure(90), self.departure(5), None])
+        self.assertEqual((far.best_booking_window, far.drop_probability), ('wait_14d', 0.70))
+        self.assertAlmostEqual(far.predicted_price, 180.0)
+        self.assertEqual(close.best_booking_window, 'book_now')
+        self.assertEqual((unknown.best_booking_window, unknown.predicted_price), ('book_soon', 200.0))
+
+    def test_model_drives_known_routes(self):
+        cheap, pricey = self.predictor.predict_batch(['MAD-BCN'] * 2, [110.0, 190.0])
+        self.assertGreater(pricey.drop_probability, cheap.drop_probability)
+        self.assertIn(pricey.best_booking_window, ('wait_14d', 'wait_7d'))
+        self.assertLess(pricey.predicted_price, 190.0)
+
+    def test_predict_watchlist_scores_active_items(self):
+        items = [SimpleNamespace(route='MAD-BCN', threshold=140.0, last_price=175.0, active=True),
+                 SimpleNamespace(route='MAD-NYC', threshold=140.0, last_price=0.0, active=True),
+                 SimpleNamespace(route='BCN-LIS', threshold=140.0, last_price=160.0, active=False)]
+        alerts = self.predictor.predict_watchlist(items)
+        self.assertEqual([a.route for a in alerts], ['MAD-BCN', 'MAD-NYC'])
+        self.assertEqual([a.current_price for a in alerts], [175.0, 140.0])
+        self.assertEqual(self.predictor.predict_watchlist([]), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
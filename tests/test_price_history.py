@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Price History Store
+Cazador Supremo v14.0
+
+Tests segment layout, range queries, crash recovery and the analysis
+methods that read from the store
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+from datetime import datetime, timedelta
+
+import numpy as np
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from price_history import PriceHistoryStore, RECORD_DTYPE, monthly_summary, to_epoch
+    from advanced_search_methods import SeasonalTrendsAnalysis
+    from additional_search_methods import CheapestMonthFinder
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+class TestPriceHistoryStore(unittest.TestCase):
+    """Test appends and range queries against a brute-force filter"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.root = tempfile.mkdtemp()
+        self.store = PriceHistoryStore(self.root)
+
+        rng = np.random.default_rng(3)
+        n = 5000
+        self.routes = rng.choice(['MAD-BCN', 'MAD-LIS', 'BCN-ROM'], n)
+        self.ts = rng.integers(to_epoch('2025-11-01'), to_epoch('2026-03-01'), n)
+        self.prices = rng.uniform(40, 400, n).round(2)
+        self.store.append_batch(self.routes, self.prices, self.ts, sources='skyscanner', stops=1)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_one_segment_per_month(self):
+        self.assertEqual(self.store.segments(), ['2025-11', '2025-12', '2026-01', '2026-02'])
+        self.assertEqual(len(self.store), 5000)
+        size = os.path.getsize(os.path.join(self.root, 'prices-2026-01.seg'))
+        self.assertEqual(size % RECORD_DTYPE.itemsize, 0)
+        self.assertEqual(RECORD_DTYPE.itemsize, 18)
+
+    def test_range_query_matches_filter(self):
+        start, end = to_epoch('2025-12-15'), to_epoch('2026-01-20T12:00')
+        records = self.store.query('MAD-LIS', start, end)
+        mask = (self.routes == 'MAD-LIS') & (self.ts >= start) & (self.ts < end)
+
+        self.assertEqual(len(records), int(mask.sum()))
+        self.assertTrue(np.all(np.diff(records['ts']) >= 0))
+        np.testing.assert_array_equal(np.sort(records['cents']),
+                                      np.sort(np.rint(self.prices[mask] * 100).astype(np.uint32)))
+        self.assertTrue(np.all(records['stops'] == 1))
+
+        before = self.store.stats['segments_scanned']
+        self.store.query('MAD-LIS', start, end)
+        self.assertEqual(self.store.stats['segments_scanned'] - before, 2)
+
+    def test_unknown_route_and_empty_store(self):
+        self.assertEqual(len(self.store.query('XXX-YYY')), 0)
+        empty = PriceHistoryStore(os.path.join(self.root, 'missing'))
+        self.assertEqual(empty.segments(), [])
+        self.assertEqual(len(empty.query('MAD-BCN')), 0)
+        self.assertFalse(os.path.exists(os.path.join(self.root, 'missing')))
+
+    def test_reopen_and_append_after_partial_record(self):
+        path = os.path.join(self.root, 'prices-2026-02.seg')
+        with open(path, 'ab') as f:
+            f.write(b'\x01\x02\x03')  # torn write
+
+        reopened = PriceHistoryStore(self.root)
+        self.assertEqual(reopened.routes(), self.store.routes())
+        self.assertEqual(reopened.sources(), ['skyscanner'])
+        self.assertEqual(len(reopened), 5000)
+
+        reopened.append('MAD-BCN', 19.99, '2026-02-10T08:00', source='api')
+        latest = reopened.query('MAD-BCN', '2026-02-10', '2026-02-11')
+        self.assertIn(1999, latest['cents'].tolist())
+        self.assertEqual(os.path.getsize(path) % RECORD_DTYPE.itemsize, 0)
+        self.assertEqual(len(reopened), 5001)
+
+    def test_monthly_summary(self):
+        records = self.store.query('BCN-ROM')
+        summary = monthly_summary(records)
+        self.assertEqual([m['month'] for m in summary], self.store.segments())
+
+        january = [m for m in summary if m['month'] == '2026-01'][0]
+        mask = ((self.routes == 'BCN-ROM') & (self.ts >= to_epoch('2026-01-01'))
+                & (self.ts < to_epoch('2026-02-01')))
+        self.assertEqual(january['count'], int(mask.sum()))
+        self.assertAlmostEqual(january['min_price'], self.prices[mask].min())
+        self.assertAlmostEqual(january['avg_price'], self.prices[mask].mean(), places=6)
+        self.assertTrue(january['best_day'].startswith('2026-01-'))
+
+
+class TestHistoryReaders(unittest.TestCase):
+    """Test the analysis methods on a store with known prices"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.root = tempfile.mkdtemp()
+        self.store = PriceHistoryStore(self.root)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_seasonal_trends_reads_monthly_history(self):
+        now = datetime.now()
+        this_month = now.replace(day=1, hour=12)
+        last_month = (this_month - timedelta(days=1)).replace(day=5)
+        self.store.append_batch(['MAD-BCN'] * 4, [100, 120, 60, 80],
+                                [last_month, last_month, this_month, this_month])
+
+        result = SeasonalTrendsAnalysis(self.store).search('mad', 'bcn')
+        self.assertEqual([m['avg_price'] for m in result.results], [110.0, 70.0])
+        self.assertEqual(result.metadata['cheapest_month'], this_month.strftime('%Y-%m'))
+        self.assertAlmostEqual(result.metadata['trend_per_month'], -40.0)
+        self.assertIn('TENDENCIAS', SeasonalTrendsAnalysis(self.store).format_output(result))
+
+        empty = SeasonalTrendsAnalysis(self.store).search('MAD', 'LIS')
+        self.assertEqual(empty.results, [])
+
+    def test_cheapest_month_finder_uses_history(self):
+        now = datetime.now()
+        stamps, prices = [], []
+        for offset in range(12):
+            day = (now.replace(day=1) + timedelta(days=32 * offset)).replace(day=10)
+            day = day.replace(year=day.year - 1)
+            stamps += [day, day + timedelta(days=2)]
+            prices += [200 + 10 * offset, 220 + 10 * offset]
+        self.store.append_batch(['MAD-NYC'] * len(prices), prices, stamps)
+
+        months = CheapestMonthFinder(self.store).find_cheapest_months('MAD', 'NYC', months_ahead=12)
+        self.assertGreaterEqual(len(months), 11)
+        first = months[0]
+        self.assertEqual(first.min_price, 200)
+        self.assertEqual(first.avg_price, 210)
+        self.assertTrue(first.best_day.endswith('-10'))
+
+
+if __name__ == '__main__':
+    unittest.main()
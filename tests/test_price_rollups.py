@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Route Price Rollups
+Cazador Supremo v14.0
+
+Tests incremental rollups against aggregates recomputed from raw records,
+the quantile sketch error bound and store subscription
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import tempfile
+import shutil
+import sys
+import os
+
+import numpy as np
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from price_history import PriceHistoryStore, monthly_summary, to_epoch
+    from price_rollups import PriceRollups, bucket_keys, rollups_for
+    from advanced_search_methods import SeasonalTrendsAnalysis
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+class TestPriceRollups(unittest.TestCase):
+    """Test rollups fed by a store against brute-force aggregates"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.root = tempfile.mkdtemp()
+        self.store = PriceHistoryStore(self.root)
+
+        rng = np.random.default_rng(8)
+        n = 20000
+        first = to_epoch('2025-10-01')
+        self.store.append_batch(rng.choice(['MAD-BCN', 'MAD-LIS'], n), rng.uniform(30, 500, n).round(2),
+                                rng.integers(first, first + 120 * 86400, n))
+        self.rollups = rollups_for(self.store)
+
+        # after attaching: a vectorized batch and single appends
+        self.store.append_batch(['MAD-BCN'] * 50, rng.uniform(30, 500, 50).round(2),
+                                rng.integers(first, first + 120 * 86400, 50))
+        for price in (12.5, 999.0, 45.0):
+            self.store.append('MAD-BCN', price, '2025-12-24T18:30')
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def test_every_record_ingested_once(self):
+        self.assertIs(rollups_for(self.store), self.rollups)
+        self.assertEqual(self.rollups.get_stats()['ingested'], len(self.store))
+        self.assertEqual(self.rollups.routes(), ['MAD-BCN', 'MAD-LIS'])
+
+    def test_buckets_match_raw_records(self):
+        records = self.store.query('MAD-BCN')
+        prices = records['cents'] / 100.0
+        for granularity in ('hour', 'day', 'month'):
+            keys = bucket_keys(records['ts'], granularity)
+            buckets = self.rollups.buckets('MAD-BCN', granularity)
+            self.assertEqual(len(buckets), len(np.unique(keys)), granularity)
+            for bucket, key in zip(buckets[::7], np.unique(keys)[::7]):
+                mine = prices[keys == key]
+                self.assertEqual(bucket['count'], len(mine))
+                self.assertAlmostEqual(bucket['min_price'], mine.min())
+                self.assertAlmostEqual(bucket['max_price'], mine.max())
+                self.assertAlmostEqual(bucket['avg_price'], mine.mean(), places=6)
+
+        for rolled, raw in zip(self.rollups.monthly('MAD-BCN'), monthly_summary(records)):
+            for field in ('month', 'count', 'min_price', 'max_price', 'best_day'):
+                self.assertEqual(rolled[field], raw[field], field)
+            self.assertAlmostEqual(rolled['avg_price'], raw['avg_price'], places=6)
+
+    def test_range_bounds(self):
+        december = self.rollups.buckets('MAD-BCN', 'day', '2025-12-01', '2026-01-01')
+        self.assertEqual(len(december), 31)
+        self.assertEqual(december[0]['bucket'], '2025-12-01')
+        christmas_eve = [b for b in december if b['bucket'] == '2025-12-24'][0]
+        self.assertEqual(christmas_eve['min_price'], 12.5)
+        self.assertEqual(christmas_eve['max_price'], 999.0)
+        self.assertEqual(christmas_eve['min_ts'], to_epoch('2025-12-24T18:30'))
+
+    def test_sketch_relative_error(self):
+        prices = self.store.query('MAD-LIS')['cents'] / 100.0
+        alpha = self.rollups.histogram.relative_accuracy
+        for q in (0.1, 0.5, 0.9):
+            exact = np.sort(prices)[int(np.floor(q * (len(prices) - 1)))]
+            estimate = self.rollups.quantile('MAD-LIS', q, 'month')
+            self.assertLessEqual(abs(estimate - exact) / exact, alpha + 1e-9, q)
+
+        share = self.rollups.share_below('MAD-LIS', 200.0)
+        self.assertAlmostEqual(share, float(np.mean(prices < 200.0)), delta=0.01)
+
+    def test_scalar_ingest_and_errors(self):
+        rollups = PriceRollups()
+        rollups.ingest('MAD-BCN', 80, '2026-01-05T10:15')
+        rollups.ingest('MAD-BCN', 60, '2026-01-05T10:45')
+        hour = rollups.buckets('MAD-BCN', 'hour')
+        self.assertEqual(hour, [{'bucket': '2026-01-05T10', 'min_price': 60.0, 'avg_price': 70.0,
+                                 'max_price': 80.0, 'count': 2,
+                                 'min_ts': to_epoch('2026-01-05T10:45')}])
+        self.assertEqual(rollups.buckets('XXX-YYY', 'day'), [])
+        with self.assertRaises(ValueError):
+            rollups.buckets('MAD-BCN', 'week')
+        for granularity in ('hour', 'day'):
+            with self.assertRaises(ValueError):
+                rollups.sketch('MAD-BCN', granularity)
+
+    def test_out_of_order_buckets_stay_sorted(self):
+        rollups = PriceRollups()
+        for day in ('2026-01-20', '2026-01-05', '2026-01-31', '2026-01-05', '2025-12-31'):
+            rollups.ingest('MAD-BCN', 80, f'{day}T10:00')
+        days = rollups.buckets('MAD-BCN', 'day')
+        self.assertEqual([b['bucket'] for b in days],
+                         ['2025-12-31', '2026-01-05', '2026-01-20', '2026-01-31'])
+        january = rollups.buckets('MAD-BCN', 'day', '2026-01-05', '2026-01-31')
+        self.assertEqual([b['count'] for b in january], [2, 1])
+        self.assertEqual(rollups.buckets('MAD-BCN', 'day', '2026-02-01', '2026-01-01'), [])
+
+    def test_analysis_reads_rollups_not_records(self):
+        before = self.store.stats['queries']
+        SeasonalTrendsAnalysis(self.store).search('MAD', 'BCN', months=36)
+        self.assertEqual(self.store.stats['queries'], before)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Route Graph Index
+Cazador Supremo v14.0
+
+Tests Yen's k-cheapest stopover paths, snapshot refresh and StopoverOptimizer
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import random
+import time
+import sys
+import os
+from itertools import permutations
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from route_graph import RouteGraph, RouteGraphIndex
+    from additional_search_methods import StopoverOptimizer
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+class TestKCheapest(unittest.TestCase):
+    """Test Yen's algorithm against exhaustive enumeration"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def enumerate_paths(self, adjacency, origin, destination):
+        middle = [n for n in adjacency if n not in (origin, destination)]
+        paths = []
+        for stops in (1, 2):
+            for mid in permutations(middle, stops):
+                path = (origin,) + mid + (destination,)
+                if all(b in adjacency.get(a, {}) for a, b in zip(path, path[1:])):
+                    paths.append(sum(adjacency[a][b] for a, b in zip(path, path[1:])))
+        return sorted(paths)
+
+    def test_matches_enumeration(self):
+        """k cheapest totals equal the sorted list of all 1-2 stop paths"""
+        nodes = ['MAD', 'AMS', 'CDG', 'DXB', 'DOH', 'SIN']
+        for seed in range(10):
+            rng = random.Random(seed)
+            adjacency = {a: {b: rng.randint(50, 500) for b in nodes
+                             if b != a and rng.random() < 0.8} for a in nodes}
+            graph = RouteGraph(adjacency, {})
+
+            found = graph.k_cheapest('MAD', 'SIN', k=6)
+
+            expected = self.enumerate_paths(adjacency, 'MAD', 'SIN')[:6]
+            self.assertEqual([i.total_price for i in found], expected)
+            self.assertEqual(len({i.path for i in found}), len(found))
+            for itinerary in found:
+                self.assertIn(len(itinerary.stops), (1, 2))
+
+    def test_direct_leg_excluded(self):
+        """A cheap direct flight is never returned as a stopover"""
+        graph = RouteGraph({'MAD': {'SIN': 10, 'DXB': 300}, 'DXB': {'SIN': 300}},
+                           {'DXB': (4, 8)})
+
+        found = graph.k_cheapest('MAD', 'SIN', k=3)
+
+        self.assertEqual([i.path for i in found], [('MAD', 'DXB', 'SIN')])
+        self.assertEqual(found[0].layovers, ((4, 8),))
+
+    def test_max_stops(self):
+        """max_stops=1 drops two-stop paths"""
+        adjacency = {'MAD': {'AMS': 100}, 'AMS': {'DXB': 100}, 'DXB': {'SIN': 100}}
+        graph = RouteGraph(adjacency, {})
+        self.assertEqual(len(graph.k_cheapest('MAD', 'SIN', max_stops=2)), 1)
+        self.assertEqual(graph.k_cheapest('MAD', 'SIN', max_stops=1), [])
+
+
+class TestRouteGraphIndex(unittest.TestCase):
+    """Test leg caching and background refresh"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.calls = []
+
+        def fare(origin, dest):
+            self.calls.append((origin, dest))
+            return 100
+
+        self.index = RouteGraphIndex(fare, ['AMS', 'DXB', 'SIN'])
+
+    def test_legs_fetched_once(self):
+        """Repeated queries are served from the snapshot"""
+        self.index.k_cheapest('MAD', 'BKK')
+        fetched = len(self.calls)
+        self.index.k_cheapest('MAD', 'BKK')
+        self.index.k_cheapest('MAD', 'SIN')  # MAD-SIN is already a hub leg
+
+        self.assertEqual(len(self.calls), fetched)
+        self.assertEqual(len(self.calls), len(set(self.calls)))
+
+    def test_refresh_swaps_snapshot(self):
+        """A refresh refetches every known leg into a new snapshot"""
+        self.index.k_cheapest('MAD', 'BKK')
+        old = self.index.graph
+
+        new = self.index.refresh()
+
+        self.assertIsNot(old, new)
+        self.assertEqual(new.price('MAD', 'BKK'), 100)
+        self.assertEqual(self.index.get_stats()['refreshes'], 2)
+
+    def test_background_refresh(self):
+        """start() rebuilds the graph on its interval until stop()"""
+        self.index.refresh_interval = 0.01
+        self.index.start()
+        self.addCleanup(self.index.stop)
+        deadline = time.time() + 2
+        while self.index.stats['refreshes'] < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertGreaterEqual(self.index.stats['refreshes'], 2)
+
+
+class TestStopoverOptimizer(unittest.TestCase):
+    """Test the optimizer on top of the graph"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_stopovers_beat_direct(self):
+        """Only hub stopovers cheaper than the direct flight are listed"""
+        optimizer = StopoverOptimizer()
+
+        routes = optimizer.find_best_stopovers('MAD', 'SIN', max_stopovers=5)
+
+        direct = optimizer.graph.graph.price('MAD', 'SIN')
+        for route in routes:
+            self.assertIn(route.stopover, optimizer.HUB_CITIES)
+            self.assertLess(route.total_price, direct)
+            self.assertAlmostEqual(route.leg1_price + route.leg2_price, route.total_price)
+
+    def test_cheapest_itineraries(self):
+        """Multi-stop itineraries come back sorted and formatted"""
+        optimizer = StopoverOptimizer()
+
+        itineraries = optimizer.find_cheapest_itineraries('MAD', 'SYD', k=5)
+
+        totals = [i.total_price for i in itineraries]
+        self.assertEqual(len(itineraries), 5)
+        self.assertEqual(totals, sorted(totals))
+        self.assertIn('ESCALAS', optimizer.format_itineraries(itineraries))
+
+    def test_default_graph_is_shared_and_refreshing(self):
+        """Instances share one index whose refresh thread is running"""
+        first, second = StopoverOptimizer(), StopoverOptimizer()
+        self.assertIs(first.graph, second.graph)
+        self.assertTrue(first.graph._thread.is_alive())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,993 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Unit Tests for Search Cache System
+Cazador Supremo v14.0
+
+Tests SearchCacheManager and the cache backends behind it
+
+Author: @Juanka_Spain
+Version: 14.0.3
+Date: 2026-01-17
+"""
+
+import unittest
+import asyncio
+import sys
+import os
+import time
+import tempfile
+import threading
+import fnmatch
+import pickle
+from datetime import datetime
+from functools import partial
+
+# Add feature modules to path
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'src', 'features'))
+
+try:
+    from advanced_search_methods import BudgetSearch, FlexibleDatesCalendar, FlightResult, SearchResult
+    from search_analytics import SearchAnalyticsTracker
+    from search_cache import (
+        LRUCacheWithTTL,
+        ShardedLRUCache,
+        FrequencySketch,
+        SearchCacheManager,
+        SQLiteL2Cache,
+        RedisCacheAdapter,
+        TieredCache,
+        estimate_size,
+        cache_tags,
+        cached_search,
+        canonical_params
+    )
+    MODULES_AVAILABLE = True
+except ImportError as e:
+    MODULES_AVAILABLE = False
+    print(f"Warning: Could not import modules: {e}")
+
+
+class TestLRUCacheWithTTL(unittest.TestCase):
+    """Test the in-memory LRU backend"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_lru_eviction(self):
+        """Least recently used key is evicted first"""
+        cache = LRUCacheWithTTL(max_size=3, default_ttl=60)
+        for i in range(3):
+            cache.set(f"key{i}", i)
+        cache.get("key0")
+        cache.set("key3", 3)
+
+        self.assertIsNone(cache.get("key1"))
+        self.assertEqual(cache.get("key0"), 0)
+        self.assertEqual(cache.get_stats()['evictions'], 1)
+
+    def test_cleanup_expired_in_batches(self):
+        """Expired entries are removed through the heap in bounded batches"""
+        cache = LRUCacheWithTTL(max_size=1000, default_ttl=60)
+        cache.SET_EXPIRE_BUDGET = 0
+        for i in range(500):
+            cache.set(f"short{i}", i, ttl=0.01)
+        for i in range(100):
+            cache.set(f"long{i}", i)
+        time.sleep(0.02)
+
+        removed = cache.cleanup_expired(batch_size=32)
+        self.assertEqual(removed, 500)
+        self.assertEqual(len(cache.cache), 100)
+        self.assertEqual(cache.get("long5"), 5)
+
+    def test_overwritten_key_survives_old_expiry(self):
+        """A superseded heap entry does not remove the refreshed key"""
+        cache = LRUCacheWithTTL(max_size=10, default_ttl=60)
+        cache.set("key", "old", ttl=0.01)
+        cache.set("key", "new", ttl=60)
+        time.sleep(0.02)
+
+        self.assertEqual(cache.cleanup_expired(), 0)
+        self.assertEqual(cache.get("key"), "new")
+
+    def test_heap_stays_bounded_on_overwrites(self):
+        """Repeated overwrites do not grow the expiry heap without bound"""
+        cache = LRUCacheWithTTL(max_size=10, default_ttl=60)
+        for i in range(10000):
+            cache.set(f"key{i % 5}", i)
+
+        self.assertLessEqual(len(cache.expiry_heap), 2 * len(cache.ttl_map) + 65)
+
+
+class TestByteBudget(unittest.TestCase):
+    """Test memory-budgeted eviction"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_estimate_size_grows_with_content(self):
+        """A month of prices is estimated larger than an empty result"""
+        small = {'results': [], 'metadata': {}}
+        large = {'results': [], 'metadata': {'prices': {d: 100.0 + d for d in range(1, 32)}}}
+        self.assertGreater(estimate_size(large), estimate_size(small) + 31 * 24)
+
+    def test_evicts_by_total_bytes(self):
+        """LRU entries are evicted until the byte budget fits"""
+        cache = LRUCacheWithTTL(max_size=1000, max_bytes=1000, size_estimator=lambda v: v)
+        for i in range(5):
+            cache.set(f"search:budget:{i}", 300)
+
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['bytes_used'], 1000)
+        self.assertEqual(stats['size'], 3)
+        self.assertIsNone(cache.get("search:budget:0"))
+        self.assertEqual(cache.get("search:budget:4"), 300)
+
+    def test_method_quota_only_evicts_that_method(self):
+        """A method over its quota evicts its own entries, not others"""
+        cache = LRUCacheWithTTL(max_size=1000, byte_quotas={'flexible_dates': 500},
+                                size_estimator=lambda v: v)
+        cache.set("search:nonstop_only:a", 100)
+        for i in range(4):
+            cache.set(f"search:flexible_dates:{i}", 200)
+
+        stats = cache.get_stats()
+        self.assertEqual(stats['bytes_by_method'], {'nonstop_only': 100, 'flexible_dates': 400})
+        self.assertEqual(cache.get("search:nonstop_only:a"), 100)
+        self.assertEqual(stats['largest_entries'][0]['bytes'], 200)
+
+    def test_oversized_entry_rejected(self):
+        """A value larger than the budget is not cached"""
+        cache = LRUCacheWithTTL(max_size=10, max_bytes=100, size_estimator=lambda v: v)
+        cache.set("search:budget:small", 50)
+        cache.set("search:budget:huge", 500)
+
+        self.assertIsNone(cache.get("search:budget:huge"))
+        self.assertEqual(cache.get("search:budget:small"), 50)
+        self.assertEqual(cache.get_stats()['rejected'], 1)
+
+    def test_manager_only_indexes_stored_entries(self):
+        """Rejected writes leave no expiry or tag records behind"""
+        mgr = SearchCacheManager(max_bytes=2000)
+        mgr.cache_result('budget', {'found': 3}, origin='MAD', budget=300)
+        self.assertTrue(mgr.cache.set('search:x:y', 1))
+
+        mgr.cache_result('budget', {'prices': list(range(2000))}, origin='MAD', budget=300)
+        mgr.cache_result('flexible_dates', {'prices': list(range(2000))},
+                         origin='MAD', destination='MIA', month='2026-03')
+
+        self.assertIsNone(mgr.get_cached_result('budget', origin='MAD', budget=300))
+        self.assertEqual(mgr._expiry, {})
+        self.assertEqual(mgr.get_stats()['tags']['tagged_entries'], 0)
+        self.assertEqual(mgr._bounds, {})
+
+    def test_manager_reports_bytes(self):
+        """SearchCacheManager passes byte budgets to sharded caches"""
+        mgr = SearchCacheManager(shards=2, max_bytes=1_000_000,
+                                 byte_quotas={'flexible_dates': 200_000})
+        mgr.cache_result('flexible_dates', {'prices': list(range(31))},
+                         origin='MAD', destination='MIA', month='2026-03')
+
+        stats = mgr.get_stats()
+        self.assertGreater(stats['bytes_used'], 0)
+        self.assertIn('flexible_dates', stats['bytes_by_method'])
+        self.assertEqual(len(stats['largest_entries']), 1)
+
+
+class TestDiskTier(unittest.TestCase):
+    """Test the persistent SQLite L2 tier"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, 'search_cache.db')
+        self.params = {'origin': 'MAD', 'destination': 'MIA', 'month': '2026-03'}
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_demoted_entries_are_promoted_back(self):
+        """L1 capacity evictions land in L2 and come back on get"""
+        l2 = SQLiteL2Cache(self.path)
+        cache = TieredCache(lambda **kw: LRUCacheWithTTL(max_size=2, **kw), l2)
+        for i in range(5):
+            cache.set(f"search:budget:{i}", {'i': i}, ttl=60)
+        l2.flush()
+
+        self.assertEqual(cache.get("search:budget:0"), {'i': 0})
+        stats = cache.get_stats()
+        self.assertEqual(stats['l2']['demotions'], 4)  # 3 on set, 1 making room for key 0
+        self.assertEqual(stats['l2']['promotions'], 1)
+        cache.close()
+
+    def test_pending_delete_wins_over_queued_write(self):
+        """A delete is visible before the writer thread commits it"""
+        l2 = SQLiteL2Cache(self.path)
+        l2.put("search:budget:x", {'v': 1}, time.time() + 60)
+        l2.delete("search:budget:x")
+        self.assertIsNone(l2.get("search:budget:x"))
+        l2.flush()
+        self.assertIsNone(l2.get("search:budget:x"))
+        l2.close()
+
+    def test_expired_rows_not_served(self):
+        """L2 keeps absolute expiry and ignores expired rows"""
+        l2 = SQLiteL2Cache(self.path)
+        l2.put("search:budget:old", {'v': 1}, time.time() - 1)
+        l2.flush()
+        self.assertIsNone(l2.get("search:budget:old"))
+        self.assertEqual(l2.purge_expired(), 1)
+        l2.close()
+
+    def test_unsigned_rows_not_unpickled(self):
+        """Rows are HMAC-signed; tampered or foreign rows are ignored"""
+        l2 = SQLiteL2Cache(self.path)
+        l2.put("search:budget:x", {'v': 1}, time.time() + 60)
+        l2.flush()
+        self.assertEqual(oct(os.stat(self.path + '.key').st_mode & 0o777), '0o600')
+
+        with l2.lock:
+            l2.conn.execute("UPDATE entries SET value = ? WHERE key = ?",
+                            (pickle.dumps({'v': 2}), "search:budget:x"))
+            l2.conn.commit()
+        self.assertIsNone(l2.get("search:budget:x"))
+        l2.close()
+
+        other = SQLiteL2Cache(self.path, secret=b'another key')
+        other.put("search:budget:y", {'v': 3}, time.time() + 60)
+        other.close()
+        reopened = SQLiteL2Cache(self.path)
+        self.assertIsNone(reopened.get("search:budget:y"))
+        reopened.close()
+
+    def test_warm_restart(self):
+        """A new manager on the same file serves the cached result"""
+        mgr = SearchCacheManager(l2_path=self.path)
+        mgr.cache_result('flexible_dates', {'prices': {1: 485.0}}, **self.params)
+        mgr.close()
+
+        restarted = SearchCacheManager(l2_path=self.path)
+        self.assertEqual(restarted.get_cached_result('flexible_dates', **self.params),
+                         {'prices': {1: 485.0}})
+        self.assertFalse(restarted._is_stale(restarted._make_cache_key('flexible_dates',
+                                                                       **self.params)))
+        restarted.close()
+
+    def test_negative_entries_survive_restart(self):
+        """Empty results keep their own TTL and negative flag through L2"""
+        empty = SearchResult(method='flexible_dates', query=self.params, results=[],
+                             metadata={}, timestamp='')
+        mgr = SearchCacheManager(l2_path=self.path, negative_ttl=30)
+        mgr.cache_result('flexible_dates', empty, **self.params)
+        key = mgr._make_cache_key('flexible_dates', **self.params)
+        expiry = mgr._expiry[key]
+        mgr.close()
+
+        restarted = SearchCacheManager(l2_path=self.path, negative_ttl=30)
+        self.assertEqual(restarted.get_cached_result('flexible_dates', **self.params), empty)
+        self.assertIn(key, restarted._negative)
+        self.assertAlmostEqual(restarted._expiry[key][0], expiry[0], places=3)
+        self.assertEqual(restarted.get_stats()['lookups']['negative_hits'], 1)
+        restarted.close()
+
+    def test_tags_survive_restart(self):
+        """Tag invalidation reaches L2 rows, before and after promotion"""
+        mgr = SearchCacheManager(l2_path=self.path)
+        mgr.cache_result('nonstop_only', 'bcn', origin='MAD', destination='BCN', date='2026-04-02')
+        mgr.cache_result('nonstop_only', 'lis', origin='MAD', destination='LIS', date='2026-04-02')
+        mgr.cache_result('budget', 'bud', origin='BCN', budget=300)
+        mgr.close()
+
+        restarted = SearchCacheManager(l2_path=self.path)
+        self.assertEqual(restarted.invalidate_tag('MAD-BCN'), 1)
+        self.assertIsNone(restarted.get_cached_result('nonstop_only', origin='MAD',
+                                                      destination='BCN', date='2026-04-02'))
+        restarted.close()
+
+        promoted = SearchCacheManager(l2_path=self.path)
+        self.assertEqual(promoted.get_cached_result('nonstop_only', origin='MAD',
+                                                    destination='LIS', date='2026-04-02'), 'lis')
+        self.assertEqual(promoted.get_cached_result('budget', origin='BCN', budget=300), 'bud')
+        key = promoted._make_cache_key('budget', origin='BCN', budget=300)
+        self.assertIn(key, promoted._key_bound)
+        self.assertEqual(promoted.invalidate_tag('LIS-*'), 0)
+        self.assertEqual(promoted.invalidate_tag('MAD-LIS'), 1)
+        self.assertIsNone(promoted.get_cached_result('nonstop_only', origin='MAD',
+                                                     destination='LIS', date='2026-04-02'))
+        self.assertEqual(promoted.invalidate_tag('BCN'), 1)
+        self.assertIsNone(promoted.get_cached_result('budget', origin='BCN', budget=300))
+        promoted.close()
+
+
+class FakeRedis:
+    """
+    In-process stand-in for a Redis server and client.
+
+    Stores bytes with millisecond expiry and counts round trips: every
+    command is one, a pipeline is one at execute().
+    """
+
+    def __init__(self):
+        self.data = {}
+        self.round_trips = 0
+
+    def _alive(self, key):
+        entry = self.data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self.data[key]
+            return None
+        return value
+
+    def _set(self, key, value, ex=None, px=None):
+        if not isinstance(value, (bytes, bytearray)):
+            raise TypeError("FakeRedis stores bytes only")
+        ttl = px / 1000 if px is not None else ex
+        self.data[key] = (bytes(value), time.time() + ttl if ttl is not None else None)
+        return True
+
+    def ping(self):
+        self.round_trips += 1
+        return True
+
+    def get(self, key):
+        self.round_trips += 1
+        return self._alive(key)
+
+    def mget(self, keys):
+        self.round_trips += 1
+        return [self._alive(k) for k in keys]
+
+    def set(self, key, value, ex=None, px=None):
+        self.round_trips += 1
+        return self._set(key, value, ex, px)
+
+    def _delete(self, keys):
+        return sum(1 for k in keys if self._alive(k) is not None and self.data.pop(k))
+
+    def delete(self, *keys):
+        self.round_trips += 1
+        return self._delete(keys)
+
+    def scan_iter(self, match='*', count=None):
+        self.round_trips += 1
+        return iter([k for k in list(self.data) if fnmatch.fnmatchcase(k, match)])
+
+    def info(self, section=None):
+        self.round_trips += 1
+        return {'keyspace_hits': 0, 'keyspace_misses': 0, 'used_memory_human': '1K'}
+
+    def pipeline(self, transaction=True):
+        server = self
+
+        class Pipeline:
+            def __init__(self):
+                self.commands = []
+
+            def set(self, key, value, ex=None, px=None):
+                self.commands.append(partial(server._set, key, value, ex, px))
+                return self
+
+            def delete(self, *keys):
+                self.commands.append(partial(server._delete, keys))
+                return self
+
+            def execute(self):
+                server.round_trips += 1
+                return [command() for command in self.commands]
+
+        return Pipeline()
+
+
+class TestRedisCacheAdapter(unittest.TestCase):
+    """Test the Redis backend against FakeRedis"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.server = FakeRedis()
+        self.cache = RedisCacheAdapter(client=self.server, prefix='test:')
+
+    def test_batch_operations_use_one_round_trip(self):
+        """get_many is one MGET, set_many one pipeline"""
+        self.cache.set_many({f"search:budget:{i}": {'i': i} for i in range(50)}, ttl=60)
+        self.assertEqual(self.server.round_trips, 1)
+
+        found = self.cache.get_many([f"search:budget:{i}" for i in range(60)])
+        self.assertEqual(self.server.round_trips, 2)
+        self.assertEqual(len(found), 50)
+        self.assertEqual(found['search:budget:7'], {'i': 7})
+
+    def test_json_values_and_compression(self):
+        """Values round-trip as JSON; large payloads are compressed"""
+        calendar = {'prices': [[f"2026-03-{d:02d}", 100.0 + d] for d in range(1, 29)] * 20}
+        self.assertTrue(self.cache.set('search:flexible_dates:x', calendar))
+
+        raw, _ = self.server.data['test:search:flexible_dates:x']
+        self.assertEqual(raw[:1], RedisCacheAdapter.FORMAT_ZLIB)
+        self.assertEqual(self.cache.get('search:flexible_dates:x'), calendar)
+        self.assertEqual(self.cache.get_stats()['compressed'], 1)
+
+        self.cache.set('search:budget:small', {'a': 1})
+        raw, _ = self.server.data['test:search:budget:small']
+        self.assertEqual(raw, RedisCacheAdapter.FORMAT_JSON + b'{"a":1}')
+
+    def test_never_unpickles(self):
+        """Objects are not pickled into Redis and pickles are not loaded from it"""
+        self.assertTrue(self.cache.set('search:x:dt', datetime(2026, 3, 1)))
+        self.assertEqual(self.cache.get_stats()['unserializable'], 1)
+        self.assertNotIn('test:search:x:dt', self.server.data)
+        self.assertEqual(self.cache.get('search:x:dt'), datetime(2026, 3, 1))
+        self.assertTrue(self.cache.delete('search:x:dt'))
+        self.assertIsNone(self.cache.get('search:x:dt'))
+
+        self.server.set('test:search:x:evil', b'\x00' + pickle.dumps(datetime(2026, 3, 1)))
+        self.assertIsNone(self.cache.get('search:x:evil'))
+        self.assertEqual(self.cache.get_stats()['errors'], 1)
+
+    def test_clear_only_removes_prefixed_keys(self):
+        """clear() leaves other applications' keys alone"""
+        self.server.set('other:app:key', b'keep')
+        self.cache.set_many({'a': 1, 'b': 2})
+
+        self.cache.clear()
+
+        self.assertEqual(self.cache.get_many(['a', 'b']), {})
+        self.assertEqual(self.server.get('other:app:key'), b'keep')
+
+    def test_ttl_and_delete(self):
+        """Sub-second TTLs expire and delete reports existence"""
+        self.cache.set('short', 1, ttl=0.05)
+        self.cache.set('long', 2, ttl=60)
+        time.sleep(0.08)
+
+        self.assertIsNone(self.cache.get('short'))
+        self.assertTrue(self.cache.delete('long'))
+        self.assertFalse(self.cache.delete('long'))
+
+    def test_search_results_round_trip(self):
+        """Real SearchResults are stored in Redis as JSON and read back equal"""
+        mgr = SearchCacheManager(use_redis=True, client=self.server, prefix='mgr:')
+        budget = BudgetSearch().search(origin='MAD', budget=300, month='2026-03')
+        calendar = FlexibleDatesCalendar().search(origin='MAD', destination='MIA', month='2026-03')
+        flights = SearchResult(method='nonstop_only', query={'route': ('MAD', 'BCN')}, metadata={},
+                               timestamp='', results=[FlightResult('MAD', 'BCN', '2026-03-01', 80.0)])
+        mgr.cache_result('budget', budget, origin='MAD', budget=300, month='2026-03')
+        mgr.cache_result('flexible_dates', calendar, origin='MAD', destination='MIA', month='2026-03')
+        mgr.cache_result('nonstop_only', flights, origin='MAD', destination='BCN', date='2026-03-01')
+
+        self.assertEqual(mgr.cache.get_stats()['unserializable'], 0)
+        self.assertEqual(mgr.get_cached_result('budget', origin='MAD', budget=300, month='2026-03'),
+                         budget)
+        self.assertEqual(mgr.get_cached_result('flexible_dates', origin='MAD', destination='MIA',
+                                               month='2026-03'), calendar)
+        self.assertEqual(mgr.get_cached_result('nonstop_only', origin='MAD', destination='BCN',
+                                               date='2026-03-01'), flights)
+
+    def test_manager_on_redis(self):
+        """SearchCacheManager works unchanged on the Redis backend"""
+        mgr = SearchCacheManager(use_redis=True, client=self.server, prefix='mgr:')
+        mgr.cache_result('budget', {'found': 3}, origin='MAD', budget=300)
+
+        self.assertEqual(mgr.get_cached_result('budget', origin='MAD', budget=300), {'found': 3})
+        self.assertEqual(mgr.get_stats()['backend'], 'redis')
+        mgr.invalidate()
+        self.assertIsNone(mgr.get_cached_result('budget', origin='MAD', budget=300))
+
+
+class TestTagInvalidation(unittest.TestCase):
+    """Test the route/origin/month tag index"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.mgr = SearchCacheManager()
+        self.mgr.cache_result('flexible_dates', 'fd', origin='MAD', destination='BCN', month='2026-03')
+        self.mgr.cache_result('nonstop_only', 'ns', origin='mad', destination='bcn', date='2026-04-02')
+        self.mgr.cache_result('flexible_dates', 'other', origin='MAD', destination='LIS', month='2026-03')
+        self.mgr.cache_result('budget', 'bud', origin='MAD', budget=300, month='2026-05')
+        self.mgr.cache_result('multi_city', 'mc', cities=['BCN', 'MAD', 'BCN'],
+                              start_date='2026-06-01', stay_days=[2, 2])
+
+    def cached(self):
+        return {k for k in ('fd', 'ns', 'other', 'bud', 'mc')
+                if any(entry[1] == k for entry in self.mgr.cache.items_snapshot())}
+
+    def test_cache_tags(self):
+        """Route, origin and month tags come from the parameters"""
+        self.assertEqual(cache_tags({'origin': 'mad', 'destination': 'bcn', 'date': '2026-04-02'}),
+                         {'MAD', 'MAD-BCN', '2026-04'})
+        self.assertEqual(cache_tags({'origin': 'MAD', 'budget': 300}), {'MAD', 'MAD-*'})
+
+    def test_route_invalidation_across_methods(self):
+        """invalidate_tag('MAD-BCN') clears that route and origin-wide searches"""
+        removed = self.mgr.invalidate_tag('MAD-BCN')
+
+        self.assertEqual(removed, 4)
+        self.assertEqual(self.cached(), {'other'})
+
+    def test_month_and_origin_tags(self):
+        """Months and origins are tags too"""
+        self.assertEqual(self.mgr.invalidate_tag('2026-03'), 2)
+        self.assertEqual(self.cached(), {'ns', 'bud', 'mc'})
+        self.assertEqual(self.mgr.invalidate_tag('MAD'), 2)
+        self.assertEqual(self.cached(), {'mc'})
+
+    def test_index_cleaned_on_eviction_and_invalidate(self):
+        """Evicted or invalidated entries leave no tag index residue"""
+        mgr = SearchCacheManager(max_size=2)
+        for i, dest in enumerate(('BCN', 'LIS', 'OPO')):
+            mgr.cache_result('nonstop_only', i, origin='MAD', destination=dest, date='2026-04-02')
+
+        self.assertEqual(mgr.get_stats()['tags']['tagged_entries'], 2)
+        self.assertNotIn('MAD-BCN', mgr._tag_index)
+
+        mgr.invalidate('nonstop_only', origin='MAD', destination='LIS', date='2026-04-02')
+        mgr.invalidate_tag('MAD-OPO')
+        self.assertEqual(mgr._tag_index, {})
+        self.assertEqual(mgr._key_tags, {})
+
+
+class TestQuerySubsumption(unittest.TestCase):
+    """Test canonical keys and answers derived from broader cached queries"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.mgr = SearchCacheManager()
+
+    def test_canonical_params(self):
+        """Case, padding, whole floats and unordered lists are normalized"""
+        params = canonical_params({'origin': 'mad', 'month': '2026-3', 'date': '2026-3-7',
+                                   'budget': 300.0, 'airlines': ['ux', 'IB'],
+                                   'cities': ['mad', 'bcn']})
+        self.assertEqual(params, {'origin': 'MAD', 'month': '2026-03', 'date': '2026-03-07',
+                                  'budget': 300, 'airlines': ['IB', 'UX'],
+                                  'cities': ['MAD', 'BCN']})
+
+        self.mgr.cache_result('budget', 'r', origin='MAD', budget=300, month='2026-03')
+        self.assertEqual(self.mgr.get_cached_result('budget', origin='mad', budget=300.0,
+                                                    month='2026-3'), 'r')
+
+    def test_budget_derived_from_larger_budget(self):
+        """A €150 search is answered by filtering a cached €300 result"""
+        broad = BudgetSearch().search(origin='MAD', budget=300, month='2026-03')
+        self.mgr.cache_result('budget', broad, origin='MAD', budget=300, month='2026-03')
+
+        narrow = self.mgr.get_cached_result('budget', origin='MAD', budget=150, month='2026-03')
+        expected = BudgetSearch().search(origin='MAD', budget=150, month='2026-03')
+
+        self.assertEqual([d['code'] for d in narrow.results], [d['code'] for d in expected.results])
+        self.assertEqual([round(d['savings_pct'], 6) for d in narrow.results],
+                         [round(d['savings_pct'], 6) for d in expected.results])
+        self.assertEqual(narrow.query['budget'], 150)
+        self.assertEqual(broad.results[0]['savings_pct'], 75.0)  # cached copy untouched
+
+        self.assertIsNone(self.mgr.get_cached_result('budget', origin='MAD', budget=500, month='2026-03'))
+        self.assertIsNone(self.mgr.get_cached_result('budget', origin='MAD', budget=150, month='2026-04'))
+
+    def test_exact_and_derived_hits_reported_separately(self):
+        """Exact hits, derived hits and misses have their own counters"""
+        broad = BudgetSearch().search(origin='MAD', budget=300, month='2026-03')
+        self.mgr.cache_result('budget', broad, origin='MAD', budget=300, month='2026-03')
+
+        self.mgr.get_cached_result('budget', origin='MAD', budget=300, month='2026-03')
+        self.mgr.get_cached_result('budget', origin='MAD', budget=100, month='2026-03')
+        self.mgr.get_cached_result('budget', origin='BCN', budget=100, month='2026-03')
+
+        lookups = self.mgr.get_stats()['lookups']
+        self.assertEqual((lookups['hits'], lookups['derived_hits'], lookups['misses']), (1, 1, 1))
+        self.assertEqual(lookups['derived_hit_rate'], '33.3%')
+
+    def test_invalidated_source_is_not_used(self):
+        """Removing the broad entry also removes it from the range index"""
+        self.mgr.cache_result('budget', BudgetSearch().search(origin='MAD', budget=300, month='2026-03'),
+                              origin='MAD', budget=300, month='2026-03')
+        self.mgr.invalidate_tag('MAD')
+
+        self.assertIsNone(self.mgr.get_cached_result('budget', origin='MAD', budget=150, month='2026-03'))
+        self.assertEqual(self.mgr._bounds, {})
+
+
+class TestTinyLFUAdmission(unittest.TestCase):
+    """Test the frequency sketch and admission filter"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_sketch_counts_and_ages(self):
+        """Estimates never under-count and halve on aging"""
+        sketch = FrequencySketch(capacity=100, sample_factor=1000)
+        for _ in range(8):
+            sketch.increment('search:flexible_dates:MAD-BCN')
+        sketch.increment('search:budget:once')
+
+        self.assertGreaterEqual(sketch.frequency('search:flexible_dates:MAD-BCN'), 8)
+        self.assertGreaterEqual(sketch.frequency('search:budget:once'), 1)
+
+        sketch._age()
+        self.assertGreaterEqual(sketch.frequency('search:flexible_dates:MAD-BCN'), 4)
+        self.assertLess(sketch.frequency('search:flexible_dates:MAD-BCN'), 8)
+
+    def test_hot_entries_survive_one_off_flood(self):
+        """One-off keys do not push out frequently read entries"""
+        plain = LRUCacheWithTTL(max_size=10, default_ttl=60)
+        filtered = LRUCacheWithTTL(max_size=10, default_ttl=60, admission=True)
+
+        for cache in (plain, filtered):
+            for i in range(10):
+                key = f"search:flexible_dates:hot{i}"
+                for _ in range(3):
+                    cache.get(key)
+                cache.set(key, i)
+            for i in range(50):
+                key = f"search:nonstop_only:once{i}"
+                cache.get(key)
+                cache.set(key, i)
+
+        hot = [f"search:flexible_dates:hot{i}" for i in range(10)]
+        self.assertEqual(sum(plain.get(k) is not None for k in hot), 0)
+        self.assertEqual(sum(filtered.get(k) is not None for k in hot), 10)
+        self.assertEqual(filtered.get_stats()['admission']['rejected'], 50)
+
+    def test_admits_while_not_full(self):
+        """The filter only applies once the cache is full"""
+        cache = LRUCacheWithTTL(max_size=3, default_ttl=60, admission=True)
+        for i in range(3):
+            cache.set(f"k{i}", i)
+
+        self.assertEqual(len(cache.cache), 3)
+        self.assertEqual(cache.admission_rejected, 0)
+
+    def test_manager_option(self):
+        """SearchCacheManager passes the option to the sharded backend"""
+        mgr = SearchCacheManager(max_size=64, shards=4, admission=True)
+        self.assertIn('admission', mgr.get_stats())
+
+
+class TestCachedSearchDecorator(unittest.TestCase):
+    """Test the cached_search decorator"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.mgr = SearchCacheManager(negative_ttl=0.1)
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        self.tracker = SearchAnalyticsTracker(os.path.join(self.tmpdir.name, 'analytics.json'))
+        self.calls = []
+
+    def test_positional_and_keyword_calls_share_key(self):
+        """Keys come from the bound signature, defaults included"""
+        @cached_search(self.mgr, method='nonstop_only')
+        def search(origin, destination, date, cabin='economy'):
+            self.calls.append((origin, destination, date, cabin))
+            return ['IB123']
+
+        search('MAD', 'BCN', '2026-04-02')
+        search(origin='mad', destination='BCN', date='2026-04-02', cabin='economy')
+        search('MAD', 'BCN', '2026-04-02', 'business')
+
+        self.assertEqual(len(self.calls), 2)
+
+    def test_empty_results_are_negatively_cached(self):
+        """Empty results are cached, but only for negative_ttl"""
+        @cached_search(self.mgr, method='redeye')
+        def search(origin, destination, date):
+            self.calls.append(date)
+            return []
+
+        self.assertEqual(search('MAD', 'BCN', '2026-04-02'), [])
+        self.assertEqual(search('MAD', 'BCN', '2026-04-02'), [])
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.mgr.get_stats()['lookups']['negative_hits'], 1)
+
+        time.sleep(0.15)
+        search('MAD', 'BCN', '2026-04-02')
+        self.assertEqual(len(self.calls), 2)
+
+    def test_coroutine_methods(self):
+        """Async methods are cached and named after self.name"""
+        test = self
+
+        class Search:
+            name = 'group_booking'
+
+            @cached_search(self.mgr)
+            async def search(self, origin, destination, date, passengers=2):
+                test.calls.append(passengers)
+                await asyncio.sleep(0)
+                return SearchResult(method='group_booking', query={}, results=[{'price': 90}],
+                                    metadata={}, timestamp='')
+
+        async def main():
+            s = Search()
+            first = await s.search('MAD', 'BCN', '2026-04-02')
+            second = await s.search('MAD', 'BCN', date='2026-04-02', passengers=2)
+            return first, second
+
+        first, second = asyncio.run(main())
+        self.assertIs(first, second)
+        self.assertEqual(self.calls, [2])
+        self.assertIsNotNone(self.mgr.get_cached_result(
+            'group_booking', origin='MAD', destination='BCN', date='2026-04-02', passengers=2))
+
+    def test_metrics_sent_to_analytics(self):
+        """Each call reports latency and hit/miss to SearchAnalyticsTracker"""
+        @cached_search(self.mgr, method='budget', analytics=self.tracker)
+        def search(origin, budget, month):
+            time.sleep(0.01)
+            return [{'code': 'BCN', 'price': 75}]
+
+        search('MAD', 300, '2026-03')
+        search('MAD', 300, '2026-03')
+
+        events = self.tracker.events
+        self.assertEqual([e.cached for e in events], [False, True])
+        self.assertEqual(events[0].result_count, 1)
+        self.assertGreater(events[0].duration_ms, events[1].duration_ms)
+        self.assertEqual(self.tracker.get_cache_hit_rate('budget'), 50.0)
+
+
+class TestShardedLRUCache(unittest.TestCase):
+    """Test the lock-striped LRU backend"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+
+    def test_same_api_and_aggregated_stats(self):
+        """Shards behave like one cache and stats add up"""
+        cache = ShardedLRUCache(max_size=800, default_ttl=60, shards=8)
+        for i in range(40):
+            cache.set(f"key{i}", i)
+        for i in range(40):
+            self.assertEqual(cache.get(f"key{i}"), i)
+        self.assertIsNone(cache.get("missing"))
+        self.assertTrue(cache.delete("key0"))
+
+        stats = cache.get_stats()
+        self.assertEqual(stats['shards'], 8)
+        self.assertEqual(stats['size'], 39)
+        self.assertEqual(stats['hits'], 40)
+        self.assertEqual(stats['misses'], 1)
+
+    def test_evictions_aggregate(self):
+        """Evictions from every shard are reported"""
+        cache = ShardedLRUCache(max_size=16, default_ttl=60, shards=4)
+        for i in range(200):
+            cache.set(f"key{i}", i)
+
+        stats = cache.get_stats()
+        self.assertLessEqual(stats['size'], 16)
+        self.assertEqual(stats['evictions'], 200 - stats['size'])
+
+    def test_manager_config_option(self):
+        """SearchCacheManager uses the sharded cache when shards > 1"""
+        mgr = SearchCacheManager(shards=4)
+        self.assertIsInstance(mgr.cache, ShardedLRUCache)
+
+        mgr.cache_result('budget', {'total_found': 3}, origin='MAD', budget=300, month='2026-07')
+        self.assertEqual(
+            mgr.get_cached_result('budget', origin='MAD', budget=300, month='2026-07'),
+            {'total_found': 3}
+        )
+        self.assertEqual(mgr.get_stats()['shards'], 4)
+
+
+class TestSingleFlight(unittest.TestCase):
+    """Test coalescing of concurrent identical searches"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.mgr = SearchCacheManager()
+        self.params = {'origin': 'MAD', 'destination': 'MIA', 'month': '2026-03'}
+
+    def test_threads_share_one_computation(self):
+        """Concurrent threads compute a missing key once"""
+        calls = []
+        results = []
+
+        def compute():
+            calls.append(1)
+            time.sleep(0.1)
+            return {'prices': [100, 200]}
+
+        def worker():
+            results.append(self.mgr.get_or_compute('flexible_dates', compute, **self.params))
+
+        threads = [threading.Thread(target=worker) for _ in range(10)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 10)
+        self.assertTrue(all(r is results[0] for r in results))
+
+        stats = self.mgr.get_stats()['single_flight']
+        self.assertEqual(stats['computations'], 1)
+        self.assertEqual(stats['coalesced'], 9)
+        self.assertEqual(stats['in_flight'], 0)
+
+    def test_async_callers_share_one_computation(self):
+        """Concurrent coroutines await the same computation"""
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            await asyncio.sleep(0.05)
+            return {'prices': [100]}
+
+        async def main():
+            return await asyncio.gather(*(
+                self.mgr.aget_or_compute('flexible_dates', compute, **self.params)
+                for _ in range(20)
+            ))
+
+        results = asyncio.run(main())
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(results), 20)
+        self.assertEqual(self.mgr.get_stats()['single_flight']['coalesced'], 19)
+
+        # Later callers hit the cache
+        cached = self.mgr.get_cached_result('flexible_dates', **self.params)
+        self.assertEqual(cached, {'prices': [100]})
+
+    def test_errors_propagate_and_are_not_cached(self):
+        """A failed computation raises in every waiter and is not cached"""
+        async def compute():
+            await asyncio.sleep(0.02)
+            raise RuntimeError("provider down")
+
+        async def main():
+            return await asyncio.gather(*(
+                self.mgr.aget_or_compute('flexible_dates', compute, **self.params)
+                for _ in range(3)
+            ), return_exceptions=True)
+
+        results = asyncio.run(main())
+        self.assertTrue(all(isinstance(r, RuntimeError) for r in results))
+        self.assertIsNone(self.mgr.get_cached_result('flexible_dates', **self.params))
+        self.assertEqual(self.mgr.get_stats()['single_flight']['failures'], 1)
+
+
+class TestStaleWhileRevalidate(unittest.TestCase):
+    """Test soft/hard TTL handling"""
+
+    def setUp(self):
+        if not MODULES_AVAILABLE:
+            self.skipTest("Modules not available")
+        self.mgr = SearchCacheManager()
+        self.mgr.ttl_config['lastminute'] = 0.05
+        self.mgr.hard_ttl_config['lastminute'] = 0.5
+        self.params = {'origin': 'MAD', 'days': 7}
+
+    def test_stale_result_served_while_refreshing(self):
+        """Between soft and hard TTL the old value is returned and refreshed once"""
+        versions = iter(range(100))
+        release = threading.Event()
+        refreshed = threading.Event()
+
+        def compute():
+            value = {'version': next(versions)}
+            if value['version'] > 0:
+                release.wait(1)
+                refreshed.set()
+            return value
+
+        self.mgr.ttl_config['lastminute'] = 0.2
+        first = self.mgr.get_or_compute('lastminute', compute, **self.params)
+        self.assertEqual(first['version'], 0)
+
+        time.sleep(0.25)
+        stale = [self.mgr.get_or_compute('lastminute', compute, **self.params) for _ in range(5)]
+        self.assertTrue(all(r['version'] == 0 for r in stale))
+
+        release.set()
+        self.assertTrue(refreshed.wait(1))
+        time.sleep(0.02)
+        fresh = self.mgr.get_or_compute('lastminute', compute, **self.params)
+        self.assertEqual(fresh['version'], 1)
+
+        stats = self.mgr.get_stats()['stale_while_revalidate']
+        self.assertEqual(stats['stale_hits'], 5)
+        self.assertEqual(stats['refreshes'], 1)
+
+    def test_async_refresh_failure_keeps_stale_value(self):
+        """A failed refresh is counted and the stale value keeps being served"""
+        calls = []
+
+        async def compute():
+            calls.append(1)
+            if len(calls) > 1:
+                raise RuntimeError("provider down")
+            return {'version': 0}
+
+        async def main():
+            await self.mgr.aget_or_compute('lastminute', compute, **self.params)
+            await asyncio.sleep(0.1)
+            stale = await self.mgr.aget_or_compute('lastminute', compute, **self.params)
+            await asyncio.sleep(0.05)
+            return stale
+
+        stale = asyncio.run(main())
+        self.assertEqual(stale, {'version': 0})
+        self.assertEqual(self.mgr.get_stats()['stale_while_revalidate']['refresh_failures'], 1)
+        self.assertEqual(self.mgr.get_cached_result('lastminute', allow_stale=True,
+                                                    **self.params), {'version': 0})
+        self.assertIsNone(self.mgr.get_cached_result('lastminute', **self.params))
+
+    def test_hard_ttl_falls_through_to_miss(self):
+        """After the hard TTL the result is recomputed synchronously"""
+        self.mgr.hard_ttl_config['lastminute'] = 0.1
+        versions = iter(range(100))
+        compute = lambda: {'version': next(versions)}
+
+        self.mgr.get_or_compute('lastminute', compute, **self.params)
+        time.sleep(0.15)
+        result = self.mgr.get_or_compute('lastminute', compute, **self.params)
+
+        self.assertEqual(result['version'], 1)
+        self.assertEqual(self.mgr.get_stats()['stale_while_revalidate']['stale_hits'], 0)
+
+    def test_interrupted_refresh_releases_key(self):
+        """A refresh ended by a BaseException still resolves its flight"""
+        def compute():
+            if self.mgr.get_stats()['stale_while_revalidate']['refreshes']:
+                raise SystemExit()
+            return {'version': 0}
+
+        self.mgr.get_or_compute('lastminute', compute, **self.params)
+        time.sleep(0.1)
+        excepthook, threading.excepthook = threading.excepthook, lambda args: None
+        try:
+            self.mgr.get_or_compute('lastminute', compute, **self.params)
+            deadline = time.time() + 1
+            while self.mgr._inflight and time.time() < deadline:
+                time.sleep(0.01)
+            time.sleep(0.05)  # let the thread finish raising
+        finally:
+            threading.excepthook = excepthook
+        self.assertEqual(self.mgr._inflight, {})
+
+        async def cancelled():
+            raise asyncio.CancelledError()
+
+        async def main():
+            await self.mgr.aget_or_compute('lastminute', cancelled, **self.params)
+            await asyncio.sleep(0.02)
+
+        asyncio.run(main())
+        self.assertEqual(self.mgr._inflight, {})
+        stats = self.mgr.get_stats()['stale_while_revalidate']
+        self.assertEqual((stats['refreshes'], stats['refresh_failures']), (2, 2))
+
+    def test_prune_expiry_in_batches(self):
+        """Records past their hard TTL are dropped through the expiry heap"""
+        for i in range(100):
+            self.mgr.cache_result('lastminute', {'i': i}, origin='MAD', days=i)
+        self.mgr.cache_result('budget', {'kept': True}, origin='MAD', budget=300)
+        for _ in range(50):  # overwrites leave superseded heap entries
+            self.mgr.cache_result('budget', {'kept': True}, origin='MAD', budget=300)
+        self.assertLessEqual(len(self.mgr._expiry_heap), 2 * len(self.mgr._expiry) + 64)
+        time.sleep(0.55)
+
+        self.assertEqual(self.mgr._prune_expiry(batch_size=16), 100)
+        self.assertEqual(len(self.mgr._expiry), 1)
+        self.assertEqual(self.mgr.get_stats()['tags']['tagged_entries'], 1)
+        self.assertEqual(self.mgr._prune_expiry(), 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)